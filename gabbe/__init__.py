@@ -4,4 +4,4 @@ __version__ = "0.8.0"
 # (e.g. argparse setup, path resolution) when the package is merely imported
 # as a library.  Use explicit imports where needed:
 #   from gabbe.main import main
-#   from gabbe.database import init_db, get_db
+#   from gabbe.database import init_db, db_connection
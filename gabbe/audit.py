@@ -1,13 +1,28 @@
 from __future__ import annotations
+import atexit
+import contextvars
 import json
 import logging
+import os
+import queue
 import sqlite3
+import threading
 import time
 import uuid
+from contextlib import contextmanager
 from functools import wraps
 from datetime import datetime, timezone
-from .database import get_db
-from .config import GABBE_DIR, GABBE_OTEL_ENABLED
+from . import database
+from .database import acquire_connection, commit_unless_nested
+from .config import (
+    GABBE_DIR,
+    GABBE_OTEL_ENABLED,
+    GABBE_AUDIT_ASYNC,
+    AUDIT_QUEUE_SIZE,
+    AUDIT_BATCH_SIZE,
+    AUDIT_FLUSH_INTERVAL_MS,
+    AUDIT_ENQUEUE_TIMEOUT_MS,
+)
 
 # Set up local text logger
 logger = logging.getLogger("gabbe.audit")
@@ -23,25 +38,285 @@ if GABBE_OTEL_ENABLED:
 else:
     otel_tracer = None
 
+_current_span = contextvars.ContextVar("gabbe_current_span", default=None)
+
+
+def current_span() -> dict | None:
+    """Return the span context activated by the caller (see ``active_span``), if any."""
+    return _current_span.get()
+
+
+@contextmanager
+def active_span(span_ctx: dict):
+    """Make *span_ctx* the default parent for spans started inside the block."""
+    token = _current_span.set(span_ctx)
+    try:
+        yield span_ctx
+    finally:
+        _current_span.reset(token)
+
+
+def annotate_span(**fields):
+    """Attach *fields* to the active span's metadata (recorded when it ends)."""
+    span_ctx = _current_span.get()
+    if span_ctx is not None:
+        span_ctx.setdefault("metadata", {}).update(fields)
+
+
+_INSERT_SPAN_SQL = """
+    INSERT INTO audit_spans 
+    (run_id, span_id, parent_span_id, timestamp, event_type, node_name, 
+     input_data, output_data, reasoning_content, model_name, 
+     prompt_tokens, completion_tokens, reasoning_tokens, cache_hit_tokens, 
+     cost_usd, duration_ms, status, metadata)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+class SpanWriter:
+    """Background writer that batches audit spans into SQLite and JSONL.
+
+    Spans are put on a bounded queue; a daemon thread drains it and writes a
+    batch with one ``executemany`` + commit once ``batch_size`` spans are
+    waiting or ``flush_interval`` seconds have passed since the first one.
+    JSONL lines go through one persistent buffered handle per log file.
+
+    When the queue is full, ``submit`` waits up to ``enqueue_timeout`` seconds
+    (backpressure) and then drops the span rather than stalling the agent.
+    """
+
+    _FLUSH = object()
+    _STOP = object()
+
+    def __init__(self, queue_size: int = AUDIT_QUEUE_SIZE, batch_size: int = AUDIT_BATCH_SIZE,
+                 flush_interval: float = AUDIT_FLUSH_INTERVAL_MS / 1000.0,
+                 enqueue_timeout: float = AUDIT_ENQUEUE_TIMEOUT_MS / 1000.0, autostart: bool = True):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._handles = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+        self._stats = {
+            "enqueued": 0, "written": 0, "dropped": 0, "backpressure_waits": 0,
+            "batches": 0, "write_errors": 0, "max_queue_depth": 0,
+        }
+        if autostart:
+            self.start()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="gabbe-span-writer", daemon=True)
+            self._thread.start()
+
+    def submit(self, db_path, row: tuple, jsonl_path, record: dict) -> bool:
+        """Queue one span. Returns False if it was dropped under backpressure."""
+        item = (str(db_path), row, jsonl_path, record)
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            with self._lock:
+                self._stats["backpressure_waits"] += 1
+            try:
+                if not self.enqueue_timeout:
+                    raise queue.Full
+                self._queue.put(item, timeout=self.enqueue_timeout)
+            except queue.Full:
+                with self._lock:
+                    self._stats["dropped"] += 1
+                    dropped = self._stats["dropped"]
+                if dropped == 1 or dropped % 1000 == 0:
+                    logger.warning("Audit span queue full; %d span(s) dropped so far.", dropped)
+                return False
+        with self._lock:
+            self._stats["enqueued"] += 1
+            depth = self._queue.qsize()
+            if depth > self._stats["max_queue_depth"]:
+                self._stats["max_queue_depth"] = depth
+        return True
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Block until every span submitted before this call has been written."""
+        if self._thread is None or not self._thread.is_alive():
+            return self._queue.empty()
+        done = threading.Event()
+        self._queue.put((self._FLUSH, done))
+        return done.wait(timeout)
+
+    def release(self, jsonl_path, timeout: float | None = 5.0) -> bool:
+        """Close the persistent JSONL handle for a finished run (after a flush)."""
+        done = threading.Event()
+        if self._thread is None or not self._thread.is_alive():
+            self._close_handle(str(jsonl_path))
+            return self._queue.empty()
+        self._queue.put((self._FLUSH, done, str(jsonl_path)))
+        return done.wait(timeout)
+
+    def close(self, timeout: float | None = 5.0):
+        """Drain the queue, stop the worker and close all file handles."""
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put((self._STOP,))
+            self._thread.join(timeout)
+        for path in list(self._handles):
+            self._close_handle(path)
+
+    def stats(self) -> dict:
+        with self._lock:
+            snap = dict(self._stats)
+        snap["queue_depth"] = self._queue.qsize()
+        return snap
+
+    def _run(self):
+        batch = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is None:
+                self._write_safely(batch)
+                batch, deadline = [], None
+                continue
+            if item[0] is self._FLUSH or item[0] is self._STOP:
+                self._write_safely(batch)
+                batch, deadline = [], None
+                if item[0] is self._STOP:
+                    return
+                try:
+                    if len(item) > 2:
+                        self._close_handle(item[2])
+                finally:
+                    item[1].set()
+                continue
+
+            batch.append(item)
+            if deadline is None:
+                deadline = time.monotonic() + self.flush_interval
+            if len(batch) >= self.batch_size:
+                self._write_safely(batch)
+                batch, deadline = [], None
+
+    def _write_safely(self, batch):
+        # Anything escaping here would kill the worker and leave flush() and
+        # release() waiting on events nobody sets.
+        try:
+            self._write_batch(batch)
+        except Exception:
+            with self._lock:
+                self._stats["write_errors"] += len(batch)
+            logger.exception("Failed to write %d audit span(s)", len(batch))
+
+    def _write_batch(self, batch):
+        if not batch:
+            return
+        by_db = {}
+        for db_path, row, _, _ in batch:
+            by_db.setdefault(db_path, []).append(row)
+        for db_path, rows in by_db.items():
+            try:
+                conn = acquire_connection(db_path)
+                with conn:
+                    conn.executemany(_INSERT_SPAN_SQL, rows)
+            except sqlite3.Error as e:
+                with self._lock:
+                    self._stats["write_errors"] += len(rows)
+                logger.error("Failed to write %d audit span(s) to DB: %s", len(rows), e)
+
+        touched = set()
+        for _, _, jsonl_path, record in batch:
+            key = str(jsonl_path)
+            try:
+                handle = self._handles.get(key)
+                if handle is None:
+                    handle = self._handles[key] = open(key, "a", encoding="utf-8", buffering=1 << 16)
+                handle.write(json.dumps(record, default=str) + "\n")
+                touched.add(key)
+            except (OSError, ValueError) as e:
+                logger.error("Failed to write JSONL log: %s", e)
+        for key in touched:
+            try:
+                self._handles[key].flush()
+            except (OSError, ValueError) as e:
+                logger.error("Failed to flush JSONL log: %s", e)
+
+        with self._lock:
+            self._stats["written"] += len(batch)
+            self._stats["batches"] += 1
+        for _, _, _, record in batch:
+            logger.info("[%s] %s completed in %.2fms with status %s. Cost: $%.6f",
+                        record["event_type"], record["node_name"], record["metrics"]["duration_ms"],
+                        record["status"], record["metrics"]["cost_usd"])
+
+    def _close_handle(self, key):
+        handle = self._handles.pop(key, None)
+        if handle is not None:
+            try:
+                handle.close()
+            except (OSError, ValueError):
+                pass
+
+
+_span_writer = None
+_span_writer_lock = threading.Lock()
+_span_writer_pid = None
+
+
+def get_span_writer() -> SpanWriter:
+    """Return the process-wide SpanWriter, starting it on first use."""
+    global _span_writer, _span_writer_pid
+    with _span_writer_lock:
+        if _span_writer is None or _span_writer_pid != os.getpid():
+            _span_writer = SpanWriter()
+            _span_writer_pid = os.getpid()
+        return _span_writer
+
+
+def shutdown_span_writer():
+    """Drain and stop the process-wide SpanWriter (registered with atexit)."""
+    global _span_writer
+    with _span_writer_lock:
+        writer, _span_writer = _span_writer, None
+    if writer is not None and _span_writer_pid == os.getpid():
+        writer.close()
+
+
+atexit.register(shutdown_span_writer)
+
 
 class AuditTracer:
-    def __init__(self, run_id: str, db_conn=None):
+    def __init__(self, run_id: str, db_conn=None, async_writes: bool | None = None):
         self.run_id = run_id
-        # We use a new connection if none provided
-        self._owns_db = False
-        if db_conn is None:
-            self.db_conn = get_db()
-            self._owns_db = True
-        else:
-            self.db_conn = db_conn
+        # Fall back to the calling thread's pooled connection if none provided
+        self.db_conn = db_conn if db_conn is not None else acquire_connection()
+        # SQLite connections are bound to their thread: spans ended elsewhere
+        # (e.g. tool handlers run by ToolGateway.execute_many) use that
+        # thread's pooled connection instead.
+        self._owner_thread = threading.get_ident()
+        self.async_writes = GABBE_AUDIT_ASYNC if async_writes is None else async_writes
+        self._writer = get_span_writer() if self.async_writes else None
 
         self.log_dir = GABBE_DIR / "logs"
         self.log_dir.mkdir(parents=True, exist_ok=True)
         self.jsonl_path = self.log_dir / f"run_{self.run_id}.jsonl"
 
-    def __del__(self):
-        if getattr(self, "_owns_db", False) and getattr(self, "db_conn", None):
-            self.db_conn.close()
+    def flush(self, timeout: float | None = None) -> bool:
+        """Wait until every span ended so far is durable in SQLite and JSONL."""
+        if self._writer is None:
+            return True
+        return self._writer.flush(timeout)
+
+    def close(self):
+        """Flush pending spans and release this run's JSONL handle."""
+        if self._writer is not None and not self._writer.release(self.jsonl_path):
+            logger.warning("Timed out flushing audit spans for run %s", self.run_id)
 
     def _log_jsonl(self, record):
         try:
@@ -52,6 +327,10 @@ class AuditTracer:
 
     def start_span(self, event_type: str, node_name: str, input_data: dict, parent_span_id: str | None = None):
         span_id = uuid.uuid4().hex[:16]
+        if parent_span_id is None:
+            parent = _current_span.get()
+            if parent is not None:
+                parent_span_id = parent["span_id"]
         start_time = time.monotonic()
         # Capture wall-clock start time so the DB timestamp reflects when the span began.
         start_wall_time = datetime.now(timezone.utc)
@@ -75,6 +354,9 @@ class AuditTracer:
                  status: str = "ok", metadata: dict | None = None):
         
         duration_ms = (time.monotonic() - span_ctx["start_time"]) * 1000
+        if span_ctx.get("metadata"):
+            # Fields the operation added with annotate_span(); explicit ones win.
+            metadata = {**span_ctx["metadata"], **(metadata or {})}
         # Use the wall-clock time captured at span start so the DB timestamp reflects
         # when the operation began, not when it was recorded.
         timestamp = span_ctx.get("start_wall_time", datetime.now(timezone.utc)).isoformat()
@@ -85,31 +367,16 @@ class AuditTracer:
         r_tokens = token_usage.get("reasoning_tokens", 0)
         ch_tokens = token_usage.get("cache_hit_tokens", 0)
 
-        # 1. SQLite Write
-        try:
-            cursor = self.db_conn.cursor()
-            cursor.execute("""
-                INSERT INTO audit_spans 
-                (run_id, span_id, parent_span_id, timestamp, event_type, node_name, 
-                 input_data, output_data, reasoning_content, model_name, 
-                 prompt_tokens, completion_tokens, reasoning_tokens, cache_hit_tokens, 
-                 cost_usd, duration_ms, status, metadata)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                self.run_id, span_ctx["span_id"], span_ctx["parent_span_id"], timestamp, 
-                span_ctx["event_type"], span_ctx["node_name"],
-                json.dumps(span_ctx["input_data"]) if span_ctx["input_data"] else None,
-                json.dumps(output_data) if output_data else None,
-                reasoning_content, model_name,
-                p_tokens, c_tokens, r_tokens, ch_tokens,
-                cost_usd, duration_ms, status, 
-                json.dumps(metadata) if metadata else None
-            ))
-            self.db_conn.commit()
-        except sqlite3.Error as e:
-            logger.error(f"Failed to record audit span to DB: {e}")
-
-        # 2. JSONL Write
+        row = (
+            self.run_id, span_ctx["span_id"], span_ctx["parent_span_id"], timestamp,
+            span_ctx["event_type"], span_ctx["node_name"],
+            json.dumps(span_ctx["input_data"]) if span_ctx["input_data"] else None,
+            json.dumps(output_data) if output_data else None,
+            reasoning_content, model_name,
+            p_tokens, c_tokens, r_tokens, ch_tokens,
+            cost_usd, duration_ms, status,
+            json.dumps(metadata) if metadata else None
+        )
         record = {
             "run_id": self.run_id,
             "span_id": span_ctx["span_id"],
@@ -130,10 +397,25 @@ class AuditTracer:
             "status": status,
             "metadata": metadata
         }
-        self._log_jsonl(record)
-        
-        # 3. Simple Text Log
-        logger.info(f"[{span_ctx['event_type']}] {span_ctx['node_name']} completed in {duration_ms:.2f}ms with status {status}. Cost: ${cost_usd:.6f}")
+
+        if self._writer is not None:
+            # Batched path: SQLite, JSONL and the text log are handled by the writer thread.
+            self._writer.submit(database.DB_PATH, row, self.jsonl_path, record)
+        else:
+            # 1. SQLite Write
+            try:
+                conn = self.db_conn if threading.get_ident() == self._owner_thread else acquire_connection()
+                conn.execute(_INSERT_SPAN_SQL, row)
+                commit_unless_nested(conn)
+            except sqlite3.Error as e:
+                logger.error(f"Failed to record audit span to DB: {e}")
+
+            # 2. JSONL Write
+            self._log_jsonl(record)
+
+            # 3. Simple Text Log
+            logger.info("[%s] %s completed in %.2fms with status %s. Cost: $%.6f",
+                        span_ctx["event_type"], span_ctx["node_name"], duration_ms, status, cost_usd)
 
         # 4. OTel Complete
         if span_ctx.get("_otel_span"):
@@ -155,12 +437,13 @@ class AuditTracer:
                 self.run_id, step, budget.tokens_used, budget.tool_calls_used,
                 budget.snapshot()["wall_time_sec"], budget.iterations
             ))
-            self.db_conn.commit()
+            commit_unless_nested(self.db_conn)
         except sqlite3.Error as e:
             logger.error(f"Failed to snapshot budget: {e}")
 
     def get_run_trace(self, run_id: str) -> list:
         """Return all audit spans for a run as a list of dicts, ordered by timestamp."""
+        self.flush()
         try:
             cursor = self.db_conn.cursor()
             cursor.execute("""
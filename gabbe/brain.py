@@ -8,10 +8,11 @@ from .config import (
     TASK_STATUS_IN_PROGRESS,
     TASK_STATUS_DONE,
 )
-from .database import get_db
+from .database import db_connection, task_status_counts
 from .llm import call_llm
 from .context import RunContext
 from .gateway import ToolDefinition
+from .tokens import estimate_prompt_tokens
 from .escalation import EscalationTrigger
 
 logger = logging.getLogger("gabbe.brain")
@@ -62,10 +63,9 @@ def activate_brain(run_context=None):
     with ctx:
         # 1. Observation (Get State from DB)
         try:
-            conn = get_db()
-            c = conn.cursor()
-            c.execute("SELECT status, count(*) FROM tasks GROUP BY status")
-            stats = dict(c.fetchall())
+            with db_connection() as conn:
+                c = conn.cursor()
+                stats = task_status_counts(c)
         except Exception as e:
             logger.error("Brain Observation Failed: %s", e)
             print(f"  {Colors.FAIL}Error reading project state: {e}{Colors.ENDC}")
@@ -82,15 +82,14 @@ def activate_brain(run_context=None):
 
         # 2. Prediction & Action Selection via LLM wrapped in Gateway.
         # Use the best evolved gene prompt if available; fall back to default.
-        gene_id, evolved_prompt = _get_best_gene(conn, _BRAIN_ACTIVATE_SKILL)
+        with db_connection() as conn:
+            gene_id, evolved_prompt = _get_best_gene(conn, _BRAIN_ACTIVATE_SKILL)
         if gene_id is not None:
             system_prompt = evolved_prompt
             logger.debug("Using evolved gene id=%s for system prompt", gene_id)
         else:
             system_prompt = _DEFAULT_BRAIN_SYSTEM_PROMPT
 
-        conn.close()
-
         prompt = f"""
         Current Reality: {state_desc}
         Goal: Complete the project efficiently with high quality.
@@ -106,7 +105,8 @@ def activate_brain(run_context=None):
             if "call_llm" not in ctx.gateway.registry:
                 ctx.gateway.register(ToolDefinition(
                     name="call_llm", description="Call LLM", parameters={},
-                    handler=lambda p, s: call_llm(p, s), allowed_roles={"brain-mode"}
+                    handler=lambda p, s: call_llm(p, s, run_context=ctx), allowed_roles={"brain-mode"},
+                    token_estimate=lambda args: estimate_prompt_tokens(args["p"], args["s"]),
                 ))
 
             # Tick the hardstop before LLM calls conceptually
@@ -118,9 +118,8 @@ def activate_brain(run_context=None):
                 print(f"  {Colors.GREEN}Selected Action:{Colors.ENDC} {action}")
                 # Close the EPO feedback loop: reward the gene that produced a result
                 if gene_id is not None:
-                    reward_conn = get_db()
-                    _update_gene_success_rate(reward_conn, gene_id)
-                    reward_conn.close()
+                    with db_connection() as reward_conn:
+                        _update_gene_success_rate(reward_conn, gene_id)
             else:
                 print(f"  {Colors.FAIL}Brain Freeze (API Error){Colors.ENDC}")
 
@@ -139,37 +138,37 @@ def evolve_prompts(skill_name):
     print(
         f"{Colors.HEADER}🧬 Evolutionary Prompt Optimization: {skill_name}{Colors.ENDC}"
     )
-    conn = get_db()
     try:
-        c = conn.cursor()
-
-        # 1. Fetch current gene (prompt)
-        c.execute(
-            "SELECT * FROM genes WHERE skill_name=? ORDER BY success_rate DESC LIMIT 1",
-            (skill_name,),
-        )
-        best_gene = c.fetchone()
+        with db_connection() as conn:
+            c = conn.cursor()
 
-        current_prompt = "You are a helpful coding assistant."
-        generation = 0
-        if best_gene:
-            current_prompt = best_gene["prompt_content"]
-            generation = best_gene["generation"]
-            print(
-                f"  Current Best: Gen {generation} (Success: {best_gene['success_rate']})"
-            )
-        else:
-            print(f"  Initializing Gene Pool for {skill_name}...")
+            # 1. Fetch current gene (prompt)
             c.execute(
-                "INSERT INTO genes (skill_name, prompt_content, generation) VALUES (?, ?, ?)",
-                (skill_name, current_prompt, 0),
+                "SELECT * FROM genes WHERE skill_name=? ORDER BY success_rate DESC LIMIT 1",
+                (skill_name,),
             )
-            conn.commit()
-
-        # 2. Mutation via LLM
-        print(f"  {Colors.CYAN}Mutating via LLM...{Colors.ENDC}")
-        system_prompt = "You are an Expert Prompt Engineer. Optimize the given prompt for an AI Coding Agent."
-        mutation_request = f"""
+            best_gene = c.fetchone()
+
+            current_prompt = "You are a helpful coding assistant."
+            generation = 0
+            if best_gene:
+                current_prompt = best_gene["prompt_content"]
+                generation = best_gene["generation"]
+                print(
+                    f"  Current Best: Gen {generation} (Success: {best_gene['success_rate']})"
+                )
+            else:
+                print(f"  Initializing Gene Pool for {skill_name}...")
+                c.execute(
+                    "INSERT INTO genes (skill_name, prompt_content, generation) VALUES (?, ?, ?)",
+                    (skill_name, current_prompt, 0),
+                )
+                conn.commit()
+
+            # 2. Mutation via LLM
+            print(f"  {Colors.CYAN}Mutating via LLM...{Colors.ENDC}")
+            system_prompt = "You are an Expert Prompt Engineer. Optimize the given prompt for an AI Coding Agent."
+            mutation_request = f"""
         Current Prompt: "{current_prompt}"
 
         Task: Rewrite this prompt to be more effective, precise, and robust.
@@ -177,31 +176,29 @@ def evolve_prompts(skill_name):
         Return ONLY the new prompt text.
         """
 
-        new_prompt = call_llm(mutation_request, system_prompt)
-
-        if new_prompt:
-            # 3. Selection (Store new candidate).
-            # success_rate starts at 0.0. activate_brain() increments it by +0.1 each
-            # time a gene produces a successful LLM response, closing the feedback loop.
-            # Genes accumulate fitness over repeated `gabbe brain activate` runs.
-            next_gen = generation + 1
-            c.execute(
-                "INSERT INTO genes (skill_name, prompt_content, generation) VALUES (?, ?, ?)",
-                (skill_name, new_prompt, next_gen),
-            )
-            conn.commit()
-            print(f"  {Colors.GREEN}Created Generation {next_gen}{Colors.ENDC}")
-            print("  - Mutation applied. Ready for testing.")
-        else:
-            print(f"  {Colors.FAIL}Mutation Failed (API Error){Colors.ENDC}")
+            new_prompt = call_llm(mutation_request, system_prompt)
+
+            if new_prompt:
+                # 3. Selection (Store new candidate).
+                # success_rate starts at 0.0. activate_brain() increments it by +0.1 each
+                # time a gene produces a successful LLM response, closing the feedback loop.
+                # Genes accumulate fitness over repeated `gabbe brain activate` runs.
+                next_gen = generation + 1
+                c.execute(
+                    "INSERT INTO genes (skill_name, prompt_content, generation) VALUES (?, ?, ?)",
+                    (skill_name, new_prompt, next_gen),
+                )
+                conn.commit()
+                print(f"  {Colors.GREEN}Created Generation {next_gen}{Colors.ENDC}")
+                print("  - Mutation applied. Ready for testing.")
+            else:
+                print(f"  {Colors.FAIL}Mutation Failed (API Error){Colors.ENDC}")
     except sqlite3.Error as e:
         logger.error("Evolution Failed (DB): %s", e)
         print(f"  {Colors.FAIL}Database error during evolution: {e}{Colors.ENDC}")
     except Exception as e:
         logger.error("Evolution Failed: %s", e)
         print(f"  {Colors.FAIL}Error evolving prompt: {e}{Colors.ENDC}")
-    finally:
-        conn.close()
 
 
 def run_healer():
@@ -211,9 +208,8 @@ def run_healer():
 
     # 1. Check DB connectivity
     try:
-        conn = get_db()
-        conn.execute("SELECT 1")
-        conn.close()
+        with db_connection() as conn:
+            conn.execute("SELECT 1")
         print(f"  {Colors.GREEN}✓ Database: Reachable{Colors.ENDC}")
     except sqlite3.Error as e:
         issues.append(f"Database unreachable: {e}")
@@ -1,7 +1,9 @@
 import sqlite3
+import threading
 import time
 from dataclasses import dataclass, field
-from .database import get_db
+from .database import db_connection
+from .providers import price_for
 from .config import (
     GABBE_MAX_TOKENS_PER_RUN,
     GABBE_MAX_TOOL_CALLS_PER_RUN,
@@ -29,18 +31,22 @@ class Budget:
     tool_calls_used: int = 0
     iterations: int = 0
     cost_usd: float = 0.0
+    # LLM responses served from gabbe.llm_cache: billed at $0, tracked as savings.
+    cache_hits: int = 0
+    cache_tokens_saved: int = 0
+    cache_savings_usd: float = 0.0
     _start_time: float = field(default_factory=time.monotonic)
     _cached_prices: dict = field(default_factory=dict)
+    # Counters may be updated from several threads (ToolGateway.execute_many).
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
 
     def __post_init__(self):
         self._load_prices()
 
     def _load_prices(self):
         try:
-            conn = get_db()
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM pricing_registry")
-            rows = cursor.fetchall()
+            with db_connection() as conn:
+                rows = conn.execute("SELECT * FROM pricing_registry").fetchall()
             for row in rows:
                 self._cached_prices[row["model_id"]] = {
                     "input": row["input_token_price"],
@@ -49,16 +55,18 @@ class Budget:
                     "cache_creation": row["cache_creation_price"],
                     "cache_read": row["cache_read_price"],
                 }
-            conn.close()
         except sqlite3.Error:
             pass # Fallback to 0 if db fails
 
     def _get_price(self, model_id: str):
-        # Default empty pricing
-        return self._cached_prices.get(model_id, {
-            "input": 0.0, "output": 0.0, "reasoning": 0.0, 
-            "cache_creation": 0.0, "cache_read": 0.0
-        })
+        if model_id not in self._cached_prices:
+            # Not in pricing_registry: use the price declared for the provider, if any.
+            declared = price_for(model_id) or {}
+            self._cached_prices[model_id] = {
+                name: float(declared.get(name, 0.0))
+                for name in ("input", "output", "reasoning", "cache_creation", "cache_read")
+            }
+        return self._cached_prices[model_id]
 
     def check(self):
         wall_time = time.monotonic() - self._start_time
@@ -73,8 +81,8 @@ class Budget:
         if wall_time > self.max_wall_seconds:
             raise BudgetExceeded("Max wall time reached", self.snapshot())
 
-    def record_llm_usage(self, model_id: str, usage_dict: dict):
-        total_tokens = usage_dict.get("total_tokens", 0)
+    def price_usage(self, model_id: str, usage_dict: dict) -> float:
+        """Return the USD cost of *usage_dict* at *model_id*'s registered prices."""
         prompt_tokens = usage_dict.get("prompt_tokens", 0)
         completion_tokens = usage_dict.get("completion_tokens", 0)
         # Reasoning tokens are included inside completion_tokens for o1/o3-class models.
@@ -82,8 +90,6 @@ class Budget:
         # Cache read tokens come from prompt_tokens_details.cached_tokens (OpenAI format).
         cache_read_tokens = usage_dict.get("prompt_tokens_details", {}).get("cached_tokens", 0)
 
-        self.tokens_used += total_tokens
-
         prices = self._get_price(model_id)
         # If no dedicated reasoning price is configured, fall back to the output rate so
         # reasoning tokens are never silently billed at zero.
@@ -94,15 +100,65 @@ class Budget:
             (reasoning_tokens * reasoning_price) +
             (cache_read_tokens * prices["cache_read"])
         )
-        self.cost_usd += cost
+        return cost
+
+    def record_llm_usage(self, model_id: str, usage_dict: dict, check: bool = True):
+        cost = self.price_usage(model_id, usage_dict)
+        with self._lock:
+            self.tokens_used += usage_dict.get("total_tokens", 0)
+            self.cost_usd += cost
+        if check:
+            self.check()
+
+    def preflight(self, model_id: str, prompt_tokens: int, completion_tokens: int,
+                  min_completion_tokens: int = 1) -> int:
+        """Completion tokens a call may request without breaking a limit.
+
+        Uses *estimated* prompt/completion sizes before anything is sent.
+        Returns *completion_tokens* if the whole call fits, a smaller cap if
+        only a shorter answer fits, and raises BudgetExceeded if not even
+        *min_completion_tokens* would. Records nothing.
+        """
+        self.check()
+        remaining = self.remaining()
+        allowed = remaining["tokens"] - prompt_tokens
+        prices = self._get_price(model_id)
+        prompt_cost = prompt_tokens * prices["input"]
+        if prices["output"] > 0:
+            allowed = min(allowed, int((remaining["cost_usd"] - prompt_cost) / prices["output"]))
+        elif prompt_cost > remaining["cost_usd"]:
+            allowed = 0
+        if allowed < min(min_completion_tokens, completion_tokens):
+            raise BudgetExceeded(
+                f"Projected LLM call (~{prompt_tokens} prompt tokens) exceeds the remaining budget",
+                self.snapshot(),
+            )
+        return min(completion_tokens, allowed)
+
+    def check_projected(self, model_id: str, usage_dict: dict):
+        """Raise BudgetExceeded if recording *usage_dict* would break a limit. Records nothing."""
         self.check()
+        if self.tokens_used + usage_dict.get("total_tokens", 0) > self.max_tokens:
+            raise BudgetExceeded("Max tokens reached", self.snapshot())
+        if self.cost_usd + self.price_usage(model_id, usage_dict) > self.max_cost_usd:
+            raise BudgetExceeded("Max cost (USD) reached", self.snapshot())
+
+    def record_cache_hit(self, model_id: str, usage_dict: dict):
+        """Account for a response served from cache: no tokens or cost, only savings."""
+        savings = self.price_usage(model_id, usage_dict)
+        with self._lock:
+            self.cache_hits += 1
+            self.cache_tokens_saved += usage_dict.get("total_tokens", 0)
+            self.cache_savings_usd += savings
 
     def record_tool_call(self):
-        self.tool_calls_used += 1
+        with self._lock:
+            self.tool_calls_used += 1
         self.check()
 
     def record_iteration(self):
-        self.iterations += 1
+        with self._lock:
+            self.iterations += 1
         self.check()
 
     def snapshot(self) -> dict:
@@ -111,7 +167,9 @@ class Budget:
             "tool_calls_used": self.tool_calls_used,
             "cost_usd": self.cost_usd,
             "iterations": self.iterations,
-            "wall_time_sec": time.monotonic() - self._start_time
+            "wall_time_sec": time.monotonic() - self._start_time,
+            "cache_hits": self.cache_hits,
+            "cache_savings_usd": self.cache_savings_usd,
         }
 
     def remaining(self) -> dict:
@@ -142,4 +200,6 @@ class Budget:
         b.tool_calls_used = d.get("tool_calls_used", 0)
         b.iterations = d.get("iterations", 0)
         b.cost_usd = d.get("cost_usd", 0.0)
+        b.cache_hits = d.get("cache_hits", 0)
+        b.cache_savings_usd = d.get("cache_savings_usd", 0.0)
         return b
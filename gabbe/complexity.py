@@ -0,0 +1,232 @@
+"""Local complexity scoring for the cost router.
+
+``score_prompt`` rates a prompt 0-100 from cheap features (length, code
+fences, identifiers, file paths and two keyword lexicons) in tens of
+microseconds, with no network call. Its confidence grows with the distance
+from ``GABBE_ROUTE_THRESHOLD``; the router only pays for an LLM score when
+the local one lands inside ``GABBE_ROUTE_UNCERTAIN_BAND``.
+
+Past LLM scores are read back from ``audit_spans`` (``llm_call`` spans sent
+with ``COMPLEXITY_SYSTEM_PROMPT``). A prompt that was scored before reuses
+that score, and once ``GABBE_ROUTE_HISTORY_MIN_SAMPLES`` are available the
+local score is linearly calibrated against them.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import math
+import os
+import sqlite3
+import threading
+from dataclasses import dataclass
+
+from . import database
+from .config import (
+    ROUTE_COMPLEXITY_THRESHOLD,
+    ROUTE_HISTORY_LIMIT,
+    ROUTE_HISTORY_MIN_SAMPLES,
+)
+
+logger = logging.getLogger("gabbe.complexity")
+
+COMPLEXITY_SYSTEM_PROMPT = (
+    "You are a complexity analyzer. Rate the following coding task complexity "
+    'from 0-100. Return ONLY a JSON object: {"score": 50, "reason": "explanation"}.'
+)
+
+# Stems, matched against word prefixes.
+_HARD_TERMS = (
+    "architect", "design", "distributed", "concurren", "parallel", "migrat",
+    "refactor", "scal", "security", "vulnerab", "performance", "optimi",
+    "deadlock", "race", "consensus", "protocol", "algorithm", "schema",
+    "microservice", "async", "integrat", "rewrite", "infrastructure", "cache",
+)
+_EASY_TERMS = (
+    "typo", "rename", "comment", "docstring", "readme", "format", "lint",
+    "bump", "spelling", "whitespace", "indent", "print", "log",
+)
+# Stems indexed by their first three letters, so most words cost one dict miss.
+_STEMS: dict = {}
+for _stem in _HARD_TERMS + _EASY_TERMS:
+    _STEMS.setdefault(_stem[:3], []).append(_stem)
+_FILE_EXTENSIONS = frozenset(
+    "py js ts tsx go rs java rb c h cpp sql yml yaml json toml md sh".split()
+)
+_PUNCTUATION = "`'\"()[]{},;:!?."
+
+
+@dataclass(frozen=True)
+class Features:
+    chars: int
+    code_fences: int
+    identifiers: int
+    paths: int
+    hard_terms: tuple
+    easy_terms: tuple
+
+
+@dataclass(frozen=True)
+class LocalScore:
+    score: int
+    confidence: float
+    reason: str
+    features: Features
+    recorded: bool = False  # score is the LLM's own, from history
+
+
+def extract_features(prompt: str) -> Features:
+    """One pass over the distinct whitespace-separated tokens of *prompt*."""
+    identifiers = paths = 0
+    found = set()
+    for token in set(prompt.split()):
+        word = token.strip(_PUNCTUATION)
+        if not word:
+            continue
+        if "/" in word or ("." in word and word.rpartition(".")[2] in _FILE_EXTENSIONS):
+            paths += 1
+        elif "_" in word or token.endswith("()") or (word[0].islower() and not word.islower()):
+            identifiers += 1  # snake_case, call(), camelCase
+        lowered = word.lower()
+        for stem in _STEMS.get(lowered[:3], ()):
+            if lowered.startswith(stem):
+                found.add(stem)
+    return Features(
+        chars=len(prompt),
+        code_fences=prompt.count("```") // 2,
+        identifiers=identifiers,
+        paths=paths,
+        hard_terms=tuple(t for t in _HARD_TERMS if t in found),
+        easy_terms=tuple(t for t in _EASY_TERMS if t in found),
+    )
+
+
+def _raw_score(f: Features) -> float:
+    score = 10.0
+    score += min(35.0, 12.0 * math.log2(1 + f.chars / 200))
+    score += min(20.0, 8.0 * f.code_fences)
+    score += min(12.0, 1.5 * f.identifiers)
+    score += min(16.0, 4.0 * f.paths)
+    score += min(36.0, 12.0 * len(f.hard_terms))
+    score -= min(25.0, 10.0 * len(f.easy_terms))
+    return score
+
+
+def _reason(f: Features) -> str:
+    parts = [f"{f.chars} chars"]
+    if f.code_fences:
+        parts.append(f"{f.code_fences} code block(s)")
+    if f.paths:
+        parts.append(f"{f.paths} path(s)")
+    if f.identifiers:
+        parts.append(f"{f.identifiers} identifier(s)")
+    if f.hard_terms:
+        parts.append("hard: " + ", ".join(f.hard_terms))
+    if f.easy_terms:
+        parts.append("easy: " + ", ".join(f.easy_terms))
+    return "Heuristic: " + "; ".join(parts)
+
+
+def confidence_for(score: float, threshold: int = ROUTE_COMPLEXITY_THRESHOLD) -> float:
+    """0 at the routing threshold, 1 at the far end of the scale."""
+    span = max(threshold, 100 - threshold, 1)
+    return min(1.0, abs(score - threshold) / span)
+
+
+def score_prompt(prompt: str, history: "ScoreHistory | None" = None,
+                 use_recorded: bool = True) -> LocalScore:
+    """Score *prompt* locally against *history* (default: the shared one).
+
+    With *use_recorded*, a prompt the LLM has scored before gets that score.
+    """
+    history = get_history() if history is None else history
+    features = extract_features(prompt)
+    recorded = history.lookup(prompt) if use_recorded else None
+    if recorded is not None:
+        return LocalScore(recorded, 1.0, "History: scored by the LLM before", features, True)
+    score = history.calibrate(_raw_score(features))
+    score = int(round(min(100.0, max(0.0, score))))
+    return LocalScore(score, confidence_for(score), _reason(features), features)
+
+
+class ScoreHistory:
+    """LLM complexity scores recorded in ``audit_spans``, and a fit against them."""
+
+    def __init__(self, samples: dict | None = None):
+        self.samples = dict(samples or {})  # prompt -> LLM score
+        self.slope, self.intercept = 1.0, 0.0
+        self._fit()
+
+    @classmethod
+    def load(cls, db_path=None, limit: int = ROUTE_HISTORY_LIMIT) -> "ScoreHistory":
+        path = str(db_path if db_path is not None else database.DB_PATH)
+        if limit <= 0 or not os.path.exists(path):
+            return cls()
+        try:
+            with database.db_connection(path) as conn:
+                rows = conn.execute(
+                    "SELECT input_data, output_data FROM audit_spans "
+                    "WHERE event_type = 'llm_call' AND status = 'ok' "
+                    "AND input_data LIKE '%complexity analyzer%' "
+                    "ORDER BY id DESC LIMIT ?",
+                    (limit,),
+                ).fetchall()
+        except sqlite3.Error as e:
+            logger.debug("No complexity history available: %s", e)
+            return cls()
+        samples = {}
+        for input_data, output_data in rows:
+            try:
+                request = json.loads(input_data)
+                score = json.loads(json.loads(output_data)["response"])["score"]
+            except (TypeError, ValueError, KeyError):
+                continue
+            if request.get("system_prompt") != COMPLEXITY_SYSTEM_PROMPT:
+                continue
+            if isinstance(score, (int, float)) and request.get("prompt"):
+                samples.setdefault(request["prompt"], int(score))  # newest wins
+        return cls(samples)
+
+    def _fit(self):
+        if len(self.samples) < ROUTE_HISTORY_MIN_SAMPLES:
+            return
+        xs = [_raw_score(extract_features(p)) for p in self.samples]
+        ys = list(self.samples.values())
+        mean_x, mean_y = sum(xs) / len(xs), sum(ys) / len(ys)
+        var_x = sum((x - mean_x) ** 2 for x in xs)
+        if var_x == 0:
+            return
+        slope = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / var_x
+        # A noisy history should nudge the scorer, not invert or flatten it.
+        self.slope = min(4.0, max(0.25, slope))
+        self.intercept = mean_y - self.slope * mean_x
+
+    def lookup(self, prompt: str) -> int | None:
+        return self.samples.get(prompt)
+
+    def calibrate(self, score: float) -> float:
+        return self.slope * score + self.intercept
+
+    def record(self, prompt: str, score: int):
+        """Remember an LLM score obtained in this process."""
+        self.samples[prompt] = int(score)
+
+
+_history: ScoreHistory | None = None
+_history_lock = threading.Lock()
+
+
+def get_history() -> ScoreHistory:
+    """The process-wide history, loaded from the audit database on first use."""
+    global _history
+    with _history_lock:
+        if _history is None:
+            _history = ScoreHistory.load()
+        return _history
+
+
+def reset_history():
+    """Forget the loaded history; the next get_history() re-reads the database."""
+    global _history
+    with _history_lock:
+        _history = None
@@ -23,16 +23,19 @@ def _find_project_root(start_path):
 PROJECT_ROOT = _find_project_root(Path(os.getcwd()))
 
 # Regex Patterns
-PII_PATTERNS = [
-    re.compile(r"[\w\.-]+@[\w\.-]+\.[a-zA-Z]{2,}"),  # email
-    re.compile(r"\b\d{3}[-.\s]\d{3}[-.\s]\d{4}\b"),  # US phone
-    # re.compile(r'\b\d{9}\b'),                               # REMOVED: matches any 9-digit number
-    re.compile(r"\b\d{3}-\d{2}-\d{4}\b"),  # SSN (dashes)
-    re.compile(r"\b(?:\d{4}[-\s]?){3}\d{4}\b"),  # credit card
-    re.compile(
-        r"(?i)\b(?:password|passwd|api[_\-]?key|secret|token)\s*[:=]\s*\S+"
-    ),  # credentials
-]
+# Named PII patterns; gabbe/pii.py combines them into one scanner. Inline
+# flags must be scoped, e.g. (?i:...), so the patterns can be joined.
+PII_PATTERN_SOURCES = {
+    # The lookbehind only anchors the match at the start of the local part
+    # (same matches as without it) so long words are not rescanned per char.
+    "email": r"(?<![\w\.-])[\w\.-]+@[\w\.-]+\.[a-zA-Z]{2,}",
+    "phone": r"\b\d{3}[-.\s]\d{3}[-.\s]\d{4}\b",  # US phone
+    # r'\b\d{9}\b' REMOVED: matches any 9-digit number
+    "ssn": r"\b\d{3}-\d{2}-\d{4}\b",  # SSN (dashes)
+    "credit_card": r"\b(?:\d{4}[-\s]?){3}\d{4}\b",
+    "credential": r"\b(?i:password|passwd|api[_\-]?key|secret|token)\s*[:=]\s*\S+",
+}
+PII_PATTERNS = [re.compile(source) for source in PII_PATTERN_SOURCES.values()]
 GABBE_DIR = PROJECT_ROOT / "project"
 DB_PATH = GABBE_DIR / "state.db"
 TASKS_FILE = PROJECT_ROOT / "project/TASKS.md"
@@ -112,10 +115,78 @@ def _safe_int(env_var, default):
 LLM_TEMPERATURE = _safe_float("GABBE_LLM_TEMPERATURE", 0.7)
 LLM_TIMEOUT = max(1, _safe_int("GABBE_LLM_TIMEOUT", 30))
 LLM_MAX_RETRIES = max(1, _safe_int("GABBE_LLM_MAX_RETRIES", 3))
+LLM_RETRY_BASE_DELAY = max(0.0, _safe_float("GABBE_LLM_RETRY_BASE_DELAY", 1.0))  # seconds
+LLM_RETRY_MAX_DELAY = max(0.0, _safe_float("GABBE_LLM_RETRY_MAX_DELAY", 30.0))  # seconds
+LLM_RETRY_JITTER = os.environ.get("GABBE_LLM_RETRY_JITTER", "full").lower()  # full | decorrelated | none
+LLM_QPS = max(0.0, _safe_float("GABBE_LLM_QPS", 0.0))  # 0 = unlimited
+LLM_QPS_BURST = max(0.0, _safe_float("GABBE_LLM_QPS_BURST", 0.0))  # 0 = same as GABBE_LLM_QPS
+LLM_POOL_SIZE = max(1, _safe_int("GABBE_LLM_POOL_SIZE", 10))
+# Max LLM requests in flight from the asyncio API (acall_llm / call_llm_batch).
+LLM_MAX_CONCURRENCY = max(1, _safe_int("GABBE_LLM_MAX_CONCURRENCY", LLM_POOL_SIZE))
+# Worker threads ToolGateway.execute_many() uses for one batch of tool calls.
+TOOL_MAX_WORKERS = max(1, _safe_int("GABBE_TOOL_MAX_WORKERS", 8))
+# Seconds an open tool circuit breaker waits before letting a probe call through.
+TOOL_CIRCUIT_COOLDOWN = max(0.0, _safe_float("GABBE_TOOL_CIRCUIT_COOLDOWN", 30.0))
+# SQLite file holding tool rate-limit and breaker state shared across processes
+# (e.g. several serve-mcp workers). Unset: each gateway keeps its own in memory.
+TOOL_STATE_FILE = os.environ.get("GABBE_TOOL_STATE_FILE", "")
+# Cached results of cacheable tools kept per gateway, and their default lifetime.
+TOOL_CACHE_ENTRIES = max(0, _safe_int("GABBE_TOOL_CACHE_ENTRIES", 256))
+TOOL_CACHE_TTL = max(0.0, _safe_float("GABBE_TOOL_CACHE_TTL", 60.0))  # seconds
+# serve-mcp: tools/call requests executed at once, and run_command's rate limit.
+MCP_MAX_CONCURRENCY = max(1, _safe_int("GABBE_MCP_MAX_CONCURRENCY", 8))
+MCP_RATE_LIMIT_PER_MIN = max(1, _safe_int("GABBE_MCP_RATE_LIMIT_PER_MIN", 60))
+# Output run_command keeps per stream (half from the start, half from the end).
+MCP_OUTPUT_MAX_BYTES = max(1024, _safe_int("GABBE_MCP_OUTPUT_MAX_BYTES", 1024 * 1024))
+# Hedging: re-send a request that is slower than GABBE_LLM_HEDGE_PERCENTILE of
+# recent calls to the same model, keep whichever answer arrives first.
+LLM_HEDGE_ENABLED = os.environ.get("GABBE_LLM_HEDGE", "false").lower() == "true"
+LLM_HEDGE_PERCENTILE = min(99.9, max(50.0, _safe_float("GABBE_LLM_HEDGE_PERCENTILE", 95.0)))
+LLM_HEDGE_MIN_SAMPLES = max(1, _safe_int("GABBE_LLM_HEDGE_MIN_SAMPLES", 20))
+LLM_HEDGE_MIN_DELAY_MS = max(0, _safe_int("GABBE_LLM_HEDGE_MIN_DELAY_MS", 50))
+LLM_LATENCY_WINDOW = max(1, _safe_int("GABBE_LLM_LATENCY_WINDOW", 500))
+# Provider pool health (see gabbe/providers.py and "providers" in config.json)
+PROVIDER_EJECT_FAILURES = max(1, _safe_int("GABBE_PROVIDER_EJECT_FAILURES", 3))
+PROVIDER_EJECT_SECONDS = max(0.0, _safe_float("GABBE_PROVIDER_EJECT_SECONDS", 30.0))
+PROVIDER_EWMA_ALPHA = min(1.0, max(0.01, _safe_float("GABBE_PROVIDER_EWMA_ALPHA", 0.3)))
+# Single-flight: concurrent identical calls at or below this temperature share one request.
+LLM_COALESCE_ENABLED = os.environ.get("GABBE_LLM_COALESCE", "true").lower() == "true"
+LLM_COALESCE_MAX_TEMPERATURE = _safe_float("GABBE_LLM_COALESCE_MAX_TEMPERATURE", 0.0)
+LLM_COALESCE_WHITESPACE = os.environ.get("GABBE_LLM_COALESCE_WHITESPACE", "false").lower() == "true"
+LLM_KEEPALIVE = os.environ.get("GABBE_LLM_KEEPALIVE", "true").lower() == "true"
+# Pre-flight budget checks: estimate tokens locally (gabbe/tokens.py) before sending.
+LLM_PREFLIGHT = os.environ.get("GABBE_LLM_PREFLIGHT", "true").lower() == "true"
+LLM_EXPECTED_COMPLETION_TOKENS = max(1, _safe_int("GABBE_LLM_EXPECTED_COMPLETION_TOKENS", 512))
+LLM_MIN_COMPLETION_TOKENS = max(1, _safe_int("GABBE_LLM_MIN_COMPLETION_TOKENS", 16))
+TOKEN_CACHE_SIZE = max(0, _safe_int("GABBE_TOKEN_CACHE_SIZE", 4096))
+PII_CACHE_SIZE = max(0, _safe_int("GABBE_PII_CACHE_SIZE", 1024))
+LLM_CACHE_ENABLED = os.environ.get("GABBE_LLM_CACHE", "true").lower() == "true"
+LLM_CACHE_TTL = max(0, _safe_int("GABBE_LLM_CACHE_TTL", 86400))  # seconds
+LLM_CACHE_MEMORY_ENTRIES = max(0, _safe_int("GABBE_LLM_CACHE_MEMORY_ENTRIES", 256))
+LLM_CACHE_MAX_ENTRIES = max(0, _safe_int("GABBE_LLM_CACHE_MAX_ENTRIES", 5000))
+# Responses sampled above this temperature are not deterministic enough to reuse.
+LLM_CACHE_MAX_TEMPERATURE = _safe_float("GABBE_LLM_CACHE_MAX_TEMPERATURE", 0.0)
 LOG_LEVEL = os.environ.get("GABBE_LOG_LEVEL", "INFO").upper()
 
+# SQLite Connection Config (applied to every connection by gabbe.database)
+DB_BUSY_TIMEOUT_MS = max(0, _safe_int("GABBE_DB_BUSY_TIMEOUT_MS", 5000))
+DB_MMAP_SIZE = max(0, _safe_int("GABBE_DB_MMAP_SIZE", 268435456))  # 256 MiB
+DB_CACHE_SIZE_KB = max(0, _safe_int("GABBE_DB_CACHE_SIZE_KB", 16384))  # 16 MiB
+
 # Router Config
 ROUTE_COMPLEXITY_THRESHOLD = _safe_int("GABBE_ROUTE_THRESHOLD", 50)
+# The LLM is only asked for a complexity score when the local score lands
+# within this many points of the threshold (0 = never ask).
+ROUTE_UNCERTAIN_BAND = max(0, _safe_int("GABBE_ROUTE_UNCERTAIN_BAND", 10))
+# Past LLM scores (audit_spans) used to calibrate the local scorer.
+ROUTE_HISTORY_LIMIT = max(0, _safe_int("GABBE_ROUTE_HISTORY_LIMIT", 2000))
+ROUTE_HISTORY_MIN_SAMPLES = max(2, _safe_int("GABBE_ROUTE_HISTORY_MIN_SAMPLES", 20))
+
+# `gabbe sync --watch`: seconds to wait for edits to settle before syncing,
+# the longest a burst may postpone a sync, and the stat/DB poll interval.
+SYNC_WATCH_DEBOUNCE = max(0.0, _safe_float("GABBE_SYNC_WATCH_DEBOUNCE", 0.2))
+SYNC_WATCH_MAX_DELAY = max(0.0, _safe_float("GABBE_SYNC_WATCH_MAX_DELAY", 2.0))
+SYNC_WATCH_POLL_INTERVAL = max(0.05, _safe_float("GABBE_SYNC_WATCH_POLL_INTERVAL", 0.5))
 
 # UI Config
 PROGRESS_BAR_LEN = 20
@@ -135,6 +206,19 @@ GABBE_POLICY_FILE = PROJECT_ROOT / os.environ.get("GABBE_POLICY_FILE", "project/
 GABBE_ESCALATION_MODE = os.environ.get("GABBE_ESCALATION_MODE", "cli") # cli, file, silent
 GABBE_OTEL_ENABLED = os.environ.get("GABBE_OTEL_ENABLED", "false").lower() == "true"
 
+# Policy engine: recent (tool, role, arguments) decisions kept per engine, and
+# how often (seconds) the policy file is polled for hot reload (0 = never).
+POLICY_DECISION_CACHE_SIZE = max(0, _safe_int("GABBE_POLICY_DECISION_CACHE_SIZE", 1024))
+POLICY_RELOAD_INTERVAL = max(0.0, _safe_float("GABBE_POLICY_RELOAD_INTERVAL", 2.0))
+
+# Audit span writer: when enabled, spans are queued and written in batches by a
+# background thread instead of one INSERT + commit per span.
+GABBE_AUDIT_ASYNC = os.environ.get("GABBE_AUDIT_ASYNC", "false").lower() == "true"
+AUDIT_QUEUE_SIZE = max(1, _safe_int("GABBE_AUDIT_QUEUE_SIZE", 10000))
+AUDIT_BATCH_SIZE = max(1, _safe_int("GABBE_AUDIT_BATCH_SIZE", 256))
+AUDIT_FLUSH_INTERVAL_MS = max(1, _safe_int("GABBE_AUDIT_FLUSH_INTERVAL_MS", 200))
+AUDIT_ENQUEUE_TIMEOUT_MS = max(0, _safe_int("GABBE_AUDIT_ENQUEUE_TIMEOUT_MS", 50))
+
 # Task status constants — single source of truth used across brain, sync, status
 TASK_STATUS_TODO = "TODO"
 TASK_STATUS_IN_PROGRESS = "IN_PROGRESS"
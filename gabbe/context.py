@@ -3,12 +3,12 @@ import json
 import logging
 import uuid
 import time
-from .database import get_db
+from .database import acquire_connection, commit_unless_nested, db_connection
 from .budget import Budget
 from .hardstop import HardStop
 from .audit import AuditTracer
 from .gateway import ToolGateway
-from .policy import PolicyEngine
+from .policy import PolicyEngine, watch_policy
 from .escalation import EscalationHandler
 from .replay import CheckpointStore
 
@@ -25,9 +25,11 @@ class RunContext:
         
         self.budget = budget or Budget.from_config()
         self.hard_stop = hard_stop or HardStop()
-        self.policy = policy or PolicyEngine.from_yaml()
+        # Without an explicit engine, follow the policy file (hot-reloaded).
+        self._policy = policy
+        self._policy_watcher = None if policy else watch_policy()
         
-        self.db_conn = get_db()
+        self.db_conn = acquire_connection()
         self.tracer = AuditTracer(self.run_id, db_conn=self.db_conn)
         self.gateway = gateway or ToolGateway()
         self.escalation = EscalationHandler(self.run_id, db_conn=self.db_conn)
@@ -36,6 +38,24 @@ class RunContext:
         self._start_time = time.monotonic()
         self._is_active = False
 
+    @property
+    def policy(self) -> PolicyEngine:
+        if self._policy is not None:
+            return self._policy
+        return self._policy_watcher.engine
+
+    @policy.setter
+    def policy(self, engine: PolicyEngine | None):
+        self._policy = engine
+        if engine is None and self._policy_watcher is None:
+            self._policy_watcher = watch_policy()
+
+    def save_checkpoint(self, step: int, node_name: str, state_snapshot: dict,
+                        parent_id: int | None = None) -> int | None:
+        """Checkpoint this run under the policy version in force right now."""
+        return self.checkpoints.save(self.run_id, step, node_name, state_snapshot,
+                                     self.policy.version, parent_id)
+
     def __enter__(self):
         try:
             cursor = self.db_conn.cursor()
@@ -56,13 +76,15 @@ class RunContext:
                 VALUES (?, ?, ?, ?, ?, ?)
             """, (self.run_id, self.command, "running", self.initiator, 
                   self.agent_persona, json.dumps(config_snap)))
-            self.db_conn.commit()
+            commit_unless_nested(self.db_conn)
             self._is_active = True
         except Exception as e:
             logger.error(f"Failed to activate RunContext {self.run_id}: {e}")
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
+        # Guarantee batched audit spans are written before the run is finalized.
+        self.tracer.close()
         if not self._is_active:
             return
             
@@ -88,11 +110,9 @@ class RunContext:
                     total_tokens_used = ?, total_cost_usd = ?
                 WHERE id = ?
             """, (status, stop_reason, self.budget.tokens_used, self.budget.cost_usd, self.run_id))
-            self.db_conn.commit()
+            commit_unless_nested(self.db_conn)
         except Exception as e:
             logger.error(f"Failed to finalize RunContext {self.run_id}: {e}")
-            
-        self.db_conn.close()
 
     @classmethod
     def from_config(cls, command: str = "brain activate", **kwargs):
@@ -101,8 +121,7 @@ class RunContext:
     @classmethod
     def from_checkpoint(cls, checkpoint_id: int) -> "RunContext":
         """Reconstruct a RunContext from a saved checkpoint for replay."""
-        db_conn = get_db()
-        try:
+        with db_connection() as db_conn:
             # Load the checkpoint row
             row = db_conn.execute(
                 "SELECT * FROM checkpoints WHERE id = ?", (checkpoint_id,)
@@ -127,5 +146,4 @@ class RunContext:
                 run_id=str(uuid.uuid4()),  # new run_id for the replay
                 budget=budget,
             )
-        finally:
-            db_conn.close()
+
@@ -1,8 +1,27 @@
+import os
 import sqlite3
-from .config import DB_PATH, GABBE_DIR, Colors
+import threading
+from contextlib import contextmanager
+from .config import (
+    DB_PATH,
+    GABBE_DIR,
+    Colors,
+    DB_BUSY_TIMEOUT_MS,
+    DB_MMAP_SIZE,
+    DB_CACHE_SIZE_KB,
+)
 
 # Increment this whenever the schema changes.
-SCHEMA_VERSION = 3
+SCHEMA_VERSION = 8
+
+# What the v7 summary tables hold, computed from the base tables. Used to
+# backfill them and by rebuild_stats() to check them.
+_TASK_STATUS_COUNTS_SQL = (
+    "SELECT COALESCE(status, '') AS status, COUNT(*) AS task_count FROM tasks GROUP BY 1"
+)
+_RUN_TOTALS_SQL = (
+    "SELECT COUNT(*), COALESCE(SUM(total_cost_usd), 0.0), COALESCE(SUM(total_tokens_used), 0) FROM runs"
+)
 
 
 def _migrate(conn):
@@ -151,6 +170,166 @@ def _migrate(conn):
                       timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
                       FOREIGN KEY(run_id) REFERENCES runs(id))""")
 
+    if current < 4:
+        # v4: content-addressed LLM response cache (see gabbe/llm_cache.py)
+        c.execute("""CREATE TABLE IF NOT EXISTS llm_cache
+                     (key TEXT PRIMARY KEY,
+                      model TEXT,
+                      response TEXT NOT NULL,
+                      usage TEXT,
+                      created_at REAL NOT NULL,
+                      expires_at REAL NOT NULL,
+                      last_access REAL NOT NULL,
+                      hits INTEGER DEFAULT 0)""")
+        c.execute(
+            "CREATE INDEX IF NOT EXISTS idx_llm_cache_last_access ON llm_cache(last_access)"
+        )
+
+    if current < 5:
+        # v5: project_state['tasks_version'] counts writes to tasks, so sync
+        # can tell whether the table changed without reading it.
+        c.execute(
+            "INSERT OR IGNORE INTO project_state (key, value) VALUES ('tasks_version', 0)"
+        )
+        for event in ("INSERT", "UPDATE", "DELETE"):
+            c.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_tasks_version_{event.lower()}
+                         AFTER {event} ON tasks
+                         BEGIN
+                             UPDATE project_state SET value = value + 1
+                             WHERE key = 'tasks_version';
+                         END""")
+
+    if current < 6:
+        # v6: richer task model parsed from TASKS.md. task_key is the stable
+        # `<!-- id:... -->` of a line, parent_id its enclosing list item, and
+        # task_tags the `#tag` tokens, kept in step with tasks.tags (a JSON
+        # array) by triggers so every writer maintains it.
+        # ALTER has no IF NOT EXISTS; check the columns so a re-run is a no-op.
+        columns = {r[1] for r in c.execute("PRAGMA table_info(tasks)")}
+        if "task_key" not in columns:
+            c.execute("ALTER TABLE tasks ADD COLUMN task_key TEXT")
+        if "parent_id" not in columns:
+            c.execute("ALTER TABLE tasks ADD COLUMN parent_id INTEGER REFERENCES tasks(id)")
+        c.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_tasks_key ON tasks(task_key) "
+            "WHERE task_key IS NOT NULL"
+        )
+        c.execute("CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status)")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_tasks_parent ON tasks(parent_id)")
+        c.execute("""CREATE TABLE IF NOT EXISTS task_tags
+                     (tag TEXT NOT NULL,
+                      task_id INTEGER NOT NULL REFERENCES tasks(id),
+                      PRIMARY KEY (tag, task_id)) WITHOUT ROWID""")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_task_tags_task ON task_tags(task_id)")
+        # tags was free text nobody wrote; keep any value as a one-tag array.
+        c.execute(
+            "UPDATE tasks SET tags = json_array(tags) "
+            "WHERE tags IS NOT NULL AND NOT json_valid(tags)"
+        )
+        tag_values = "json_each(CASE WHEN json_valid(new.tags) THEN new.tags ELSE '[]' END)"
+        c.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_task_tags_insert
+                     AFTER INSERT ON tasks WHEN new.tags IS NOT NULL
+                     BEGIN
+                         INSERT OR IGNORE INTO task_tags (tag, task_id)
+                         SELECT value, new.id FROM {tag_values};
+                     END""")
+        c.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_task_tags_update
+                     AFTER UPDATE OF tags ON tasks
+                     BEGIN
+                         DELETE FROM task_tags WHERE task_id = old.id;
+                         INSERT OR IGNORE INTO task_tags (tag, task_id)
+                         SELECT value, new.id FROM {tag_values} WHERE new.tags IS NOT NULL;
+                     END""")
+        c.execute("""CREATE TRIGGER IF NOT EXISTS trg_task_tags_delete
+                     AFTER DELETE ON tasks
+                     BEGIN
+                         DELETE FROM task_tags WHERE task_id = old.id;
+                         UPDATE tasks SET parent_id = NULL WHERE parent_id = old.id;
+                     END""")
+        c.execute(
+            "INSERT OR IGNORE INTO task_tags (tag, task_id) "
+            "SELECT j.value, t.id FROM tasks t, json_each(t.tags) j WHERE t.tags IS NOT NULL"
+        )
+
+    if current < 7:
+        # v7: per-status task counts and run totals, kept by triggers so
+        # dashboards read a few rows instead of aggregating the tables.
+        c.execute("""CREATE TABLE IF NOT EXISTS task_status_counts
+                     (status TEXT PRIMARY KEY,
+                      task_count INTEGER NOT NULL DEFAULT 0) WITHOUT ROWID""")
+        c.execute("""CREATE TABLE IF NOT EXISTS run_totals
+                     (id INTEGER PRIMARY KEY CHECK (id = 1),
+                      runs INTEGER NOT NULL DEFAULT 0,
+                      total_cost_usd REAL NOT NULL DEFAULT 0.0,
+                      total_tokens_used INTEGER NOT NULL DEFAULT 0)""")
+        c.execute("DELETE FROM task_status_counts")
+        c.execute(f"INSERT INTO task_status_counts (status, task_count) {_TASK_STATUS_COUNTS_SQL}")
+        c.execute(
+            "INSERT OR REPLACE INTO run_totals (id, runs, total_cost_usd, total_tokens_used) "
+            f"SELECT 1, * FROM ({_RUN_TOTALS_SQL})"
+        )
+        bump = """INSERT INTO task_status_counts (status, task_count)
+                  VALUES (COALESCE(new.status, ''), 1)
+                  ON CONFLICT(status) DO UPDATE SET task_count = task_count + 1;"""
+        drop = """UPDATE task_status_counts SET task_count = task_count - 1
+                  WHERE status = COALESCE(old.status, '');"""
+        c.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_task_status_counts_insert
+                     AFTER INSERT ON tasks
+                     BEGIN {bump} END""")
+        c.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_task_status_counts_update
+                     AFTER UPDATE OF status ON tasks WHEN old.status IS NOT new.status
+                     BEGIN {drop} {bump} END""")
+        c.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_task_status_counts_delete
+                     AFTER DELETE ON tasks
+                     BEGIN {drop} END""")
+        c.execute("""CREATE TRIGGER IF NOT EXISTS trg_run_totals_insert
+                     AFTER INSERT ON runs
+                     BEGIN
+                         UPDATE run_totals SET runs = runs + 1,
+                             total_cost_usd = total_cost_usd + COALESCE(new.total_cost_usd, 0.0),
+                             total_tokens_used = total_tokens_used + COALESCE(new.total_tokens_used, 0)
+                         WHERE id = 1;
+                     END""")
+        c.execute("""CREATE TRIGGER IF NOT EXISTS trg_run_totals_update
+                     AFTER UPDATE OF total_cost_usd, total_tokens_used ON runs
+                     BEGIN
+                         UPDATE run_totals SET
+                             total_cost_usd = total_cost_usd
+                                 + COALESCE(new.total_cost_usd, 0.0) - COALESCE(old.total_cost_usd, 0.0),
+                             total_tokens_used = total_tokens_used
+                                 + COALESCE(new.total_tokens_used, 0) - COALESCE(old.total_tokens_used, 0)
+                         WHERE id = 1;
+                     END""")
+        c.execute("""CREATE TRIGGER IF NOT EXISTS trg_run_totals_delete
+                     AFTER DELETE ON runs
+                     BEGIN
+                         UPDATE run_totals SET runs = runs - 1,
+                             total_cost_usd = total_cost_usd - COALESCE(old.total_cost_usd, 0.0),
+                             total_tokens_used = total_tokens_used - COALESCE(old.total_tokens_used, 0)
+                         WHERE id = 1;
+                     END""")
+
+    if current < 8:
+        # v8: the snapshot incremental sync diffs TASKS.md against, as rows
+        # instead of one JSON value in project_state, so an edit rewrites
+        # only the line block and task rows it touches. The old JSON keys
+        # are dropped; the next sync is a full one that fills these tables.
+        c.execute("""CREATE TABLE IF NOT EXISTS task_sync_blocks
+                     (seq INTEGER PRIMARY KEY,
+                      line_count INTEGER NOT NULL,
+                      digest TEXT NOT NULL,
+                      lines TEXT NOT NULL)""")
+        c.execute("""CREATE TABLE IF NOT EXISTS task_sync_tasks
+                     (title TEXT PRIMARY KEY,
+                      status TEXT,
+                      task_key TEXT,
+                      parent TEXT) WITHOUT ROWID""")
+        c.execute(
+            "CREATE INDEX IF NOT EXISTS idx_task_sync_tasks_key ON task_sync_tasks(task_key) "
+            "WHERE task_key IS NOT NULL"
+        )
+        c.execute("DELETE FROM project_state WHERE key IN ('tasks_sync_state', 'tasks_sync_snapshot')")
+
     # Upsert schema version
     if row:
         c.execute("UPDATE schema_version SET version = ?", (SCHEMA_VERSION,))
@@ -160,13 +339,189 @@ def _migrate(conn):
     conn.commit()
 
 
+def _configure(conn):
+    """Apply the connection pragmas shared by every GABBE connection.
+
+    WAL lets readers proceed while a writer commits, and synchronous=NORMAL
+    skips the per-commit fsync that WAL makes unnecessary for durability of
+    the database file itself (only the last transactions can be lost on
+    power failure, never corrupted).
+    """
+    conn.row_factory = sqlite3.Row
+    conn.execute(f"PRAGMA busy_timeout = {int(DB_BUSY_TIMEOUT_MS)}")
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute(f"PRAGMA mmap_size = {int(DB_MMAP_SIZE)}")
+    # Negative cache_size is interpreted by SQLite as KiB rather than pages.
+    conn.execute(f"PRAGMA cache_size = -{int(DB_CACHE_SIZE_KB)}")
+    return conn
+
+
+def _connect(path, check_same_thread=True):
+    conn = sqlite3.connect(str(path), timeout=DB_BUSY_TIMEOUT_MS / 1000.0,
+                           check_same_thread=check_same_thread)
+    return _configure(conn)
+
+
+def _file_identity(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_dev, st.st_ino)
+
+
+class ConnectionManager:
+    """Per-thread pool of configured SQLite connections.
+
+    Each thread gets at most one connection per database path, reused across
+    calls so hot paths (span writes, run bookkeeping, dashboards) no longer pay
+    an open/close and pragma setup per query. Connections are never shared
+    between threads, and the pool is discarded in a forked child.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._all = []
+        self._pid = os.getpid()
+
+    def _slots(self):
+        if self._pid != os.getpid():
+            # Never reuse (or close) a parent's connections after fork().
+            self._local = threading.local()
+            self._all = []
+            self._pid = os.getpid()
+        slots = getattr(self._local, "slots", None)
+        if slots is None:
+            slots = self._local.slots = {}
+        return slots
+
+    def acquire(self, path=None):
+        """Return this thread's pooled connection for *path* (default DB_PATH)."""
+        path = str(path if path is not None else DB_PATH)
+        slots = self._slots()
+        slot = slots.get(path)
+        identity = _file_identity(path)
+        if slot is not None:
+            conn, known_identity = slot
+            try:
+                conn.total_changes  # raises ProgrammingError once closed
+                alive = True
+            except sqlite3.ProgrammingError:
+                alive = False
+            # A replaced or deleted database file must not keep receiving
+            # writes through a stale handle.
+            if alive and identity == known_identity:
+                return conn
+            self._discard(path, conn)
+
+        # Only the owning thread uses a pooled connection; disabling the
+        # thread check lets close_all() close it from whichever thread
+        # shuts the pool down.
+        conn = _connect(path, check_same_thread=False)
+        slots[path] = (conn, _file_identity(path))
+        with self._lock:
+            self._all.append(conn)
+        return conn
+
+    def _discard(self, path, conn):
+        self._slots().pop(path, None)
+        with self._lock:
+            if conn in self._all:
+                self._all.remove(conn)
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    def in_block(self, conn):
+        """True if *conn* is this thread's pooled connection inside a db_connection() block."""
+        depths = getattr(self._local, "depths", None)
+        if not depths:
+            return False
+        for path, (pooled, _) in self._slots().items():
+            if pooled is conn:
+                return depths.get(path, 0) > 0
+        return False
+
+    def close_thread(self):
+        """Close every pooled connection owned by the calling thread."""
+        for path, (conn, _) in list(self._slots().items()):
+            self._discard(path, conn)
+
+    def close_all(self):
+        """Close every pooled connection (all threads). Use at shutdown only."""
+        with self._lock:
+            conns, self._all = self._all, []
+        for conn in conns:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        self._local = threading.local()
+
+
+_manager = ConnectionManager()
+
+
+def acquire_connection(path=None):
+    """Return the calling thread's pooled connection. Do not close it."""
+    return _manager.acquire(path)
+
+
+def close_connections():
+    """Close all pooled connections (process shutdown, tests)."""
+    _manager.close_all()
+
+
+def commit_unless_nested(conn):
+    """Commit *conn*, unless an enclosing db_connection() block owns its transaction.
+
+    Bookkeeping that shares the pooled connection (run rows, audit spans,
+    checkpoints) must not commit a caller's half-finished work; inside a
+    block its writes join the caller's transaction instead.
+    """
+    if not _manager.in_block(conn):
+        conn.commit()
+
+
+@contextmanager
+def db_connection(path=None):
+    """Context manager yielding the calling thread's pooled connection.
+
+    The outermost block commits on success and rolls back on error; nested
+    blocks share the same connection and transaction. The connection stays
+    open in the pool afterwards. Nesting is tracked per database path, so
+    a block on another database commits its own connection.
+    """
+    key = str(path if path is not None else DB_PATH)
+    conn = _manager.acquire(key)
+    depths = getattr(_manager._local, "depths", None)
+    if depths is None:
+        depths = _manager._local.depths = {}
+    depth = depths.get(key, 0)
+    depths[key] = depth + 1
+    try:
+        yield conn
+    except BaseException:
+        if depth == 0 and conn.in_transaction:
+            conn.rollback()
+        raise
+    else:
+        if depth == 0 and conn.in_transaction:
+            conn.commit()
+    finally:
+        depths[key] = depth
+
+
 def init_db():
     """Initialize (or migrate) the SQLite database schema."""
     if not GABBE_DIR.exists():
         GABBE_DIR.mkdir(parents=True, exist_ok=True)
         print(f"{Colors.GREEN}Created project directory{Colors.ENDC}")
 
-    conn = sqlite3.connect(DB_PATH)
+    conn = _connect(DB_PATH)
     try:
         _migrate(conn)
     finally:
@@ -175,7 +530,59 @@ def init_db():
 
 
 def get_db():
-    """Return a database connection with row_factory set."""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Return a new, dedicated connection with row_factory and pragmas set.
+
+    The caller owns the connection and must close it. Application code should
+    prefer ``db_connection()``, which reuses a pooled per-thread connection.
+    """
+    return _connect(DB_PATH)
+
+
+def task_status_counts(c):
+    """``{status: count}`` for the tasks table, from the trigger-kept summary (v7)."""
+    c.execute("SELECT status, task_count FROM task_status_counts WHERE task_count != 0")
+    return {row[0]: row[1] for row in c.fetchall()}
+
+
+def run_totals(c):
+    """``(runs, total_cost_usd, total_tokens_used)`` over all runs, from the summary (v7)."""
+    c.execute("SELECT runs, total_cost_usd, total_tokens_used FROM run_totals WHERE id = 1")
+    row = c.fetchone()
+    return tuple(row) if row else (0, 0.0, 0)
+
+
+def rebuild_stats():
+    """Recompute the v7 summary tables from tasks and runs.
+
+    Returns the ``(name, stored, actual)`` entries that had drifted, after
+    rewriting them. An empty list means the triggers kept them exact.
+    """
+    drift = []
+    with db_connection() as conn:
+        c = conn.cursor()
+        if not conn.in_transaction:
+            # Read and rewrite under one write lock so no commit slips in between.
+            c.execute("BEGIN IMMEDIATE")
+        stored = task_status_counts(c)
+        c.execute(_TASK_STATUS_COUNTS_SQL)
+        actual = {row[0]: row[1] for row in c.fetchall()}
+        for status in sorted(stored.keys() | actual.keys()):
+            if stored.get(status, 0) != actual.get(status, 0):
+                drift.append((f"tasks[{status}]", stored.get(status, 0), actual.get(status, 0)))
+
+        c.execute(_RUN_TOTALS_SQL)
+        actual_runs = tuple(c.fetchone())
+        for name, before, after in zip(("runs", "total_cost_usd", "total_tokens_used"),
+                                       run_totals(c), actual_runs):
+            # The cost is summed in a different order by the triggers.
+            if abs(before - after) > 1e-9 * max(1.0, abs(after)):
+                drift.append((f"run_totals.{name}", before, after))
+
+        c.execute("DELETE FROM task_status_counts")
+        c.execute(f"INSERT INTO task_status_counts (status, task_count) {_TASK_STATUS_COUNTS_SQL}")
+        c.execute(
+            "INSERT OR REPLACE INTO run_totals (id, runs, total_cost_usd, total_tokens_used) "
+            "VALUES (1, ?, ?, ?)",
+            actual_runs,
+        )
+    return drift
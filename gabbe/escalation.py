@@ -2,7 +2,7 @@ from __future__ import annotations
 import json
 import logging
 from enum import Enum
-from .database import get_db
+from .database import acquire_connection
 from .config import GABBE_ESCALATION_MODE
 
 logger = logging.getLogger("gabbe.escalation")
@@ -23,18 +23,9 @@ class EscalationHandler:
     def __init__(self, run_id: str, db_conn=None):
         self.run_id = run_id
         # Single connection context usually passed in runtime
-        self._owns_db = False
-        if db_conn is None:
-            self.db_conn = get_db()
-            self._owns_db = True
-        else:
-            self.db_conn = db_conn
+        self.db_conn = db_conn if db_conn is not None else acquire_connection()
         self.mode = GABBE_ESCALATION_MODE.lower()  # cli, file, silent
 
-    def __del__(self):
-        if self._owns_db and self.db_conn:
-            self.db_conn.close()
-
     def escalate(self, trigger: EscalationTrigger, context_dict: dict, step: int = 0) -> EscalationResult:
         logger.warning(f"Escalation Triggered: {trigger.value}")
         
@@ -1,14 +1,22 @@
-import time
 import logging
-from collections import deque
-from dataclasses import dataclass
-from typing import Callable, Dict, Any
-
-try:
-    import jsonschema  # type: ignore
-    HAS_JSONSCHEMA = True
-except ImportError:
-    HAS_JSONSCHEMA = False
+import threading
+from concurrent.futures import Executor, ThreadPoolExecutor
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Any, List, Optional, Sequence
+from .audit import active_span
+from .budget import BudgetExceeded
+from .config import (
+    GABBE_API_MODEL,
+    LLM_EXPECTED_COMPLETION_TOKENS,
+    LLM_MIN_COMPLETION_TOKENS,
+    TOOL_CACHE_TTL,
+    TOOL_CIRCUIT_COOLDOWN,
+    TOOL_MAX_WORKERS,
+)
+from .limits import CircuitOpen, RateLimitExceeded, ToolLimiter  # noqa: F401 (re-exported)
+from .tool_cache import MISS, ToolResultCache, make_key
+from .schema import HAS_JSONSCHEMA, compile_validator  # noqa: F401 (HAS_JSONSCHEMA re-exported)
 
 logger = logging.getLogger("gabbe.gateway")
 
@@ -18,9 +26,6 @@ class ToolNotFound(Exception):
 class PolicyDenied(Exception):
     pass
 
-class CircuitOpen(Exception):
-    pass
-
 @dataclass
 class ToolDefinition:
     name: str
@@ -29,84 +34,251 @@ class ToolDefinition:
     handler: Callable
     allowed_roles: set
     rate_limit_per_min: int = 60
+    # Calls allowed back to back before the per-minute rate applies (0 = rate_limit_per_min).
+    rate_limit_burst: int = 0
     circuit_breaker_threshold: int = 3
+    circuit_cooldown_s: float = TOOL_CIRCUIT_COOLDOWN
+    # Calls let through to test a half-open circuit.
+    circuit_half_open_probes: int = 1
+    # For LLM-backed tools: arguments -> estimated prompt tokens (see gabbe.tokens).
+    token_estimate: Optional[Callable[[dict], int]] = None
+    # Handlers of this tool running at once in execute_many() (0 = no limit).
+    max_concurrency: int = 0
+    # Result caching (gabbe/tool_cache.py): True, or a predicate on the arguments.
+    cacheable: Any = False
+    cache_ttl: float = TOOL_CACHE_TTL  # seconds; 0 = until invalidated
+    # arguments -> freshness token (e.g. tool_cache.mtime_token); a change drops the entry.
+    cache_validator: Optional[Callable[[dict], Any]] = None
+    # Tools whose cached results are dropped when this one succeeds.
+    invalidates: tuple = ()
+    # Compiled from `parameters` by ToolGateway.register(); raises ValueError.
+    validator: Optional[Callable[[Any], None]] = field(default=None, repr=False, compare=False)
+
+@dataclass
+class ToolResult:
+    """Outcome of one call in ToolGateway.execute_many()."""
+    name: str
+    value: Any = None
+    error: Optional[BaseException] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def unwrap(self) -> Any:
+        """The handler's return value, or re-raise the call's error."""
+        if self.error is not None:
+            raise self.error
+        return self.value
 
 class ToolGateway:
-    def __init__(self):
+    def __init__(self, limit_store=None):
         self.registry: Dict[str, ToolDefinition] = {}
-        self._call_times: Dict[str, deque] = {}
-        self._failure_counts: Dict[str, int] = {}
+        # Rate limits and circuit breakers (see gabbe/limits.py); the store is
+        # shared across processes when GABBE_TOOL_STATE_FILE is set.
+        self.limiter = ToolLimiter(limit_store)
+        self.tool_cache = ToolResultCache()
+        self._slots: Dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
 
     def register(self, tool_def: ToolDefinition):
-        self.registry[tool_def.name] = tool_def
-        self._call_times[tool_def.name] = deque()
-        self._failure_counts[tool_def.name] = 0
-
-    def _check_rate_limit(self, name: str):
-        tool = self.registry[name]
-        now = time.monotonic()
-        q = self._call_times[name]
-        
-        # Remove timestamps older than 60s
-        while q and now - q[0] > 60:
-            q.popleft()
-            
-        if len(q) >= tool.rate_limit_per_min:
-            raise RateLimitExceeded(f"Rate limit exceeded for tool {name}")
-            
-        q.append(now)
-
-    def _check_circuit_breaker(self, name: str):
-        tool = self.registry[name]
-        if self._failure_counts[name] >= tool.circuit_breaker_threshold:
-            raise CircuitOpen(f"Circuit open for tool {name} due to consecutive failures.")
+        tool_def.validator = compile_validator(tool_def.parameters)
+        if not self.limiter.store.shared:
+            # Other processes may be mid-cooldown on a shared store; keep their state.
+            self.limiter.reset(tool_def.name)
+        self.tool_cache.invalidate([tool_def.name])
+        with self._lock:
+            self.registry[tool_def.name] = tool_def
+            if tool_def.max_concurrency > 0:
+                self._slots[tool_def.name] = threading.BoundedSemaphore(tool_def.max_concurrency)
+            else:
+                self._slots.pop(tool_def.name, None)
+
+    def circuit_state(self, name: str) -> dict:
+        """Breaker state (``circuit``, ``failures``) and remaining ``tokens`` for *name*."""
+        return self.limiter.state(name)
+
+    def _authorize(self, name: str, arguments: dict, role: str, run_context) -> ToolDefinition:
+        """Registration and policy: checked for every call, cached or not."""
+        if name not in self.registry:
+            raise ToolNotFound(f"Tool {name} is not registered.")
+
+        tool_def = self.registry[name]
+
+        # Policy Check
+        if run_context.policy:
+            policy_res = run_context.policy.evaluate({"tool": name, "arguments": arguments, "role": role})
+            if not policy_res.allowed:
+                raise PolicyDenied(f"Policy denied: {policy_res.reason}")
+        return tool_def
+
+    def _lookup(self, tool_def: ToolDefinition, arguments: dict):
+        """(cached result or MISS, key, validator token) for a cacheable call, else None."""
+        if not self.tool_cache.accepts(tool_def, arguments):
+            return None
+        key = make_key(tool_def.name, arguments)
+        value = self.tool_cache.get(tool_def, arguments, key)
+        token = None
+        if value is MISS and tool_def.cache_validator is not None:
+            # Taken before the handler runs, so changes it makes mark the entry stale.
+            token = tool_def.cache_validator(arguments)
+        return value, key, token
+
+    def _admit(self, tool_def: ToolDefinition, arguments: dict, run_context):
+        """Checks for a call that will run its handler; raises if it may not."""
+        # Budget Check
+        if run_context.budget:
+            run_context.budget.record_tool_call()
+            if tool_def.token_estimate is not None:
+                run_context.budget.preflight(
+                    GABBE_API_MODEL,
+                    tool_def.token_estimate(arguments),
+                    LLM_EXPECTED_COMPLETION_TOKENS,
+                    LLM_MIN_COMPLETION_TOKENS,
+                )
+
+        # Schema Validation (validator compiled at register time)
+        if tool_def.validator is not None:
+            tool_def.validator(arguments)
+
+        # Rate limit & circuit breaker, last: a call admitted here must report
+        # its outcome to the breaker (a half-open probe slot is taken).
+        self.limiter.admit(tool_def)
+
+    def _succeeded(self, tool_def: ToolDefinition, arguments: dict, result, lookup):
+        self.limiter.record(tool_def, ok=True)
+        if lookup is not None:
+            _, key, token = lookup
+            self.tool_cache.put(tool_def, arguments, result, key, token)
+        if tool_def.invalidates:
+            self.tool_cache.invalidate(tool_def.invalidates)
+
+    @staticmethod
+    def _end_cache_hit(tracer, span_ctx, result):
+        tracer.end_span(span_ctx, output_data={"result": result}, status="ok",
+                        metadata={"cache_hit": True})
 
     def execute(self, name: str, arguments: dict, role: str, run_context) -> Any:
         span_ctx = run_context.tracer.start_span("tool_call", name, {"arguments": arguments, "role": role})
 
         try:
-            if name not in self.registry:
-                raise ToolNotFound(f"Tool {name} is not registered.")
-                
-            tool_def = self.registry[name]
-            
-            # Policy Check
-            if run_context.policy:
-                policy_res = run_context.policy.evaluate({"tool": name, "arguments": arguments, "role": role})
-                if not policy_res.allowed:
-                    raise PolicyDenied(f"Policy denied: {policy_res.reason}")
-
-            # Budget Check
-            if run_context.budget:
-                run_context.budget.record_tool_call()
-
-            # Rate Limits & Circuit Breaker
-            self._check_rate_limit(name)
-            self._check_circuit_breaker(name)
-
-            # Schema Validation
-            if HAS_JSONSCHEMA and tool_def.parameters:
-                try:
-                    jsonschema.validate(instance=arguments, schema=tool_def.parameters)
-                except jsonschema.ValidationError as e:
-                    raise ValueError(f"Argument validation failed: {e.message}")
-
-            # Execute
-            result = tool_def.handler(**arguments)
-            
-            # Success => reset circuit breaker
-            self._failure_counts[name] = 0
-            
+            tool_def = self._authorize(name, arguments, role, run_context)
+            lookup = self._lookup(tool_def, arguments)
+            if lookup is not None and lookup[0] is not MISS:
+                self._end_cache_hit(run_context.tracer, span_ctx, lookup[0])
+                return lookup[0]
+            self._admit(tool_def, arguments, run_context)
+
+            # Execute (spans started by the handler, e.g. LLM calls, nest under this one)
+            try:
+                with active_span(span_ctx):
+                    result = tool_def.handler(**arguments)
+            except Exception:
+                self.limiter.record(tool_def, ok=False)
+                raise
+
+            self._succeeded(tool_def, arguments, result, lookup)
+
             run_context.tracer.end_span(span_ctx, output_data={"result": result}, status="ok")
             return result
 
         except Exception as e:
-            if name in self._failure_counts:
-                self._failure_counts[name] += 1
-            
             # Re-raise standard workflow exceptions to be caught by brain loop
             run_context.tracer.end_span(span_ctx, output_data={"error": str(e)}, status="error")
             raise
 
-class RateLimitExceeded(Exception):
-    pass
+    def execute_many(self, calls: Sequence, role: str, run_context,
+                     max_workers: Optional[int] = None,
+                     executor: Optional[Executor] = None) -> List[ToolResult]:
+        """Run several tool calls concurrently; one ToolResult per call, in order.
+
+        *calls* holds ``(name, arguments)`` pairs or ``{"name", "arguments"}``
+        dicts. Policy, cache, budget, schema, rate-limit and circuit-breaker
+        checks run first, in order, on the calling thread; cache hits are
+        answered there. Admitted handlers then run
+        on up to *max_workers* threads (default ``GABBE_TOOL_MAX_WORKERS``),
+        at most ``ToolDefinition.max_concurrency`` at a time per tool. Pass a
+        ``ProcessPoolExecutor`` as *executor* to run picklable handlers in
+        other processes; the worker threads then only wait for them.
+
+        Partial failure: a call that is refused or whose handler raises gets
+        ``ToolResult.error`` and does not affect the others. Once the budget
+        runs out, that call and every later one are not run and carry the
+        BudgetExceeded; calls admitted before it still run. Nothing is
+        raised for per-call errors; use ``ToolResult.unwrap()``.
+        Every call gets a ``tool_call`` span parented to the caller's span.
+        """
+        calls = [
+            (c["name"], c.get("arguments") or {}) if isinstance(c, dict) else (c[0], c[1] or {})
+            for c in calls
+        ]
+        tracer = run_context.tracer
+        results: List[Optional[ToolResult]] = [None] * len(calls)
+        admitted = []
+        exhausted: Optional[BudgetExceeded] = None
+
+        for index, (name, arguments) in enumerate(calls):
+            span_ctx = tracer.start_span("tool_call", name, {"arguments": arguments, "role": role})
+            try:
+                if exhausted is not None:
+                    raise exhausted
+                tool_def = self._authorize(name, arguments, role, run_context)
+                lookup = self._lookup(tool_def, arguments)
+                if lookup is not None and lookup[0] is not MISS:
+                    results[index] = ToolResult(name, value=lookup[0])
+                    self._end_cache_hit(tracer, span_ctx, lookup[0])
+                    continue
+                self._admit(tool_def, arguments, run_context)
+            except Exception as e:
+                if isinstance(e, BudgetExceeded):
+                    exhausted = e
+                results[index] = ToolResult(name, error=e)
+                tracer.end_span(span_ctx, output_data={"error": str(e)}, status="error")
+                continue
+            admitted.append((index, tool_def, arguments, span_ctx, lookup))
+
+        if not admitted:
+            return results
+        if len(admitted) == 1:
+            pool = None
+            futures = [_Immediate(self._run_handler, *admitted[0][1:4], executor)]
+        else:
+            workers = min(len(admitted), max_workers or TOOL_MAX_WORKERS)
+            pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="gabbe-tool")
+            futures = [pool.submit(self._run_handler, tool_def, arguments, span_ctx, executor)
+                       for _, tool_def, arguments, span_ctx, _ in admitted]
+        try:
+            # Spans are ended here, on the thread that owns the run's connection.
+            for (index, tool_def, arguments, span_ctx, lookup), future in zip(admitted, futures):
+                try:
+                    value = future.result()
+                except Exception as e:
+                    self.limiter.record(tool_def, ok=False)
+                    results[index] = ToolResult(tool_def.name, error=e)
+                    tracer.end_span(span_ctx, output_data={"error": str(e)}, status="error")
+                else:
+                    self._succeeded(tool_def, arguments, value, lookup)
+                    results[index] = ToolResult(tool_def.name, value=value)
+                    tracer.end_span(span_ctx, output_data={"result": value}, status="ok")
+        finally:
+            if pool is not None:
+                pool.shutdown(wait=True)
+        return results
+
+    def _run_handler(self, tool_def: ToolDefinition, arguments: dict, span_ctx: dict,
+                     executor: Optional[Executor]):
+        with self._slots.get(tool_def.name) or nullcontext():
+            # Spans started by the handler nest under this call's span.
+            with active_span(span_ctx):
+                if executor is not None:
+                    return executor.submit(tool_def.handler, **arguments).result()
+                return tool_def.handler(**arguments)
+
+class _Immediate:
+    """Future-like wrapper that runs a lone call inline instead of on a pool."""
+
+    def __init__(self, fn, *args):
+        self._fn, self._args = fn, args
+
+    def result(self):
+        return self._fn(*self._args)
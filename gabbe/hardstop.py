@@ -38,6 +38,18 @@ class HardStop:
         if time.monotonic() - self._start_time > self.timeout_sec:
             raise TimeoutExceeded(f"Hard stop: Timeout ({self.timeout_sec}s) exceeded.")
 
+    def check(self):
+        """Raise if the wall-clock limit has passed, without consuming an iteration.
+
+        Used inside long operations (e.g. a streaming LLM call) that run
+        between ticks.
+        """
+        if time.monotonic() - self._start_time > self.timeout_sec:
+            raise TimeoutExceeded(f"Hard stop: Timeout ({self.timeout_sec}s) exceeded.")
+
+    def remaining_seconds(self) -> float:
+        return max(0.0, self.timeout_sec - (time.monotonic() - self._start_time))
+
     def remaining_steps(self) -> int:
         return max(0, self.max_iterations - self.iterations)
 
@@ -0,0 +1,70 @@
+"""Rolling per-model latency windows for LLM calls.
+
+Every successful LLM request reports its total latency here. Hedging
+(``GABBE_LLM_HEDGE``) reads the percentiles to decide when a request
+counts as "slow"; ``latency_snapshot()`` exposes the same data.
+"""
+from __future__ import annotations
+
+import math
+import threading
+from collections import deque
+
+from .config import LLM_LATENCY_WINDOW
+
+
+class LatencyWindow:
+    """The last ``size`` latencies (ms) of one model, with percentile queries."""
+
+    def __init__(self, size: int = LLM_LATENCY_WINDOW):
+        self._samples = deque(maxlen=max(1, size))
+        self._lock = threading.Lock()
+
+    def observe(self, latency_ms: float):
+        with self._lock:
+            self._samples.append(latency_ms)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._samples)
+
+    def percentile(self, pct: float) -> float | None:
+        """Nearest-rank percentile (0-100), or None if no samples yet."""
+        with self._lock:
+            ordered = sorted(self._samples)
+        if not ordered:
+            return None
+        rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+        return ordered[min(rank, len(ordered)) - 1]
+
+    def snapshot(self) -> dict:
+        return {
+            "count": len(self),
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+        }
+
+
+_windows: dict[str, LatencyWindow] = {}
+_windows_lock = threading.Lock()
+
+
+def get_latency_window(model: str) -> LatencyWindow:
+    with _windows_lock:
+        window = _windows.get(model)
+        if window is None:
+            window = _windows[model] = LatencyWindow()
+        return window
+
+
+def latency_snapshot() -> dict:
+    """Return ``{model: {count, p50, p90, p99}}`` for every model seen so far."""
+    with _windows_lock:
+        windows = dict(_windows)
+    return {model: window.snapshot() for model, window in windows.items()}
+
+
+def reset_latency_windows():
+    with _windows_lock:
+        _windows.clear()
@@ -0,0 +1,222 @@
+"""Per-tool rate limits and circuit breakers for ToolGateway.
+
+Rate limits are token buckets: a tool holds up to ``rate_limit_burst``
+tokens (default ``rate_limit_per_min``), refilled at
+``rate_limit_per_min / 60`` per second, and each call takes one. Checking
+one is O(1) whatever the rate.
+
+The circuit breaker has three states:
+
+- ``closed``: calls run. ``circuit_breaker_threshold`` consecutive handler
+  failures open it.
+- ``open``: calls fail fast with CircuitOpen until ``circuit_cooldown_s``
+  has passed since it opened.
+- ``half_open``: up to ``circuit_half_open_probes`` calls are let through as
+  probes. A successful probe closes the circuit; a failed one opens it
+  again for another cool-down. Probes that never report back are given up
+  on after one cool-down.
+
+Both keep a few numbers per tool in a ``LimitStore``. By default each
+gateway has its own in-memory store. With ``GABBE_TOOL_STATE_FILE`` set, the
+state lives in that SQLite file and every process using it (e.g. several
+``serve-mcp`` workers) shares one limit and one breaker per tool name.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Optional
+
+from .config import TOOL_STATE_FILE
+
+logger = logging.getLogger("gabbe.limits")
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitOpen(Exception):
+    pass
+
+
+class RateLimitExceeded(Exception):
+    pass
+
+
+def _fresh(tool, now: float) -> dict:
+    return {
+        "tokens": float(_capacity(tool)),
+        "updated": now,
+        "circuit": CLOSED,
+        "failures": 0,
+        "opened_at": 0.0,
+        "probes": 0,
+    }
+
+
+def _capacity(tool) -> int:
+    return tool.rate_limit_burst if tool.rate_limit_burst > 0 else tool.rate_limit_per_min
+
+
+def _admit(state: dict, now: float, tool):
+    """Take a token and, if half-open, a probe slot; or return the refusal."""
+    capacity = _capacity(tool)
+    # Clamp: wall clocks shared between processes can step backwards.
+    elapsed = max(0.0, now - state["updated"])
+    state["tokens"] = min(capacity, state["tokens"] + elapsed * tool.rate_limit_per_min / 60.0)
+    state["updated"] = now
+
+    if state["circuit"] != CLOSED and now - state["opened_at"] >= tool.circuit_cooldown_s:
+        # Cool-down over (or the last probes never reported): allow new probes.
+        state["circuit"], state["opened_at"], state["probes"] = HALF_OPEN, now, 0
+    if state["circuit"] == OPEN or (
+        state["circuit"] == HALF_OPEN and state["probes"] >= max(1, tool.circuit_half_open_probes)
+    ):
+        return CircuitOpen(f"Circuit open for tool {tool.name} due to consecutive failures.")
+    if state["tokens"] < 1:
+        return RateLimitExceeded(f"Rate limit exceeded for tool {tool.name}")
+    state["tokens"] -= 1
+    if state["circuit"] == HALF_OPEN:
+        state["probes"] += 1
+    return None
+
+
+def _record(state: dict, now: float, tool, ok: bool):
+    if ok:
+        if state["circuit"] != OPEN:
+            if state["circuit"] == HALF_OPEN:
+                logger.info("Circuit for tool %s closed after a successful probe", tool.name)
+            state["circuit"], state["failures"], state["probes"] = CLOSED, 0, 0
+        return
+    state["failures"] += 1
+    if state["circuit"] == HALF_OPEN or (
+        state["circuit"] == CLOSED and state["failures"] >= tool.circuit_breaker_threshold
+    ):
+        logger.warning("Circuit for tool %s opened after %d failure(s)", tool.name, state["failures"])
+        state["circuit"], state["opened_at"], state["probes"] = OPEN, now, 0
+
+
+class MemoryLimitStore:
+    """Limit state for one process, keyed by tool name."""
+
+    shared = False
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        self._rows: dict = {}
+        self._lock = threading.Lock()
+
+    def update(self, name: str, tool, fn):
+        """Apply ``fn(state, now)`` to *name*'s state atomically; return its result."""
+        with self._lock:
+            now = self.clock()
+            state = self._rows.get(name)
+            if state is None:
+                state = self._rows[name] = _fresh(tool, now)
+            return fn(state, now)
+
+    def get(self, name: str) -> Optional[dict]:
+        with self._lock:
+            state = self._rows.get(name)
+            return dict(state) if state is not None else None
+
+    def reset(self, name: str):
+        with self._lock:
+            self._rows.pop(name, None)
+
+
+class SQLiteLimitStore:
+    """Limit state in a SQLite file shared by every process that opens it.
+
+    Each update is one ``BEGIN IMMEDIATE`` transaction, so concurrent
+    processes see each other's tokens and breaker transitions. Times are
+    wall-clock seconds, which all processes on the host agree on.
+    """
+
+    shared = True
+
+    def __init__(self, path, clock: Callable[[], float] = time.time):
+        self.path = str(path)
+        self.clock = clock
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            from .database import _connect
+
+            parent = os.path.dirname(self.path)
+            if parent:
+                os.makedirs(parent, exist_ok=True)
+            conn = _connect(self.path)
+            conn.isolation_level = None  # explicit BEGIN IMMEDIATE / COMMIT below
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS tool_limits (name TEXT PRIMARY KEY, state TEXT NOT NULL)"
+            )
+            self._local.conn = conn
+        return conn
+
+    def update(self, name: str, tool, fn):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = self.clock()
+            row = conn.execute("SELECT state FROM tool_limits WHERE name = ?", (name,)).fetchone()
+            state = json.loads(row[0]) if row else _fresh(tool, now)
+            result = fn(state, now)
+            conn.execute(
+                "INSERT INTO tool_limits (name, state) VALUES (?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET state = excluded.state",
+                (name, json.dumps(state)),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return result
+
+    def get(self, name: str) -> Optional[dict]:
+        row = self._conn().execute(
+            "SELECT state FROM tool_limits WHERE name = ?", (name,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def reset(self, name: str):
+        self._conn().execute("DELETE FROM tool_limits WHERE name = ?", (name,))
+
+
+def default_store():
+    """A store for a new gateway: the shared file if configured, else in-memory."""
+    if TOOL_STATE_FILE:
+        return SQLiteLimitStore(TOOL_STATE_FILE)
+    return MemoryLimitStore()
+
+
+class ToolLimiter:
+    """Rate limit and circuit breaker for every tool of one gateway."""
+
+    def __init__(self, store=None):
+        self.store = store if store is not None else default_store()
+
+    def admit(self, tool):
+        """Raise CircuitOpen or RateLimitExceeded if *tool* may not run now."""
+        refusal = self.store.update(tool.name, tool, lambda s, now: _admit(s, now, tool))
+        if refusal is not None:
+            raise refusal
+
+    def record(self, tool, ok: bool):
+        """Report the outcome of a call admitted by admit()."""
+        self.store.update(tool.name, tool, lambda s, now: _record(s, now, tool, ok))
+
+    def state(self, name: str) -> dict:
+        """Current ``circuit``, ``failures`` and ``tokens`` for *name*."""
+        state = self.store.get(name)
+        if state is None:
+            return {"circuit": CLOSED, "failures": 0, "tokens": None}
+        return {k: state[k] for k in ("circuit", "failures", "tokens")}
+
+    def reset(self, name: str):
+        self.store.reset(name)
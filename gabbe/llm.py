@@ -1,23 +1,180 @@
 from __future__ import annotations
+import asyncio
+import datetime
+import json
+import os
+import socket
+import threading
 import time
+import weakref
 import requests
 import logging
+from http.cookiejar import DefaultCookiePolicy
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
 from .config import (
     GABBE_API_URL,
     GABBE_API_KEY,
     GABBE_API_MODEL,
     LLM_TEMPERATURE,
     LLM_TIMEOUT,
-    LLM_MAX_RETRIES,
+    LLM_POOL_SIZE,
+    LLM_KEEPALIVE,
+    LLM_MAX_CONCURRENCY,
+    LLM_HEDGE_ENABLED,
+    LLM_HEDGE_PERCENTILE,
+    LLM_HEDGE_MIN_SAMPLES,
+    LLM_HEDGE_MIN_DELAY_MS,
+    LLM_COALESCE_ENABLED,
+    LLM_COALESCE_MAX_TEMPERATURE,
+    LLM_COALESCE_WHITESPACE,
+    LLM_PREFLIGHT,
+    LLM_EXPECTED_COMPLETION_TOKENS,
+    LLM_MIN_COMPLETION_TOKENS,
 )
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from .budget import BudgetExceeded
+from .hardstop import HardStopTriggered
+from .latency import get_latency_window
+from .llm_cache import get_llm_cache, make_key
+from .providers import ProviderUnavailable, get_registry
+from . import retry
+from .retry import RetryPolicy
+from .tokens import estimate_prompt_tokens
 
 logger = logging.getLogger("gabbe.llm")
 
-_LLM_RETRY_DELAY = 1  # seconds
+_retry_policy = RetryPolicy()
 
 
-def _create_payload(prompt, system_prompt, temperature):
-    return {
+# ---------------------------------------------------------------------------
+# Pooled HTTP session
+# ---------------------------------------------------------------------------
+# One requests.Session per process, shared by every thread. The urllib3 pool
+# behind it is thread-safe; cookies are disabled so the shared jar is never
+# mutated by concurrent responses. Connection setup is timed per thread so
+# each call can report how long it spent in connect() (0 when reused), and
+# the connection carrying a hedged attempt is recorded so it can be aborted.
+
+_timing = threading.local()
+
+
+class _TrackedConnection:
+    """Mixin for urllib3 connections: times connect(), registers hedge attempts."""
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            _timing.connect_ms = getattr(_timing, "connect_ms", 0.0) + (
+                time.perf_counter() - start
+            ) * 1000
+
+    def request(self, *args, **kwargs):
+        attempt = getattr(_timing, "hedge", None)
+        if attempt is not None:
+            # Register first, then check: abort() sets the flag first, then
+            # reads the connection, so one side always sees the other.
+            attempt.conn = self
+            if attempt.cancel.is_set():
+                raise ConnectionAbortedError("hedged attempt cancelled")
+        return super().request(*args, **kwargs)
+
+
+class _TimedHTTPConnection(_TrackedConnection, HTTPConnection):
+    pass
+
+
+class _TimedHTTPSConnection(_TrackedConnection, HTTPSConnection):
+    pass
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _PooledAdapter(HTTPAdapter):
+    """HTTPAdapter whose pools time new connections (see ``_timing``)."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _TimedHTTPConnectionPool,
+            "https": _TimedHTTPSConnectionPool,
+        }
+
+
+_session: requests.Session | None = None
+_session_pid: int | None = None
+_session_lock = threading.Lock()
+
+
+def _build_session() -> requests.Session:
+    session = requests.Session()
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    # Retries are handled by _call_with_retry, not urllib3.
+    adapter = _PooledAdapter(
+        pool_connections=LLM_POOL_SIZE, pool_maxsize=LLM_POOL_SIZE, max_retries=0
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    if not LLM_KEEPALIVE:
+        session.headers["Connection"] = "close"
+    return session
+
+
+def _get_session() -> requests.Session:
+    """Return the process-wide pooled session, creating it on first use."""
+    global _session, _session_pid
+    session = _session
+    if session is not None and _session_pid == os.getpid():
+        return session
+    with _session_lock:
+        if _session is None or _session_pid != os.getpid():
+            # Never reuse sockets inherited across fork(): they are shared
+            # with the parent, so the child starts with a fresh pool.
+            _session = _build_session()
+            _session_pid = os.getpid()
+        return _session
+
+
+def close_session():
+    """Close pooled connections. The next call opens a fresh session."""
+    global _session, _session_pid
+    with _session_lock:
+        if _session is not None and _session_pid == os.getpid():
+            _session.close()
+        _session = None
+        _session_pid = None
+
+
+def _reset_after_fork():
+    global _session, _session_pid, _executor, _hedge_executor
+    # Drop (don't close) the parent's session; its sockets belong to the parent.
+    # The parent's executor threads don't exist in the child either.
+    _session = None
+    _session_pid = None
+    _executor = None
+    _hedge_executor = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _post(url, **kwargs):
+    return _get_session().post(url, **kwargs)
+
+
+def _create_payload(prompt, system_prompt, temperature, max_tokens=None):
+    payload = {
         "model": GABBE_API_MODEL,
         "messages": [
             {"role": "system", "content": system_prompt},
@@ -25,6 +182,9 @@ def _create_payload(prompt, system_prompt, temperature):
         ],
         "temperature": temperature,
     }
+    if max_tokens is not None:
+        payload["max_tokens"] = max_tokens
+    return payload
 
 
 def _handle_response(response):
@@ -41,67 +201,688 @@ def _handle_response(response):
     return None, usage
 
 
-def _call_with_retry(prompt, system_prompt, temperature, timeout):
-    """Shared retry loop. Returns (content, usage) tuple."""
-    if not GABBE_API_KEY:
+def _require_api_key():
+    if not GABBE_API_KEY and not get_registry().configured:
         raise EnvironmentError(
             "GABBE_API_KEY is not set. "
             "Set the environment variable before using LLM features."
         )
 
+
+def _call_with_retry(prompt, system_prompt, temperature, timeout, metrics=None, deadline=None,
+                     cancel=None, pool=None, max_tokens=None):
+    """Shared retry loop. Returns (content, usage) tuple.
+
+    If *metrics* is a dict it is filled with the latency breakdown of the
+    last attempt (connect_ms, ttfb_ms, total_ms, reused) and the attempt count.
+    """
+    _require_api_key()
     temperature = temperature if temperature is not None else LLM_TEMPERATURE
-    timeout = timeout if timeout is not None else LLM_TIMEOUT
+    payload = _create_payload(prompt, system_prompt, temperature, max_tokens)
+
+    response = _send_with_retry(
+        payload, timeout, metrics, deadline=deadline, cancel=cancel, pool=pool
+    )
+    if response is None:
+        return None, {}
+    try:
+        return _handle_response(response)
+    except requests.exceptions.RequestException as e:
+        logger.error("LLM request failed: %s", e)
+        return None, {}
 
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {GABBE_API_KEY}",
-    }
-    payload = _create_payload(prompt, system_prompt, temperature)
 
-    for attempt in range(1, LLM_MAX_RETRIES + 1):
+def _endpoint(registry, pool, timeout):
+    """Pick where the next attempt goes: ``(provider|None, url, api_key, model)``.
+
+    With providers configured in config.json, a provider is acquired from
+    *pool* (default REMOTE) and must be handed back via registry.release().
+    Otherwise the single GABBE_API_* endpoint is used, which only serves the
+    REMOTE pool: LOCAL traffic is never sent to it.
+    """
+    if registry.configured:
+        provider = registry.acquire(pool or "REMOTE", timeout)
+        return provider, provider.url, provider.api_key, provider.model
+    if pool == "LOCAL":
+        raise ProviderUnavailable(
+            "No LOCAL provider configured in config.json; refusing to send to the remote API"
+        )
+    return None, GABBE_API_URL, GABBE_API_KEY, GABBE_API_MODEL
+
+
+def _pool_label(pool):
+    """Model name for cache keys and latency windows before a provider is picked."""
+    if get_registry().configured:
+        return f"pool:{pool or 'REMOTE'}"
+    return GABBE_API_MODEL
+
+
+def _send_with_retry(payload, timeout, metrics=None, stream=False, deadline=None, cancel=None,
+                     pool=None):
+    """POST *payload* with retries on transient errors.
+
+    Waits between attempts come from the active RetryPolicy (jitter plus any
+    Retry-After the server sent). *deadline* is a ``time.monotonic()`` value
+    from the caller's Budget/HardStop; retries that can't finish before it are
+    skipped. Setting the *cancel* event (hedging) stops further attempts.
+    Each attempt may go to a different provider of *pool* (see _endpoint()).
+    Returns the successful (2xx) response, or None once the error is
+    non-retriable, attempts are exhausted or the call was cancelled.
+    """
+    timeout = timeout if timeout is not None else LLM_TIMEOUT
+    extra = {"stream": True} if stream else {}
+    policy = _retry_policy
+    retry.record("requests")
+    delay = None
+    waited = 0.0
+
+    for attempt in range(1, policy.max_attempts + 1):
+        if cancel is not None and cancel.is_set():
+            return None
+        response = None
+        retry_after = None
+        throttle = retry.get_rate_limiter().reserve()
+        if throttle > 0:
+            retry.record("throttle_wait_sec", throttle)
+            time.sleep(throttle)
+        retry.record("attempts")
+        registry = get_registry()
+        provider, url, api_key, model = _endpoint(registry, pool, timeout)
+        headers = {"Content-Type": "application/json"}
+        if api_key:
+            headers["Authorization"] = f"Bearer {api_key}"
+        # Passive health check: None leaves the provider's record untouched.
+        healthy = False
+        start = time.perf_counter()
         try:
             logger.debug(
                 "LLM Request (Attempt %d/%d) to %s",
                 attempt,
-                LLM_MAX_RETRIES,
-                GABBE_API_URL,
-            )
-            response = requests.post(
-                GABBE_API_URL, headers=headers, json=payload, timeout=timeout
+                policy.max_attempts,
+                url,
             )
-            return _handle_response(response)
+            _timing.connect_ms = 0.0
+            try:
+                response = _post(
+                    url, headers=headers, json=dict(payload, model=model),
+                    timeout=timeout, **extra
+                )
+            finally:
+                if metrics is not None:
+                    _record_latency(metrics, attempt, start, response)
+                    metrics["retry_wait_s"] = round(waited, 3)
+                    metrics["model"] = model
+                    if provider is not None:
+                        metrics["provider"] = provider.name
+            response.raise_for_status()
+            healthy = True
+            if not stream:
+                latency_ms = (time.perf_counter() - start) * 1000
+                get_latency_window(model).observe(latency_ms)
+                if provider is not None:
+                    get_latency_window(_pool_label(pool)).observe(latency_ms)
+            return response
 
         except requests.exceptions.HTTPError as e:
-            status = e.response.status_code if e.response else 500
-            if status in (429, 500, 502, 503, 504) and attempt < LLM_MAX_RETRIES:
+            if stream and response is not None:
+                response.close()
+            # Not `if e.response`: a Response is falsy for 4xx/5xx.
+            status = e.response.status_code if e.response is not None else 500
+            retry.record_status(status)
+            if status in retry.RETRIABLE_STATUSES:
+                retry_after = retry.parse_retry_after(e.response.headers.get("Retry-After")) \
+                    if e.response is not None else None
                 logger.warning("Retriable HTTP %d error: %s", status, e)
             elif status == 401 or status == 403:
                 logger.error("Authentication failed (HTTP %d). Check GABBE_API_KEY.", status)
-                return None, {}
+                return None
             else:
+                # The endpoint answered; the request itself was bad.
+                healthy = True
                 logger.error("Non-retriable HTTP error (status %d): %s", status, e)
-                return None, {}
+                return None
 
         except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            if cancel is not None and cancel.is_set():
+                healthy = None  # our own hedge abort, not the provider's fault
             logger.warning("LLM transient error: %s", e)
 
         except requests.exceptions.RequestException as e:
             logger.error("LLM request failed: %s", e)
-            return None, {}
+            return None
+
+        finally:
+            if provider is not None:
+                registry.release(
+                    provider, healthy, (time.perf_counter() - start) * 1000 if healthy else None
+                )
+
+        if cancel is not None and cancel.is_set():
+            return None
 
         # Backoff logic
-        if attempt < LLM_MAX_RETRIES:
-            sleep_time = _LLM_RETRY_DELAY * (2 ** (attempt - 1))
-            logger.debug("Retrying in %.1fs...", sleep_time)
-            time.sleep(sleep_time)
+        remaining = deadline - time.monotonic() if deadline is not None else None
+        delay = policy.next_delay(attempt, delay, retry_after, remaining)
+        if delay is None:
+            retry.record("gave_up")
+            if attempt < policy.max_attempts:
+                retry.record("budget_stops")
+                logger.error(
+                    "LLM call abandoned after %d attempts: next retry would exceed "
+                    "the remaining wall-time budget (%.1fs).", attempt, remaining,
+                )
+            else:
+                logger.error("LLM call failed after %d attempts.", attempt)
+            return None
+        if retry_after is not None:
+            retry.record("retry_after_honored")
+        retry.record("retries")
+        retry.record("retry_wait_sec", delay)
+        waited += delay
+        logger.debug("Retrying in %.1fs...", delay)
+        time.sleep(delay)
+
+    return None
+
+
+def set_retry_policy(policy: RetryPolicy):
+    """Replace the process-wide retry policy used by every LLM entry point."""
+    global _retry_policy
+    _retry_policy = policy
+
+
+def _deadline(run_context):
+    """Monotonic deadline implied by *run_context*'s Budget and HardStop (or None)."""
+    if run_context is None:
+        return None
+    remaining = run_context.budget.remaining()["wall_time_sec"]
+    remaining = min(remaining, run_context.hard_stop.remaining_seconds())
+    return time.monotonic() + remaining
+
+
+def _record_latency(metrics, attempt, start, response):
+    connect_ms = getattr(_timing, "connect_ms", 0.0)
+    metrics["attempts"] = attempt
+    metrics["total_ms"] = round((time.perf_counter() - start) * 1000, 3)
+    metrics["connect_ms"] = round(connect_ms, 3)
+    metrics["reused"] = connect_ms == 0.0
+    # requests measures request-sent -> headers-parsed as response.elapsed.
+    elapsed = getattr(response, "elapsed", None)
+    if isinstance(elapsed, datetime.timedelta):
+        metrics["ttfb_ms"] = round(elapsed.total_seconds() * 1000, 3)
+
+
+# ---------------------------------------------------------------------------
+# Hedged requests
+# ---------------------------------------------------------------------------
+# With GABBE_LLM_HEDGE=true, a request still outstanding after the model's
+# GABBE_LLM_HEDGE_PERCENTILE latency gets a duplicate; the first successful
+# answer wins and the other leg is aborted by shutting down its socket. The
+# provider still bills the loser (at least its prompt), so its usage is
+# charged to the Budget and recorded as an ``llm_hedge`` span.
+
+_HEDGE_ABORT_WAIT = 2.0  # seconds to wait for an aborted leg to report its usage
+
+_hedge_executor = None
+_hedge_stats = {"fired": 0, "won_by_primary": 0, "won_by_hedge": 0, "both_failed": 0}
+_hedge_lock = threading.Lock()
+
+
+class _HedgeAttempt:
+    """One leg of a hedged request; abort() may be called from another thread."""
+
+    def __init__(self, role):
+        self.role = role
+        self.cancel = threading.Event()
+        self.conn = None
+        self.metrics = {}
+
+    def run(self, args, deadline, options):
+        _timing.hedge = self
+        try:
+            return _call_with_retry(
+                *args, metrics=self.metrics, deadline=deadline, cancel=self.cancel, **options
+            )
+        finally:
+            _timing.hedge = None
+
+    def abort(self):
+        self.cancel.set()
+        sock = getattr(self.conn, "sock", None)
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+def _get_hedge_executor():
+    global _hedge_executor
+    with _hedge_lock:
+        if _hedge_executor is None:
+            # Separate from the asyncio pool: hedged calls may themselves run there.
+            _hedge_executor = ThreadPoolExecutor(
+                max_workers=2 * LLM_MAX_CONCURRENCY, thread_name_prefix="gabbe-llm-hedge"
+            )
+        return _hedge_executor
+
+
+def _hedge_delay_ms(pool=None):
+    """Latency after which a request is hedged, or None while there is too little history."""
+    window = get_latency_window(_pool_label(pool))
+    if len(window) < LLM_HEDGE_MIN_SAMPLES:
+        return None
+    return max(float(LLM_HEDGE_MIN_DELAY_MS), window.percentile(LLM_HEDGE_PERCENTILE))
+
+
+def _bump_hedge(name):
+    with _hedge_lock:
+        _hedge_stats[name] += 1
+
+
+def get_hedge_stats() -> dict:
+    """Counts of hedges fired and which leg won."""
+    with _hedge_lock:
+        return dict(_hedge_stats)
+
+
+def _hedged_call(args, metrics, deadline, **options):
+    """Run _call_with_retry, hedging it if it outlives the recent latency percentile.
+
+    Returns ``(content, usage, hedge)`` where *hedge* is None when no duplicate
+    was sent, else a dict describing the delay, the winner and the loser's usage.
+    *options* (pool, max_tokens) are passed through to _call_with_retry. With
+    a provider pool the duplicate is balanced like any other request, so it
+    usually lands on a different provider.
+    """
+    delay_ms = _hedge_delay_ms(options.get("pool"))
+    if delay_ms is None:
+        content, usage = _call_with_retry(*args, metrics=metrics, deadline=deadline, **options)
+        return content, usage, None
+
+    executor = _get_hedge_executor()
+    primary = _HedgeAttempt("primary")
+    legs = {executor.submit(primary.run, args, deadline, options): primary}
+    done, _ = wait(legs, timeout=delay_ms / 1000)
+    if done:
+        content, usage = next(iter(done)).result()
+        metrics.update(primary.metrics)
+        return content, usage, None
+
+    _bump_hedge("fired")
+    duplicate = _HedgeAttempt("hedge")
+    legs[executor.submit(duplicate.run, args, deadline, options)] = duplicate
+    results = {}
+    winner = None
+    pending = set(legs)
+    while pending and winner is None:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            leg = legs[future]
+            results[leg] = future.result()
+            if winner is None and results[leg][0] is not None:
+                winner = leg
+
+    if winner is None:
+        _bump_hedge("both_failed")
+        content, usage = results[primary]
+        metrics.update(primary.metrics)
+        return content, usage, {"delay_ms": round(delay_ms, 3), "winner": None}
+
+    _bump_hedge("won_by_primary" if winner is primary else "won_by_hedge")
+    loser = duplicate if winner is primary else primary
+    if loser not in results:
+        loser.abort()
+        loser_future = next(f for f, leg in legs.items() if leg is loser)
+        try:
+            results[loser] = loser_future.result(timeout=_HEDGE_ABORT_WAIT)
+        except FutureTimeoutError:
+            logger.warning("Hedged %s request did not stop after abort", loser.role)
+
+    content, usage = results[winner]
+    metrics.update(winner.metrics)
+    loser_content, loser_usage = results.get(loser) or (None, {})
+    estimated = not loser_usage
+    if estimated:
+        # Aborted mid-flight: the provider has at least consumed the prompt.
+        prompt_tokens = (usage or {}).get("prompt_tokens", 0)
+        loser_usage = {"prompt_tokens": prompt_tokens, "completion_tokens": 0,
+                       "total_tokens": prompt_tokens}
+    return content, usage, {
+        "delay_ms": round(delay_ms, 3),
+        "winner": winner.role,
+        "loser": {
+            "role": loser.role,
+            "completed": loser_content is not None,
+            "usage": loser_usage,
+            "usage_estimated": estimated,
+            "latency": loser.metrics,
+        },
+    }
+
+
+def _transport(call, deadline):
+    """Network step of an _LLMCall: ``(content, usage, hedge)``; safe to run off-thread.
+
+    If *call* leads a coalesced flight, the waiting callers are released here,
+    before control returns to the caller, so they never depend on the leader
+    still being awaited.
+    """
+    try:
+        options = {"pool": call.pool, "max_tokens": call.max_tokens}
+        if LLM_HEDGE_ENABLED:
+            result = _hedged_call(call.args(), call.metrics, deadline, **options)
         else:
-            logger.error("LLM call failed after %d attempts.", attempt)
+            content, usage = _call_with_retry(
+                *call.args(), metrics=call.metrics, deadline=deadline, **options
+            )
+            result = (content, usage, None)
+    except Exception as e:
+        call.land(error=e)
+        raise
+    except BaseException:
+        call.land(error=_FlightAbandoned())
+        raise
+    call.land(result)
+    return result
+
+
+# ---------------------------------------------------------------------------
+# Request coalescing (single-flight)
+# ---------------------------------------------------------------------------
+# Identical deterministic calls in flight at the same time share one upstream
+# request: the first caller (the leader) sends it and the others wait on its
+# Future. Every caller still gets its own llm_call span, but usage is billed
+# once, to the leader; the others' spans carry ``metadata.coalesced``.
+
+_flights = {}
+_flights_lock = threading.Lock()
+_coalesce_stats = {"leaders": 0, "coalesced": 0}
+
 
-    return None, {}
+class _FlightAbandoned(Exception):
+    """The leader of a coalesced call was cancelled before sending the request."""
+
+
+def _flight_key(label, system_prompt, prompt, temperature, max_tokens=None):
+    """Key under which identical in-flight calls are merged, or None if they may not be."""
+    if not LLM_COALESCE_ENABLED or temperature > LLM_COALESCE_MAX_TEMPERATURE:
+        return None
+    if LLM_COALESCE_WHITESPACE:
+        system_prompt = " ".join(str(system_prompt).split())
+        prompt = " ".join(str(prompt).split())
+    if max_tokens is not None:
+        label = f"{label}|max_tokens={max_tokens}"
+    return make_key(label, system_prompt, prompt, temperature)
+
+
+def _join_flight(key):
+    """Return ``(future, leader)``: the leader must resolve *future* via _land_flight()."""
+    with _flights_lock:
+        future = _flights.get(key)
+        if future is not None:
+            _coalesce_stats["coalesced"] += 1
+            return future, False
+        future = _flights[key] = Future()
+        _coalesce_stats["leaders"] += 1
+        return future, True
+
+
+def _land_flight(key, future, result=None, error=None):
+    """Resolve a flight once; later calls (e.g. a cancelled leader's cleanup) are no-ops."""
+    with _flights_lock:
+        if _flights.get(key) is future:
+            del _flights[key]
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+
+def get_coalesce_stats() -> dict:
+    """Counts of upstream requests sent as flight leaders and calls that joined one."""
+    with _flights_lock:
+        return dict(_coalesce_stats, in_flight=len(_flights))
+
+
+def _preflight(run_context, model, prompt, system_prompt):
+    """Check a call's estimated size against *run_context*'s Budget before sending.
+
+    Returns ``(estimate, max_tokens)``: *max_tokens* is None when the call
+    fits as is, or the completion cap that keeps it within budget. If not
+    even GABBE_LLM_MIN_COMPLETION_TOKENS fit, a ``rejected`` llm_call span is
+    recorded and BudgetExceeded is raised without contacting the API.
+    """
+    if run_context is None or not LLM_PREFLIGHT:
+        return None, None
+    prompt_tokens = estimate_prompt_tokens(prompt, system_prompt)
+    try:
+        allowed = run_context.budget.preflight(
+            model, prompt_tokens, LLM_EXPECTED_COMPLETION_TOKENS, LLM_MIN_COMPLETION_TOKENS
+        )
+    except BudgetExceeded as e:
+        span = run_context.tracer.start_span(
+            "llm_call", model, input_data={"prompt": prompt, "system_prompt": system_prompt}
+        )
+        run_context.tracer.end_span(
+            span, output_data={"error": str(e)}, status="rejected", model_name=model,
+            metadata={"preflight": {"prompt_tokens": prompt_tokens}},
+        )
+        raise
+    max_tokens = allowed if allowed < LLM_EXPECTED_COMPLETION_TOKENS else None
+    if max_tokens is not None:
+        logger.warning(
+            "Capping LLM completion at %d tokens to stay within the run budget", max_tokens
+        )
+    return {"prompt_tokens": prompt_tokens, "max_tokens": max_tokens}, max_tokens
+
+
+class _LLMCall:
+    """Bookkeeping around one non-streaming completion: cache, span and budget.
+
+    Shared by the blocking and asyncio entry points so both trace, cache and
+    bill calls identically; only the transport step differs.
+    """
+
+    def __init__(self, prompt, system_prompt, temperature, timeout, run_context, use_cache,
+                 pool=None):
+        _require_api_key()
+        self.prompt = prompt
+        self.system_prompt = system_prompt
+        self.temperature = temperature if temperature is not None else LLM_TEMPERATURE
+        self.timeout = timeout
+        self.run_context = run_context
+        self.pool = pool
+        self.label = _pool_label(pool)
+        self.metrics = {}
+        self.span = None
+        self.key = None
+        self.cached = None
+        self.flight_key = None
+        self.flight = None
+        self.leader = True
+        self.max_tokens = None
+        self.estimate = None
+
+        cache = get_llm_cache()
+        if cache.accepts(self.temperature, use_cache):
+            self.key = make_key(self.label, system_prompt, prompt, self.temperature)
+            self.cached = cache.get(self.key)
+            if self.cached is not None:
+                self._trace_cache_hit(*self.cached)
+        if self.cached is None:
+            self.estimate, self.max_tokens = _preflight(
+                run_context, self.label, prompt, system_prompt
+            )
+            self.flight_key = _flight_key(
+                self.label, system_prompt, prompt, self.temperature, self.max_tokens
+            )
+
+    def args(self):
+        return (self.prompt, self.system_prompt, self.temperature, self.timeout)
+
+    @property
+    def model(self):
+        """The model that actually answered (known once a provider was picked)."""
+        return self.metrics.get("model", self.label)
+
+    def begin(self):
+        if self.run_context is not None and self.span is None:
+            self.span = self.run_context.tracer.start_span(
+                "llm_call",
+                self.label,
+                input_data={"prompt": self.prompt, "system_prompt": self.system_prompt},
+            )
+
+    def join(self):
+        """Join an identical in-flight call. Returns True if this call must send it."""
+        if self.flight_key is not None:
+            self.flight, self.leader = _join_flight(self.flight_key)
+        return self.leader
+
+    def land(self, result=None, error=None):
+        """Hand the leader's outcome to the callers waiting on it."""
+        if self.flight is None or not self.leader:
+            return
+        if error is None:
+            content, usage, _ = result
+            result = (content, usage, {
+                "span_id": self.span["span_id"] if self.span is not None else None,
+                "model": self.model,
+            })
+        _land_flight(self.flight_key, self.flight, result, error)
+
+    def fail(self, error, status="error"):
+        if self.span is not None:
+            self.run_context.tracer.end_span(
+                self.span, output_data={"error": str(error)}, status=status,
+                model_name=self.model, metadata={"latency": self.metrics},
+            )
+
+    def finish(self, content, usage, hedge=None):
+        usage = usage or {}
+        model = self.model
+        # An answer that used its whole pre-flight cap is probably truncated: don't cache it.
+        truncated = (
+            self.max_tokens is not None
+            and usage.get("completion_tokens", self.max_tokens) >= self.max_tokens
+        )
+        if self.key is not None and content is not None and not truncated:
+            get_llm_cache().put(self.key, model, content, usage)
+        if self.span is not None:
+            budget = self.run_context.budget
+            metadata = {"latency": self.metrics, "cache_hit": False}
+            if self.estimate is not None:
+                metadata["preflight"] = self.estimate
+            if hedge is not None:
+                metadata["hedge"] = {"delay_ms": hedge["delay_ms"], "winner": hedge["winner"]}
+                if "loser" in hedge:
+                    self._trace_hedge_loser(hedge["loser"])
+            self.run_context.tracer.end_span(
+                self.span,
+                output_data={"response": content},
+                model_name=model,
+                token_usage=usage or None,
+                cost_usd=budget.price_usage(model, usage),
+                status="ok" if content is not None else "error",
+                metadata=metadata,
+            )
+            budget.record_llm_usage(model, usage)
+        return content, usage
+
+    def finish_coalesced(self, content, usage, leader):
+        """Record a call answered by another caller's request: traced, not billed."""
+        usage = dict(usage or {})
+        if self.span is not None:
+            self.run_context.tracer.end_span(
+                self.span,
+                output_data={"response": content},
+                model_name=leader["model"],
+                status="ok" if content is not None else "error",
+                metadata={
+                    "coalesced": True,
+                    "coalesced_with": leader["span_id"],
+                    "shared_usage": usage,
+                    "cache_hit": False,
+                },
+            )
+        return content, usage
+
+    def _trace_hedge_loser(self, loser):
+        # Billed by the provider even though its answer is discarded. Charged
+        # without a limit check so the winner's answer is still returned; the
+        # winner's record_llm_usage() right after enforces the budget.
+        tracer = self.run_context.tracer
+        budget = self.run_context.budget
+        model = loser["latency"].get("model", self.label)
+        span = tracer.start_span(
+            "llm_hedge", model, input_data=None, parent_span_id=self.span["span_id"]
+        )
+        tracer.end_span(
+            span,
+            model_name=model,
+            token_usage=loser["usage"],
+            cost_usd=budget.price_usage(model, loser["usage"]),
+            status="discarded" if loser["completed"] else "cancelled",
+            metadata={
+                "hedge_role": loser["role"],
+                "usage_estimated": loser["usage_estimated"],
+                "latency": loser["latency"],
+            },
+        )
+        budget.record_llm_usage(model, loser["usage"], check=False)
+
+    def _trace_cache_hit(self, content, usage):
+        if self.run_context is None:
+            return
+        span = self.run_context.tracer.start_span(
+            "llm_call",
+            self.label,
+            input_data={"prompt": self.prompt, "system_prompt": self.system_prompt},
+        )
+        self.run_context.tracer.end_span(
+            span,
+            output_data={"response": content},
+            model_name=self.label,
+            metadata={"cache_hit": True, "tokens_saved": usage.get("total_tokens", 0)},
+        )
+        self.run_context.budget.record_cache_hit(self.label, usage)
+
+
+def _complete(prompt, system_prompt, temperature, timeout, run_context, use_cache, pool=None):
+    """Serve from gabbe.llm_cache when allowed, otherwise call the API (traced)."""
+    call = _LLMCall(prompt, system_prompt, temperature, timeout, run_context, use_cache, pool)
+    if call.cached is not None:
+        return call.cached
+    call.begin()
+    if not call.join():
+        try:
+            content, usage, leader = call.flight.result()
+        except _FlightAbandoned:
+            pass  # the leader was cancelled before sending: go ourselves
+        except Exception as e:
+            call.fail(e)
+            raise
+        else:
+            return call.finish_coalesced(content, usage, leader)
+    try:
+        content, usage, hedge = _transport(call, _deadline(run_context))
+    except Exception as e:
+        call.fail(e)
+        raise
+    return call.finish(content, usage, hedge)
 
 
 def call_llm(
-    prompt, system_prompt="You are a helpful assistant.", temperature=None, timeout=None
+    prompt,
+    system_prompt="You are a helpful assistant.",
+    temperature=None,
+    timeout=None,
+    run_context=None,
+    use_cache=True,
+    pool=None,
 ):
     """
     Call an LLM via an OpenAI-compatible API.
@@ -109,16 +890,338 @@ def call_llm(
     Raises EnvironmentError if GABBE_API_KEY is not set so callers can
     distinguish missing configuration from actual API failures.
     Returns the response string on success, or None on network/API error.
+    If *run_context* is given, the call is recorded as an ``llm_call`` span
+    with its latency breakdown in the span metadata, and its usage is charged
+    to ``run_context.budget``.
+
+    Deterministic calls (temperature <= GABBE_LLM_CACHE_MAX_TEMPERATURE) are
+    served from gabbe.llm_cache when possible; pass ``use_cache=False`` to
+    always hit the API.
+
+    *pool* ("LOCAL" / "REMOTE", see gabbe.route) selects the provider pool
+    from config.json. Raises ProviderUnavailable if the pool has no usable
+    provider; LOCAL requests are never sent to the remote endpoint.
     """
-    content, _ = _call_with_retry(prompt, system_prompt, temperature, timeout)
+    content, _ = _complete(
+        prompt, system_prompt, temperature, timeout, run_context, use_cache, pool
+    )
     return content
 
 
 def call_llm_with_usage(
-    prompt, system_prompt="You are a helpful assistant.", temperature=None, timeout=None
+    prompt,
+    system_prompt="You are a helpful assistant.",
+    temperature=None,
+    timeout=None,
+    run_context=None,
+    use_cache=True,
+    pool=None,
 ):
     """
     Like call_llm() but also returns the token usage dict for budget tracking.
     Returns (str|None, dict) where dict contains prompt_tokens, completion_tokens, total_tokens.
     """
-    return _call_with_retry(prompt, system_prompt, temperature, timeout)
+    return _complete(prompt, system_prompt, temperature, timeout, run_context, use_cache, pool)
+
+
+
+# ---------------------------------------------------------------------------
+# asyncio API
+# ---------------------------------------------------------------------------
+# requests is blocking, so async calls run the same retry loop
+# (_call_with_retry) on a shared worker pool sized to GABBE_LLM_MAX_CONCURRENCY
+# and reuse the pooled session. Cache lookups, spans and budget updates stay
+# on the event-loop thread, so a RunContext never crosses threads.
+
+_executor = None
+_executor_lock = threading.Lock()
+_loop_semaphores = weakref.WeakKeyDictionary()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=LLM_MAX_CONCURRENCY, thread_name_prefix="gabbe-llm"
+            )
+        return _executor
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    """Return the in-flight limiter for the running event loop."""
+    loop = asyncio.get_running_loop()
+    with _executor_lock:
+        semaphore = _loop_semaphores.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+            _loop_semaphores[loop] = semaphore
+        return semaphore
+
+
+async def _acomplete(prompt, system_prompt, temperature, timeout, run_context, use_cache,
+                     pool=None):
+    call = _LLMCall(prompt, system_prompt, temperature, timeout, run_context, use_cache, pool)
+    if call.cached is not None:
+        return call.cached
+    if not call.join():
+        # Waiting on another caller's request takes no concurrency slot.
+        call.begin()
+        try:
+            # shield(): cancelling this waiter must not cancel the shared flight.
+            content, usage, leader = await asyncio.shield(asyncio.wrap_future(call.flight))
+        except _FlightAbandoned:
+            pass  # the leader was cancelled before sending: go ourselves
+        except asyncio.CancelledError:
+            call.fail("cancelled", status="cancelled")
+            raise
+        except Exception as e:
+            call.fail(e)
+            raise
+        else:
+            return call.finish_coalesced(content, usage, leader)
+    work = None
+    try:
+        async with _get_semaphore():
+            call.begin()
+            work = _get_executor().submit(_transport, call, _deadline(run_context))
+            try:
+                content, usage, hedge = await asyncio.shield(asyncio.wrap_future(work))
+            except asyncio.CancelledError:
+                # The worker finishes the request in the background; we just stop waiting.
+                call.fail("cancelled", status="cancelled")
+                raise
+            except Exception as e:
+                call.fail(e)
+                raise
+    except asyncio.CancelledError:
+        # Never started, so _transport won't release the callers waiting on us.
+        if work is None or work.cancel():
+            call.land(error=_FlightAbandoned())
+        raise
+    return call.finish(content, usage, hedge)
+
+
+async def acall_llm(
+    prompt,
+    system_prompt="You are a helpful assistant.",
+    temperature=None,
+    timeout=None,
+    run_context=None,
+    use_cache=True,
+    pool=None,
+):
+    """Async call_llm(): same retry, auth, cache and tracing semantics."""
+    content, _ = await _acomplete(
+        prompt, system_prompt, temperature, timeout, run_context, use_cache, pool
+    )
+    return content
+
+
+async def acall_llm_with_usage(
+    prompt,
+    system_prompt="You are a helpful assistant.",
+    temperature=None,
+    timeout=None,
+    run_context=None,
+    use_cache=True,
+    pool=None,
+):
+    """Async call_llm_with_usage(). Returns (str|None, dict)."""
+    return await _acomplete(
+        prompt, system_prompt, temperature, timeout, run_context, use_cache, pool
+    )
+
+
+def call_llm_batch(
+    prompts,
+    system_prompt="You are a helpful assistant.",
+    temperature=None,
+    timeout=None,
+    run_context=None,
+    use_cache=True,
+    with_usage=False,
+    pool=None,
+):
+    """
+    Run *prompts* concurrently (bounded by GABBE_LLM_MAX_CONCURRENCY) and
+    return their results in input order.
+
+    Each result is what call_llm() (or call_llm_with_usage() when
+    *with_usage* is true) would have returned for that prompt. Must be
+    called from synchronous code; inside a running event loop, gather
+    acall_llm() directly instead.
+    """
+    call = acall_llm_with_usage if with_usage else acall_llm
+
+    async def _gather():
+        return await asyncio.gather(*(
+            call(p, system_prompt, temperature, timeout, run_context, use_cache, pool)
+            for p in prompts
+        ))
+
+    return list(asyncio.run(_gather()))
+
+def _iter_sse(response):
+    """Yield the JSON events of an OpenAI-style ``text/event-stream`` body."""
+    # chunk_size=None hands lines over as soon as each chunk arrives.
+    for raw in response.iter_lines(chunk_size=None):
+        if not raw:
+            continue
+        line = raw.decode("utf-8") if isinstance(raw, bytes) else raw
+        if not line.startswith("data:"):
+            continue  # comments / keep-alives / event names
+        data = line[5:].strip()
+        if data == "[DONE]":
+            return
+        try:
+            yield json.loads(data)
+        except json.JSONDecodeError:
+            logger.warning("Skipping malformed SSE event: %s", data[:200])
+
+
+def call_llm_stream(
+    prompt,
+    system_prompt="You are a helpful assistant.",
+    temperature=None,
+    timeout=None,
+    run_context=None,
+    stats=None,
+    pool=None,
+):
+    """
+    Stream a completion, yielding content deltas (str) as they arrive.
+
+    Raises EnvironmentError (on first iteration) if GABBE_API_KEY is not set.
+    Network/API errors end the stream early and are logged, like call_llm().
+    Streams always bypass the response cache.
+
+    With *run_context*, the call is recorded as an ``llm_call`` span with
+    time-to-first-token and tokens/sec, the final usage block is charged to
+    ``run_context.budget``, and the stream is cancelled (response closed,
+    HardStopTriggered / BudgetExceeded raised) as soon as the wall clock or
+    the projected token/cost spend trips a limit.
+
+    If *stats* is a dict it receives usage, ttft_ms, tokens_per_sec, chunks,
+    latency and cancelled once the stream ends.
+    """
+    _require_api_key()
+    temperature = temperature if temperature is not None else LLM_TEMPERATURE
+    estimate, max_tokens = _preflight(run_context, _pool_label(pool), prompt, system_prompt)
+    prompt_tokens = estimate["prompt_tokens"] if estimate else 0
+    payload = _create_payload(prompt, system_prompt, temperature, max_tokens)
+    payload["stream"] = True
+    payload["stream_options"] = {"include_usage": True}
+    stats = stats if stats is not None else {}
+
+    span = None
+    if run_context is not None:
+        span = run_context.tracer.start_span(
+            "llm_call",
+            _pool_label(pool),
+            input_data={"prompt": prompt, "system_prompt": system_prompt},
+        )
+
+    metrics = {}
+    start = time.perf_counter()
+    try:
+        response = _send_with_retry(
+            payload, timeout, metrics, stream=True, deadline=_deadline(run_context), pool=pool
+        )
+    except BaseException as e:
+        if span is not None:
+            run_context.tracer.end_span(span, output_data={"error": str(e) or type(e).__name__},
+                                        status="error")
+        raise
+    model = metrics.get("model", _pool_label(pool))
+    parts = []
+    usage = {}
+    chunks = 0
+    first_token_at = None
+    cancelled = None
+    failed = response is None
+    try:
+        if response is not None:
+            for event in _iter_sse(response):
+                if event.get("usage"):
+                    usage = event["usage"]
+                for choice in event.get("choices") or []:
+                    delta = (choice.get("delta") or {}).get("content")
+                    if not delta:
+                        continue
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                    chunks += 1
+                    parts.append(delta)
+                    if run_context is not None:
+                        run_context.hard_stop.check()
+                        # One content delta is ~one token until the usage block
+                        # arrives; the prompt is billed too.
+                        run_context.budget.check_projected(model, {
+                            "prompt_tokens": prompt_tokens,
+                            "completion_tokens": chunks,
+                            "total_tokens": prompt_tokens + chunks,
+                        })
+                    yield delta
+    except (HardStopTriggered, BudgetExceeded) as e:
+        cancelled = str(e)
+        raise
+    except GeneratorExit:
+        cancelled = "closed by consumer"
+        raise
+    except requests.exceptions.RequestException as e:
+        failed = True
+        logger.error("LLM stream interrupted: %s", e)
+    finally:
+        if response is not None:
+            response.close()
+        _finish_stream(
+            run_context, span, stats, metrics, usage, parts, chunks,
+            start, first_token_at, cancelled, failed, model,
+        )
+
+
+def _finish_stream(run_context, span, stats, metrics, usage, parts, chunks,
+                   start, first_token_at, cancelled, failed, model):
+    end = time.perf_counter()
+    estimated = not usage and chunks > 0
+    if estimated:
+        usage = {"completion_tokens": chunks, "total_tokens": chunks}
+    completion_tokens = usage.get("completion_tokens", chunks)
+    generation_sec = end - first_token_at if first_token_at is not None else 0.0
+
+    stats.update({
+        "usage": usage,
+        "ttft_ms": round((first_token_at - start) * 1000, 3) if first_token_at else None,
+        "tokens_per_sec": round(completion_tokens / generation_sec, 2) if generation_sec > 0 else None,
+        "chunks": chunks,
+        "total_ms": round((end - start) * 1000, 3),
+        "latency": metrics,
+        "cancelled": cancelled,
+    })
+    if run_context is None:
+        return
+
+    if cancelled:
+        status = "cancelled"
+    elif failed:
+        status = "error"
+    else:
+        status = "ok"
+    metadata = {key: stats[key] for key in ("ttft_ms", "tokens_per_sec", "chunks", "total_ms", "latency", "cancelled")}
+    metadata.update({"stream": True, "usage_estimated": estimated})
+    run_context.tracer.end_span(
+        span,
+        output_data={"response": "".join(parts)},
+        model_name=model,
+        token_usage=usage or None,
+        cost_usd=run_context.budget.price_usage(model, usage),
+        status=status,
+        metadata=metadata,
+    )
+    try:
+        run_context.budget.record_llm_usage(model, usage)
+    except BudgetExceeded:
+        # Already unwinding from a cancellation: don't mask the original reason.
+        if cancelled is None:
+            raise
@@ -0,0 +1,227 @@
+"""Content-addressed cache for LLM responses.
+
+Two tiers sit in front of the network call:
+
+1. An in-process LRU (``GABBE_LLM_CACHE_MEMORY_ENTRIES``) for repeated
+   prompts within one process.
+2. The ``llm_cache`` table in ``state.db``, shared across runs, with a TTL
+   (``GABBE_LLM_CACHE_TTL``) and an entry cap (``GABBE_LLM_CACHE_MAX_ENTRIES``)
+   enforced by evicting the least recently used rows.
+
+Entries are keyed by a SHA-256 of (model, system_prompt, prompt, temperature).
+Only calls at or below ``GABBE_LLM_CACHE_MAX_TEMPERATURE`` are cached; sampled
+responses are not reproducible, so serving them from cache would change
+behaviour rather than just save money.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from . import database
+from .config import (
+    LLM_CACHE_ENABLED,
+    LLM_CACHE_TTL,
+    LLM_CACHE_MEMORY_ENTRIES,
+    LLM_CACHE_MAX_ENTRIES,
+    LLM_CACHE_MAX_TEMPERATURE,
+)
+
+logger = logging.getLogger("gabbe.llm_cache")
+
+
+def make_key(model: str, system_prompt: str, prompt: str, temperature: float) -> str:
+    """Return the cache key for one chat completion request."""
+    material = json.dumps(
+        [model, system_prompt, prompt, round(float(temperature), 4)],
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """Two-tier (memory LRU + SQLite) cache of ``(content, usage)`` pairs."""
+
+    def __init__(
+        self,
+        enabled: bool = LLM_CACHE_ENABLED,
+        ttl: int = LLM_CACHE_TTL,
+        memory_entries: int = LLM_CACHE_MEMORY_ENTRIES,
+        max_entries: int = LLM_CACHE_MAX_ENTRIES,
+        max_temperature: float = LLM_CACHE_MAX_TEMPERATURE,
+    ):
+        self.enabled = enabled
+        self.ttl = ttl
+        self.memory_entries = memory_entries
+        self.max_entries = max_entries
+        self.max_temperature = max_temperature
+        self._memory: OrderedDict[str, tuple[float, str, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {
+            "hits": 0,
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "bypassed": 0,
+            "stores": 0,
+            "evictions": 0,
+            "tokens_saved": 0,
+        }
+
+    # -- policy -------------------------------------------------------------
+
+    def accepts(self, temperature: float, use_cache: bool = True) -> bool:
+        """True if a call with these settings may be served from / stored in the cache."""
+        if not (self.enabled and use_cache and self.ttl > 0):
+            return False
+        if temperature > self.max_temperature:
+            self._bump("bypassed")
+            return False
+        return True
+
+    # -- lookup / store -------------------------------------------------------
+
+    def get(self, key: str) -> tuple[str, dict] | None:
+        """Return the cached ``(content, usage)`` for *key*, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires_at, content, usage = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self._record_hit("memory_hits", usage)
+                    return content, usage
+                del self._memory[key]
+
+        row = self._disk_get(key, now)
+        if row is None:
+            self._bump("misses")
+            return None
+        content, usage, expires_at = row
+        with self._lock:
+            self._remember(key, expires_at, content, usage)
+            self._record_hit("disk_hits", usage)
+        return content, usage
+
+    def put(self, key: str, model: str, content: str, usage: dict | None):
+        """Store a successful response under *key* in both tiers."""
+        if content is None:
+            return
+        now = time.time()
+        expires_at = now + self.ttl
+        usage = usage or {}
+        with self._lock:
+            self._remember(key, expires_at, content, usage)
+            self._stats["stores"] += 1
+        try:
+            with database.db_connection() as conn:
+                conn.execute(
+                    """INSERT INTO llm_cache
+                       (key, model, response, usage, created_at, expires_at, last_access, hits)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, 0)
+                       ON CONFLICT(key) DO UPDATE SET
+                         response = excluded.response, usage = excluded.usage,
+                         created_at = excluded.created_at, expires_at = excluded.expires_at,
+                         last_access = excluded.last_access""",
+                    (key, model, content, json.dumps(usage), now, expires_at, now),
+                )
+                self._evict(conn, now)
+        except sqlite3.Error as e:
+            logger.warning("LLM cache write failed: %s", e)
+
+    def clear(self, memory_only: bool = False):
+        """Drop cached entries (the in-memory tier, and the table unless *memory_only*)."""
+        with self._lock:
+            self._memory.clear()
+        if memory_only:
+            return
+        try:
+            with database.db_connection() as conn:
+                conn.execute("DELETE FROM llm_cache")
+        except sqlite3.Error as e:
+            logger.warning("LLM cache clear failed: %s", e)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+    # -- internals ------------------------------------------------------------
+
+    def _bump(self, name: str, amount: int = 1):
+        with self._lock:
+            self._stats[name] += amount
+
+    def _record_hit(self, tier: str, usage: dict):
+        # Caller holds self._lock.
+        self._stats["hits"] += 1
+        self._stats[tier] += 1
+        self._stats["tokens_saved"] += usage.get("total_tokens", 0)
+
+    def _remember(self, key: str, expires_at: float, content: str, usage: dict):
+        # Caller holds self._lock.
+        if self.memory_entries <= 0:
+            return
+        self._memory[key] = (expires_at, content, usage)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _disk_get(self, key: str, now: float):
+        try:
+            with database.db_connection() as conn:
+                row = conn.execute(
+                    "SELECT response, usage, expires_at FROM llm_cache WHERE key = ?",
+                    (key,),
+                ).fetchone()
+                if row is None:
+                    return None
+                if row["expires_at"] <= now:
+                    conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                    return None
+                conn.execute(
+                    "UPDATE llm_cache SET last_access = ?, hits = hits + 1 WHERE key = ?",
+                    (now, key),
+                )
+        except sqlite3.Error as e:
+            logger.warning("LLM cache read failed: %s", e)
+            return None
+        usage = json.loads(row["usage"]) if row["usage"] else {}
+        return row["response"], usage, row["expires_at"]
+
+    def _evict(self, conn, now: float):
+        expired = conn.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (now,)).rowcount
+        overflow = conn.execute(
+            """DELETE FROM llm_cache WHERE key IN (
+                   SELECT key FROM llm_cache ORDER BY last_access ASC
+                   LIMIT max(0, (SELECT COUNT(*) FROM llm_cache) - ?))""",
+            (self.max_entries,),
+        ).rowcount
+        if expired or overflow:
+            self._bump("evictions", expired + overflow)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+_cache_pid = None
+
+
+def get_llm_cache() -> LLMCache:
+    """Return the process-wide LLMCache."""
+    global _cache, _cache_pid
+    with _cache_lock:
+        if _cache is None or _cache_pid != os.getpid():
+            _cache = LLMCache()
+            _cache_pid = os.getpid()
+        return _cache
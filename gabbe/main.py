@@ -35,9 +35,17 @@ def main():
     db_parser.add_argument(
         "--init", action="store_true", help="Initialize the database schema"
     )
+    db_parser.add_argument(
+        "--rebuild-stats", action="store_true",
+        help="Recompute the task/run summary tables and report any drift",
+    )
 
     # --- COMMAND: sync ---
-    subparsers.add_parser("sync", help="Sync Markdown <-> SQLite")
+    sync_parser = subparsers.add_parser("sync", help="Sync Markdown <-> SQLite")
+    sync_parser.add_argument(
+        "--watch", action="store_true",
+        help="Keep running and sync whenever project/TASKS.md or the tasks table changes",
+    )
 
     # --- COMMAND: verify ---
     subparsers.add_parser("verify", help="Run integrity checks")
@@ -47,7 +55,15 @@ def main():
 
     # --- COMMAND: route ---
     route_parser = subparsers.add_parser("route", help="Cost-Effective Router")
-    route_parser.add_argument("prompt", help="The prompt to analyze")
+    route_parser.add_argument("prompt", nargs="?", help="The prompt to analyze")
+    route_parser.add_argument(
+        "--run", action="store_true",
+        help="Send the prompt to the chosen provider pool and print the response",
+    )
+    route_parser.add_argument(
+        "--batch", metavar="FILE",
+        help="Score every prompt in FILE locally and report agreement with LLM scores",
+    )
 
     # --- COMMAND: brain ---
     brain_parser = subparsers.add_parser("brain", help="Brain Mode Interface")
@@ -108,13 +124,28 @@ def main():
         elif args.command == "db":
             if args.init:
                 init_db()
+            elif args.rebuild_stats:
+                from .database import rebuild_stats
+
+                drift = rebuild_stats()
+                for name, stored, actual in drift:
+                    print(f"{Colors.WARNING}  {name}: stored {stored}, actual {actual}{Colors.ENDC}")
+                if drift:
+                    print(f"{Colors.GREEN}✓ Rebuilt summary tables ({len(drift)} value(s) had drifted){Colors.ENDC}")
+                else:
+                    print(f"{Colors.GREEN}✓ Summary tables match tasks and runs{Colors.ENDC}")
             else:
                 db_parser.print_help()
 
         elif args.command == "sync":
-            from .sync import sync_tasks
+            if args.watch:
+                from .sync_watch import watch
+
+                watch()
+            else:
+                from .sync import sync_tasks
 
-            sync_tasks()
+                sync_tasks()
 
         elif args.command == "verify":
             from .verify import run_verification
@@ -127,9 +158,22 @@ def main():
             show_dashboard()
 
         elif args.command == "route":
-            from .route import route_request
+            if args.batch:
+                from .route import route_batch
+
+                route_batch(args.batch)
+            elif args.prompt is None:
+                route_parser.error("a prompt or --batch FILE is required")
+            elif args.run:
+                from .route import dispatch
+
+                _, response = dispatch(args.prompt)
+                if response is not None:
+                    print(response)
+            else:
+                from .route import route_request
 
-            route_request(args.prompt)
+                route_request(args.prompt)
 
         elif args.command == "brain":
             from .brain import activate_brain, evolve_prompts, run_healer
@@ -152,9 +196,8 @@ def main():
             run_forecast()
 
         elif args.command == "runs":
-            from .database import get_db
-            conn = get_db()
-            try:
+            from .database import db_connection
+            with db_connection() as conn:
                 query = "SELECT id, command, status, started_at, ended_at, total_cost_usd, initiator FROM runs"
                 params = []
                 if hasattr(args, "status") and args.status:
@@ -171,50 +214,45 @@ def main():
                     for r in rows:
                         cost = f"${r['total_cost_usd']:.4f}" if r['total_cost_usd'] else "$0.0000"
                         print(f"{r['id']:<38} {(r['command'] or '')[:20]:<20} {(r['status'] or ''):<16} {(r['started_at'] or ''):<22} {cost:>8}")
-            finally:
-                conn.close()
 
         elif args.command == "audit":
-            from .database import get_db
+            from .database import db_connection
             from .audit import AuditTracer
-            conn = get_db()
-            tracer = AuditTracer(args.run_id, db_conn=conn)
-            if args.format == "json":
-                print(tracer.export_json(args.run_id))
-            else:
-                spans = tracer.get_run_trace(args.run_id)
-                if not spans:
-                    print(f"No audit spans found for run {args.run_id}")
+            with db_connection() as conn:
+                tracer = AuditTracer(args.run_id, db_conn=conn)
+                if args.format == "json":
+                    print(tracer.export_json(args.run_id))
                 else:
-                    print(f"{'EVENT TYPE':<18} {'NODE':<25} {'DURATION(ms)':>14} {'COST(USD)':>12} {'STATUS':<10}")
-                    print("-" * 82)
-                    for s in spans:
-                        dur = f"{s['duration_ms']:.2f}" if s['duration_ms'] else "N/A"
-                        cost = f"${s['cost_usd']:.6f}" if s['cost_usd'] else "$0.000000"
-                        print(f"{(s['event_type'] or ''):<18} {(s['node_name'] or '')[:25]:<25} {dur:>14} {cost:>12} {(s['status'] or ''):<10}")
-            conn.close()
+                    spans = tracer.get_run_trace(args.run_id)
+                    if not spans:
+                        print(f"No audit spans found for run {args.run_id}")
+                    else:
+                        print(f"{'EVENT TYPE':<18} {'NODE':<25} {'DURATION(ms)':>14} {'COST(USD)':>12} {'STATUS':<10}")
+                        print("-" * 82)
+                        for s in spans:
+                            dur = f"{s['duration_ms']:.2f}" if s['duration_ms'] else "N/A"
+                            cost = f"${s['cost_usd']:.6f}" if s['cost_usd'] else "$0.000000"
+                            print(f"{(s['event_type'] or ''):<18} {(s['node_name'] or '')[:25]:<25} {dur:>14} {cost:>12} {(s['status'] or ''):<10}")
 
         elif args.command == "replay":
-            from .database import get_db
+            from .database import db_connection
             from .replay import CheckpointStore, ReplayRunner
-            conn = get_db()
-            store = CheckpointStore(db_conn=conn)
-            runner = ReplayRunner(store)
-            from_step = getattr(args, "from_step", 0)
-            steps = runner.replay(args.run_id, from_step=from_step)
+            with db_connection() as conn:
+                store = CheckpointStore(db_conn=conn)
+                runner = ReplayRunner(store)
+                from_step = getattr(args, "from_step", 0)
+                steps = runner.replay(args.run_id, from_step=from_step)
             if not steps:
                 print(f"No checkpoints to replay for run {args.run_id}")
             else:
                 print(f"Replayed {len(steps)} steps for run {args.run_id}")
                 for s in steps:
                     print(f"  Step {s['step']}: {s['node_name']} (policy: {s['policy_version']})")
-            conn.close()
 
         elif args.command == "resume":
-            from .database import get_db
+            from .database import db_connection
             from .escalation import EscalationHandler
-            conn = get_db()
-            try:
+            with db_connection() as conn:
                 rows = conn.execute(
                     "SELECT * FROM pending_escalations WHERE run_id = ? AND status = 'pending' ORDER BY id",
                     (args.run_id,)
@@ -231,8 +269,6 @@ def main():
                         status = "approved" if choice == "a" else "rejected"
                         handler.resolve(row["id"], status)
                         print(f"  Marked as {status}.")
-            finally:
-                conn.close()
 
         else:
             parser.print_help()
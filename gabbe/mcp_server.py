@@ -1,11 +1,28 @@
 import os
 import sys
 import json
+import queue
 import shlex
+import signal
+import time
+import asyncio
+import codecs
 import logging
+import threading
+import contextvars
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from .audit import annotate_span
+from .config import (
+    MCP_MAX_CONCURRENCY,
+    MCP_OUTPUT_MAX_BYTES,
+    MCP_RATE_LIMIT_PER_MIN,
+    SUBPROCESS_TIMEOUT,
+)
 from .context import RunContext
 from .gateway import ToolDefinition
+from .tool_cache import mtime_token
 
 logger = logging.getLogger("gabbe.mcp")
 
@@ -19,8 +36,55 @@ _MCP_TOKEN = os.environ.get("GABBE_MCP_TOKEN")
 _raw_allowed = os.environ.get("GABBE_MCP_ALLOWED_COMMANDS", "")
 _ALLOWED_COMMANDS: list = [c.strip() for c in _raw_allowed.split(",") if c.strip()]
 
+# Read-only commands whose results may be reused within a session, as
+# comma-separated prefixes (e.g. "git status,git diff,ls"). Unset: nothing is cached.
+_raw_cacheable = os.environ.get("GABBE_MCP_CACHEABLE_COMMANDS", "")
+_CACHEABLE_COMMANDS: list = [shlex.split(c) for c in _raw_cacheable.split(",") if c.strip()]
+
 _authenticated = False  # per-process session flag
 
+# Subprocesses of in-flight run_command calls, so notifications/cancelled can kill them.
+_request_id = contextvars.ContextVar("gabbe_mcp_request_id", default=None)
+# Set while a tools/call that asked for progress runs: callback(progress, message).
+_progress = contextvars.ContextVar("gabbe_mcp_progress", default=None)
+_running: dict = {}      # request id -> Popen
+_cancelled: set = set()  # request ids the client cancelled while in flight
+_running_lock = threading.Lock()
+
+
+def _command_is_cacheable(arguments: dict) -> bool:
+    try:
+        tokens = shlex.split(arguments.get("command", ""))
+    except ValueError:
+        return False
+    return any(tokens[:len(prefix)] == prefix for prefix in _CACHEABLE_COMMANDS)
+
+
+def _command_freshness(arguments: dict) -> tuple:
+    """mtimes a cached command result depends on: the cwd, paths it names, git state."""
+    tokens = shlex.split(arguments.get("command", ""))
+    paths = [os.getcwd(), os.path.join(".git", "index"), os.path.join(".git", "HEAD")]
+    paths += [t for t in tokens[1:] if not t.startswith("-") and os.path.exists(t)]
+    return mtime_token(paths)
+
+
+@contextmanager
+def _tracked(proc):
+    """Make *proc* killable by a cancellation of the request running it."""
+    req_id = _request_id.get()
+    if req_id is None:
+        yield
+        return
+    with _running_lock:
+        _running[req_id] = proc
+        if req_id in _cancelled:  # cancelled before the process started
+            _kill_group(proc)
+    try:
+        yield
+    finally:
+        with _running_lock:
+            _running.pop(req_id, None)
+
 
 def run_command_handler(command: str):
     tokens = shlex.split(command)
@@ -33,12 +97,365 @@ def run_command_handler(command: str):
                    for allowed in _ALLOWED_COMMANDS):
             logger.warning("MCP command blocked by allowlist: %s", executable)
             return {"stdout": "", "stderr": f"Command '{executable}' not in allowed list", "returncode": 126}
-    result = subprocess.run(tokens, shell=False, capture_output=True, text=True)
-    return {"stdout": result.stdout, "stderr": result.stderr, "returncode": result.returncode}
+    return _run_streaming(tokens, on_output=_progress.get())
+
+
+def _kill_group(proc):
+    """Kill *proc* and everything it started (it leads its own process group)."""
+    try:
+        if os.name == "posix":
+            os.killpg(proc.pid, signal.SIGKILL)
+        else:
+            proc.kill()
+    except (ProcessLookupError, PermissionError):
+        pass  # already gone
+
+
+class _Capture:
+    """Keeps the first and last *limit*/2 bytes of a stream and counts the rest."""
+
+    def __init__(self, limit: int):
+        self.half = limit // 2
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.total = 0
+        self.decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+    def add(self, data: bytes) -> str:
+        """Record a chunk; return it decoded (for progress messages)."""
+        self.total += len(data)
+        text = self.decoder.decode(data)
+        room = self.half - len(self.head)
+        if room > 0:
+            self.head += data[:room]
+            data = data[room:]
+        if data:
+            self.tail += data
+            del self.tail[:-self.half]
+        return text
+
+    @property
+    def truncated(self) -> int:
+        return self.total - len(self.head) - len(self.tail)
+
+    def text(self) -> str:
+        head = self.head.decode("utf-8", errors="replace")
+        if not self.truncated:
+            return head + self.tail.decode("utf-8", errors="replace")
+        tail = self.tail.decode("utf-8", errors="replace")
+        return f"{head}\n... [{self.truncated} bytes truncated] ...\n{tail}"
+
+
+def _pump(stream, name, chunks):
+    """Reader thread: forward *stream* to *chunks* as it arrives; None marks EOF."""
+    try:
+        while True:
+            data = stream.read1(65536)
+            if not data:
+                break
+            chunks.put((name, data))
+    except (OSError, ValueError):
+        pass  # pipe closed under us (process killed)
+    finally:
+        chunks.put((name, None))
+
+
+def _reap(proc):
+    """Wait for *proc*; return (returncode, peak RSS of the child in KiB or None)."""
+    if hasattr(os, "wait4"):
+        try:
+            _, status, usage = os.wait4(proc.pid, 0)
+        except ChildProcessError:
+            return proc.wait(), None
+        # Same convention as Popen: negative signal number if killed.
+        # (os.waitstatus_to_exitcode is 3.9+.)
+        if os.WIFSIGNALED(status):
+            proc.returncode = -os.WTERMSIG(status)
+        else:
+            proc.returncode = os.WEXITSTATUS(status)
+        # ru_maxrss is KiB on Linux, bytes on macOS.
+        peak = usage.ru_maxrss // 1024 if sys.platform == "darwin" else usage.ru_maxrss
+        return proc.returncode, peak
+    return proc.wait(), None
+
+
+def _run_streaming(tokens, timeout: float = SUBPROCESS_TIMEOUT, on_output=None,
+                   max_bytes: int = MCP_OUTPUT_MAX_BYTES) -> dict:
+    """Run *tokens*, reading stdout/stderr as they are produced.
+
+    Each stream keeps at most *max_bytes* (head and tail; the middle is
+    replaced by a marker), so a verbose build can't exhaust memory.
+    *on_output(progress, message)* gets the text as it arrives. After
+    *timeout* seconds the process group is killed and ``timed_out`` is set.
+    Bytes streamed and the child's peak RSS go into the audit span.
+    """
+    extra = {"start_new_session": True} if os.name == "posix" else {}
+    proc = subprocess.Popen(tokens, shell=False, stdout=subprocess.PIPE, stderr=subprocess.PIPE, **extra)
+    captures = {"stdout": _Capture(max_bytes), "stderr": _Capture(max_bytes)}
+    chunks: queue.Queue = queue.Queue()
+    for name in captures:
+        threading.Thread(target=_pump, args=(getattr(proc, name), name, chunks),
+                         name=f"gabbe-mcp-{name}", daemon=True).start()
+
+    deadline = time.monotonic() + timeout
+    timed_out = False
+    open_streams = len(captures)
+    streamed = 0
+    with _tracked(proc):
+        while open_streams:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 and not timed_out:
+                logger.warning("run_command timed out after %ss: %s", timeout, tokens[0])
+                timed_out = True
+                _kill_group(proc)
+                deadline = time.monotonic() + 5  # grace for the pipes to close
+                continue
+            try:
+                name, data = chunks.get(timeout=max(0.0, min(remaining, 1.0)))
+            except queue.Empty:
+                if timed_out and remaining <= 0:
+                    break  # a grandchild outside the group holds the pipe open
+                continue
+            if data is None:
+                open_streams -= 1
+                continue
+            streamed += len(data)
+            text = captures[name].add(data)
+            if on_output is not None and text:
+                on_output(streamed, text)
+        if timed_out:
+            _kill_group(proc)
+        returncode, peak_rss_kb = _reap(proc)
+
+    result = {name: capture.text() for name, capture in captures.items()}
+    result["returncode"] = returncode
+    if timed_out:
+        result["timed_out"] = True
+    truncated = {name: c.truncated for name, c in captures.items() if c.truncated}
+    if truncated:
+        result["truncated_bytes"] = truncated
+    annotate_span(
+        bytes_streamed=streamed,
+        stdout_bytes=captures["stdout"].total,
+        stderr_bytes=captures["stderr"].total,
+        peak_rss_kb=peak_rss_kb,
+        timed_out=timed_out,
+    )
+    return result
 
 
-def serve():
-    """Zero-dependency JSON-RPC server implementing the MCP Protocol endpoints."""
+def _error(req_id, code, message):
+    return {"jsonrpc": "2.0", "id": req_id, "error": {"code": code, "message": message}}
+
+
+class _Server:
+    """One MCP session over stdin/stdout.
+
+    Requests are read and dispatched in order, so ``initialize`` always takes
+    effect before the calls behind it. ``tools/call`` requests then run
+    concurrently (at most *max_concurrency* at a time) and each response is
+    written as soon as it is ready, so responses may arrive out of order;
+    clients match them by ``id``. A JSON-RPC batch (an array of requests) is
+    answered with one array once all its calls are done.
+    """
+
+    def __init__(self, ctx, max_concurrency: int):
+        self.ctx = ctx
+        self.loop = asyncio.get_running_loop()
+        self.slots = asyncio.Semaphore(max_concurrency)
+        self.workers = ThreadPoolExecutor(max_concurrency, thread_name_prefix="gabbe-mcp")
+        self.pending: set = set()   # tasks still running
+        self.inflight: set = set()  # ids of tools/call requests not yet answered
+
+    async def run(self):
+        reader = ThreadPoolExecutor(1, thread_name_prefix="gabbe-mcp-stdin")
+        try:
+            while True:
+                # sys.stdin is looked up per line so tests (and embedders) can swap it.
+                line = await self.loop.run_in_executor(reader, sys.stdin.readline)
+                if not line:
+                    break
+                line = line.strip()
+                if line:
+                    self.handle_line(line)
+            # EOF: answer everything already received before exiting.
+            while self.pending:
+                await asyncio.gather(*self.pending, return_exceptions=True)
+        finally:
+            reader.shutdown(wait=False)
+            self.workers.shutdown(wait=True)
+
+    @staticmethod
+    def write(message):
+        print(json.dumps(message), flush=True)
+
+    def spawn(self, coro) -> asyncio.Task:
+        task = self.loop.create_task(coro)
+        self.pending.add(task)
+        task.add_done_callback(self.pending.discard)
+        return task
+
+    def handle_line(self, line: str):
+        try:
+            req = json.loads(line)
+            if isinstance(req, list):
+                if not req:
+                    self.write(_error(None, -32600, "Invalid Request"))
+                    return
+                replies = [self.dispatch(r) for r in req]
+                self.spawn(self._answer_batch(replies))
+                return
+            reply = self.dispatch(req)
+            if isinstance(reply, asyncio.Task):
+                self.spawn(self._answer(reply))
+            elif reply is not None:
+                self.write(reply)
+        except Exception as e:
+            logger.error("MCP Server error processing line: %s", e)
+            res = {"jsonrpc": "2.0", "error": {"code": -32700, "message": "Parse error"}}
+            self.write(res)
+
+    def dispatch(self, req):
+        """The response to *req*, a Task that will produce it, or None (no response)."""
+        global _authenticated
+        if not isinstance(req, dict):
+            return _error(None, -32600, "Invalid Request")
+        method = req.get("method")
+        req_id = req.get("id")
+
+        if method == "initialize":
+            # Validate token if authentication is required.
+            if _MCP_TOKEN:
+                provided = (req.get("params") or {}).get("token", "")
+                if provided != _MCP_TOKEN:
+                    return _error(req_id, -32000, "Unauthorized")
+                _authenticated = True
+            return {
+                "jsonrpc": "2.0",
+                "id": req_id,
+                "result": {
+                    "capabilities": {"tools": {}},
+                    "serverInfo": {"name": "gabbe-mcp", "version": "1.0.0"}
+                }
+            }
+        if method == "notifications/initialized":
+            return None  # No response needed
+        if method == "notifications/cancelled":
+            if _authenticated:
+                self.cancel((req.get("params") or {}).get("requestId"))
+            return None
+        if not _authenticated:
+            return _error(req_id, -32000, "Unauthorized")
+        if method == "tools/list":
+            return {
+                "jsonrpc": "2.0",
+                "id": req_id,
+                "result": {
+                    "tools": [{
+                        "name": "run_command",
+                        "description": "Run a shell command",
+                        "inputSchema": {
+                            "type": "object",
+                            "properties": {"command": {"type": "string"}},
+                            "required": ["command"]
+                        }
+                    }]
+                }
+            }
+        if method == "tools/call":
+            self.inflight.add(req_id)
+            return self.spawn(self._call(req))
+        return _error(req_id, -32601, "Method not found")
+
+    def cancel(self, req_id):
+        """Drop the response to *req_id* and kill its subprocess, if it has one."""
+        if req_id not in self.inflight:
+            return  # already answered, or never sent: nothing to cancel
+        with _running_lock:
+            _cancelled.add(req_id)
+            proc = _running.get(req_id)
+        if proc is not None and proc.poll() is None:
+            logger.info("Killing run_command for cancelled request %s", req_id)
+            _kill_group(proc)
+
+    def _execute(self, req_id, name, args, progress_token=None):
+        """Runs on a worker thread; tags the thread so run_command can be cancelled."""
+        token = _request_id.set(req_id)
+        progress = _progress.set(self._progress_sender(progress_token) if progress_token is not None else None)
+        try:
+            return self.ctx.gateway.execute(name, args, role="external_agent", run_context=self.ctx)
+        finally:
+            _progress.reset(progress)
+            _request_id.reset(token)
+
+    def _progress_sender(self, progress_token):
+        """Callback that sends ``notifications/progress`` from a worker thread."""
+        def send(progress, message):
+            note = {"jsonrpc": "2.0", "method": "notifications/progress",
+                    "params": {"progressToken": progress_token, "progress": progress, "message": message}}
+            # Written by the loop, so it precedes the final response.
+            self.loop.call_soon_threadsafe(self.write, note)
+        return send
+
+    async def _call(self, req):
+        req_id = req.get("id")
+        params = req.get("params", {})
+        name = params.get("name")
+        args = params.get("arguments", {})
+        # MCP: a client that wants progress sends params._meta.progressToken.
+        progress_token = (params.get("_meta") or {}).get("progressToken")
+        try:
+            async with self.slots:
+                if req_id in _cancelled:
+                    return None
+                tool_res = await self.loop.run_in_executor(
+                    self.workers, self._execute, req_id, name, args, progress_token
+                )
+            res = {
+                "jsonrpc": "2.0",
+                "id": req_id,
+                "result": {
+                    "content": [{"type": "text", "text": json.dumps(tool_res)}]
+                }
+            }
+        except Exception as e:
+            logger.error("MCP tool execution error: %s", e)
+            res = _error(req_id, -32603, "Internal tool execution error")
+        finally:
+            self.inflight.discard(req_id)
+            with _running_lock:
+                cancelled = req_id in _cancelled
+                _cancelled.discard(req_id)
+        # The client gave up on a cancelled request: it gets no response.
+        return None if cancelled else res
+
+    async def _answer(self, task):
+        res = await task
+        if res is not None:
+            self.write(res)
+
+    async def _answer_batch(self, replies):
+        results = []
+        for reply in replies:
+            if isinstance(reply, asyncio.Task):
+                reply = await reply
+            if reply is not None:
+                results.append(reply)
+        if results:  # a batch of notifications gets no response at all
+            self.write(results)
+
+
+async def _serve(ctx, max_concurrency):
+    await _Server(ctx, max_concurrency).run()
+
+
+def serve(max_concurrency: int = MCP_MAX_CONCURRENCY):
+    """Zero-dependency JSON-RPC server implementing the MCP Protocol endpoints.
+
+    Runs on asyncio: up to *max_concurrency* (``GABBE_MCP_MAX_CONCURRENCY``)
+    ``tools/call`` requests execute at once, and a slow command no longer
+    holds up the rest of the session.
+    """
     global _authenticated
     _authenticated = not bool(_MCP_TOKEN)  # pre-authed if no token required
 
@@ -48,79 +465,9 @@ def serve():
             description="Run a shell command on the host.",
             parameters={"type": "object", "properties": {"command": {"type": "string"}}, "required": ["command"]},
             handler=run_command_handler,
-            allowed_roles={"external_agent"}
+            allowed_roles={"external_agent"},
+            rate_limit_per_min=MCP_RATE_LIMIT_PER_MIN,
+            cacheable=_command_is_cacheable,
+            cache_validator=_command_freshness,
         ))
-
-        for line in sys.stdin:
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                req = json.loads(line)
-                method = req.get("method")
-                req_id = req.get("id")
-
-                if method == "initialize":
-                    # Validate token if authentication is required.
-                    if _MCP_TOKEN:
-                        provided = (req.get("params") or {}).get("token", "")
-                        if provided != _MCP_TOKEN:
-                            res = {"jsonrpc": "2.0", "id": req_id,
-                                   "error": {"code": -32000, "message": "Unauthorized"}}
-                            print(json.dumps(res), flush=True)
-                            continue
-                        _authenticated = True
-                    res = {
-                        "jsonrpc": "2.0",
-                        "id": req_id,
-                        "result": {
-                            "capabilities": {"tools": {}},
-                            "serverInfo": {"name": "gabbe-mcp", "version": "1.0.0"}
-                        }
-                    }
-                elif method == "notifications/initialized":
-                    continue  # No response needed
-                elif not _authenticated:
-                    res = {"jsonrpc": "2.0", "id": req_id,
-                           "error": {"code": -32000, "message": "Unauthorized"}}
-                elif method == "tools/list":
-                    res = {
-                        "jsonrpc": "2.0",
-                        "id": req_id,
-                        "result": {
-                            "tools": [{
-                                "name": "run_command",
-                                "description": "Run a shell command",
-                                "inputSchema": {
-                                    "type": "object",
-                                    "properties": {"command": {"type": "string"}},
-                                    "required": ["command"]
-                                }
-                            }]
-                        }
-                    }
-                elif method == "tools/call":
-                    params = req.get("params", {})
-                    name = params.get("name")
-                    args = params.get("arguments", {})
-                    try:
-                        tool_res = ctx.gateway.execute(name, args, role="external_agent", run_context=ctx)
-                        res = {
-                            "jsonrpc": "2.0",
-                            "id": req_id,
-                            "result": {
-                                "content": [{"type": "text", "text": json.dumps(tool_res)}]
-                            }
-                        }
-                    except Exception as e:
-                        logger.error("MCP tool execution error: %s", e)
-                        res = {"jsonrpc": "2.0", "id": req_id,
-                               "error": {"code": -32603, "message": "Internal tool execution error"}}
-                else:
-                    res = {"jsonrpc": "2.0", "id": req_id, "error": {"code": -32601, "message": "Method not found"}}
-
-                print(json.dumps(res), flush=True)
-            except Exception as e:
-                logger.error("MCP Server error processing line: %s", e)
-                res = {"jsonrpc": "2.0", "error": {"code": -32700, "message": "Parse error"}}
-                print(json.dumps(res), flush=True)
+        asyncio.run(_serve(ctx, max(1, max_concurrency)))
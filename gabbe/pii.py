@@ -0,0 +1,232 @@
+"""Single-pass PII scanner shared by the router and ContentSafetyPolicy.
+
+All of ``config.PII_PATTERN_SOURCES`` are joined into one regex with a named
+group per category, so each input is scanned once. Before any regex runs, a
+cheap pre-filter looks for what a match needs (``@`` for emails, digits for
+phone/SSN/card numbers, a credential keyword plus ``:`` or ``=`` for
+credentials); inputs with none of them are clean by construction, and
+categories whose trigger is missing are left out of the regex used for that
+input.
+
+Results are cached by a hash of the content (``GABBE_PII_CACHE_SIZE``
+entries), so the same prompt or tool argument is only scanned once.
+``PIIStreamScanner`` applies the same patterns to text arriving in chunks.
+"""
+from __future__ import annotations
+
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from .config import PII_CACHE_SIZE, PII_PATTERN_SOURCES
+
+# What a category needs to be present before it is worth scanning for.
+# Categories added to PII_PATTERN_SOURCES without an entry are always scanned.
+_TRIGGERS = {
+    "email": "at",
+    "phone": "digit",
+    "ssn": "digit",
+    "credit_card": "digit",
+    "credential": "keyword",
+}
+_DIGIT = re.compile(r"\d")
+_CREDENTIAL_WORDS = ("pass", "api", "secret", "token")
+
+# Cheap first-character guards: a failing position is rejected by one
+# lookahead instead of entering the category's full pattern.
+_GUARDS = {
+    "phone": r"(?=\d)",
+    "ssn": r"(?=\d)",
+    "credit_card": r"(?=\d)",
+    "credential": r"(?=[PpAaSsTt])",
+}
+
+
+@dataclass(frozen=True)
+class PIIMatch:
+    category: str
+    start: int
+    end: int
+
+
+@dataclass(frozen=True)
+class ScanResult:
+    matches: tuple = ()
+
+    @property
+    def found(self) -> bool:
+        return bool(self.matches)
+
+    @property
+    def categories(self) -> list:
+        """Categories present, in pattern order."""
+        seen = {m.category for m in self.matches}
+        return [name for name in PII_PATTERN_SOURCES if name in seen]
+
+    def __bool__(self):
+        return self.found
+
+
+_CLEAN = ScanResult()
+_compiled: dict = {}
+_compiled_lock = threading.Lock()
+
+
+def _combined(categories: tuple) -> re.Pattern:
+    """One regex with a named group per category, compiled once per category subset."""
+    with _compiled_lock:
+        pattern = _compiled.get(categories)
+        if pattern is None:
+            pattern = re.compile("|".join(
+                f"{_GUARDS.get(name, '')}(?P<{name}>{PII_PATTERN_SOURCES[name]})"
+                for name in categories
+            ))
+            _compiled[categories] = pattern
+        return pattern
+
+
+def _candidates(text: str) -> tuple:
+    """Categories that could match *text*, judged from its trigger characters."""
+    present = {
+        "at": "@" in text,
+        "digit": _DIGIT.search(text) is not None,
+        "keyword": ("=" in text or ":" in text) and _has_credential_word(text),
+    }
+    return tuple(
+        name for name in PII_PATTERN_SOURCES if present.get(_TRIGGERS.get(name), True)
+    )
+
+
+def _has_credential_word(text: str) -> bool:
+    lowered = text.lower()
+    return any(word in lowered for word in _CREDENTIAL_WORDS)
+
+
+def _find(text: str, categories: tuple | None = None) -> tuple:
+    categories = _candidates(text) if categories is None else categories
+    if not categories:
+        return ()
+    pattern = _combined(categories)
+    return tuple(PIIMatch(m.lastgroup, m.start(), m.end()) for m in pattern.finditer(text))
+
+
+class _ResultCache:
+    """Small thread-safe LRU keyed by content digest."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+            return result
+
+    def put(self, key, result):
+        if self.size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_cache = _ResultCache(PII_CACHE_SIZE)
+
+
+def _digest(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+
+
+def scan(text) -> ScanResult:
+    """Return every PII match in *text* (non-overlapping, leftmost first)."""
+    if not text:
+        return _CLEAN
+    text = str(text)
+    categories = _candidates(text)
+    if not categories:
+        return _CLEAN
+    key = _digest(text)
+    result = _cache.get(key)
+    if result is None:
+        result = ScanResult(_find(text, categories))
+        _cache.put(key, result)
+    return result
+
+
+def contains_pii(text) -> bool:
+    """True if *text* contains any PII pattern. Stops at the first match."""
+    if not text:
+        return False
+    text = str(text)
+    categories = _candidates(text)
+    if not categories:
+        return False
+    key = _digest(text)
+    result = _cache.get(key)
+    if result is not None:
+        return result.found
+    if _combined(categories).search(text) is None:
+        _cache.put(key, _CLEAN)
+        return False
+    return True
+
+
+def clear_cache():
+    _cache.clear()
+
+
+class PIIStreamScanner:
+    """Scan text that arrives in chunks (e.g. a streamed LLM response).
+
+    feed() returns the matches that are complete so far, with offsets into the
+    whole stream. A match touching the last ``overlap`` characters could still
+    grow, so that tail is carried into the next chunk; close() flushes it.
+    """
+
+    def __init__(self, overlap: int = 256):
+        self.overlap = overlap
+        self.matches: list = []
+        self._buffer = ""
+        self._offset = 0  # stream position of self._buffer[0]
+
+    @property
+    def found(self) -> bool:
+        return bool(self.matches)
+
+    def feed(self, chunk: str) -> list:
+        self._buffer += chunk
+        return self._drain(final=False)
+
+    def close(self) -> list:
+        return self._drain(final=True)
+
+    def _drain(self, final: bool) -> list:
+        text = self._buffer
+        horizon = len(text) if final else len(text) - self.overlap
+        new = []
+        keep_from = max(0, horizon)
+        for m in _find(text):
+            if m.end > horizon and not final:
+                keep_from = min(keep_from, m.start)
+                break
+            new.append(PIIMatch(m.category, m.start + self._offset, m.end + self._offset))
+        if final:
+            keep_from = len(text)
+        # Never carry text that already produced a reported match.
+        if new:
+            keep_from = max(keep_from, new[-1].end - self._offset)
+        self._buffer = text[keep_from:]
+        self._offset += keep_from
+        self.matches.extend(new)
+        return new
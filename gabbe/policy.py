@@ -1,7 +1,20 @@
-import yaml
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
 from dataclasses import dataclass
+from pathlib import Path
 from typing import List, Dict
-from .config import GABBE_POLICY_FILE, PII_PATTERNS
+
+import yaml
+
+from .config import GABBE_POLICY_FILE, POLICY_DECISION_CACHE_SIZE, POLICY_RELOAD_INTERVAL
+from .pii import scan
+
+logger = logging.getLogger("gabbe.policy")
 
 @dataclass
 class PolicyResult:
@@ -11,16 +24,29 @@ class PolicyResult:
 
 class Policy:
     name: str = "BasePolicy"
-    
+    # static: the decision depends only on context["tool"] and context["role"],
+    # so PolicyEngine precomputes it. cacheable: same context, same decision.
+    static: bool = False
+    cacheable: bool = False
+
     def check(self, context: dict) -> PolicyResult:
         raise NotImplementedError
 
+    def vocabulary(self) -> tuple:
+        """(tool names, role names) this policy mentions; used to precompute decisions."""
+        return (), ()
+
 class ToolAllowlistPolicy(Policy):
     name = "ToolAllowlistPolicy"
+    static = cacheable = True
+
     def __init__(self, allowed_tools: List[str], denied_tools: List[str]):
         self.allowed = set(allowed_tools)
         self.denied = set(denied_tools)
 
+    def vocabulary(self) -> tuple:
+        return (self.allowed | self.denied) - {"*"}, ()
+
     def check(self, context: dict) -> PolicyResult:
         tool_name = context.get("tool")
         if not tool_name:
@@ -36,9 +62,15 @@ class ToolAllowlistPolicy(Policy):
 
 class RolePolicy(Policy):
     name = "RolePolicy"
+    static = cacheable = True
+
     def __init__(self, roles: Dict[str, List[str]]):
         self.roles = roles
-        
+
+    def vocabulary(self) -> tuple:
+        tools = {t for allowed in self.roles.values() for t in allowed} - {"*"}
+        return tools, set(self.roles)
+
     def check(self, context: dict) -> PolicyResult:
         tool_name = context.get("tool")
         role_name = context.get("role")
@@ -55,22 +87,27 @@ class RolePolicy(Policy):
 class ContentSafetyPolicy(Policy):
     """Deny tool calls whose input text contains PII patterns."""
     name = "ContentSafetyPolicy"
+    cacheable = True
 
     def check(self, context: dict) -> PolicyResult:
         text = context.get("input", "")
-        if not text:
-            # Also check arguments dict values
-            args = context.get("arguments", {})
-            text = " ".join(str(v) for v in args.values()) if args else ""
-        for pattern in PII_PATTERNS:
-            if pattern.search(text):
-                return PolicyResult(False, "Input contains PII — routing to LOCAL only", self.name)
+        # Otherwise scan each argument value on its own (cached per value).
+        values = [text] if text else list((context.get("arguments") or {}).values())
+        for value in values:
+            result = scan(value)
+            if result.found:
+                return PolicyResult(
+                    False,
+                    f"Input contains PII ({', '.join(result.categories)}) — routing to LOCAL only",
+                    self.name,
+                )
         return PolicyResult(True, "No PII detected", self.name)
 
 
 class ParameterRangePolicy(Policy):
     """Validate numeric parameters against defined min/max bounds."""
     name = "ParameterRangePolicy"
+    cacheable = True
 
     def __init__(self, bounds: Dict[str, Dict[str, float]]):
         # bounds = {"param_name": {"min": 0, "max": 100}, ...}
@@ -89,57 +126,272 @@ class ParameterRangePolicy(Policy):
         return PolicyResult(True, "All parameters in range", self.name)
 
 
+_PASSED = PolicyResult(True, "All policies passed", "PolicyEngine")
+
+
+class _DecisionCache:
+    """Thread-safe LRU of recent evaluate() results."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+            return result
+
+    def put(self, key, result):
+        if self.size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+
 class PolicyEngine:
-    def __init__(self, policies: List[Policy]):
+    """Deny-first chain of policies, compiled for fast repeated evaluation.
+
+    Static policies (tool/role only) are folded into a (tool, role) table of
+    the first denial; names mentioned in the policies are precomputed and
+    others are filled in on first use. Content policies run only for
+    positions before that denial, and whole decisions are kept in an LRU
+    keyed by (tool, role, hash of the remaining context) when every content
+    policy is cacheable.
+    """
+
+    def __init__(self, policies: List[Policy], decision_cache_size: int = POLICY_DECISION_CACHE_SIZE):
         self.policies = policies
         self.version = "unknown"
+        self._static = [(i, p) for i, p in enumerate(policies) if p.static]
+        self._dynamic = [(i, p) for i, p in enumerate(policies) if not p.static]
+        self._cacheable = all(p.cacheable for _, p in self._dynamic)
+        self._decisions = _DecisionCache(decision_cache_size)
+        self._table: dict = {}
+        self._compile()
+
+    def _compile(self):
+        tools, roles = {None}, {None}
+        for _, p in self._static:
+            t, r = p.vocabulary()
+            tools.update(t)
+            roles.update(r)
+        for tool in tools:
+            for role in roles:
+                self._static_denial(tool, role)
+
+    def _static_denial(self, tool, role):
+        """(index, result) of the first static policy denying (tool, role), or None."""
+        key = (tool, role)
+        try:
+            return self._table[key]
+        except KeyError:
+            pass
+        denial = None
+        context = {"tool": tool, "role": role}
+        for index, p in self._static:
+            res = p.check(context)
+            if not res.allowed:
+                denial = (index, res)
+                break
+        self._table[key] = denial  # a racing writer computes the same value
+        return denial
+
+    @staticmethod
+    def _decision_key(tool, role, context: dict):
+        rest = {k: v for k, v in context.items() if k not in ("tool", "role")}
+        try:
+            blob = json.dumps(rest, sort_keys=True, default=str)
+        except (TypeError, ValueError):
+            return None
+        return tool, role, hashlib.blake2b(blob.encode(), digest_size=16).digest()
 
     def evaluate(self, context: dict) -> PolicyResult:
+        tool, role = context.get("tool"), context.get("role")
+        try:
+            denial = self._static_denial(tool, role)
+        except TypeError:  # unhashable tool/role: evaluate the chain directly
+            return self._evaluate_chain(context)
+        # Content policies after the first static denial can never decide.
+        if denial is not None and (not self._dynamic or denial[0] < self._dynamic[0][0]):
+            return denial[1]
+        if not self._dynamic:
+            return _PASSED
+        limit = denial[0] if denial else len(self.policies)
+        key = self._decision_key(tool, role, context) if self._cacheable else None
+        if key is not None:
+            cached = self._decisions.get(key)
+            if cached is not None:
+                return cached
+        result = denial[1] if denial else _PASSED
+        for index, p in self._dynamic:
+            if index >= limit:
+                break
+            res = p.check(context)
+            if not res.allowed:
+                result = res
+                break
+        if key is not None:
+            self._decisions.put(key, result)
+        return result
+
+    def _evaluate_chain(self, context: dict) -> PolicyResult:
         for p in self.policies:
             res = p.check(context)
             if not res.allowed:
                 return res
-        return PolicyResult(True, "All policies passed", "PolicyEngine")
+        return _PASSED
 
     def evaluate_all(self, context: dict) -> List[PolicyResult]:
         return [p.check(context) for p in self.policies]
 
     @classmethod
     def from_yaml(cls, path=None):
-        path = path or GABBE_POLICY_FILE
-        policies = []
-        version = "1"
-        if path.exists():
-            with open(path, "r") as f:
-                data = yaml.safe_load(f) or {}
-                version = data.get("version", "1")
-                
-                tools = data.get("tools", {})
-                policies.append(ToolAllowlistPolicy(
-                    allowed_tools=tools.get("allowed", ["*"]),
-                    denied_tools=tools.get("denied", [])
-                ))
-                
-                roles = data.get("roles", {})
-                if roles:
-                    policies.append(RolePolicy(roles))
-
-                if data.get("content_safety", {}).get("enabled", False):
-                    policies.append(ContentSafetyPolicy())
-
-                param_bounds = data.get("parameter_bounds", {})
-                if param_bounds:
-                    policies.append(ParameterRangePolicy(param_bounds))
-        else:
+        """Engine for the policy file at *path* (default GABBE_POLICY_FILE).
+
+        Engines are memoised per file: an unchanged file (same mtime and size,
+        or same content hash) returns the already-built engine without
+        re-reading or re-parsing it.
+        """
+        path = Path(path or GABBE_POLICY_FILE)
+        key = (cls, str(path))
+        with _loaded_lock:
+            cached = _loaded.get(key)
+        try:
+            stat = path.stat()
+        except OSError:
+            if cached is not None and cached[0] is None:
+                return cached[2]
             # Policy file not found: default to deny-all and warn the operator.
             # This is the secure default — explicit policies must be created to allow tools.
-            import logging as _logging
-            _logging.getLogger("gabbe.policy").warning(
+            logger.warning(
                 "Policy file not found at %s — defaulting to deny-all. "
                 "Create project/policies.yml to configure tool access.", path
             )
-            policies.append(ToolAllowlistPolicy([], []))
-            
+            engine = cls([ToolAllowlistPolicy([], [])])
+            engine.version = "1"
+            with _loaded_lock:
+                _loaded[key] = (None, None, engine)
+            return engine
+
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if cached is not None and cached[0] == stamp:
+            return cached[2]
+        raw = path.read_bytes()
+        digest = hashlib.sha256(raw).hexdigest()
+        if cached is not None and cached[1] == digest:
+            engine = cached[2]
+        else:
+            engine = cls._build(yaml.safe_load(raw) or {})
+        with _loaded_lock:
+            _loaded[key] = (stamp, digest, engine)
+        return engine
+
+    @classmethod
+    def _build(cls, data: dict):
+        policies = []
+        version = data.get("version", "1")
+
+        tools = data.get("tools", {})
+        policies.append(ToolAllowlistPolicy(
+            allowed_tools=tools.get("allowed", ["*"]),
+            denied_tools=tools.get("denied", [])
+        ))
+
+        roles = data.get("roles", {})
+        if roles:
+            policies.append(RolePolicy(roles))
+
+        if data.get("content_safety", {}).get("enabled", False):
+            policies.append(ContentSafetyPolicy())
+
+        param_bounds = data.get("parameter_bounds", {})
+        if param_bounds:
+            policies.append(ParameterRangePolicy(param_bounds))
+
         engine = cls(policies)
         engine.version = version
         return engine
+
+
+# (engine class, path) -> (stat stamp, sha256 of content, engine)
+_loaded: dict = {}
+_loaded_lock = threading.Lock()
+
+
+def clear_policy_cache():
+    """Forget memoised engines and watchers (tests, or after editing in place)."""
+    with _loaded_lock:
+        _loaded.clear()
+    with _watchers_lock:
+        _watchers.clear()
+
+
+class PolicyWatcher:
+    """The current engine for one policy file, swapped when the file changes.
+
+    ``engine`` is a single reference replaced only after the new engine is
+    fully built, so readers see either the old or the new policy, never a mix.
+    """
+
+    def __init__(self, path=None):
+        self.path = Path(path or GABBE_POLICY_FILE)
+        self._engine = PolicyEngine.from_yaml(self.path)
+
+    @property
+    def engine(self) -> PolicyEngine:
+        return self._engine
+
+    def check(self) -> bool:
+        """Reload if the file changed; True if the engine was swapped."""
+        try:
+            engine = PolicyEngine.from_yaml(self.path)
+        except Exception as e:  # keep serving the last good policy
+            logger.error("Policy reload from %s failed, keeping version %s: %s",
+                         self.path, self._engine.version, e)
+            return False
+        if engine is self._engine:
+            return False
+        logger.info("Policy file %s changed: version %s -> %s",
+                    self.path, self._engine.version, engine.version)
+        self._engine = engine
+        return True
+
+
+_watchers: dict = {}
+_watchers_lock = threading.Lock()
+_poller: threading.Thread | None = None
+_poller_wakeup = threading.Event()  # never set; Event.wait() is the poll interval
+
+
+def _poll_watchers():
+    while True:
+        _poller_wakeup.wait(POLICY_RELOAD_INTERVAL)
+        with _watchers_lock:
+            watchers = list(_watchers.values())
+        for watcher in watchers:
+            watcher.check()
+
+
+def watch_policy(path=None) -> PolicyWatcher:
+    """Process-wide watcher for *path* (default GABBE_POLICY_FILE).
+
+    Watchers are polled every ``GABBE_POLICY_RELOAD_INTERVAL`` seconds by one
+    daemon thread; with an interval of 0 the file is loaded once and never
+    reloaded.
+    """
+    global _poller
+    path = Path(path or GABBE_POLICY_FILE)
+    with _watchers_lock:
+        watcher = _watchers.get(str(path))
+        if watcher is None:
+            watcher = _watchers[str(path)] = PolicyWatcher(path)
+        if POLICY_RELOAD_INTERVAL > 0 and _poller is None:
+            _poller = threading.Thread(target=_poll_watchers, name="gabbe-policy-watch", daemon=True)
+            _poller.start()
+        return watcher
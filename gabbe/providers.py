@@ -0,0 +1,278 @@
+"""LLM provider registry with health-aware load balancing.
+
+Providers are declared in ``project/config.json``::
+
+    {
+      "provider_strategy": "least_outstanding",
+      "providers": [
+        {"name": "openai", "pool": "REMOTE", "url": "https://api.openai.com/v1/chat/completions",
+         "model": "gpt-4o", "api_key_env": "OPENAI_API_KEY", "weight": 2, "max_concurrency": 8,
+         "price": {"input": 0.0000025, "output": 0.00001}},
+        {"name": "ollama", "pool": "LOCAL", "url": "http://localhost:11434/v1/chat/completions",
+         "model": "llama3.1"}
+      ]
+    }
+
+``pool`` is the router decision the provider serves (``LOCAL`` / ``REMOTE``).
+Keys are read from ``api_key_env`` (preferred) or a literal ``api_key``.
+``provider_strategy`` is one of ``least_outstanding``, ``weighted_round_robin``
+or ``ewma`` (lowest latency EWMA, scaled by outstanding requests).
+
+Health is tracked passively from real traffic: after
+``GABBE_PROVIDER_EJECT_FAILURES`` consecutive failures a provider is ejected
+for ``GABBE_PROVIDER_EJECT_SECONDS`` (doubling on repeated ejections), then
+admitted for a single probe request; success reinstates it.
+
+Without a ``providers`` entry the registry is empty and gabbe.llm keeps
+using GABBE_API_URL / GABBE_API_KEY / GABBE_API_MODEL directly.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+
+from . import config
+from .config import (
+    LLM_POOL_SIZE,
+    PROVIDER_EJECT_FAILURES,
+    PROVIDER_EJECT_SECONDS,
+    PROVIDER_EWMA_ALPHA,
+)
+
+logger = logging.getLogger("gabbe.providers")
+
+POOLS = ("LOCAL", "REMOTE")
+STRATEGIES = ("least_outstanding", "weighted_round_robin", "ewma")
+_MAX_EJECT_MULTIPLIER = 8
+
+
+class ProviderUnavailable(Exception):
+    """No provider in the requested pool can take the request."""
+
+
+@dataclass
+class Provider:
+    name: str
+    url: str
+    model: str
+    pool: str = "REMOTE"
+    api_key: str | None = None
+    weight: int = 1
+    max_concurrency: int = LLM_POOL_SIZE
+    price: dict = field(default_factory=dict)
+
+    # Live health state (guarded by the owning registry's lock)
+    outstanding: int = 0
+    ewma_ms: float | None = None
+    requests: int = 0
+    failures: int = 0
+    consecutive_failures: int = 0
+    ejections: int = 0
+    ejected_until: float = 0.0
+    probing: bool = False
+    current_weight: int = 0
+
+    def snapshot(self) -> dict:
+        return {
+            "name": self.name,
+            "pool": self.pool,
+            "model": self.model,
+            "outstanding": self.outstanding,
+            "ewma_ms": round(self.ewma_ms, 3) if self.ewma_ms is not None else None,
+            "requests": self.requests,
+            "failures": self.failures,
+            "ejected": self.ejected_until > time.monotonic(),
+            "ejections": self.ejections,
+        }
+
+
+def _provider_from_dict(entry: dict) -> Provider:
+    key = entry.get("api_key")
+    if entry.get("api_key_env"):
+        key = os.environ.get(entry["api_key_env"])
+    pool = str(entry.get("pool", "REMOTE")).upper()
+    if pool not in POOLS:
+        raise ValueError(f"provider {entry.get('name')!r}: pool must be one of {POOLS}")
+    return Provider(
+        name=entry["name"],
+        url=entry["url"],
+        model=entry["model"],
+        pool=pool,
+        api_key=key,
+        weight=max(1, int(entry.get("weight", 1))),
+        max_concurrency=max(1, int(entry.get("max_concurrency", LLM_POOL_SIZE))),
+        price=dict(entry.get("price") or {}),
+    )
+
+
+class ProviderRegistry:
+    def __init__(self, providers=(), strategy: str = "least_outstanding",
+                 eject_failures: int = PROVIDER_EJECT_FAILURES,
+                 eject_seconds: float = PROVIDER_EJECT_SECONDS,
+                 ewma_alpha: float = PROVIDER_EWMA_ALPHA):
+        if strategy not in STRATEGIES:
+            logger.warning("Unknown provider_strategy %r; using least_outstanding", strategy)
+            strategy = "least_outstanding"
+        self.providers = list(providers)
+        self.strategy = strategy
+        self.eject_failures = eject_failures
+        self.eject_seconds = eject_seconds
+        self.ewma_alpha = ewma_alpha
+        self._cond = threading.Condition()
+
+    @classmethod
+    def from_config(cls, path=None) -> "ProviderRegistry":
+        path = path or config.GABBE_CONFIG_FILE
+        if not path.exists():
+            return cls()
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+            providers = [_provider_from_dict(p) for p in data.get("providers", [])]
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.error("Ignoring invalid providers in %s: %s", path, e)
+            return cls()
+        return cls(providers, data.get("provider_strategy", "least_outstanding"))
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.providers)
+
+    def pool(self, name: str) -> list:
+        return [p for p in self.providers if p.pool == name]
+
+    def find_model(self, model: str) -> Provider | None:
+        return next((p for p in self.providers if p.model == model), None)
+
+    # -- selection ---------------------------------------------------------
+
+    def acquire(self, pool: str, timeout: float | None = None) -> Provider:
+        """Pick a provider from *pool* and count the request as outstanding.
+
+        Blocks while every healthy provider is at its max_concurrency, up to
+        *timeout* seconds. Callers must pair this with release().
+        """
+        members = self.pool(pool)
+        if not members:
+            raise ProviderUnavailable(f"No providers configured for pool {pool}")
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self._cond:
+            while True:
+                provider = self._choose(members)
+                if provider is not None:
+                    provider.outstanding += 1
+                    provider.requests += 1
+                    return provider
+                remaining = deadline - time.monotonic() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    raise ProviderUnavailable(f"All providers in pool {pool} are at max concurrency")
+                self._cond.wait(remaining)
+
+    def release(self, provider: Provider, ok: bool | None, latency_ms: float | None = None):
+        """Record the outcome of a request started with acquire().
+
+        ``ok=None`` (e.g. a request we cancelled ourselves) only frees the slot.
+        """
+        now = time.monotonic()
+        with self._cond:
+            provider.outstanding -= 1
+            if ok is None:
+                pass
+            elif ok:
+                if latency_ms is not None:
+                    provider.ewma_ms = latency_ms if provider.ewma_ms is None else (
+                        self.ewma_alpha * latency_ms + (1 - self.ewma_alpha) * provider.ewma_ms
+                    )
+                if provider.probing:
+                    logger.info("Provider %s reinstated after successful probe", provider.name)
+                provider.ejections = 0
+                provider.consecutive_failures = 0
+                provider.ejected_until = 0.0
+            else:
+                provider.failures += 1
+                provider.consecutive_failures += 1
+                if provider.probing or provider.consecutive_failures >= self.eject_failures:
+                    provider.ejections += 1
+                    backoff = self.eject_seconds * min(_MAX_EJECT_MULTIPLIER, 2 ** (provider.ejections - 1))
+                    provider.ejected_until = now + backoff
+                    logger.warning(
+                        "Provider %s ejected for %.0fs after %d consecutive failures",
+                        provider.name, backoff, provider.consecutive_failures,
+                    )
+            provider.probing = False
+            self._cond.notify_all()
+
+    def _eligible(self, members, now):
+        healthy = []
+        for p in members:
+            if p.outstanding >= p.max_concurrency:
+                continue
+            if p.ejected_until > now:
+                continue
+            if p.ejected_until and p.probing:
+                continue  # half-open: one probe at a time
+            healthy.append(p)
+        return healthy
+
+    def _choose(self, members):
+        # Caller holds self._cond.
+        now = time.monotonic()
+        candidates = self._eligible(members, now)
+        if not candidates and all(p.ejected_until > now for p in members):
+            # Panic mode: everything is ejected; spreading load beats refusing it.
+            candidates = [p for p in members if p.outstanding < p.max_concurrency]
+        if not candidates:
+            return None
+
+        if self.strategy == "weighted_round_robin":
+            # Smooth weighted round robin (as in nginx).
+            total = sum(p.weight for p in candidates)
+            for p in candidates:
+                p.current_weight += p.weight
+            chosen = max(candidates, key=lambda p: p.current_weight)
+            chosen.current_weight -= total
+        elif self.strategy == "ewma":
+            # Unmeasured providers score 0 so they get traffic and a latency estimate.
+            chosen = min(candidates, key=lambda p: (p.ewma_ms or 0.0) * (p.outstanding + 1))
+        else:
+            chosen = min(candidates, key=lambda p: (p.outstanding / p.weight, p.ewma_ms or 0.0))
+
+        if chosen.ejected_until and chosen.ejected_until <= now:
+            chosen.probing = True
+        return chosen
+
+    def snapshot(self) -> list:
+        with self._cond:
+            return [p.snapshot() for p in self.providers]
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> ProviderRegistry:
+    """Return the process-wide registry, loading project/config.json on first use."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ProviderRegistry.from_config()
+        return _registry
+
+
+def set_registry(registry: ProviderRegistry | None):
+    """Install *registry* (None reloads config.json on next use)."""
+    global _registry
+    with _registry_lock:
+        _registry = registry
+
+
+def price_for(model: str) -> dict | None:
+    """Per-token prices declared for *model* in config.json, if any."""
+    provider = get_registry().find_model(model)
+    if provider is None or not provider.price:
+        return None
+    return provider.price
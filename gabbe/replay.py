@@ -1,22 +1,13 @@
 from __future__ import annotations
 import json
 import logging
-from .database import get_db
+from .database import acquire_connection, commit_unless_nested
 
 logger = logging.getLogger("gabbe.replay")
 
 class CheckpointStore:
     def __init__(self, db_conn=None):
-        self._owns_db = False
-        if db_conn is None:
-            self.db_conn = get_db()
-            self._owns_db = True
-        else:
-            self.db_conn = db_conn
-
-    def __del__(self):
-        if self._owns_db and self.db_conn:
-            self.db_conn.close()
+        self.db_conn = db_conn if db_conn is not None else acquire_connection()
 
     def save(self, run_id: str, step: int, node_name: str, state_snapshot: dict, policy_version: str, parent_id: int | None = None) -> int | None:
         try:
@@ -26,7 +17,7 @@ class CheckpointStore:
                 (run_id, step, node_name, state_snapshot, policy_version, parent_checkpoint_id)
                 VALUES (?, ?, ?, ?, ?, ?)
             """, (run_id, step, node_name, json.dumps(state_snapshot), policy_version, parent_id))
-            self.db_conn.commit()
+            commit_unless_nested(self.db_conn)
             return cursor.lastrowid
         except Exception as e:
             logger.error(f"Failed to save checkpoint: {e}")
@@ -0,0 +1,200 @@
+"""Retry scheduling for outbound LLM requests.
+
+``RetryPolicy`` decides how long to wait before the next attempt:
+
+- ``jitter="full"`` (default): sleep ``uniform(0, min(cap, base * 2**n))``.
+- ``jitter="decorrelated"``: sleep ``min(cap, uniform(base, previous * 3))``.
+- ``jitter="none"``: plain exponential backoff, ``min(cap, base * 2**n)``.
+
+A ``Retry-After`` header (seconds or HTTP date) is a floor: we never retry
+earlier than the server asked. A retry is skipped entirely when the wait
+would not fit in the caller's remaining wall time (``Budget`` / ``HardStop``).
+
+``TokenBucket`` caps outbound requests per second for the whole process
+(``GABBE_LLM_QPS``; 0 disables it). ``RetryStats`` counts what happened so
+throttling can be observed via ``get_retry_stats()``.
+"""
+from __future__ import annotations
+
+import logging
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+from .config import (
+    LLM_MAX_RETRIES,
+    LLM_RETRY_BASE_DELAY,
+    LLM_RETRY_MAX_DELAY,
+    LLM_RETRY_JITTER,
+    LLM_QPS,
+    LLM_QPS_BURST,
+)
+
+logger = logging.getLogger("gabbe.retry")
+
+RETRIABLE_STATUSES = frozenset({429, 500, 502, 503, 504})
+JITTER_MODES = ("full", "decorrelated", "none")
+
+
+def parse_retry_after(value, now: datetime | None = None) -> float | None:
+    """Return the delay in seconds requested by a ``Retry-After`` header value."""
+    if not isinstance(value, str) or not value.strip():
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if when is None:
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    now = now or datetime.now(timezone.utc)
+    return max(0.0, (when - now).total_seconds())
+
+
+class RetryPolicy:
+    """Decides whether and how long to wait before retrying a failed attempt."""
+
+    def __init__(
+        self,
+        max_attempts: int = LLM_MAX_RETRIES,
+        base_delay: float = LLM_RETRY_BASE_DELAY,
+        max_delay: float = LLM_RETRY_MAX_DELAY,
+        jitter: str = LLM_RETRY_JITTER,
+        rng: random.Random | None = None,
+    ):
+        if jitter not in JITTER_MODES:
+            logger.warning("Unknown retry jitter %r; using 'full'", jitter)
+            jitter = "full"
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = max(0.0, base_delay)
+        self.max_delay = max(self.base_delay, max_delay)
+        self.jitter = jitter
+        self._rng = rng or random.Random()
+
+    def backoff(self, attempt: int, previous: float | None = None) -> float:
+        """Delay after failed *attempt* (1-based), before Retry-After is applied."""
+        ceiling = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        if self.jitter == "none":
+            return ceiling
+        if self.jitter == "decorrelated":
+            previous = previous if previous else self.base_delay
+            upper = max(self.base_delay, previous * 3)
+            return min(self.max_delay, self._rng.uniform(self.base_delay, upper))
+        return self._rng.uniform(0, ceiling)
+
+    def next_delay(
+        self,
+        attempt: int,
+        previous: float | None = None,
+        retry_after: float | None = None,
+        remaining: float | None = None,
+    ) -> float | None:
+        """Return seconds to wait before attempt ``attempt + 1``, or None to give up.
+
+        *remaining* is the caller's wall-clock allowance in seconds; if the
+        wait (including a server-mandated Retry-After) can't fit in it there
+        is no point sleeping only to be stopped by the budget.
+        """
+        if attempt >= self.max_attempts:
+            return None
+        delay = self.backoff(attempt, previous)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        if remaining is not None and delay >= remaining:
+            return None
+        return delay
+
+
+class TokenBucket:
+    """Thread-safe token bucket; ``rate`` tokens/sec with bursts up to ``capacity``."""
+
+    def __init__(self, rate: float = LLM_QPS, capacity: float | None = None):
+        self.rate = max(0.0, rate)
+        self.capacity = max(1.0, capacity if capacity is not None else (LLM_QPS_BURST or self.rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def reserve(self) -> float:
+        """Take one token and return how long the caller must wait before using it."""
+        if not self.enabled:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            # Negative balance: the token is ours once the deficit refills.
+            return -self._tokens / self.rate
+
+
+class RetryStats:
+    """Process-wide counters for LLM request attempts and retries."""
+
+    _FIELDS = (
+        "requests", "attempts", "retries", "retry_after_honored",
+        "gave_up", "budget_stops", "retry_wait_sec", "throttle_wait_sec",
+    )
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._counts = dict.fromkeys(self._FIELDS, 0)
+            self._by_status = {}
+
+    def add(self, name: str, amount=1):
+        with self._lock:
+            self._counts[name] += amount
+
+    def add_status(self, status):
+        with self._lock:
+            self._by_status[status] = self._by_status.get(status, 0) + 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            snap = dict(self._counts)
+            snap["by_status"] = dict(self._by_status)
+        return snap
+
+
+_stats = RetryStats()
+_limiter = TokenBucket()
+
+
+def record(name: str, amount=1):
+    _stats.add(name, amount)
+
+
+def record_status(status):
+    _stats.add_status(status)
+
+
+def get_retry_stats() -> dict:
+    """Return a snapshot of the process-wide retry counters."""
+    return _stats.snapshot()
+
+
+def reset_retry_stats():
+    _stats.reset()
+
+
+def get_rate_limiter() -> TokenBucket:
+    """Return the process-wide outbound QPS limiter."""
+    return _limiter
@@ -1,51 +1,53 @@
 import json
-from .config import Colors, ROUTE_COMPLEXITY_THRESHOLD, PII_PATTERNS
+import time
+
+from .complexity import COMPLEXITY_SYSTEM_PROMPT, get_history, score_prompt
+from .config import Colors, ROUTE_COMPLEXITY_THRESHOLD, ROUTE_UNCERTAIN_BAND
 from .llm import call_llm
+from .pii import contains_pii
+from .providers import ProviderUnavailable
+
 
+def _uncertain(score):
+    return abs(score - ROUTE_COMPLEXITY_THRESHOLD) < ROUTE_UNCERTAIN_BAND
 
-def calculate_complexity(prompt):
-    """Estimate complexity score (0-100). Uses heuristics first, then LLM."""
-    # Heuristics (save money/time)
-    if len(prompt) < 100 and "```" not in prompt:
-        print(f"  {Colors.CYAN}Complexity Analysis (Heuristic): Simple{Colors.ENDC}")
-        return 10, "Heuristic: Short prompt, no code blocks"
 
-    print(f"  {Colors.CYAN}Analyzing Complexity via LLM...{Colors.ENDC}")
+def calculate_complexity(prompt, run_context=None):
+    """Estimate complexity score (0-100). Scores locally; asks the LLM only when unsure."""
+    local = score_prompt(prompt)
+    if local.recorded or not _uncertain(local.score):
+        print(f"  {Colors.CYAN}Complexity Analysis (Local): {local.score} "
+              f"(confidence {local.confidence:.2f}){Colors.ENDC}")
+        return local.score, local.reason
 
-    system_prompt = (
-        "You are a complexity analyzer. Rate the following coding task complexity "
-        'from 0-100. Return ONLY a JSON object: {"score": 50, "reason": "explanation"}.'
-    )
+    print(f"  {Colors.CYAN}Local score {local.score} is near the threshold — "
+          f"analyzing complexity via LLM...{Colors.ENDC}")
 
     try:
-        response = call_llm(prompt, system_prompt)
+        # Scoring is deterministic (temperature 0) so repeated prompts hit the LLM cache.
+        response = call_llm(prompt, COMPLEXITY_SYSTEM_PROMPT, temperature=0, run_context=run_context)
         if response is None:
             raise ValueError("LLM returned no response")
         data = json.loads(response)
-        return data.get("score", 50), data.get("reason", "No reason provided")
+        score = data.get("score", local.score)
+        if isinstance(score, (int, float)):
+            get_history().record(prompt, score)
+        return score, data.get("reason", "No reason provided")
     except Exception as e:
-        # Fallback heuristic if LLM fails or returns invalid JSON
+        # Fall back to the local score if the LLM fails or returns invalid JSON
         if isinstance(e, json.JSONDecodeError):
-            print(f"  {Colors.WARNING}LLM returned invalid JSON — using fallback heuristic: {e}{Colors.ENDC}")
+            print(f"  {Colors.WARNING}LLM returned invalid JSON — using local score: {e}{Colors.ENDC}")
         else:
             print(f"  {Colors.WARNING}LLM Analysis Failed: {e}{Colors.ENDC}")
-        score = 0
-        if len(prompt) > 500:
-            score += 60  # Updated to ensure long prompts route REMOTE (Threshold 50)
-        if "architect" in prompt.lower():
-            score += 30
-        return score, "Fallback Heuristic (LLM Error)"
+        return local.score, f"Fallback Heuristic (LLM Error) — {local.reason}"
 
 
 def detect_pii(prompt):
     """Detect common PII patterns using local regex (no external calls)."""
-    for pattern in PII_PATTERNS:
-        if pattern.search(prompt):
-            return True
-    return False
+    return contains_pii(prompt)
 
 
-def route_request(prompt):
+def route_request(prompt, run_context=None):
     """Arbitrate between Local and Remote LLM."""
     print(f"{Colors.HEADER}🔀 Cost-Effective Router{Colors.ENDC}")
     print(f'  Prompt: "{prompt[:50]}..."')
@@ -56,7 +58,7 @@ def route_request(prompt):
         print(f"  {Colors.FAIL}PII DETECTED! Routing to LOCAL ONLY.{Colors.ENDC}")
         return "LOCAL"
 
-    complexity, reason = calculate_complexity(prompt)
+    complexity, reason = calculate_complexity(prompt, run_context)
 
     print(f"  {Colors.BLUE}Analysis:{Colors.ENDC}")
     print(f"  - Complexity Score: {complexity}/100")
@@ -67,3 +69,86 @@ def route_request(prompt):
     print(f"  {Colors.BOLD}Decision: {color}{decision}{Colors.ENDC}")
 
     return decision
+
+
+def dispatch(prompt, system_prompt="You are a helpful assistant.", run_context=None):
+    """Route *prompt* and send it to the matching provider pool.
+
+    Returns ``(decision, response)``. PII-bearing prompts go to the LOCAL
+    pool only; if no LOCAL provider is configured the prompt is not sent
+    anywhere and the response is None.
+    """
+    decision = route_request(prompt, run_context)
+    try:
+        response = call_llm(prompt, system_prompt, run_context=run_context, pool=decision)
+    except ProviderUnavailable as e:
+        print(f"  {Colors.FAIL}{e}{Colors.ENDC}")
+        return decision, None
+    return decision, response
+
+
+def _read_batch(path):
+    """Prompts from *path*: one per line, or JSON lines ``{"prompt": ..., "score": n}``."""
+    items = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                try:
+                    item = json.loads(line)
+                except ValueError:
+                    item = None
+                if isinstance(item, dict) and isinstance(item.get("prompt"), str):
+                    items.append((item["prompt"], item.get("score")))
+                    continue
+            items.append((line, None))
+    return items
+
+
+def route_batch(path, history=None):
+    """Route every prompt in *path* locally and compare against known LLM scores.
+
+    Nothing is sent to an LLM. A prompt's reference score is its ``score``
+    field, or else the score the LLM gave it before (audit history).
+    Returns a stats dict and prints a summary.
+    """
+    history = get_history() if history is None else history
+    items = _read_batch(path)
+    stats = {"prompts": len(items), "LOCAL": 0, "REMOTE": 0, "pii": 0, "uncertain": 0,
+             "compared": 0, "agree": 0, "abs_error": 0.0}
+
+    start = time.perf_counter()
+    for prompt, reference in items:
+        if detect_pii(prompt):
+            stats["pii"] += 1
+            stats["LOCAL"] += 1
+            continue
+        local = score_prompt(prompt, history, use_recorded=False)
+        stats["REMOTE" if local.score > ROUTE_COMPLEXITY_THRESHOLD else "LOCAL"] += 1
+        stats["uncertain"] += _uncertain(local.score)
+        if reference is None:
+            reference = history.lookup(prompt)
+        if isinstance(reference, (int, float)):
+            stats["compared"] += 1
+            threshold = ROUTE_COMPLEXITY_THRESHOLD
+            stats["agree"] += (local.score > threshold) == (reference > threshold)
+            stats["abs_error"] += abs(local.score - reference)
+    stats["elapsed_sec"] = time.perf_counter() - start
+
+    total = stats["prompts"] or 1
+    print(f"{Colors.HEADER}🔀 Batch Routing: {path}{Colors.ENDC}")
+    print(f"  Prompts: {stats['prompts']} in {stats['elapsed_sec'] * 1000:.1f} ms "
+          f"({stats['prompts'] / max(stats['elapsed_sec'], 1e-9):,.0f}/s)")
+    print(f"  LOCAL: {stats['LOCAL']} (PII: {stats['pii']})  REMOTE: {stats['REMOTE']}")
+    print(f"  Would consult LLM (within ±{ROUTE_UNCERTAIN_BAND} of {ROUTE_COMPLEXITY_THRESHOLD}): "
+          f"{stats['uncertain']} ({stats['uncertain'] / total:.0%})")
+    if stats["compared"]:
+        print(f"  Agreement with LLM: {stats['agree'] / stats['compared']:.1%} of "
+              f"{stats['compared']} scored prompts "
+              f"(mean |local - LLM| = {stats['abs_error'] / stats['compared']:.1f})")
+    else:
+        print(f"  {Colors.WARNING}No LLM scores to compare against "
+              f"(add \"score\" to JSON lines or route prompts with the LLM first).{Colors.ENDC}")
+    return stats
@@ -0,0 +1,139 @@
+"""Tool argument validators, compiled once per ToolDefinition.
+
+``compile_validator(schema)`` returns a callable that raises ValueError for
+invalid arguments, or None when there is nothing to check. Flat object
+schemas (typed ``properties``, ``required``, ``additionalProperties``) get a
+hand-rolled validator that never touches jsonschema; anything richer is
+compiled with jsonschema's validator class for the schema, with the schema
+itself checked once at compile time. Without jsonschema installed, rich
+schemas are not validated (the gateway's previous behaviour).
+"""
+from __future__ import annotations
+
+import logging
+from typing import Any, Callable, Optional
+
+try:
+    import jsonschema  # type: ignore
+    HAS_JSONSCHEMA = True
+except ImportError:
+    HAS_JSONSCHEMA = False
+
+logger = logging.getLogger("gabbe.schema")
+
+Validator = Callable[[Any], None]
+
+
+def _is_integer(value) -> bool:
+    if isinstance(value, bool):
+        return False
+    return isinstance(value, int) or (isinstance(value, float) and value.is_integer())
+
+
+# JSON Schema types as jsonschema's default (draft 2020-12) type checker sees them.
+_TYPE_CHECKS = {
+    "string": lambda v: isinstance(v, str),
+    "integer": _is_integer,
+    "number": lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+    "boolean": lambda v: isinstance(v, bool),
+    "array": lambda v: isinstance(v, list),
+    "object": lambda v: isinstance(v, dict),
+    "null": lambda v: v is None,
+}
+# Keywords the fast path understands; annotations are ignored as jsonschema does.
+_ANNOTATIONS = {"description", "title", "default", "examples", "$comment"}
+# No "$schema": an older draft changes type semantics (e.g. draft 4 rejects 1.0 as integer).
+_OBJECT_KEYWORDS = {"type", "properties", "required", "additionalProperties"} | _ANNOTATIONS
+_PROPERTY_KEYWORDS = {"type", "enum"} | _ANNOTATIONS
+
+
+def _property_check(prop: dict):
+    """[(predicate, problem)] for one property schema, or None if it is not simple."""
+    if not isinstance(prop, dict) or not set(prop) <= _PROPERTY_KEYWORDS:
+        return None
+    checks = []
+    types = prop.get("type")
+    if types is not None:
+        names = [types] if isinstance(types, str) else types
+        if not isinstance(names, list) or not all(n in _TYPE_CHECKS for n in names):
+            return None
+        preds = [_TYPE_CHECKS[n] for n in names]
+        shown = ", ".join(repr(n) for n in names)
+        checks.append((lambda v: any(p(v) for p in preds), f"is not of type {shown}"))
+    if "enum" in prop:
+        # Only string enums: jsonschema's equality for mixed types (1 vs True) is subtle.
+        allowed = prop["enum"]
+        if not isinstance(allowed, list) or not all(isinstance(a, str) for a in allowed):
+            return None
+        allowed_set = frozenset(allowed)
+        checks.append((lambda v: isinstance(v, str) and v in allowed_set, f"is not one of {allowed!r}"))
+    return checks
+
+
+def _fast_validator(schema: dict) -> Optional[Validator]:
+    """Hand-rolled validator for a flat object schema, or None if *schema* is richer."""
+    if not set(schema) <= _OBJECT_KEYWORDS or schema.get("type", "object") != "object":
+        return None
+    properties = schema.get("properties", {})
+    required = schema.get("required", [])
+    additional = schema.get("additionalProperties", True)
+    if not isinstance(properties, dict) or not isinstance(required, list) \
+            or not isinstance(additional, bool):
+        return None
+    prop_checks = {}
+    for name, prop in properties.items():
+        checks = _property_check(prop)
+        if checks is None:
+            return None
+        if checks:
+            prop_checks[name] = checks
+    known = frozenset(properties)
+
+    def validate(instance):
+        if not isinstance(instance, dict):
+            raise ValueError(f"Argument validation failed: {instance!r} is not of type 'object'")
+        for name in required:
+            if name not in instance:
+                raise ValueError(f"Argument validation failed: {name!r} is a required property")
+        if not additional:
+            extra = [k for k in instance if k not in known]
+            if extra:
+                listed = ", ".join(repr(k) for k in sorted(extra))
+                verb = "was" if len(extra) == 1 else "were"
+                raise ValueError(
+                    f"Argument validation failed: Additional properties are not allowed "
+                    f"({listed} {verb} unexpected)"
+                )
+        for name, checks in prop_checks.items():
+            if name in instance:
+                value = instance[name]
+                for predicate, problem in checks:
+                    if not predicate(value):
+                        raise ValueError(f"Argument validation failed: {value!r} {problem}")
+
+    validate.fast_path = True
+    return validate
+
+
+def _jsonschema_validator(schema: dict) -> Optional[Validator]:
+    if not HAS_JSONSCHEMA:
+        logger.debug("jsonschema not installed; schema will not be validated: %s", schema)
+        return None
+    cls = jsonschema.validators.validator_for(schema)
+    cls.check_schema(schema)  # once, instead of on every call
+    compiled = cls(schema)
+
+    def validate(instance):
+        error = jsonschema.exceptions.best_match(compiled.iter_errors(instance))
+        if error is not None:
+            raise ValueError(f"Argument validation failed: {error.message}")
+
+    validate.fast_path = False
+    return validate
+
+
+def compile_validator(schema: Optional[dict]) -> Optional[Validator]:
+    """Compile *schema* into a validator; None for an empty schema."""
+    if not schema:
+        return None
+    return _fast_validator(schema) or _jsonschema_validator(schema)
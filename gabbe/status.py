@@ -1,11 +1,10 @@
 from .config import Colors, PROGRESS_BAR_LEN
-from .database import get_db
+from .database import db_connection, task_status_counts
 
 
 def show_dashboard():
     """Render the CLI Dashboard."""
-    conn = get_db()
-    try:
+    with db_connection() as conn:
         c = conn.cursor()
 
         # 1. Project Phase (read from project_state table)
@@ -14,8 +13,7 @@ def show_dashboard():
         phase = row["value"] if row else "—"
 
         # 2. Task Statistics
-        c.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status")
-        stats = dict(c.fetchall())
+        stats = task_status_counts(c)
         total = sum(stats.values())
         done = stats.get("DONE", 0)
         in_progress = stats.get("IN_PROGRESS", 0)
@@ -35,5 +33,3 @@ def show_dashboard():
         )
         print(f"Progress: [{Colors.GREEN}{bar}{Colors.ENDC}] {percent}%")
         print("===============================\n")
-    finally:
-        conn.close()
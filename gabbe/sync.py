@@ -1,9 +1,12 @@
+import mmap
 import os
 import re
 import tempfile
+import uuid
 import hashlib
+import json
 from datetime import datetime
-from .database import get_db
+from .database import db_connection
 from .config import Colors, TASKS_FILE
 import logging
 
@@ -11,15 +14,12 @@ logger = logging.getLogger("gabbe.sync")
 
 _MARKER_START = "<!-- GABBE:TASKS:START -->"
 _MARKER_END = "<!-- GABBE:TASKS:END -->"
+_MARKER_START_B = _MARKER_START.encode()
+_MARKER_END_B = _MARKER_END.encode()
 
 
-def parse_markdown_tasks(content):
-    """Parse project/TASKS.md content into a list of dicts.
-
-    Supports both legacy full-file parsing and new marker-based parsing.
-    """
-    lines_to_parse = content.split("\n")
-
+def _task_section_lines(content):
+    """The lines of *content* that hold tasks: between the markers if present."""
     # If markers are present, only parse between them
     if _MARKER_START in content and _MARKER_END in content:
         try:
@@ -27,46 +27,185 @@ def parse_markdown_tasks(content):
             end_idx = content.find(_MARKER_END)
             if start_idx < end_idx:
                 section = content[start_idx:end_idx]
-                lines_to_parse = section.split("\n")
                 logger.debug(
                     "Found markers, parsing %d chars of marked content", len(section)
                 )
+                return section.split("\n")
         except Exception as e:
             logger.warning(
                 "Failed to parse between markers, falling back to full file: %s", e
             )
+    return content.split("\n")
+
+
+_TASK_RE = re.compile(r"- \[(.)\] (.*)")
+_TASK_ID_RE = re.compile(r"\s*<!--\s*id:\s*([\w.:/-]+)\s*-->")
+_TAG_RE = re.compile(r"(?<!\S)#([A-Za-z_][\w/-]*)")
+
+
+def _parse_task_line(line):
+    """Parse one ``- [ ] title`` line into a task dict, or None.
+
+    The dict also carries the line's ``<!-- id:... -->`` (``task_key``), its
+    ``#tag`` tokens and its indentation; ``_link_parents`` turns the
+    indentation into ``parent`` and ``depth``.
+    """
+    stripped = line.lstrip()
+    indent = len(line) - len(stripped)
+    if indent and "\t" in line[:indent]:
+        indent = len(line[:indent].expandtabs(4))
+    line = stripped.rstrip()
+    if not line.startswith("- ["):
+        return None
+    match = _TASK_RE.match(line)
+    if not match:
+        return None
+    char = match.group(1)
+    title = match.group(2)
+    task_key = None
+    id_match = _TASK_ID_RE.search(title) if "<!--" in title else None
+    if id_match:
+        task_key = id_match.group(1)
+        title = title[:id_match.start()] + title[id_match.end():]
+    title = title.strip()
+
+    status = "TODO"
+    if char.lower() == "x":
+        status = "DONE"
+    elif char == "/":
+        status = "IN_PROGRESS"
+
+    return {
+        "title": title,
+        "status": status,
+        "task_key": task_key,
+        "tags": list(dict.fromkeys(_TAG_RE.findall(title))) if "#" in title else [],
+        "indent": indent,
+    }
+
+
+def _task_hash(task):
+    """Content hash of a task, to detect changes; title and status only when plain."""
+    text = f"{task['title']}|{task['status']}"
+    task_key, tags, parent = task.get("task_key"), task.get("tags"), task.get("parent")
+    if task_key or tags or parent:
+        text += f"\x1f{task_key or ''}\x1f{' '.join(tags or ())}\x1f{parent or ''}"
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def _link_parents(tasks, stack=None):
+    """Give each parsed task its ``parent`` title and ``depth``.
+
+    A task's parent is the nearest task above it that is indented less.
+    *stack* is the ``(indent, title)`` chain of tasks still open before the
+    first one, when parsing starts mid-file.
+    """
+    stack = list(stack or ())
+    for task in tasks:
+        indent = task.pop("indent")
+        while stack and stack[-1][0] >= indent:
+            stack.pop()
+        task["parent"] = stack[-1][1] if stack else None
+        task["depth"] = len(stack)
+        stack.append((indent, task["title"]))
+        yield task
+
 
-    tasks = []
-    for line in lines_to_parse:
-        if line.strip().startswith("- ["):
-            match = re.match(r"- \[(.)\] (.*)", line.strip())
-            if match:
-                char = match.group(1)
-                title = match.group(2).strip()
+def _parse_task_lines(lines, hashed=True):
+    tasks = _link_parents(t for t in map(_parse_task_line, lines) if t)
+    if not hashed:
+        return tasks
+    return (_with_hash(t) for t in tasks)
 
-                status = "TODO"
-                if char.lower() == "x":
-                    status = "DONE"
-                elif char == "/":
-                    status = "IN_PROGRESS"
 
-                # Generate a content hash to detect changes
-                content_hash = hashlib.sha256(f"{title}|{status}".encode()).hexdigest()
-                tasks.append({"title": title, "status": status, "hash": content_hash})
-    return tasks
+def _with_hash(task):
+    # Generate a content hash to detect changes
+    task["hash"] = _task_hash(task)
+    return task
+
+
+def parse_markdown_tasks(content):
+    """Parse project/TASKS.md content into a list of dicts.
+
+    Supports both legacy full-file parsing and new marker-based parsing.
+    """
+    return list(_parse_task_lines(_task_section_lines(content)))
+
+
+def _find_markers(f):
+    """Byte offsets ``(start, end)`` of the task section in open binary file *f*.
+
+    *start* is just past the start marker and *end* at the end marker, or
+    None when the file has no well-formed pair (the whole file is tasks).
+    Searching an mmap keeps the file out of the Python heap.
+    """
+    if os.fstat(f.fileno()).st_size == 0:
+        return None
+    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        start = mm.find(_MARKER_START_B)
+        end = mm.find(_MARKER_END_B)
+    if start < 0 or end < 0 or start + len(_MARKER_START_B) >= end:
+        return None
+    return start + len(_MARKER_START_B), end
+
+
+def iter_task_section_lines(path):
+    """Stream the task lines of the file at *path*, like ``_task_section_lines``.
+
+    Reads one line at a time after seeking to the start marker, so memory
+    does not grow with the file.
+    """
+    with open(path, "rb") as f:
+        section = _find_markers(f)
+        if section is None:
+            line = b"\n"
+            for line in f:
+                yield line.rstrip(b"\n").rstrip(b"\r").decode("utf-8")
+            if line.endswith(b"\n"):
+                yield ""
+            return
+        start, end = section
+        f.seek(start)
+        remaining = end - start
+        for line in f:
+            if len(line) > remaining:
+                yield line[:remaining].rstrip(b"\r").decode("utf-8")
+                return
+            remaining -= len(line)
+            yield line.rstrip(b"\n").rstrip(b"\r").decode("utf-8")
+
+
+def iter_markdown_tasks(path):
+    """Yield the task dicts of the file at *path* without reading it whole."""
+    return _parse_task_lines(iter_task_section_lines(path))
+
+
+def _format_task_line(title, status, task_key=None, depth=0):
+    char = " "
+    if status == "DONE":
+        char = "x"
+    elif status == "IN_PROGRESS":
+        char = "/"
+    line = f"{'  ' * depth}- [{char}] {title}"
+    if task_key:
+        line += f" <!-- id:{task_key} -->"
+    return line
+
+
+def _task_line(task):
+    """The TASKS.md line for a task dict or row; nesting and ID when it has them."""
+    fields = task.keys()
+    return _format_task_line(
+        task["title"],
+        task["status"],
+        task["task_key"] if "task_key" in fields else None,
+        task["depth"] if "depth" in fields else 0,
+    )
 
 
 def _generate_task_lines(tasks):
     """Generate just the list of task lines."""
-    lines = []
-    for task in tasks:
-        char = " "
-        if task["status"] == "DONE":
-            char = "x"
-        elif task["status"] == "IN_PROGRESS":
-            char = "/"
-        lines.append(f"- [{char}] {task['title']}")
-    return "\n".join(lines)
+    return "\n".join(_task_line(task) for task in tasks)
 
 
 def generate_markdown_tasks(tasks):
@@ -104,11 +243,16 @@ def get_db_timestamp(c):
 
 def _atomic_write(path, content):
     """Write *content* to *path* atomically using a temp file + rename."""
+    _atomic_write_with(path, lambda f: f.write(content.encode("utf-8")))
+
+
+def _atomic_write_with(path, write):
+    """Call ``write(f)`` on a binary temp file next to *path*, then rename it over *path*."""
     dir_ = path.parent
     fd, tmp_path = tempfile.mkstemp(dir=dir_, prefix=".tmp_tasks_")
     try:
-        with os.fdopen(fd, "w", encoding="utf-8") as f:
-            f.write(content)
+        with os.fdopen(fd, "wb") as f:
+            write(f)
         os.replace(tmp_path, path)
     except Exception:
         try:
@@ -128,152 +272,697 @@ def _calculate_state_hash(tasks):
     return hashlib.sha256(combined.encode()).hexdigest()
 
 
+# project_state key written by sync_tasks (see docs/CLI_REFERENCE.md).
+_STATE_KEY = "tasks_sync_state"
+
+
+def _file_signature(path):
+    """``[size, mtime_ns, inode]`` of *path*, or None if it does not exist."""
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns, st.st_ino]
+
+
+def _file_hash(path):
+    """SHA-256 of the file at *path*, read in chunks; None if it does not exist."""
+    digest = hashlib.sha256()
+    try:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(_COPY_CHUNK), b""):
+                digest.update(chunk)
+    except FileNotFoundError:
+        return None
+    return digest.hexdigest()
+
+
+def _tasks_version(c):
+    """Write counter for the tasks table, maintained by triggers (schema v5)."""
+    c.execute("SELECT value FROM project_state WHERE key = 'tasks_version'")
+    row = c.fetchone()
+    return int(row[0]) if row and row[0] is not None else None
+
+
+def _load_state(c, key):
+    c.execute("SELECT value FROM project_state WHERE key = ?", (key,))
+    row = c.fetchone()
+    if not row or not row[0]:
+        return None
+    try:
+        return json.loads(row[0])
+    except ValueError:
+        logger.warning("Ignoring unreadable %s in project_state", key)
+        return None
+
+
+def _save_state(c, key, value):
+    c.execute(
+        "INSERT INTO project_state (key, value, updated_at) VALUES (?, ?, CURRENT_TIMESTAMP) "
+        "ON CONFLICT(key) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at",
+        (key, json.dumps(value)),
+    )
+
+
+# Bumped when the snapshot layout changes; older state forces a full sync.
+_SNAPSHOT_FORMAT = 3
+
+# The snapshot's task lines are stored in blocks of at most this many lines
+# (task_sync_blocks), so an edit rewrites the blocks it touches.
+_SNAPSHOT_BLOCK_LINES = 256
+
+# Gap between consecutive block keys; blocks split off by an edit take keys
+# inside it, so the blocks after them keep theirs.
+_BLOCK_KEY_STEP = 1 << 20
+
+
+def _snapshot_entry(task):
+    return (task["status"], task["task_key"], task["parent"])
+
+
+def _save_sync(c, signature, content_hash, unique):
+    _save_state(c, _STATE_KEY, {
+        "format": _SNAPSHOT_FORMAT,
+        "file": signature,
+        "content_hash": content_hash,
+        "tasks_version": _tasks_version(c),
+        "unique": unique,
+    })
+
+
+def _block_digest(lines):
+    return hashlib.sha256("\n".join(lines).encode("utf-8")).hexdigest()
+
+
+def _diff_lines(c, lines):
+    """Compare *lines* with the snapshot's task lines, one block at a time.
+
+    Blocks are matched by digest from both ends, and only the ones left in
+    between are read. Returns ``(head, removed, added, edit)``: the number
+    of leading lines both share, the old and new lines after them that
+    differ, and the block replacement to hand to _write_lines().
+    """
+    c.execute("SELECT seq, line_count, digest FROM task_sync_blocks ORDER BY seq")
+    blocks = c.fetchall()
+    i = start = 0
+    while i < len(blocks):
+        count, digest = blocks[i][1], blocks[i][2]
+        if start + count > len(lines) or _block_digest(lines[start:start + count]) != digest:
+            break
+        start += count
+        i += 1
+    j, end = len(blocks), len(lines)
+    while j > i:
+        count, digest = blocks[j - 1][1], blocks[j - 1][2]
+        if end - count < start or _block_digest(lines[end - count:end]) != digest:
+            break
+        end -= count
+        j -= 1
+
+    old = []
+    if i < j:
+        c.execute("SELECT lines FROM task_sync_blocks WHERE seq BETWEEN ? AND ? ORDER BY seq",
+                  (blocks[i][0], blocks[j - 1][0]))
+        for row in c.fetchall():
+            old.extend(row[0].split("\n"))
+    head, removed, added = _changed_region(old, lines[start:end])
+    edit = (
+        blocks[i - 1][0] if i else 0,
+        blocks[j][0] if j < len(blocks) else None,
+        [b[0] for b in blocks[i:j]],
+        start,
+        end,
+    )
+    return start + head, removed, added, edit
+
+
+def _write_lines(c, lines, edit):
+    """Store ``lines[start:end]`` in place of the blocks *edit* names (see _diff_lines)."""
+    after, before, stale, start, end = edit
+    chunks = [lines[k:min(k + _SNAPSHOT_BLOCK_LINES, end)]
+              for k in range(start, end, _SNAPSHOT_BLOCK_LINES)]
+    keys = stale[:len(chunks)]
+    extra = len(chunks) - len(keys)
+    if extra:
+        if keys:
+            after = keys[-1]
+        gap = _BLOCK_KEY_STEP if before is None else (before - after) // (extra + 1)
+        if gap == 0:
+            _rewrite_lines(c, lines)  # no room left between the neighbours
+            return
+        keys += [after + gap * k for k in range(1, extra + 1)]
+    if len(stale) > len(keys):
+        c.execute("DELETE FROM task_sync_blocks WHERE seq BETWEEN ? AND ?",
+                  (stale[len(keys)], stale[-1]))
+    c.executemany(
+        "INSERT OR REPLACE INTO task_sync_blocks (seq, line_count, digest, lines) VALUES (?, ?, ?, ?)",
+        ((key, len(chunk), _block_digest(chunk), "\n".join(chunk)) for key, chunk in zip(keys, chunks)),
+    )
+
+
+def _rewrite_lines(c, lines):
+    c.execute("DELETE FROM task_sync_blocks")
+    _write_lines(c, lines, (0, None, [], 0, len(lines)))
+
+
+def _write_entries(c, deleted, tasks):
+    """Drop the *deleted* titles from task_sync_tasks and store *tasks*."""
+    c.executemany("DELETE FROM task_sync_tasks WHERE title = ?", ((title,) for title in deleted))
+    c.executemany(
+        "INSERT OR REPLACE INTO task_sync_tasks (title, status, task_key, parent) VALUES (?, ?, ?, ?)",
+        ((t["title"], *_snapshot_entry(t)) for t in tasks),
+    )
+
+
+def _record_sync(c, lines=None, tasks=None):
+    """Remember the file and table as they are now, in sync with each other.
+
+    *lines* and *tasks* are the file's task lines and parsed tasks when the
+    caller already has them. Only snapshot rows that differ are rewritten.
+    """
+    signature = _file_signature(TASKS_FILE)
+    if signature is None:
+        lines, tasks = [], []
+    elif lines is None:
+        lines = list(iter_task_section_lines(TASKS_FILE))
+        tasks = list(_parse_task_lines(lines, hashed=False))
+    entries = {t["title"]: t for t in tasks}  # last one wins, as on import
+
+    state = _load_state(c, _STATE_KEY)
+    if state is None or state.get("format") != _SNAPSHOT_FORMAT:
+        # Nothing trustworthy stored: write the snapshot afresh.
+        _rewrite_lines(c, lines)
+        c.execute("DELETE FROM task_sync_tasks")
+        _write_entries(c, (), entries.values())
+    else:
+        _write_lines(c, lines, _diff_lines(c, lines)[3])
+        c.execute("SELECT title, status, task_key, parent FROM task_sync_tasks")
+        stored = {row[0]: tuple(row)[1:] for row in c.fetchall()}
+        _write_entries(
+            c,
+            stored.keys() - entries.keys(),
+            [t for title, t in entries.items() if stored.get(title) != _snapshot_entry(t)],
+        )
+    _save_sync(c, signature, _file_hash(TASKS_FILE), len(entries) == len(tasks))
+
+
+def _changed_region(old, new):
+    """Strip the common head and tail of two line lists.
+
+    Returns ``(head, old_middle, new_middle)``, *head* being the number of
+    leading lines they share.
+    """
+    limit = min(len(old), len(new))
+    head = 0
+    while head < limit and old[head] == new[head]:
+        head += 1
+    tail = 0
+    while tail < limit - head and old[-1 - tail] == new[-1 - tail]:
+        tail += 1
+    return head, old[head:len(old) - tail], new[head:len(new) - tail]
+
+
+def _open_parents(lines, end, indent):
+    """The ``(indent, title)`` chain of tasks in ``lines[:end]`` that a task at *indent* would nest in."""
+    chain = []
+    for i in range(end - 1, -1, -1):
+        if indent == 0:
+            break
+        task = _parse_task_line(lines[i])
+        if task and task["indent"] < indent:
+            indent = task["indent"]
+            chain.append((indent, task["title"]))
+    chain.reverse()
+    return chain
+
+
+def _next_task(lines, start):
+    for i in range(start, len(lines)):
+        task = _parse_task_line(lines[i])
+        if task:
+            return task
+    return None
+
+
+def _diff_tasks(c, state, lines):
+    """Tasks that differ from the snapshot, from the changed lines only.
+
+    Returns ``(changed_tasks, edit, deleted_titles)`` for _write_lines() and
+    _write_entries(), or None when the edit can't be applied line by line
+    and the whole file has to be imported: a title now appears more than
+    once, an ID moves to another task, or the edit may change the parent of
+    tasks below it.
+    """
+    if state.get("format") != _SNAPSHOT_FORMAT or not state.get("unique"):
+        return None
+    head, removed, added, edit = _diff_lines(c, lines)
+    removed_tasks = [t for t in map(_parse_task_line, removed) if t]
+    added_tasks = [t for t in map(_parse_task_line, added) if t]
+
+    # Tasks after the edit keep their parents unless it adds, removes or
+    # renames a task indented less than the first of them.
+    following = _next_task(lines, head + len(added))
+    if following is not None and following["indent"] > 0:
+        def outline(tasks):
+            return [(t["indent"], t["title"]) for t in tasks]
+
+        if outline(removed_tasks) != outline(added_tasks) and any(
+            t["indent"] < following["indent"] for t in removed_tasks + added_tasks
+        ):
+            return None
+
+    removed_titles = {t["title"] for t in removed_tasks}
+    added_titles = set()
+    keys = {}
+    changed = []
+    stack = _open_parents(lines, head, added_tasks[0]["indent"]) if added_tasks else None
+    for task in _link_parents(added_tasks, stack):
+        title = task["title"]
+        c.execute("SELECT status, task_key, parent FROM task_sync_tasks WHERE title = ?", (title,))
+        row = c.fetchone()
+        old = tuple(row) if row else None
+        if title in added_titles or (old is not None and title not in removed_titles):
+            return None  # duplicate title: keep the sequential last-one-wins rules
+        added_titles.add(title)
+        key = task["task_key"]
+        if key:
+            owners = {keys[key]} if key in keys else set()
+            c.execute("SELECT title FROM task_sync_tasks WHERE task_key = ?", (key,))
+            owners.update(r[0] for r in c.fetchall() if r[0] not in removed_titles)
+            if owners - {title}:
+                return None  # the ID is still on another line
+            keys[key] = title
+        if _snapshot_entry(task) != old:
+            changed.append(task)
+    return changed, edit, removed_titles - added_titles
+
+
 def sync_tasks():
-    """Bidirectional sync for project/TASKS.md based on content changes."""
+    """Bidirectional sync for project/TASKS.md based on content changes.
+
+    The outcome of the last sync is kept in ``project_state``: the file's
+    size, mtime, inode and content hash, and the tasks table's write
+    counter. A snapshot of the task lines and each task's state is kept in
+    ``task_sync_blocks`` and ``task_sync_tasks``. When neither side moved,
+    sync stops after one ``stat()`` and two row reads. When only the file
+    changed, the snapshot is diffed line by line and only the changed tasks
+    and snapshot rows are written.
+    """
     print(f"{Colors.HEADER}🔄 Syncing Tasks...{Colors.ENDC}")
-    conn = get_db()
-    try:
+    with db_connection() as conn:
         c = conn.cursor()
 
-        # Check existing data
-        c.execute("SELECT title, status FROM tasks")
-        db_rows = c.fetchall()
-        db_tasks = []
-        # sqlite3.Row supports dict-like ['col'] access; row_factory is set in get_db()
-        for row in db_rows:
-            title = row['title']
-            status = row['status']
-            content_hash = hashlib.sha256(f"{title}|{status}".encode()).hexdigest()
-            db_tasks.append({'title': title, 'status': status, 'hash': content_hash})
-
-        file_exists = TASKS_FILE.exists()
-        file_tasks = []
-        if file_exists:
-            content = TASKS_FILE.read_text(encoding="utf-8")
-            file_tasks = parse_markdown_tasks(content)
-
-        # 1. Check content equality first (Fast Path)
-        if _calculate_state_hash(db_tasks) == _calculate_state_hash(file_tasks):
-             print(f"  {Colors.GREEN}✓ Synchronized (No changes detected).{Colors.ENDC}")
-             return
-
-        # 2. Decide Sync Direction
-        db_count = len(db_tasks)
-        file_count = len(file_tasks)
-        db_mtime = get_db_timestamp(c)
-        file_mtime = TASKS_FILE.stat().st_mtime if file_exists else 0
-        
-        if db_count == 0 and file_count > 0:
-             print(f"  {Colors.BLUE}Bootstrap: Importing from project/TASKS.md{Colors.ENDC}")
-             import_from_md(c, file_tasks)
-             conn.commit()
-
-        elif file_count == 0 and db_count > 0:
-             print(f"  {Colors.BLUE}Bootstrap: Exporting to project/TASKS.md{Colors.ENDC}")
-             export_to_md(c)
-
-        elif file_mtime >= db_mtime:
-             # File is newer (or equal). Check for actual changes.
-             print(f"  {Colors.BLUE}Checking project/TASKS.md for new updates...{Colors.ENDC}")
-             import_from_md(c, file_tasks)
-             conn.commit()
-        
+        state = _load_state(c, _STATE_KEY)
+        version = _tasks_version(c)
+        db_unchanged = state is not None and version is not None and state.get("tasks_version") == version
+        signature = _file_signature(TASKS_FILE)
+        if db_unchanged and signature == state.get("file"):
+            print(f"  {Colors.GREEN}✓ Synchronized (No changes detected).{Colors.ENDC}")
+            return
+
+        file_exists = signature is not None
+        content_hash = _file_hash(TASKS_FILE) if file_exists else None
+        file_unchanged = state is not None and content_hash == state.get("content_hash")
+
+        if db_unchanged and file_unchanged:
+            # Touched but not edited: just remember the new mtime.
+            _save_sync(c, signature, content_hash, state.get("unique"))
+            print(f"  {Colors.GREEN}✓ Synchronized (No changes detected).{Colors.ENDC}")
+            return
+
+        if file_unchanged and file_exists:
+            print(f"  {Colors.BLUE}Exporting DB changes to project/TASKS.md...{Colors.ENDC}")
+            export_to_md(c)
+            _record_sync(c)
+            return
+
+        if db_unchanged and file_exists:
+            lines = list(iter_task_section_lines(TASKS_FILE))
+            diff = _diff_tasks(c, state, lines)
+            if diff is not None:
+                changed, edit, deleted = diff
+                print(f"  {Colors.BLUE}Importing {len(changed)} changed task(s) from project/TASKS.md{Colors.ENDC}")
+                if changed:
+                    import_from_md(c, changed)
+                _write_lines(c, lines, edit)
+                _write_entries(c, deleted, changed)
+                _save_sync(c, signature, content_hash, True)
+                return
+
+        _full_sync(c, file_exists)
+
+
+def _full_sync(c, file_exists):
+    """Compare every task on both sides and import or export as needed."""
+    # Check existing data
+    c.execute(
+        "SELECT t.title, t.status, t.tags, t.task_key, p.title AS parent "
+        "FROM tasks t LEFT JOIN tasks p ON p.id = t.parent_id"
+    )
+    db_rows = c.fetchall()
+    db_tasks = []
+    # sqlite3.Row supports dict-like ['col'] access; row_factory is set on every pooled connection
+    for row in db_rows:
+        task = {
+            'title': row['title'],
+            'status': row['status'],
+            'task_key': row['task_key'],
+            'tags': _tags_from_db(row['tags']),
+            'parent': row['parent'],
+        }
+        task['hash'] = _task_hash(task)
+        db_tasks.append(task)
+
+    lines = list(iter_task_section_lines(TASKS_FILE)) if file_exists else []
+    file_tasks = list(_parse_task_lines(lines))
+
+    # 1. Check content equality first (Fast Path)
+    if _calculate_state_hash(db_tasks) == _calculate_state_hash(file_tasks):
+        print(f"  {Colors.GREEN}✓ Synchronized (No changes detected).{Colors.ENDC}")
+        _record_sync(c, lines, file_tasks)
+        return
+
+    # 2. Decide Sync Direction
+    db_count = len(db_tasks)
+    file_count = len(file_tasks)
+    db_mtime = get_db_timestamp(c)
+    file_mtime = TASKS_FILE.stat().st_mtime if file_exists else 0
+
+    if db_count == 0 and file_count > 0:
+        print(f"  {Colors.BLUE}Bootstrap: Importing from project/TASKS.md{Colors.ENDC}")
+        import_from_md(c, file_tasks)
+
+    elif file_count == 0 and db_count > 0:
+        print(f"  {Colors.BLUE}Bootstrap: Exporting to project/TASKS.md{Colors.ENDC}")
+        export_to_md(c)
+        _record_sync(c)
+        return
+
+    elif file_mtime >= db_mtime:
+        # File is newer (or equal). Check for actual changes.
+        print(f"  {Colors.BLUE}Checking project/TASKS.md for new updates...{Colors.ENDC}")
+        import_from_md(c, file_tasks)
+
+    else:
+        # DB is newer
+        print(f"  {Colors.BLUE}Exporting DB changes to project/TASKS.md...{Colors.ENDC}")
+        export_to_md(c)
+        _record_sync(c)
+        return
+    # Importing left the file as it was parsed.
+    _record_sync(c, lines, file_tasks)
+
+
+def _tags_json(tags):
+    """``tasks.tags`` for a list of tags: a JSON array, or NULL for none."""
+    return json.dumps(tags) if tags else None
+
+
+def _tags_from_db(value):
+    if not value:
+        return []
+    try:
+        tags = json.loads(value)
+    except ValueError:
+        return [value]
+    return tags if isinstance(tags, list) else [tags]
+
+
+# True when the staged row i differs from its table row t, whose parent is pt.
+_IMPORT_CHANGED = (
+    "(i.renamed OR t.status IS NOT i.status OR t.tags IS NOT i.tags "
+    "OR t.task_key IS NOT i.task_key OR pt.title IS NOT i.parent_title)"
+)
+
+# inserted / updated / skipped for the rows staged in _import_tasks.
+_IMPORT_STATS_SQL = f"""
+    SELECT COALESCE(SUM(t.id IS NULL), 0),
+           COALESCE(SUM(t.id IS NOT NULL AND {_IMPORT_CHANGED}), 0),
+           COALESCE(SUM(t.id IS NOT NULL AND NOT {_IMPORT_CHANGED}), 0)
+    FROM _import_tasks i LEFT JOIN tasks t ON t.title = i.title
+    LEFT JOIN tasks pt ON pt.id = t.parent_id
+"""
+
+# Parents are left alone when a title is listed twice, so they aren't compared.
+_IMPORT_STATS_WITH_DUPLICATES_SQL = """
+    SELECT COALESCE(SUM(is_new), 0),
+           COALESCE(SUM(NOT is_new AND (renamed OR prior IS NOT state)), 0),
+           COALESCE(SUM(NOT is_new AND NOT (renamed OR prior IS NOT state)), 0)
+    FROM (SELECT i.renamed,
+                 json_array(i.status, i.tags, i.task_key) AS state,
+                 ROW_NUMBER() OVER w = 1 AND t.id IS NULL AS is_new,
+                 CASE WHEN ROW_NUMBER() OVER w = 1
+                      THEN json_array(t.status, t.tags, t.task_key)
+                      ELSE LAG(json_array(i.status, i.tags, i.task_key)) OVER w
+                 END AS prior
+          FROM _import_tasks i LEFT JOIN tasks t ON t.title = i.title
+          WINDOW w AS (PARTITION BY i.title ORDER BY i.seq))
+"""
+
+
+def _apply_task_keys(c, now, keys_unique):
+    """Rename tasks whose ID now sits on a new title, and drop IDs that can't apply.
+
+    Runs on the staged rows before they are merged, so the upsert finds a
+    renamed task under its new title instead of inserting a duplicate.
+    """
+    c.execute("CREATE INDEX temp._import_tasks_key ON _import_tasks(task_key)")
+    dropped = 0
+    if not keys_unique:
+        # An ID on several titles stays with the last of them.
+        c.execute(
+            "UPDATE _import_tasks SET task_key = NULL WHERE task_key IS NOT NULL AND title IS NOT "
+            "(SELECT j.title FROM _import_tasks j WHERE j.task_key = _import_tasks.task_key "
+            "ORDER BY j.seq DESC LIMIT 1)"
+        )
+        dropped = c.rowcount
+    c.execute(
+        "SELECT DISTINCT t.id, t.title AS old_title, i.title FROM _import_tasks i "
+        "JOIN tasks t ON t.task_key = i.task_key WHERE t.title IS NOT i.title"
+    )
+    for row in c.fetchall():
+        c.execute("UPDATE OR IGNORE tasks SET title = ?, updated_at = ? WHERE id = ?",
+                  (row["title"], now, row["id"]))
+        if c.rowcount:
+            c.execute("UPDATE _import_tasks SET renamed = 1 WHERE title = ?", (row["title"],))
         else:
-             # DB is newer
-             print(f"  {Colors.BLUE}Exporting DB changes to project/TASKS.md...{Colors.ENDC}")
-             export_to_md(c)
+            logger.warning("Not renaming %r to %r: a task with that title already exists",
+                           row["old_title"], row["title"])
+    # An ID still held by another task (a blocked rename) would break the upsert.
+    c.execute(
+        "UPDATE _import_tasks SET task_key = NULL WHERE task_key IS NOT NULL AND EXISTS "
+        "(SELECT 1 FROM tasks t WHERE t.task_key = _import_tasks.task_key "
+        "AND t.title IS NOT _import_tasks.title)"
+    )
+    dropped += c.rowcount
+    if dropped:
+        logger.warning("Ignored %d task ID(s) that belong to another task in project/TASKS.md", dropped)
+
 
+def _link_staged_parents(c):
+    """Point each staged task's parent_id at the task its line is nested under."""
+    c.execute("CREATE TEMP TABLE _task_moves (id INTEGER PRIMARY KEY, parent_id INTEGER)")
+    try:
+        c.execute(
+            "INSERT INTO _task_moves SELECT t.id, p.id FROM _import_tasks i "
+            "JOIN tasks t ON t.title = i.title LEFT JOIN tasks p ON p.title = i.parent_title "
+            "WHERE t.parent_id IS NOT p.id"
+        )
+        if c.rowcount:
+            c.execute(
+                "UPDATE tasks SET parent_id = (SELECT m.parent_id FROM _task_moves m WHERE m.id = tasks.id) "
+                "WHERE id IN (SELECT id FROM _task_moves)"
+            )
     finally:
-        conn.close()
+        c.execute("DROP TABLE temp._task_moves")
 
 
 def import_from_md(c, tasks_or_content):
+    """Reconcile parsed tasks into the ``tasks`` table; return the stats.
+
+    Set-based: the tasks are loaded into a temp table with one
+    ``executemany`` and merged with a single upsert, so the cost is a few
+    statements however long TASKS.md is. Rows are applied in file order,
+    so a title listed twice ends with its last status, as before. A task
+    whose ``<!-- id:... -->`` is already in the table under another title is
+    renamed. Parents follow the nesting of the lines, except when a title is
+    listed twice and the nesting is ambiguous. The caller commits.
+    """
     if isinstance(tasks_or_content, str):
         tasks = parse_markdown_tasks(tasks_or_content)
     else:
         tasks = tasks_or_content
     now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     stats = {"updated": 0, "inserted": 0, "skipped": 0}
+    unique = len({t["title"] for t in tasks}) == len(tasks)
 
-    for t in tasks:
-        # Check if task exists
-        c.execute("SELECT id, title, status FROM tasks WHERE title = ?", (t["title"],))
-        row = c.fetchone()
-
-        if row:
-            db_id, db_title, db_status = row
-            # Calculate DB hash
-            db_hash = hashlib.sha256(f"{db_title}|{db_status}".encode()).hexdigest()
-
-            if t["hash"] != db_hash:
-                # Actual change detected
-                c.execute(
-                    "UPDATE tasks SET status = ?, updated_at = ? WHERE id = ?",
-                    (t["status"], now, db_id),
-                )
-                stats["updated"] += 1
-            else:
-                stats["skipped"] += 1
+    c.execute("DROP TABLE IF EXISTS temp._import_tasks")
+    c.execute(
+        "CREATE TEMP TABLE _import_tasks (seq INTEGER PRIMARY KEY, title TEXT NOT NULL, "
+        "status TEXT NOT NULL, tags TEXT, task_key TEXT, parent_title TEXT, renamed INTEGER DEFAULT 0)"
+    )
+    try:
+        keys = [t["task_key"] for t in tasks if t.get("task_key")]
+        has_keys = bool(keys)
+        has_parents = any(t.get("parent") for t in tasks)
+        if has_keys or has_parents or any(t.get("tags") for t in tasks):
+            c.executemany(
+                "INSERT INTO _import_tasks (title, status, tags, task_key, parent_title) VALUES (?, ?, ?, ?, ?)",
+                ((t["title"], t["status"], _tags_json(t.get("tags")), t.get("task_key"), t.get("parent"))
+                 for t in tasks),
+            )
         else:
-            c.execute(
-                "INSERT INTO tasks (title, status, updated_at) VALUES (?, ?, ?)",
-                (t["title"], t["status"], now),
+            # Binding three NULLs per row would double the cost of a plain list.
+            c.executemany(
+                "INSERT INTO _import_tasks (title, status) VALUES (?, ?)",
+                ((t["title"], t["status"]) for t in tasks),
             )
-            stats["inserted"] += 1
+        if has_keys:
+            _apply_task_keys(c, now, len(set(keys)) == len(keys))
+        # Count what the upsert will do before running it. A title listed
+        # twice is compared with its previous line rather than the table.
+        if unique:
+            c.execute(_IMPORT_STATS_SQL)
+        else:
+            c.execute(_IMPORT_STATS_WITH_DUPLICATES_SQL)
+        stats["inserted"], stats["updated"], stats["skipped"] = c.fetchone()
+
+        # "WHERE true" keeps SQLite from parsing ON CONFLICT as a join constraint.
+        c.execute(
+            "INSERT INTO tasks (title, status, tags, task_key, updated_at) "
+            "SELECT title, status, tags, task_key, ? FROM _import_tasks WHERE true ORDER BY seq "
+            "ON CONFLICT(title) DO UPDATE SET status = excluded.status, tags = excluded.tags, "
+            "task_key = excluded.task_key, updated_at = excluded.updated_at "
+            "WHERE tasks.status IS NOT excluded.status OR tasks.tags IS NOT excluded.tags "
+            "OR tasks.task_key IS NOT excluded.task_key",
+            (now,),
+        )
+        if unique and (has_parents or _has_subtasks(c)):
+            _link_staged_parents(c)
+    finally:
+        c.execute("DROP TABLE IF EXISTS temp._import_tasks")
 
     print(
         f"  {Colors.GREEN}✓ Sync Complete: {stats['inserted']} new, {stats['updated']} updated, {stats['skipped']} unchanged.{Colors.ENDC}"
     )
+    return stats
 
 
-def export_to_md(c):
-    c.execute("SELECT * FROM tasks ORDER BY id")
-    db_tasks = c.fetchall()
+_COPY_CHUNK = 1 << 16
+_WHITESPACE = b" \t\n\r\x0b\x0c\x1c\x1d\x1e\x1f"
+
+
+def _rstrip_offset(mm, end):
+    """Offset of ``mm[:end].rstrip()`` without copying it (ASCII whitespace)."""
+    while end > 0 and mm[end - 1] in _WHITESPACE:
+        end -= 1
+    return end
 
-    new_task_lines = _generate_task_lines(db_tasks)
 
-    # Default content for new file
-    final_content = (
-        f"# Project Tasks\n\n{_MARKER_START}\n{new_task_lines}\n{_MARKER_END}\n"
+def _export_plan(path):
+    """How export_to_md rewrites the file at *path*.
+
+    Returns ``(keep_head, before, after, keep_tail)``: the new file is bytes
+    ``[0, keep_head)`` of the old one, *before*, the task lines, *after*,
+    then bytes ``[keep_tail, EOF)`` (None: nothing copied).
+    """
+    fresh = (None, f"# Project Tasks\n\n{_MARKER_START}\n", f"\n{_MARKER_END}\n", None)
+    wrapped = (f"\n\n{_MARKER_START}\n", f"\n{_MARKER_END}\n")
+    if not path.exists():
+        return fresh
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            logger.info("No markers or tasks found. Appending to file.")
+            return (0, *wrapped, None)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            start = mm.find(_MARKER_START_B)
+            end = mm.find(_MARKER_END_B)
+            if start >= 0 and end >= 0:
+                start += len(_MARKER_START_B)
+                if start < end:
+                    # Splicing logic
+                    logger.debug("Splicing tasks into existing file")
+                    return (start, "\n", "\n", end)
+                logger.warning("Markers found but malformed. Overwriting task section.")
+                return fresh
+            # Legacy fallback: Try to preserve header/preamble
+            first_task_idx = mm.find(b"- [")
+            if first_task_idx != -1:
+                logger.info("No markers found. Preserving preamble before first task.")
+                return (_rstrip_offset(mm, first_task_idx), *wrapped, None)
+            logger.info("No markers or tasks found. Appending to file.")
+            return (_rstrip_offset(mm, size), *wrapped, None)
+
+
+def _copy_range(src, dst, start, stop=None):
+    src.seek(start)
+    remaining = None if stop is None else stop - start
+    while remaining is None or remaining > 0:
+        chunk = src.read(_COPY_CHUNK if remaining is None else min(_COPY_CHUNK, remaining))
+        if not chunk:
+            break
+        dst.write(chunk)
+        if remaining is not None:
+            remaining -= len(chunk)
+
+
+_EXPORT_FLAT_SQL = "SELECT title, status, task_key, 0 AS depth FROM tasks ORDER BY id"
+
+# Depth-first, children after their parent in id order. A task whose parent
+# row is gone is exported at the top level.
+_EXPORT_NESTED_SQL = """
+    WITH RECURSIVE tree(id, depth, path) AS (
+        SELECT id, 0, printf('%012d', id) FROM tasks
+        WHERE parent_id IS NULL OR parent_id NOT IN (SELECT id FROM tasks)
+        UNION ALL
+        SELECT t.id, tree.depth + 1, tree.path || printf('%012d', t.id)
+        FROM tasks t JOIN tree ON t.parent_id = tree.id
     )
+    SELECT t.title, t.status, t.task_key, tree.depth AS depth
+    FROM tree JOIN tasks t ON t.id = tree.id ORDER BY tree.path
+"""
 
-    # Read existing if present to preserve custom content
-    if TASKS_FILE.exists():
-        try:
-            content = TASKS_FILE.read_text(encoding="utf-8")
-            if _MARKER_START in content and _MARKER_END in content:
-                # Splicing logic
-                start_idx = content.find(_MARKER_START) + len(_MARKER_START)
-                end_idx = content.find(_MARKER_END)
-
-                if start_idx < end_idx:
-                    logger.debug("Splicing %d tasks into existing file", len(db_tasks))
-                    final_content = (
-                        content[:start_idx]
-                        + "\n"
-                        + new_task_lines
-                        + "\n"
-                        + content[end_idx:]
-                    )
-                else:
-                    logger.warning(
-                        "Markers found but malformed. Overwriting task section."
-                    )
-            else:
-                # Legacy fallback: Try to preserve header/preamble
-                first_task_idx = content.find("- [")
-                if first_task_idx != -1:
-                    logger.info(
-                        "No markers found. Preserving preamble before first task."
-                    )
-                    preamble = content[:first_task_idx].rstrip()
-                    final_content = f"{preamble}\n\n{_MARKER_START}\n{new_task_lines}\n{_MARKER_END}\n"
-                else:
-                    logger.info("No markers or tasks found. Appending to file.")
-                    final_content = f"{content.rstrip()}\n\n{_MARKER_START}\n{new_task_lines}\n{_MARKER_END}\n"
 
-        except Exception as e:
-            logger.error("Error reading project/TASKS.md: %s", e)
+def _has_subtasks(c):
+    c.execute("SELECT EXISTS (SELECT 1 FROM tasks WHERE parent_id IS NOT NULL)")
+    row = c.fetchone()
+    return bool(row and row[0])
+
+
+def export_to_md(c):
+    """Write the tasks table into project/TASKS.md, keeping text outside the markers.
 
-    _atomic_write(TASKS_FILE, final_content)
-    print(f"  {Colors.GREEN}✓ Exported {len(db_tasks)} tasks to project/TASKS.md{Colors.ENDC}")
+    Streams: the kept parts of the old file are copied in chunks and the task
+    lines come straight from the cursor, so memory does not grow with the
+    number of tasks.
+    """
+    try:
+        keep_head, before, after, keep_tail = _export_plan(TASKS_FILE)
+    except Exception as e:
+        logger.error("Error reading project/TASKS.md: %s", e)
+        keep_head, before, after, keep_tail = (
+            None, f"# Project Tasks\n\n{_MARKER_START}\n", f"\n{_MARKER_END}\n", None
+        )
+    count = 0
+
+    def write(out):
+        nonlocal count
+        src = open(TASKS_FILE, "rb") if keep_head is not None or keep_tail is not None else None
+        try:
+            if keep_head:
+                _copy_range(src, out, 0, keep_head)
+            out.write(before.encode("utf-8"))
+            c.execute(_EXPORT_NESTED_SQL if _has_subtasks(c) else _EXPORT_FLAT_SQL)
+            for row in c:
+                out.write((("\n" if count else "") + _task_line(row)).encode("utf-8"))
+                count += 1
+            out.write(after.encode("utf-8"))
+            if keep_tail is not None:
+                _copy_range(src, out, keep_tail)
+        finally:
+            if src is not None:
+                src.close()
+
+    _atomic_write_with(TASKS_FILE, write)
+    print(f"  {Colors.GREEN}✓ Exported {count} tasks to project/TASKS.md{Colors.ENDC}")
@@ -0,0 +1,267 @@
+"""``gabbe sync --watch``: keep project/TASKS.md and the tasks table in sync.
+
+One long-running process keeps the pooled DB connection open and runs
+``sync_tasks()`` whenever either side changes:
+
+- TASKS.md edits are seen through inotify on Linux. The watch is on the
+  file's directory, so editors that save by renaming over the file are
+  seen too. Elsewhere the file is ``stat()``-polled every
+  ``GABBE_SYNC_WATCH_POLL_INTERVAL`` seconds.
+- Commits by other connections (other ``gabbe`` commands, agents) are
+  detected with ``PRAGMA data_version`` at the same interval.
+
+A burst of changes gives one sync. The sync runs once nothing has changed
+for ``GABBE_SYNC_WATCH_DEBOUNCE`` seconds, or ``GABBE_SYNC_WATCH_MAX_DELAY``
+after the first change, whichever comes first. ``SyncWatcher.stats()``
+reports event counts and the latency from a change being seen to its sync
+finishing. The CLI prints the same figures on SIGUSR1 and at exit.
+"""
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import signal
+import struct
+import sys
+import threading
+import time
+
+from . import sync as task_sync
+from .config import (
+    SYNC_WATCH_DEBOUNCE,
+    SYNC_WATCH_MAX_DELAY,
+    SYNC_WATCH_POLL_INTERVAL,
+    Colors,
+)
+from .database import acquire_connection
+from .latency import LatencyWindow
+
+logger = logging.getLogger("gabbe.sync_watch")
+
+# <sys/inotify.h>
+_IN_MODIFY = 0x002
+_IN_CLOSE_WRITE = 0x008
+_IN_MOVED_FROM = 0x040
+_IN_MOVED_TO = 0x080
+_IN_CREATE = 0x100
+_IN_DELETE = 0x200
+_IN_Q_OVERFLOW = 0x4000
+_IN_NONBLOCK = os.O_NONBLOCK
+_IN_CLOEXEC = getattr(os, "O_CLOEXEC", 0o2000000)
+_IN_MASK = _IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE
+_EVENT = struct.Struct("iIII")  # wd, mask, cookie, len; then `len` bytes of name
+
+
+class PollWatcher:
+    """Wakes up every *timeout*; the caller ``stat()``s the file itself."""
+
+    kind = "poll"
+
+    def __init__(self, path=None):
+        self._wake = threading.Event()
+
+    def wait(self, timeout: float) -> bool:
+        """Block up to *timeout* seconds; True if the file may have changed."""
+        self._wake.wait(timeout)
+        return True
+
+    def interrupt(self):
+        self._wake.set()
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """inotify watch on the file's directory, filtered to the file's name."""
+
+    kind = "inotify"
+
+    def __init__(self, path):
+        if not sys.platform.startswith("linux"):
+            raise OSError("inotify is only available on Linux")
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        try:
+            init, add_watch = libc.inotify_init1, libc.inotify_add_watch
+        except AttributeError as e:
+            raise OSError(f"libc has no inotify: {e}") from e
+        fd = init(_IN_NONBLOCK | _IN_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if add_watch(fd, os.fsencode(str(path.parent)), _IN_MASK) < 0:
+            err = ctypes.get_errno()
+            os.close(fd)
+            raise OSError(err, f"cannot watch {path.parent}")
+        self._fd = fd
+        self._name = os.fsencode(path.name)
+        self._wake_r, self._wake_w = os.pipe()
+
+    def wait(self, timeout: float) -> bool:
+        ready, _, _ = select.select([self._fd, self._wake_r], [], [], timeout)
+        if self._fd not in ready:
+            return False
+        hit = False
+        while True:
+            try:
+                data = os.read(self._fd, 65536)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset + _EVENT.size <= len(data):
+                _, mask, _, length = _EVENT.unpack_from(data, offset)
+                name = data[offset + _EVENT.size:offset + _EVENT.size + length].rstrip(b"\0")
+                offset += _EVENT.size + length
+                if name == self._name or mask & _IN_Q_OVERFLOW:
+                    hit = True
+        return hit
+
+    def interrupt(self):
+        os.write(self._wake_w, b"\0")
+
+    def close(self):
+        for fd in (self._fd, self._wake_r, self._wake_w):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+
+def file_watcher(path, use_inotify: bool = True):
+    """An inotify watcher for *path* if possible, else a polling one."""
+    if use_inotify:
+        try:
+            return InotifyWatcher(path)
+        except OSError as e:
+            logger.info("inotify unavailable (%s); polling %s instead", e, path)
+    return PollWatcher(path)
+
+
+class SyncWatcher:
+    """Runs ``sync_tasks()`` on the calling thread whenever TASKS.md or the DB changes."""
+
+    def __init__(self, path=None, debounce: float = SYNC_WATCH_DEBOUNCE,
+                 max_delay: float = SYNC_WATCH_MAX_DELAY,
+                 poll_interval: float = SYNC_WATCH_POLL_INTERVAL, watcher=None):
+        self.path = path if path is not None else task_sync.TASKS_FILE
+        self.debounce = debounce
+        self.max_delay = max(debounce, max_delay)
+        self.poll_interval = poll_interval
+        self.watcher = watcher if watcher is not None else file_watcher(self.path)
+        self._stop = threading.Event()
+        self._file_signature = None
+        self._data_version = None
+        self._latency = LatencyWindow()
+        self._durations = LatencyWindow()
+        self._lock = threading.Lock()
+        self._counts = {"file_events": 0, "db_events": 0, "syncs": 0, "errors": 0}
+
+    def _bump(self, name):
+        with self._lock:
+            self._counts[name] += 1
+
+    def _read_data_version(self):
+        return acquire_connection().execute("PRAGMA data_version").fetchone()[0]
+
+    def _sync(self, changed_at=None):
+        # Take the baseline first: an edit or a commit from another
+        # connection that lands mid-sync must still trigger the next sync.
+        # The sync's own export then costs one no-op re-sync; its DB writes
+        # go through this thread's connection, which data_version ignores.
+        self._file_signature = task_sync._file_signature(self.path)
+        self._data_version = self._read_data_version()
+        start = time.monotonic()
+        try:
+            task_sync.sync_tasks()
+        except Exception:
+            logger.exception("Task sync failed; will retry on the next change")
+            self._bump("errors")
+        else:
+            done = time.monotonic()
+            self._bump("syncs")
+            self._durations.observe((done - start) * 1000)
+            if changed_at is not None:
+                self._latency.observe((done - changed_at) * 1000)
+
+    def run(self):
+        """Sync once, then watch until stop() is called."""
+        self._sync()
+        pending_since = last_change = None
+        try:
+            while not self._stop.is_set():
+                timeout = self.poll_interval
+                if pending_since is not None:
+                    due = min(last_change + self.debounce, pending_since + self.max_delay)
+                    timeout = min(timeout, max(0.0, due - time.monotonic()))
+                maybe_file = self.watcher.wait(timeout)
+                if self._stop.is_set():
+                    break
+                now = time.monotonic()
+                changed = False
+                if maybe_file:
+                    signature = task_sync._file_signature(self.path)
+                    if signature != self._file_signature:
+                        self._file_signature = signature
+                        self._bump("file_events")
+                        changed = True
+                version = self._read_data_version()
+                if version != self._data_version:
+                    self._data_version = version
+                    self._bump("db_events")
+                    changed = True
+                if changed:
+                    last_change = now
+                    if pending_since is None:
+                        pending_since = now
+                if pending_since is not None and (
+                    now - last_change >= self.debounce or now - pending_since >= self.max_delay
+                ):
+                    self._sync(pending_since)
+                    pending_since = None
+        finally:
+            self.watcher.close()
+
+    def stop(self):
+        """Ask run() to return; safe to call from another thread or a signal handler."""
+        self._stop.set()
+        self.watcher.interrupt()
+
+    def stats(self) -> dict:
+        """Event and sync counts, change-to-synced latency and sync duration (ms)."""
+        with self._lock:
+            snap = dict(self._counts)
+        snap["watcher"] = self.watcher.kind
+        snap["latency_ms"] = self._latency.snapshot()
+        snap["duration_ms"] = self._durations.snapshot()
+        return snap
+
+
+def _format_stats(stats: dict) -> str:
+    def ms(value):
+        return "-" if value is None else f"{value:.1f}"
+
+    lat, dur = stats["latency_ms"], stats["duration_ms"]
+    return (
+        f"{stats['syncs']} syncs ({stats['errors']} failed), "
+        f"{stats['file_events']} file / {stats['db_events']} DB changes; "
+        f"latency p50 {ms(lat['p50'])} ms, p90 {ms(lat['p90'])} ms, p99 {ms(lat['p99'])} ms; "
+        f"sync p50 {ms(dur['p50'])} ms"
+    )
+
+
+def watch():
+    """CLI entry point for ``gabbe sync --watch``."""
+    watcher = SyncWatcher()
+    print(f"{Colors.HEADER}👀 Watching {watcher.path} and the tasks table "
+          f"({watcher.watcher.kind}); Ctrl-C to stop.{Colors.ENDC}")
+    if threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGTERM, lambda *_: watcher.stop())
+        if hasattr(signal, "SIGUSR1"):
+            signal.signal(signal.SIGUSR1, lambda *_: print(_format_stats(watcher.stats()), flush=True))
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        pass
+    print(f"{Colors.GREEN}✓ Stopped watching: {_format_stats(watcher.stats())}{Colors.ENDC}")
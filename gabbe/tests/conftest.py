@@ -22,6 +22,7 @@ def tmp_project(tmp_path):
     - gabbe.brain.REQUIRED_FILES   (brain imports REQUIRED_FILES at module top)
     - gabbe.audit.GABBE_DIR        (audit imports GABBE_DIR at module top for log path)
     - gabbe.policy.GABBE_POLICY_FILE (policy module caches this at import time)
+    - gabbe.config.GABBE_CONFIG_FILE (the provider registry is reloaded from it)
 
     Yields the temporary project root Path.
     """
@@ -45,6 +46,7 @@ def tmp_project(tmp_path):
          patch("gabbe.config.TASKS_FILE", tasks_file), \
          patch("gabbe.config.REQUIRED_FILES", required_files), \
          patch("gabbe.config.GABBE_POLICY_FILE", policy_file), \
+         patch("gabbe.config.GABBE_CONFIG_FILE", gabbe_dir / "config.json"), \
          patch("gabbe.policy.GABBE_POLICY_FILE", policy_file), \
          patch("gabbe.database.GABBE_DIR", gabbe_dir), \
          patch("gabbe.database.DB_PATH", db_path), \
@@ -56,9 +58,21 @@ def tmp_project(tmp_path):
          patch("gabbe.brain.REQUIRED_FILES", required_files), \
          patch("gabbe.audit.GABBE_DIR", gabbe_dir):
         # Initialise the DB so every test starts clean
-        from gabbe.database import init_db
+        from gabbe.database import init_db, close_connections
+        from gabbe.llm_cache import get_llm_cache
+        from gabbe.providers import set_registry
+        from gabbe.complexity import reset_history
+        from gabbe.policy import clear_policy_cache
         init_db()
+        get_llm_cache().clear(memory_only=True)
+        set_registry(None)
+        reset_history()
         yield tmp_path
+        get_llm_cache().clear(memory_only=True)
+        set_registry(None)
+        reset_history()
+        clear_policy_cache()
+        close_connections()
 
 
 @pytest.fixture()
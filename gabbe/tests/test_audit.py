@@ -116,3 +116,81 @@ def test_multiple_runs_isolated(tmp_project, db_conn):
 
     assert len(trace_a) == 1 and trace_a[0]["node_name"] == "node_a"
     assert len(trace_b) == 1 and trace_b[0]["node_name"] == "node_b"
+
+
+# ---------------------------------------------------------------------------
+# Batched (async) span writer
+# ---------------------------------------------------------------------------
+
+def test_async_tracer_batches_spans_into_db_and_jsonl(tmp_project, db_conn):
+    tracer = AuditTracer("run-async-1", db_conn=db_conn, async_writes=True)
+    for i in range(5):
+        span = tracer.start_span("tool_call", f"node_{i}", {"i": i})
+        tracer.end_span(span, output_data={"ok": True}, status="ok")
+
+    assert tracer.flush(timeout=5)
+    rows = db_conn.execute("SELECT node_name FROM audit_spans WHERE run_id='run-async-1' ORDER BY id").fetchall()
+    assert [r["node_name"] for r in rows] == [f"node_{i}" for i in range(5)]
+    tracer.close()
+    lines = tracer.jsonl_path.read_text().splitlines()
+    assert len(lines) == 5
+    assert json.loads(lines[-1])["node_name"] == "node_4"
+
+
+def test_async_get_run_trace_sees_pending_spans(tmp_project, db_conn):
+    tracer = AuditTracer("run-async-2", db_conn=db_conn, async_writes=True)
+    span = tracer.start_span("step", "pending", {})
+    tracer.end_span(span, status="ok")
+    trace = tracer.get_run_trace("run-async-2")
+    assert [t["node_name"] for t in trace] == ["pending"]
+
+
+def test_span_writer_drops_and_counts_under_backpressure(tmp_project, db_conn):
+    from gabbe.audit import SpanWriter
+    writer = SpanWriter(queue_size=1, enqueue_timeout=0, autostart=False)
+    tracer = AuditTracer("run-async-3", db_conn=db_conn, async_writes=True)
+    tracer._writer = writer
+    for i in range(3):
+        span = tracer.start_span("step", f"n{i}", {})
+        tracer.end_span(span, status="ok")
+
+    stats = writer.stats()
+    assert stats["enqueued"] == 1
+    assert stats["dropped"] == 2
+    assert stats["backpressure_waits"] == 2
+
+    writer.start()
+    assert writer.flush(timeout=5)
+    writer.close()
+    assert writer.stats()["written"] == 1
+    count = db_conn.execute("SELECT COUNT(*) FROM audit_spans WHERE run_id='run-async-3'").fetchone()[0]
+    assert count == 1
+
+
+def test_run_context_exit_drains_async_spans(tmp_project, db_conn):
+    from gabbe.context import RunContext
+    ctx = RunContext.from_config(command="async-drain")
+    ctx.tracer = AuditTracer(ctx.run_id, db_conn=ctx.db_conn, async_writes=True)
+    with ctx:
+        span = ctx.tracer.start_span("step", "drained", {})
+        ctx.tracer.end_span(span, status="ok")
+    row = db_conn.execute("SELECT node_name FROM audit_spans WHERE run_id=?", (ctx.run_id,)).fetchone()
+    assert row["node_name"] == "drained"
+
+
+def test_span_writer_survives_unexpected_write_errors(tmp_project, db_conn):
+    from unittest.mock import patch
+    from gabbe.audit import SpanWriter
+    writer = SpanWriter()
+    tracer = AuditTracer("run-async-4", db_conn=db_conn, async_writes=True)
+    tracer._writer = writer
+    with patch.object(writer, "_write_batch", side_effect=ValueError("I/O operation on closed file")):
+        tracer.end_span(tracer.start_span("step", "lost", {}), status="ok")
+        assert writer.flush(timeout=5)
+    assert writer.stats()["write_errors"] == 1
+
+    tracer.end_span(tracer.start_span("step", "kept", {}), status="ok")
+    assert writer.release(tracer.jsonl_path, timeout=5)
+    writer.close()
+    rows = db_conn.execute("SELECT node_name FROM audit_spans WHERE run_id='run-async-4'").fetchall()
+    assert [r["node_name"] for r in rows] == ["kept"]
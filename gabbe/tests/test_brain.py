@@ -180,10 +180,10 @@ def test_run_healer_missing_files(tmp_project, capsys):
 
 
 def test_run_healer_db_unreachable(tmp_project, capsys):
-    """Healer reports DB issue when get_db raises."""
+    """Healer reports DB issue when db_connection raises."""
     from gabbe.brain import run_healer
 
-    with patch("gabbe.brain.get_db", side_effect=Exception("locked")), \
+    with patch("gabbe.brain.db_connection", side_effect=Exception("locked")), \
          patch("gabbe.brain.REQUIRED_FILES", []):
         run_healer()
 
@@ -91,6 +91,28 @@ def test_budget_record_llm_usage_no_pricing():
     assert b.cost_usd == 0.0  # No pricing in registry
 
 
+def test_budget_check_projected_raises_without_recording():
+    b = Budget(max_tokens=100)
+    b.tokens_used = 90
+    b.check_projected("gpt-test", {"total_tokens": 10})
+    with pytest.raises(BudgetExceeded):
+        b.check_projected("gpt-test", {"total_tokens": 11})
+    assert b.tokens_used == 90
+
+
+def test_budget_record_cache_hit_tracks_savings_not_spend():
+    b = Budget(max_tokens=1000)
+    b._cached_prices["gpt-test"] = {
+        "input": 0.001, "output": 0.002, "reasoning": 0.0, "cache_creation": 0.0, "cache_read": 0.0,
+    }
+    b.record_cache_hit("gpt-test", {"total_tokens": 50, "prompt_tokens": 30, "completion_tokens": 20})
+    assert b.tokens_used == 0
+    assert b.cost_usd == 0.0
+    assert b.cache_hits == 1
+    assert b.cache_tokens_saved == 50
+    assert b.cache_savings_usd == pytest.approx(0.07)
+
+
 def test_budget_snapshot():
     b = Budget(max_tokens=100)
     b.tokens_used = 25
@@ -0,0 +1,58 @@
+"""Unit tests for gabbe.complexity."""
+import json
+
+from gabbe.complexity import (
+    COMPLEXITY_SYSTEM_PROMPT,
+    ScoreHistory,
+    extract_features,
+    get_history,
+    score_prompt,
+)
+
+
+def test_features():
+    f = extract_features(
+        "Refactor gabbe/llm.py: move _send_with_retry() into retry.py\n```py\nx = 1\n```"
+    )
+    assert f.code_fences == 1
+    assert f.paths == 2
+    assert f.identifiers >= 1
+    assert "refactor" in f.hard_terms
+
+
+def test_scores_order_simple_below_complex():
+    empty = ScoreHistory()
+    simple = score_prompt("Fix typo in the readme", empty)
+    complex_ = score_prompt(
+        "Design a distributed cache with consensus-based invalidation across regions, "
+        "handle concurrency and migrate the existing schema.\n```python\n...\n```", empty
+    )
+    assert simple.score < 20 < 60 < complex_.score
+    assert simple.confidence > 0.5 and complex_.confidence > 0.2
+
+
+def test_history_reuses_scores_and_calibrates():
+    samples = {f"task {i} " + "word " * (i * 20): 10 + i * 4 for i in range(20)}
+    history = ScoreHistory(samples)
+    prompt = next(iter(samples))
+    assert score_prompt(prompt, history).score == samples[prompt]
+    assert score_prompt(prompt, history).confidence == 1.0
+    assert history.slope != 1.0 or history.intercept != 0.0
+    fresh = score_prompt(prompt, history, use_recorded=False)
+    assert fresh.reason.startswith("Heuristic")
+
+
+def test_history_loads_complexity_spans_from_audit(tmp_project):
+    from gabbe.audit import AuditTracer
+
+    tracer = AuditTracer("run-1", async_writes=False)
+    for prompt, system, score in [
+        ("Plan the migration", COMPLEXITY_SYSTEM_PROMPT, 70),
+        ("Plan the migration", "You are a complexity analyzer. (old prompt)", 10),
+        ("Say hi", "You are a helpful assistant.", 99),
+    ]:
+        span = tracer.start_span("llm_call", "m", {"prompt": prompt, "system_prompt": system})
+        tracer.end_span(span, output_data={"response": json.dumps({"score": score})})
+    tracer.close()
+
+    assert get_history().samples == {"Plan the migration": 70}
@@ -73,3 +73,231 @@ def test_init_db_idempotent(tmp_project):
         assert c.fetchone() is not None
     finally:
         conn.close()
+
+
+def test_connections_use_wal_and_busy_timeout(tmp_project):
+    from gabbe.database import db_connection
+    from gabbe.config import DB_BUSY_TIMEOUT_MS
+    with db_connection() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+        assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == DB_BUSY_TIMEOUT_MS
+
+
+def test_db_connection_reuses_pooled_connection_per_thread(tmp_project):
+    import threading
+    from gabbe.database import db_connection, acquire_connection
+    with db_connection() as first:
+        pass
+    with db_connection() as second:
+        pass
+    assert first is second
+    assert acquire_connection() is first
+
+    other = {}
+    t = threading.Thread(target=lambda: other.setdefault("conn", acquire_connection()))
+    t.start()
+    t.join()
+    assert other["conn"] is not first
+
+
+def test_db_connection_commits_and_rolls_back(tmp_project):
+    from gabbe.database import db_connection, get_db
+    with db_connection() as conn:
+        conn.execute("INSERT INTO tasks (title) VALUES ('Committed')")
+
+    with pytest.raises(RuntimeError):
+        with db_connection() as conn:
+            conn.execute("INSERT INTO tasks (title) VALUES ('Rolled back')")
+            raise RuntimeError("boom")
+
+    other = get_db()
+    try:
+        titles = {r["title"] for r in other.execute("SELECT title FROM tasks")}
+    finally:
+        other.close()
+    assert titles == {"Committed"}
+
+
+def test_nested_db_connection_commits_once_at_outermost(tmp_project):
+    from gabbe.database import db_connection
+    with db_connection() as outer:
+        outer.execute("INSERT INTO tasks (title) VALUES ('Outer')")
+        with db_connection() as inner:
+            assert inner is outer
+        # The inner block must not have committed the outer transaction.
+        assert outer.in_transaction
+    assert not outer.in_transaction
+
+
+def test_close_connections_closes_other_threads_connections(tmp_project):
+    import sqlite3
+    import threading
+    from gabbe.database import acquire_connection, close_connections
+    acquired, closed, result = threading.Event(), threading.Event(), {}
+
+    def worker():
+        conn = acquire_connection()
+        acquired.set()
+        closed.wait(5)
+        try:
+            conn.execute("SELECT 1")
+            result["open"] = True
+        except sqlite3.ProgrammingError:
+            result["open"] = False
+
+    t = threading.Thread(target=worker)
+    t.start()
+    acquired.wait(5)
+    close_connections()
+    closed.set()
+    t.join()
+    assert result == {"open": False}
+
+
+def test_nested_db_connection_on_other_path_commits_its_own(tmp_project, tmp_path):
+    from gabbe.database import _connect, db_connection
+    other_path = tmp_path / "other.db"
+    setup = _connect(other_path)
+    setup.execute("CREATE TABLE t (x INTEGER)")
+    setup.commit()
+    setup.close()
+    with db_connection() as outer:
+        outer.execute("INSERT INTO tasks (title) VALUES ('Outer')")
+        with db_connection(other_path) as inner:
+            assert inner is not outer
+            inner.execute("INSERT INTO t VALUES (1)")
+        assert not inner.in_transaction
+        assert outer.in_transaction
+    assert not outer.in_transaction
+
+
+def test_pool_reconnects_when_database_file_is_replaced(tmp_project):
+    from gabbe.database import acquire_connection, init_db
+    import gabbe.database as database
+    stale = acquire_connection()
+    for suffix in ("", "-wal", "-shm"):
+        p = database.DB_PATH.parent / (database.DB_PATH.name + suffix)
+        if p.exists():
+            p.unlink()
+    init_db()
+    fresh = acquire_connection()
+    assert fresh is not stale
+    assert fresh.execute("SELECT COUNT(*) FROM tasks").fetchone()[0] == 0
+
+
+def test_v6_migration_keeps_tags_and_triggers_index_them(tmp_path):
+    from gabbe.database import _connect, _migrate
+    conn = _connect(tmp_path / "v5.db")
+    try:
+        conn.execute("CREATE TABLE schema_version (version INTEGER)")
+        conn.execute("INSERT INTO schema_version VALUES (5)")
+        conn.execute("CREATE TABLE project_state (key TEXT PRIMARY KEY, value TEXT, updated_at DATETIME)")
+        conn.execute("CREATE TABLE tasks (id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT NOT NULL UNIQUE, "
+                     "status TEXT DEFAULT 'TODO', tags TEXT, created_at DATETIME, updated_at DATETIME)")
+        conn.execute("CREATE TABLE runs (id TEXT PRIMARY KEY, total_tokens_used INTEGER DEFAULT 0, "
+                     "total_cost_usd REAL DEFAULT 0.0)")
+        conn.execute("INSERT INTO tasks (title, tags) VALUES ('Old', 'legacy')")
+        conn.commit()
+        _migrate(conn)
+
+        def tags():
+            return sorted(tuple(r) for r in conn.execute(
+                "SELECT t.title, g.tag FROM task_tags g JOIN tasks t ON t.id = g.task_id"))
+
+        assert tags() == [("Old", "legacy")]
+        conn.execute("""INSERT INTO tasks (title, tags) VALUES ('New', '["a", "b"]')""")
+        conn.execute("""UPDATE tasks SET tags = '["c"]' WHERE title = 'Old'""")
+        assert tags() == [("New", "a"), ("New", "b"), ("Old", "c")]
+        conn.execute("UPDATE tasks SET parent_id = (SELECT id FROM tasks WHERE title = 'Old') WHERE title = 'New'")
+        conn.execute("DELETE FROM tasks WHERE title = 'Old'")
+        assert tags() == [("New", "a"), ("New", "b")]
+        assert conn.execute("SELECT parent_id FROM tasks WHERE title = 'New'").fetchone()[0] is None
+    finally:
+        conn.close()
+
+
+def test_v6_migration_reruns_over_partially_applied_schema(tmp_project):
+    # Another process may already have added the columns when _migrate
+    # proceeds without the BEGIN IMMEDIATE lock.
+    import gabbe.database as database
+    conn = database._connect(database.DB_PATH)
+    try:
+        conn.execute("UPDATE schema_version SET version = 5")
+        conn.commit()
+        database._migrate(conn)
+        assert conn.execute("SELECT version FROM schema_version").fetchone()[0] == database.SCHEMA_VERSION
+    finally:
+        conn.close()
+
+
+def test_summary_tables_follow_task_and_run_writes(tmp_project):
+    from gabbe.database import db_connection, rebuild_stats, run_totals, task_status_counts
+    with db_connection() as conn:
+        c = conn.cursor()
+        c.executemany("INSERT INTO tasks (title, status) VALUES (?, ?)",
+                      [("A", "TODO"), ("B", "TODO"), ("C", "DONE"), ("D", None)])
+        c.execute("UPDATE tasks SET status = 'IN_PROGRESS' WHERE title = 'A'")
+        c.execute("UPDATE tasks SET title = 'C2' WHERE title = 'C'")
+        c.execute("DELETE FROM tasks WHERE title = 'B'")
+        assert task_status_counts(c) == {"IN_PROGRESS": 1, "DONE": 1, "": 1}
+
+        c.execute("INSERT INTO runs (id, total_cost_usd, total_tokens_used) VALUES ('r1', 0.25, 100)")
+        c.execute("INSERT INTO runs (id) VALUES ('r2')")
+        c.execute("UPDATE runs SET total_cost_usd = 0.5, total_tokens_used = 300 WHERE id = 'r2'")
+        c.execute("DELETE FROM runs WHERE id = 'r1'")
+        assert run_totals(c) == (1, 0.5, 300)
+    assert rebuild_stats() == []
+
+
+def test_v7_migration_backfills_summary_tables(tmp_project):
+    from gabbe.database import db_connection, init_db, run_totals, task_status_counts
+    with db_connection() as conn:
+        conn.execute("INSERT INTO tasks (title, status) VALUES ('A', 'DONE'), ('B', 'TODO'), ('C', 'DONE')")
+        conn.execute("INSERT INTO runs (id, total_cost_usd, total_tokens_used) VALUES ('r1', 1.5, 10)")
+        conn.execute("DELETE FROM task_status_counts")
+        conn.execute("DELETE FROM run_totals")
+        conn.execute("UPDATE schema_version SET version = 6")
+    init_db()
+    with db_connection() as conn:
+        c = conn.cursor()
+        assert task_status_counts(c) == {"DONE": 2, "TODO": 1}
+        assert run_totals(c) == (1, 1.5, 10)
+
+
+def test_run_bookkeeping_inside_db_connection_joins_its_transaction(tmp_project):
+    from gabbe.context import RunContext
+    from gabbe.database import db_connection, get_db
+    with pytest.raises(RuntimeError):
+        with db_connection() as conn:
+            conn.execute("INSERT INTO tasks (title) VALUES ('Half done')")
+            with RunContext(command="nested") as ctx:
+                span = ctx.tracer.start_span("step", "inner", {})
+                ctx.tracer.end_span(span, status="ok")
+                ctx.tracer.snapshot_budget(1, ctx.budget)
+            assert conn.in_transaction
+            raise RuntimeError("boom")
+
+    other = get_db()
+    try:
+        assert other.execute("SELECT COUNT(*) FROM tasks").fetchone()[0] == 0
+        assert other.execute("SELECT COUNT(*) FROM runs WHERE id = ?", (ctx.run_id,)).fetchone()[0] == 0
+    finally:
+        other.close()
+
+
+def test_v8_migration_drops_the_json_sync_snapshot(tmp_project):
+    import gabbe.database as database
+    conn = database._connect(database.DB_PATH)
+    try:
+        conn.execute("UPDATE schema_version SET version = 7")
+        conn.executemany("INSERT OR REPLACE INTO project_state (key, value) VALUES (?, '{}')",
+                         [("tasks_sync_state",), ("tasks_sync_snapshot",), ("current_phase",)])
+        conn.commit()
+        database._migrate(conn)
+        keys = {r[0] for r in conn.execute("SELECT key FROM project_state")}
+        assert {"tasks_sync_state", "tasks_sync_snapshot"}.isdisjoint(keys)
+        assert "current_phase" in keys
+        assert conn.execute("SELECT COUNT(*) FROM task_sync_blocks").fetchone()[0] == 0
+    finally:
+        conn.close()
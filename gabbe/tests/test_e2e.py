@@ -43,6 +43,7 @@ class TestGabbeE2E(unittest.TestCase):
             patch("gabbe.policy.GABBE_POLICY_FILE", _policy_file),
             patch("gabbe.database.GABBE_DIR", self.project_dir),
             patch("gabbe.database.DB_PATH", self.db_path),
+            patch("gabbe.audit.GABBE_DIR", self.project_dir),
             patch("gabbe.sync.TASKS_FILE", self.tasks_file),
             patch("gabbe.verify.PROJECT_ROOT", self.project_root),
             patch("gabbe.verify.GABBE_DIR", self.project_dir),
@@ -71,6 +71,7 @@ class TestWorkflowGoldenPath(unittest.TestCase):
             patch("gabbe.policy.GABBE_POLICY_FILE", _policy_file),
             patch("gabbe.database.GABBE_DIR", self.project_dir),
             patch("gabbe.database.DB_PATH", self.db_path),
+            patch("gabbe.audit.GABBE_DIR", self.project_dir),
             patch("gabbe.sync.TASKS_FILE", self.tasks_file),
             patch("gabbe.verify.PROJECT_ROOT", self.project_root),
             patch("gabbe.verify.GABBE_DIR", self.project_dir),
@@ -632,6 +633,7 @@ class TestPlatformControls(unittest.TestCase):
             patch("gabbe.policy.GABBE_POLICY_FILE", _policy_file),
             patch("gabbe.database.GABBE_DIR", self.project_dir),
             patch("gabbe.database.DB_PATH", self.db_path),
+            patch("gabbe.audit.GABBE_DIR", self.project_dir),
         ]
         for p in self._patches:
             p.start()
@@ -800,6 +802,7 @@ class TestMCPServerProtocol(unittest.TestCase):
             patch("gabbe.policy.GABBE_POLICY_FILE", _policy_file),
             patch("gabbe.database.GABBE_DIR", self.project_dir),
             patch("gabbe.database.DB_PATH", self.db_path),
+            patch("gabbe.audit.GABBE_DIR", self.project_dir),
         ]
         for p in self._patches:
             p.start()
@@ -1,4 +1,6 @@
 """Unit tests for gabbe.gateway."""
+import json
+
 import pytest
 from gabbe.gateway import ToolDefinition, ToolNotFound, PolicyDenied, CircuitOpen, RateLimitExceeded
 from gabbe.budget import Budget, BudgetExceeded
@@ -77,7 +79,7 @@ def test_circuit_breaker_resets_on_success(tmp_project):
             ctx.gateway.execute("conditional", {}, "t", ctx)
         result = ctx.gateway.execute("conditional", {}, "t", ctx)
         assert result == "ok"
-        assert ctx.gateway._failure_counts["conditional"] == 0
+        assert ctx.gateway.circuit_state("conditional")["failures"] == 0
 
 
 def test_rate_limit(tmp_project):
@@ -101,3 +103,164 @@ def test_execute_records_audit_span(tmp_project):
     conn.close()
     assert len(spans) >= 1
     assert any(s["node_name"] == "spy" for s in spans)
+
+
+def test_spans_started_by_handler_nest_under_tool_span(tmp_project):
+    from gabbe.context import RunContext
+    with RunContext.from_config(command="gw-nest", policy=_allow_all_policy()) as ctx:
+        def _nested():
+            inner = ctx.tracer.start_span("llm_call", "model", {})
+            ctx.tracer.end_span(inner)
+            return "done"
+
+        ctx.gateway.register(ToolDefinition("outer", "desc", {}, _nested, {"t"}))
+        ctx.gateway.execute("outer", {}, "t", ctx)
+        spans = {s["event_type"]: s for s in ctx.tracer.get_run_trace(ctx.run_id)}
+
+    assert spans["llm_call"]["parent_span_id"] == spans["tool_call"]["span_id"]
+
+
+def test_register_compiles_validator_once(tmp_project):
+    from unittest.mock import patch
+    from gabbe.context import RunContext
+    schema = {"type": "object", "properties": {"x": {"type": "integer"}}, "required": ["x"]}
+    with RunContext.from_config(command="gw-schema", policy=_allow_all_policy()) as ctx:
+        tool = ToolDefinition("double", "doubles x", schema, _simple_tool, {"tester"})
+        ctx.gateway.register(tool)
+        assert tool.validator is not None
+        with patch("gabbe.gateway.compile_validator") as compile_:
+            assert ctx.gateway.execute("double", {"x": 4}, "tester", ctx) == 8
+            with pytest.raises(ValueError, match="'x' is a required property"):
+                ctx.gateway.execute("double", {}, "tester", ctx)
+        compile_.assert_not_called()
+
+
+# ---------------------------------------------------------------------------
+# execute_many
+# ---------------------------------------------------------------------------
+
+def test_execute_many_runs_in_parallel_and_keeps_order(tmp_project):
+    import threading
+    import time
+    from gabbe.context import RunContext
+    barrier = threading.Barrier(3, timeout=5)
+
+    def wait_then(x):
+        barrier.wait()  # only passes if all three handlers run at once
+        time.sleep(0.01 * (3 - x))
+        return x
+
+    with RunContext.from_config(command="gw-many", policy=_allow_all_policy()) as ctx:
+        ctx.gateway.register(ToolDefinition("wait", "desc", {}, wait_then, {"t"}))
+        results = ctx.gateway.execute_many(
+            [("wait", {"x": 0}), {"name": "wait", "arguments": {"x": 1}}, ("wait", {"x": 2})], "t", ctx
+        )
+    assert [r.unwrap() for r in results] == [0, 1, 2]
+
+
+def test_execute_many_partial_failure(tmp_project):
+    from gabbe.context import RunContext
+
+    def boom():
+        raise RuntimeError("handler failed")
+
+    policy = PolicyEngine([ToolAllowlistPolicy(["*"], ["forbidden"])])
+    with RunContext.from_config(command="gw-many", policy=policy) as ctx:
+        ctx.gateway.register(ToolDefinition("double", "desc", {}, _simple_tool, {"t"}))
+        ctx.gateway.register(ToolDefinition("boom", "desc", {}, boom, {"t"}))
+        ctx.gateway.register(ToolDefinition("forbidden", "desc", {}, _simple_tool, {"t"}))
+        results = ctx.gateway.execute_many(
+            [("double", {"x": 2}), ("boom", {}), ("forbidden", {}), ("missing", {}), ("double", {"x": 5})],
+            "t", ctx,
+        )
+        trace = ctx.tracer.get_run_trace(ctx.run_id)
+
+    assert [r.ok for r in results] == [True, False, False, False, True]
+    assert results[0].value == 4 and results[4].value == 10
+    assert isinstance(results[1].error, RuntimeError)
+    assert isinstance(results[2].error, PolicyDenied)
+    assert isinstance(results[3].error, ToolNotFound)
+    with pytest.raises(RuntimeError):
+        results[1].unwrap()
+    assert [s["status"] for s in trace].count("error") == 3 and len(trace) == 5
+
+
+def test_execute_many_stops_admitting_when_budget_runs_out(tmp_project):
+    from gabbe.context import RunContext
+    ran = []
+    with RunContext.from_config(command="gw-many", budget=Budget(max_tool_calls=2),
+                                policy=_allow_all_policy()) as ctx:
+        ctx.gateway.register(ToolDefinition("track", "desc", {}, lambda i: ran.append(i), {"t"}))
+        results = ctx.gateway.execute_many([("track", {"i": i}) for i in range(4)], "t", ctx)
+    assert sorted(ran) == [0, 1]
+    assert [r.ok for r in results] == [True, True, False, False]
+    assert all(isinstance(r.error, BudgetExceeded) for r in results[2:])
+
+
+def test_execute_many_respects_per_tool_concurrency(tmp_project):
+    import threading
+    import time
+    from gabbe.context import RunContext
+    state = {"running": 0, "peak": 0}
+    lock = threading.Lock()
+
+    def tracked():
+        with lock:
+            state["running"] += 1
+            state["peak"] = max(state["peak"], state["running"])
+        time.sleep(0.01)
+        with lock:
+            state["running"] -= 1
+
+    with RunContext.from_config(command="gw-many", policy=_allow_all_policy()) as ctx:
+        ctx.gateway.register(ToolDefinition("slow", "desc", {}, tracked, {"t"}, max_concurrency=2))
+        results = ctx.gateway.execute_many([("slow", {})] * 6, "t", ctx, max_workers=6)
+    assert all(r.ok for r in results)
+    assert state["peak"] == 2
+
+
+def test_execute_many_spans_are_parented(tmp_project):
+    from gabbe.audit import active_span
+    from gabbe.context import RunContext
+    with RunContext.from_config(command="gw-many", policy=_allow_all_policy()) as ctx:
+        def nested(tag):
+            inner = ctx.tracer.start_span("llm_call", tag, {})
+            ctx.tracer.end_span(inner)
+            return tag
+
+        ctx.gateway.register(ToolDefinition("outer", "desc", {}, nested, {"t"}))
+        root = ctx.tracer.start_span("node", "turn", {})
+        with active_span(root):
+            ctx.gateway.execute_many([("outer", {"tag": "a"}), ("outer", {"tag": "b"})], "t", ctx)
+        ctx.tracer.end_span(root)
+        spans = ctx.tracer.get_run_trace(ctx.run_id)
+
+    tools = {json.loads(s["output_data"])["result"]: s for s in spans if s["event_type"] == "tool_call"}
+    assert {s["parent_span_id"] for s in tools.values()} == {root["span_id"]}
+    for s in spans:
+        if s["event_type"] == "llm_call":
+            assert s["parent_span_id"] == tools[s["node_name"]]["span_id"]
+
+
+def test_failure_counts_are_thread_safe(tmp_project):
+    from gabbe.context import RunContext
+
+    def boom():
+        raise RuntimeError("x")
+
+    with RunContext.from_config(command="gw-many", policy=_allow_all_policy()) as ctx:
+        ctx.gateway.register(ToolDefinition("boom", "desc", {}, boom, {"t"}, circuit_breaker_threshold=100))
+        ctx.gateway.execute_many([("boom", {})] * 20, "t", ctx, max_workers=8)
+        assert ctx.gateway.circuit_state("boom")["failures"] == 20
+
+
+def test_execute_many_with_process_pool(tmp_project):
+    from concurrent.futures import ProcessPoolExecutor
+    from gabbe.context import RunContext
+    with RunContext.from_config(command="gw-many", policy=_allow_all_policy()) as ctx, \
+            ProcessPoolExecutor(max_workers=2) as procs:
+        ctx.gateway.register(ToolDefinition("double", "desc", {}, _simple_tool, {"t"}))
+        results = ctx.gateway.execute_many(
+            [("double", {"x": i}) for i in range(4)], "t", ctx, executor=procs
+        )
+    assert [r.value for r in results] == [0, 2, 4, 6]
@@ -83,3 +83,16 @@ def test_hardstop_should_wrap_up_custom_threshold():
     assert not h.should_wrap_up(threshold=3)
     h.tick()  # 3 remaining
     assert h.should_wrap_up(threshold=3)
+
+
+def test_hardstop_check_does_not_consume_iterations():
+    h = HardStop(max_iterations=1)
+    h.check()
+    h.check()
+    assert h.iterations == 0
+
+
+def test_hardstop_check_raises_after_timeout():
+    h = HardStop(timeout_sec=-1)
+    with pytest.raises(TimeoutExceeded):
+        h.check()
@@ -0,0 +1,156 @@
+"""Unit tests for gabbe.limits (token buckets and circuit breakers)."""
+import multiprocessing
+
+import pytest
+
+from gabbe.gateway import ToolDefinition, ToolGateway
+from gabbe.limits import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitOpen,
+    MemoryLimitStore,
+    RateLimitExceeded,
+    SQLiteLimitStore,
+    ToolLimiter,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _tool(**kwargs):
+    kwargs.setdefault("rate_limit_per_min", 600)
+    return ToolDefinition("t", "", {}, lambda: None, {"r"}, **kwargs)
+
+
+def _limiter(clock=None):
+    return ToolLimiter(MemoryLimitStore(clock or FakeClock()))
+
+
+def test_bucket_allows_burst_then_refills():
+    clock = FakeClock()
+    limiter = _limiter(clock)
+    tool = _tool(rate_limit_per_min=60, rate_limit_burst=3)
+    for _ in range(3):
+        limiter.admit(tool)
+    with pytest.raises(RateLimitExceeded):
+        limiter.admit(tool)
+    clock.now += 1.0  # one token per second
+    limiter.admit(tool)
+    with pytest.raises(RateLimitExceeded):
+        limiter.admit(tool)
+    clock.now += 3600
+    assert limiter.state("t")["tokens"] == 0  # state is refreshed lazily on admit
+    for _ in range(3):
+        limiter.admit(tool)
+
+
+def test_breaker_opens_then_half_opens_after_cooldown():
+    clock = FakeClock()
+    limiter = _limiter(clock)
+    tool = _tool(circuit_breaker_threshold=2, circuit_cooldown_s=10)
+    for _ in range(2):
+        limiter.admit(tool)
+        limiter.record(tool, ok=False)
+    assert limiter.state("t")["circuit"] == OPEN
+    with pytest.raises(CircuitOpen):
+        limiter.admit(tool)
+
+    clock.now += 10
+    limiter.admit(tool)  # the probe
+    assert limiter.state("t")["circuit"] == HALF_OPEN
+    with pytest.raises(CircuitOpen):
+        limiter.admit(tool)  # only one probe at a time
+    limiter.record(tool, ok=True)
+    assert limiter.state("t") == {"circuit": CLOSED, "failures": 0, "tokens": pytest.approx(598, abs=1)}
+    limiter.admit(tool)
+
+
+def test_failed_probe_reopens_for_another_cooldown():
+    clock = FakeClock()
+    limiter = _limiter(clock)
+    tool = _tool(circuit_breaker_threshold=1, circuit_cooldown_s=10)
+    limiter.admit(tool)
+    limiter.record(tool, ok=False)
+    clock.now += 10
+    limiter.admit(tool)
+    limiter.record(tool, ok=False)
+    assert limiter.state("t")["circuit"] == OPEN
+    clock.now += 9
+    with pytest.raises(CircuitOpen):
+        limiter.admit(tool)
+    clock.now += 1
+    limiter.admit(tool)
+
+
+def test_abandoned_probe_is_replaced_after_cooldown():
+    clock = FakeClock()
+    limiter = _limiter(clock)
+    tool = _tool(circuit_breaker_threshold=1, circuit_cooldown_s=5)
+    limiter.admit(tool)
+    limiter.record(tool, ok=False)
+    clock.now += 5
+    limiter.admit(tool)  # probe that never reports back
+    with pytest.raises(CircuitOpen):
+        limiter.admit(tool)
+    clock.now += 5
+    limiter.admit(tool)
+
+
+def test_refused_calls_do_not_count_as_failures(tmp_project):
+    from gabbe.context import RunContext
+    from gabbe.gateway import PolicyDenied
+    from gabbe.policy import PolicyEngine, ToolAllowlistPolicy
+
+    deny = PolicyEngine([ToolAllowlistPolicy([], ["t"])])
+    with RunContext.from_config(command="limits", policy=deny) as ctx:
+        ctx.gateway.register(_tool(circuit_breaker_threshold=1))
+        for _ in range(3):
+            with pytest.raises(PolicyDenied):
+                ctx.gateway.execute("t", {}, "r", ctx)
+        assert ctx.gateway.circuit_state("t")["circuit"] == CLOSED
+
+
+def test_sqlite_store_shares_state_between_gateways(tmp_path):
+    path = tmp_path / "limits.db"
+    first, second = ToolGateway(SQLiteLimitStore(path)), ToolGateway(SQLiteLimitStore(path))
+    tool = _tool(rate_limit_per_min=2, circuit_breaker_threshold=1)
+    first.register(tool)
+    second.register(tool)
+    first.limiter.admit(tool)
+    second.limiter.admit(tool)
+    with pytest.raises(RateLimitExceeded):
+        first.limiter.admit(tool)
+    second.limiter.record(tool, ok=False)
+    assert first.circuit_state("t")["circuit"] == OPEN
+
+
+def _take_tokens(path, n, out):
+    limiter = ToolLimiter(SQLiteLimitStore(path))
+    tool = _tool(rate_limit_per_min=1, rate_limit_burst=50)
+    taken = 0
+    for _ in range(n):
+        try:
+            limiter.admit(tool)
+            taken += 1
+        except RateLimitExceeded:
+            pass
+    out.put(taken)
+
+
+def test_sqlite_store_enforces_one_limit_across_processes(tmp_path):
+    path = str(tmp_path / "limits.db")
+    ctx = multiprocessing.get_context("spawn")
+    out = ctx.Queue()
+    workers = [ctx.Process(target=_take_tokens, args=(path, 40, out)) for _ in range(3)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join(timeout=60)
+    assert sum(out.get(timeout=5) for _ in workers) == 50
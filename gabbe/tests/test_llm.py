@@ -1,4 +1,5 @@
 """Unit tests for gabbe.llm."""
+import json
 import pytest
 from unittest.mock import patch, MagicMock
 
@@ -21,7 +22,7 @@ def test_call_llm_returns_content_on_success():
     mock_response.raise_for_status = MagicMock()
 
     with patch("gabbe.llm.GABBE_API_KEY", "test-key"), \
-         patch("gabbe.llm.requests.post", return_value=mock_response):
+         patch("gabbe.llm._post", return_value=mock_response):
         result = llm_mod.call_llm("prompt")
 
     assert result == "Hello world"
@@ -32,7 +33,7 @@ def test_call_llm_returns_none_on_request_exception():
     import requests
 
     with patch("gabbe.llm.GABBE_API_KEY", "test-key"), \
-         patch("gabbe.llm.requests.post", side_effect=requests.exceptions.ConnectionError("fail")):
+         patch("gabbe.llm._post", side_effect=requests.exceptions.ConnectionError("fail")):
         result = llm_mod.call_llm("prompt")
 
     assert result is None
@@ -46,7 +47,7 @@ def test_call_llm_returns_none_on_empty_choices():
     mock_response.raise_for_status = MagicMock()
 
     with patch("gabbe.llm.GABBE_API_KEY", "test-key"), \
-         patch("gabbe.llm.requests.post", return_value=mock_response):
+         patch("gabbe.llm._post", return_value=mock_response):
         result = llm_mod.call_llm("prompt")
 
     assert result is None
@@ -60,7 +61,7 @@ def test_call_llm_returns_none_on_missing_choices_key():
     mock_response.raise_for_status = MagicMock()
 
     with patch("gabbe.llm.GABBE_API_KEY", "test-key"), \
-         patch("gabbe.llm.requests.post", return_value=mock_response):
+         patch("gabbe.llm._post", return_value=mock_response):
         result = llm_mod.call_llm("prompt")
 
     assert result is None
@@ -81,7 +82,286 @@ def test_call_llm_passes_custom_temperature():
         return mock_response
 
     with patch("gabbe.llm.GABBE_API_KEY", "test-key"), \
-         patch("gabbe.llm.requests.post", fake_post):
+         patch("gabbe.llm._post", fake_post):
         llm_mod.call_llm("prompt", temperature=0.1)
 
     assert captured["payload"]["temperature"] == pytest.approx(0.1)
+
+
+class _StubHandler:
+    """Minimal OpenAI-compatible chat endpoint served over HTTP/1.1 keep-alive."""
+
+    @staticmethod
+    def server():
+        import json
+        import threading
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                body = json.dumps({
+                    "choices": [{"message": {"content": "pong"}}],
+                    "usage": {"prompt_tokens": 3, "completion_tokens": 1, "total_tokens": 4},
+                }).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        return httpd
+
+
+@pytest.fixture
+def stub_api():
+    import gabbe.llm as llm_mod
+    httpd = _StubHandler.server()
+    url = f"http://127.0.0.1:{httpd.server_address[1]}/v1/chat/completions"
+    llm_mod.close_session()
+    with patch("gabbe.llm.GABBE_API_KEY", "test-key"), patch("gabbe.llm.GABBE_API_URL", url):
+        yield url
+    llm_mod.close_session()
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_session_is_shared_and_reset_after_fork():
+    import gabbe.llm as llm_mod
+    llm_mod.close_session()
+    first = llm_mod._get_session()
+    assert llm_mod._get_session() is first
+
+    llm_mod._reset_after_fork()
+    assert llm_mod._get_session() is not first
+    llm_mod.close_session()
+
+
+def test_pooled_session_reuses_connection(stub_api):
+    import gabbe.llm as llm_mod
+    first, second = {}, {}
+    assert llm_mod._call_with_retry("ping", "sys", 0, 5, metrics=first)[0] == "pong"
+    assert llm_mod._call_with_retry("ping", "sys", 0, 5, metrics=second)[0] == "pong"
+
+    assert first["reused"] is False and first["connect_ms"] > 0
+    assert second["reused"] is True and second["connect_ms"] == 0
+    for m in (first, second):
+        assert m["attempts"] == 1
+        assert 0 <= m["ttfb_ms"] <= m["total_ms"]
+
+
+def test_call_llm_records_latency_span(tmp_project, stub_api):
+    import gabbe.llm as llm_mod
+    from gabbe.context import RunContext
+
+    with RunContext(command="test") as ctx:
+        content, usage = llm_mod.call_llm_with_usage("ping", run_context=ctx)
+        trace = ctx.tracer.get_run_trace(ctx.run_id)
+
+    assert content == "pong" and usage["total_tokens"] == 4
+    assert len(trace) == 1
+    span = trace[0]
+    assert span["event_type"] == "llm_call"
+    assert span["prompt_tokens"] == 3 and span["completion_tokens"] == 1
+    latency = json.loads(span["metadata"])["latency"]
+    assert set(latency) >= {"connect_ms", "ttfb_ms", "total_ms", "reused", "attempts"}
+
+
+def _sse_response(deltas, usage=None):
+    lines = [b": keep-alive", b""]
+    for d in deltas:
+        lines.append(b"data: " + json.dumps({"choices": [{"delta": {"content": d}}]}).encode())
+        lines.append(b"")
+    if usage:
+        lines.append(b"data: " + json.dumps({"choices": [], "usage": usage}).encode())
+    lines.append(b"data: [DONE]")
+    response = MagicMock()
+    response.iter_lines.return_value = iter(lines)
+    return response
+
+
+def test_call_llm_stream_yields_deltas_and_reports_stats():
+    import gabbe.llm as llm_mod
+    response = _sse_response(["Hel", "lo", " world"], usage={"prompt_tokens": 4, "completion_tokens": 3, "total_tokens": 7})
+    stats = {}
+    with patch("gabbe.llm.GABBE_API_KEY", "test-key"), \
+         patch("gabbe.llm._post", return_value=response) as post:
+        assert list(llm_mod.call_llm_stream("prompt", stats=stats)) == ["Hel", "lo", " world"]
+
+    payload = post.call_args.kwargs["json"]
+    assert payload["stream"] is True and payload["stream_options"] == {"include_usage": True}
+    assert post.call_args.kwargs["stream"] is True
+    assert stats["usage"]["total_tokens"] == 7
+    assert stats["chunks"] == 3 and stats["ttft_ms"] is not None
+    response.close.assert_called_once()
+
+
+def test_call_llm_stream_records_span_and_budget(tmp_project):
+    import gabbe.llm as llm_mod
+    from gabbe.context import RunContext
+    response = _sse_response(["a", "b"], usage={"prompt_tokens": 5, "completion_tokens": 2, "total_tokens": 7})
+    with patch("gabbe.llm.GABBE_API_KEY", "test-key"), \
+         patch("gabbe.llm._post", return_value=response), \
+         RunContext(command="stream-test") as ctx:
+        assert "".join(llm_mod.call_llm_stream("prompt", run_context=ctx)) == "ab"
+        span = ctx.tracer.get_run_trace(ctx.run_id)[0]
+
+    assert ctx.budget.tokens_used == 7
+    assert span["status"] == "ok" and span["completion_tokens"] == 2
+    meta = json.loads(span["metadata"])
+    assert meta["stream"] is True and meta["chunks"] == 2
+    assert "ttft_ms" in meta and "tokens_per_sec" in meta
+
+
+def test_call_llm_stream_cancels_when_budget_trips(tmp_project):
+    import gabbe.llm as llm_mod
+    from gabbe.budget import Budget, BudgetExceeded
+    from gabbe.context import RunContext
+    response = _sse_response(["t"] * 10)
+    received = []
+    # Pre-flight would refuse this prompt outright; this test is about mid-stream cancellation.
+    with patch("gabbe.llm.GABBE_API_KEY", "test-key"), \
+         patch("gabbe.llm.LLM_PREFLIGHT", False), \
+         patch("gabbe.llm._post", return_value=response), \
+         RunContext(command="stream-cancel", budget=Budget(max_tokens=3)) as ctx:
+        with pytest.raises(BudgetExceeded):
+            for delta in llm_mod.call_llm_stream("prompt", run_context=ctx):
+                received.append(delta)
+        span = ctx.tracer.get_run_trace(ctx.run_id)[0]
+
+    assert len(received) == 3
+    response.close.assert_called_once()
+    assert span["status"] == "cancelled"
+    assert json.loads(span["metadata"])["usage_estimated"] is True
+
+
+def test_call_llm_stream_projection_counts_prompt_tokens(tmp_project):
+    import gabbe.llm as llm_mod
+    from gabbe.budget import Budget, BudgetExceeded
+    from gabbe.context import RunContext
+    response = _sse_response(["t"] * 10)
+    received = []
+    with patch("gabbe.llm.GABBE_API_KEY", "test-key"), \
+         patch("gabbe.llm.estimate_prompt_tokens", return_value=5), \
+         patch("gabbe.llm.LLM_MIN_COMPLETION_TOKENS", 1), \
+         patch("gabbe.llm._post", return_value=response), \
+         RunContext(command="stream-prompt", budget=Budget(max_tokens=8)) as ctx:
+        with pytest.raises(BudgetExceeded):
+            for delta in llm_mod.call_llm_stream("prompt", run_context=ctx):
+                received.append(delta)
+
+    # 5 prompt tokens + 3 deltas fill the budget; the 4th delta trips it.
+    assert len(received) == 3
+
+
+def test_call_llm_stream_ends_span_on_unexpected_error(tmp_project):
+    import gabbe.llm as llm_mod
+    from gabbe.context import RunContext
+    with patch("gabbe.llm.GABBE_API_KEY", "test-key"), \
+         patch("gabbe.llm._send_with_retry", side_effect=KeyboardInterrupt), \
+         RunContext(command="stream-interrupt") as ctx:
+        with pytest.raises(KeyboardInterrupt):
+            list(llm_mod.call_llm_stream("prompt", run_context=ctx))
+        span = ctx.tracer.get_run_trace(ctx.run_id)[0]
+    assert span["status"] == "error"
+
+
+def test_call_llm_stream_cancels_on_hard_stop_timeout(tmp_project):
+    import gabbe.llm as llm_mod
+    from gabbe.context import RunContext
+    from gabbe.hardstop import HardStop, TimeoutExceeded
+    response = _sse_response(["a", "b"])
+    with patch("gabbe.llm.GABBE_API_KEY", "test-key"), \
+         patch("gabbe.llm._post", return_value=response), \
+         RunContext(command="stream-timeout", hard_stop=HardStop(timeout_sec=-1)) as ctx:
+        with pytest.raises(TimeoutExceeded):
+            list(llm_mod.call_llm_stream("prompt", run_context=ctx))
+    response.close.assert_called_once()
+
+
+def test_call_llm_stream_closing_generator_closes_response():
+    import gabbe.llm as llm_mod
+    response = _sse_response(["a", "b", "c"])
+    stats = {}
+    with patch("gabbe.llm.GABBE_API_KEY", "test-key"), \
+         patch("gabbe.llm._post", return_value=response):
+        stream = llm_mod.call_llm_stream("prompt", stats=stats)
+        assert next(stream) == "a"
+        stream.close()
+    response.close.assert_called_once()
+    assert stats["cancelled"] == "closed by consumer"
+
+
+def _echo_post(delay=0.0, tracker=None):
+    """Fake transport echoing the prompt back; tracks peak concurrency."""
+    import threading
+    import time as _time
+    lock = threading.Lock()
+
+    def fake_post(url, headers, json, timeout):
+        if tracker is not None:
+            with lock:
+                tracker["active"] += 1
+                tracker["peak"] = max(tracker["peak"], tracker["active"])
+        _time.sleep(delay)
+        if tracker is not None:
+            with lock:
+                tracker["active"] -= 1
+        response = MagicMock()
+        response.json.return_value = {
+            "choices": [{"message": {"content": "echo:" + json["messages"][1]["content"]}}],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+        }
+        return response
+    return fake_post
+
+
+def test_acall_llm_returns_content():
+    import asyncio
+    import gabbe.llm as llm_mod
+    with patch("gabbe.llm.GABBE_API_KEY", "test-key"), patch("gabbe.llm._post", _echo_post()):
+        content, usage = asyncio.run(llm_mod.acall_llm_with_usage("hi"))
+    assert content == "echo:hi"
+    assert usage["total_tokens"] == 2
+
+
+def test_acall_llm_raises_without_api_key():
+    import asyncio
+    import gabbe.llm as llm_mod
+    with patch("gabbe.llm.GABBE_API_KEY", None):
+        with pytest.raises(EnvironmentError):
+            asyncio.run(llm_mod.acall_llm("hi"))
+
+
+def test_call_llm_batch_preserves_order_and_bounds_concurrency():
+    import gabbe.llm as llm_mod
+    tracker = {"active": 0, "peak": 0}
+    prompts = [f"p{i}" for i in range(12)]
+    with patch("gabbe.llm.GABBE_API_KEY", "test-key"), \
+         patch("gabbe.llm.LLM_MAX_CONCURRENCY", 3), \
+         patch("gabbe.llm._executor", None), \
+         patch("gabbe.llm._post", _echo_post(delay=0.02, tracker=tracker)):
+        results = llm_mod.call_llm_batch(prompts)
+    assert results == [f"echo:{p}" for p in prompts]
+    assert 1 < tracker["peak"] <= 3
+
+
+def test_call_llm_batch_traces_each_call(tmp_project):
+    import gabbe.llm as llm_mod
+    from gabbe.context import RunContext
+    with patch("gabbe.llm.GABBE_API_KEY", "test-key"), \
+         patch("gabbe.llm._post", _echo_post()), \
+         RunContext(command="batch") as ctx:
+        results = llm_mod.call_llm_batch(["a", "b", "c"], run_context=ctx, with_usage=True)
+        spans = ctx.tracer.get_run_trace(ctx.run_id)
+    assert [r[0] for r in results] == ["echo:a", "echo:b", "echo:c"]
+    assert len(spans) == 3 and all(s["event_type"] == "llm_call" for s in spans)
+    assert ctx.budget.tokens_used == 6
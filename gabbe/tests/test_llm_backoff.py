@@ -2,13 +2,15 @@
 import requests
 from unittest.mock import MagicMock, patch
 from gabbe.llm import call_llm
+from gabbe.retry import RetryPolicy
 
 @patch("gabbe.llm.time.sleep")
-@patch("gabbe.llm.requests.post")
+@patch("gabbe.llm._post")
 @patch("gabbe.llm.GABBE_API_KEY", "fake-key") 
+@patch("gabbe.llm._retry_policy", RetryPolicy(max_attempts=3, base_delay=1, jitter="none"))
 def test_llm_exponential_backoff_429(mock_post, mock_sleep):
     """
-    Test that call_llm retries on 429 using exponential backoff.
+    Test that call_llm retries on 429 using exponential backoff (jitter disabled).
     """
     # Setup mock response for 429 then success
     mock_response_429 = MagicMock()
@@ -41,7 +43,7 @@ def test_llm_exponential_backoff_429(mock_post, mock_sleep):
     assert actual_calls == expected_calls
 
 @patch("gabbe.llm.time.sleep")
-@patch("gabbe.llm.requests.post")
+@patch("gabbe.llm._post")
 @patch("gabbe.llm.GABBE_API_KEY", "fake-key") 
 def test_llm_sanitizes_errors(mock_post, mock_sleep, capsys):
     """
@@ -65,7 +67,7 @@ def test_llm_sanitizes_errors(mock_post, mock_sleep, capsys):
     assert "Sensitive: API Key Invalid" not in captured.out
 
 @patch("gabbe.llm.time.sleep")
-@patch("gabbe.llm.requests.post")
+@patch("gabbe.llm._post")
 @patch("gabbe.llm.GABBE_API_KEY", "fake-key") 
 def test_llm_auth_error_no_retry(mock_post, mock_sleep):
     """
@@ -0,0 +1,129 @@
+"""Unit tests for gabbe.llm_cache."""
+from unittest.mock import patch, MagicMock
+
+from gabbe.llm_cache import LLMCache, make_key
+
+
+def _usage(total=10):
+    return {"prompt_tokens": total - 2, "completion_tokens": 2, "total_tokens": total}
+
+
+def test_make_key_is_stable_and_distinguishes_inputs():
+    key = make_key("m", "sys", "hello", 0)
+    assert key == make_key("m", "sys", "hello", 0.0)
+    assert key != make_key("m", "sys", "hello", 0.5)
+    assert key != make_key("other", "sys", "hello", 0)
+    assert key != make_key("m", "sys2", "hello", 0)
+
+
+def test_memory_hit_after_put(tmp_project):
+    cache = LLMCache(enabled=True)
+    key = make_key("m", "s", "p", 0)
+    assert cache.get(key) is None
+    cache.put(key, "m", "answer", _usage())
+    assert cache.get(key) == ("answer", _usage())
+
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["memory_hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["tokens_saved"] == 10
+
+
+def test_disk_tier_survives_new_process_cache(tmp_project):
+    key = make_key("m", "s", "p", 0)
+    LLMCache(enabled=True).put(key, "m", "persisted", _usage())
+
+    fresh = LLMCache(enabled=True)
+    assert fresh.get(key) == ("persisted", _usage())
+    assert fresh.stats()["disk_hits"] == 1
+    # Promoted into memory for the next lookup.
+    fresh.get(key)
+    assert fresh.stats()["memory_hits"] == 1
+
+
+def test_expired_entries_are_misses(tmp_project):
+    cache = LLMCache(enabled=True, ttl=60)
+    key = make_key("m", "s", "p", 0)
+    with patch("gabbe.llm_cache.time.time", return_value=1000.0):
+        cache.put(key, "m", "old", _usage())
+    with patch("gabbe.llm_cache.time.time", return_value=1061.0):
+        assert cache.get(key) is None
+        assert LLMCache(enabled=True).get(key) is None
+
+
+def test_disk_tier_evicts_least_recently_used(tmp_project, db_conn):
+    cache = LLMCache(enabled=True, memory_entries=0, max_entries=2)
+    keys = [make_key("m", "s", f"p{i}", 0) for i in range(3)]
+    with patch("gabbe.llm_cache.time.time", side_effect=[1.0, 2.0, 3.0, 4.0]):
+        cache.put(keys[0], "m", "a", _usage())
+        cache.put(keys[1], "m", "b", _usage())
+        cache.get(keys[0])  # touch: keys[1] is now least recently used
+        cache.put(keys[2], "m", "c", _usage())
+
+    remaining = {r["key"] for r in db_conn.execute("SELECT key FROM llm_cache")}
+    assert remaining == {keys[0], keys[2]}
+    assert cache.stats()["evictions"] == 1
+
+
+def test_memory_tier_is_bounded(tmp_project):
+    cache = LLMCache(enabled=True, memory_entries=2)
+    for i in range(3):
+        cache.put(make_key("m", "s", f"p{i}", 0), "m", str(i), _usage())
+    assert cache.stats()["memory_entries"] == 2
+
+
+def test_accepts_bypasses_sampled_and_opted_out_calls():
+    cache = LLMCache(enabled=True, max_temperature=0.0)
+    assert cache.accepts(0.0)
+    assert not cache.accepts(0.7)
+    assert not cache.accepts(0.0, use_cache=False)
+    assert not LLMCache(enabled=False).accepts(0.0)
+    assert cache.stats()["bypassed"] == 1
+
+
+def _ok_response(content="cached answer"):
+    response = MagicMock()
+    response.json.return_value = {
+        "choices": [{"message": {"content": content}}],
+        "usage": _usage(),
+    }
+    return response
+
+
+def test_call_llm_serves_repeat_deterministic_calls_from_cache(tmp_project):
+    import gabbe.llm as llm_mod
+    with patch("gabbe.llm.GABBE_API_KEY", "k"), \
+         patch("gabbe.llm._post", return_value=_ok_response()) as post:
+        assert llm_mod.call_llm("same", temperature=0) == "cached answer"
+        assert llm_mod.call_llm("same", temperature=0) == "cached answer"
+        assert post.call_count == 1
+
+        llm_mod.call_llm("same", temperature=0, use_cache=False)
+        llm_mod.call_llm("same", temperature=0.7)
+        assert post.call_count == 3
+
+
+def test_cache_hit_costs_nothing_and_is_traced(tmp_project):
+    import json
+    import gabbe.llm as llm_mod
+    from gabbe.context import RunContext
+
+    with patch("gabbe.llm.GABBE_API_KEY", "k"), \
+         patch("gabbe.llm._post", return_value=_ok_response()), \
+         RunContext(command="cache-test") as ctx:
+        ctx.budget._cached_prices[llm_mod.GABBE_API_MODEL] = {
+            "input": 0.01, "output": 0.02, "reasoning": 0.0,
+            "cache_creation": 0.0, "cache_read": 0.0,
+        }
+        llm_mod.call_llm("same", temperature=0, run_context=ctx)
+        cost_after_miss = ctx.budget.cost_usd
+        llm_mod.call_llm("same", temperature=0, run_context=ctx)
+        spans = ctx.tracer.get_run_trace(ctx.run_id)
+
+    assert cost_after_miss > 0
+    assert ctx.budget.cost_usd == cost_after_miss
+    assert ctx.budget.tokens_used == 10
+    assert ctx.budget.cache_hits == 1
+    assert ctx.budget.cache_savings_usd == cost_after_miss
+    assert [json.loads(s["metadata"])["cache_hit"] for s in spans] == [False, True]
+    assert spans[1]["cost_usd"] == 0
@@ -0,0 +1,144 @@
+"""Tests for single-flight coalescing of identical in-flight LLM calls."""
+import asyncio
+import json
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+import gabbe.llm as llm_mod
+
+
+def _slow_post(counter, delay=0.3, content="shared"):
+    lock = threading.Lock()
+
+    def post(url, **kwargs):
+        with lock:
+            counter.append(kwargs["json"]["messages"][1]["content"])
+        time.sleep(delay)
+        response = MagicMock()
+        response.json.return_value = {
+            "choices": [{"message": {"content": content}}],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15},
+        }
+        return response
+
+    return post
+
+
+def _run_threads(target, n):
+    results = [None] * n
+    threads = [
+        threading.Thread(target=lambda i=i: results.__setitem__(i, target()))
+        for i in range(n)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+@pytest.fixture
+def api_key():
+    with patch("gabbe.llm.GABBE_API_KEY", "test-key"):
+        yield
+
+
+def test_concurrent_identical_calls_share_one_request(api_key):
+    sent = []
+    with patch("gabbe.llm._post", side_effect=_slow_post(sent)):
+        results = _run_threads(lambda: llm_mod.call_llm("score me", temperature=0, use_cache=False), 5)
+    assert results == ["shared"] * 5
+    assert len(sent) == 1
+
+
+def test_sampled_calls_are_not_coalesced(api_key):
+    sent = []
+    with patch("gabbe.llm._post", side_effect=_slow_post(sent, delay=0.1)):
+        _run_threads(lambda: llm_mod.call_llm("write a poem", temperature=0.9), 3)
+    assert len(sent) == 3
+
+
+def test_whitespace_normalization_is_opt_in(api_key):
+    sent = []
+    prompts = iter(["fix  the bug", "fix the bug\n"])
+    lock = threading.Lock()
+
+    def call():
+        with lock:
+            prompt = next(prompts)
+        return llm_mod.call_llm(prompt, temperature=0, use_cache=False)
+
+    with patch("gabbe.llm._post", side_effect=_slow_post(sent)):
+        _run_threads(call, 2)
+    assert len(sent) == 2
+
+    sent.clear()
+    prompts = iter(["fix  the bug", "fix the bug\n"])
+    with patch("gabbe.llm.LLM_COALESCE_WHITESPACE", True), \
+         patch("gabbe.llm._post", side_effect=_slow_post(sent)):
+        _run_threads(call, 2)
+    assert len(sent) == 1
+
+
+def test_leader_error_reaches_followers(api_key):
+    def post(url, **kwargs):
+        time.sleep(0.2)
+        raise RuntimeError("boom")
+
+    errors = []
+
+    def call():
+        try:
+            llm_mod.call_llm("same", temperature=0, use_cache=False)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    with patch("gabbe.llm._post", side_effect=post) as mock_post:
+        _run_threads(call, 3)
+    assert errors == ["boom"] * 3
+    assert mock_post.call_count == 1
+    assert llm_mod.get_coalesce_stats()["in_flight"] == 0
+
+
+def test_followers_get_coalesced_spans_and_no_charge(tmp_project, api_key):
+    from gabbe.context import RunContext
+
+    sent = []
+    with patch("gabbe.llm._post", side_effect=_slow_post(sent)):
+        def call():
+            with RunContext(command="test") as ctx:
+                _, usage = llm_mod.call_llm_with_usage(
+                    "score me", temperature=0, use_cache=False, run_context=ctx
+                )
+                span = ctx.tracer.get_run_trace(ctx.run_id)[0]
+                return usage, span, ctx.budget.tokens_used
+        results = _run_threads(call, 3)
+
+    assert len(sent) == 1
+    assert all(usage["total_tokens"] == 15 for usage, _, _ in results)
+    spans = [span for _, span, _ in results]
+    meta = [json.loads(span["metadata"] or "{}") for span in spans]
+    leaders = [s for s, m in zip(spans, meta) if not m.get("coalesced")]
+    followers = [m for m in meta if m.get("coalesced")]
+    assert len(leaders) == 1 and len(followers) == 2
+    assert all(m["coalesced_with"] == leaders[0]["span_id"] for m in followers)
+    assert sorted(tokens for _, _, tokens in results) == [0, 0, 15]
+
+
+def test_async_calls_coalesce_and_survive_leader_cancel(api_key):
+    sent = []
+
+    async def scenario():
+        leader = asyncio.ensure_future(llm_mod.acall_llm("x", temperature=0, use_cache=False))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(llm_mod.acall_llm("x", temperature=0, use_cache=False))
+        await asyncio.sleep(0.05)
+        leader.cancel()
+        return await follower
+
+    with patch("gabbe.llm._post", side_effect=_slow_post(sent, delay=0.2)):
+        assert asyncio.run(scenario()) == "shared"
+    assert len(sent) == 1
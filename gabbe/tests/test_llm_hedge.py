@@ -0,0 +1,133 @@
+"""Tests for hedged LLM requests and the per-model latency windows."""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch, MagicMock
+
+import pytest
+
+from gabbe.latency import LatencyWindow, get_latency_window, reset_latency_windows
+
+
+def test_latency_window_percentiles_and_rolling():
+    window = LatencyWindow(size=100)
+    assert window.percentile(50) is None
+    for ms in range(1, 101):
+        window.observe(float(ms))
+    assert window.percentile(50) == 50
+    assert window.percentile(99) == 99
+    window.observe(1000.0)  # evicts the oldest sample (1ms)
+    assert len(window) == 100
+    assert window.percentile(100) == 1000.0
+
+
+@pytest.fixture
+def slow_first_server():
+    """Stub API whose first request stalls; later requests answer at once."""
+    state = {"requests": 0}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            with lock:
+                state["requests"] += 1
+                first = state["requests"] == 1
+            if first:
+                time.sleep(1.5)
+            body = json.dumps({
+                "choices": [{"message": {"content": "slow" if first else "fast"}}],
+                "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15},
+            }).encode()
+            try:
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            except OSError:
+                pass  # client aborted the losing leg
+
+        def log_message(self, *args):
+            pass
+
+    import gabbe.llm as llm_mod
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{httpd.server_address[1]}/v1/chat/completions"
+    llm_mod.close_session()
+    reset_latency_windows()
+    with patch("gabbe.llm.GABBE_API_KEY", "test-key"), \
+         patch("gabbe.llm.GABBE_API_URL", url), \
+         patch("gabbe.llm.LLM_HEDGE_ENABLED", True):
+        yield state
+    llm_mod.close_session()
+    reset_latency_windows()
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _seed_history(ms=20.0, count=30):
+    import gabbe.llm as llm_mod
+    window = get_latency_window(llm_mod.GABBE_API_MODEL)
+    for _ in range(count):
+        window.observe(ms)
+
+
+def test_hedge_fires_after_percentile_and_bills_loser(tmp_project, slow_first_server):
+    import gabbe.llm as llm_mod
+    from gabbe.context import RunContext
+    _seed_history()
+
+    with RunContext(command="hedge") as ctx:
+        start = time.perf_counter()
+        content = llm_mod.call_llm("p", run_context=ctx, use_cache=False)
+        elapsed = time.perf_counter() - start
+        spans = {s["event_type"]: s for s in ctx.tracer.get_run_trace(ctx.run_id)}
+
+    assert content == "fast"
+    assert elapsed < 1.0
+    assert slow_first_server["requests"] == 2
+
+    call_meta = json.loads(spans["llm_call"]["metadata"])
+    assert call_meta["hedge"]["winner"] == "hedge"
+    loser = spans["llm_hedge"]
+    assert loser["parent_span_id"] == spans["llm_call"]["span_id"]
+    assert loser["status"] == "cancelled"
+    assert json.loads(loser["metadata"])["usage_estimated"] is True
+    # Winner's full usage plus the aborted leg's prompt tokens.
+    assert ctx.budget.tokens_used == 15 + 10
+    assert llm_mod.get_hedge_stats()["won_by_hedge"] >= 1
+
+
+def test_no_hedge_without_latency_history():
+    import gabbe.llm as llm_mod
+    reset_latency_windows()
+    response = MagicMock()
+    response.json.return_value = {"choices": [{"message": {"content": "ok"}}]}
+    with patch("gabbe.llm.GABBE_API_KEY", "test-key"), \
+         patch("gabbe.llm.LLM_HEDGE_ENABLED", True), \
+         patch("gabbe.llm._post", return_value=response) as post:
+        assert llm_mod.call_llm("p", use_cache=False) == "ok"
+    assert post.call_count == 1
+    reset_latency_windows()
+
+
+def test_fast_primary_is_not_hedged():
+    import gabbe.llm as llm_mod
+    reset_latency_windows()
+    _seed_history(ms=500.0)
+    response = MagicMock()
+    response.json.return_value = {"choices": [{"message": {"content": "ok"}}]}
+    with patch("gabbe.llm.GABBE_API_KEY", "test-key"), \
+         patch("gabbe.llm.LLM_HEDGE_ENABLED", True), \
+         patch("gabbe.llm._post", return_value=response) as post:
+        content, _, hedge = llm_mod._hedged_call(("p", "s", 0, 5), {}, None)
+    assert content == "ok" and hedge is None
+    assert post.call_count == 1
+    reset_latency_windows()
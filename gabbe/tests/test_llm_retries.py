@@ -8,7 +8,7 @@ from gabbe.config import LLM_MAX_RETRIES as _LLM_MAX_RETRIES
 def mock_env(monkeypatch):
     monkeypatch.setenv("GABBE_API_KEY", "test-key")
 
-@patch("gabbe.llm.requests.post")
+@patch("gabbe.llm._post")
 @patch("gabbe.llm.time.sleep")
 @patch("gabbe.llm.GABBE_API_KEY", "test-key")
 def test_call_llm_success_first_try(mock_sleep, mock_post):
@@ -21,7 +21,7 @@ def test_call_llm_success_first_try(mock_sleep, mock_post):
     assert mock_post.call_count == 1
     mock_sleep.assert_not_called()
 
-@patch("gabbe.llm.requests.post")
+@patch("gabbe.llm._post")
 @patch("gabbe.llm.time.sleep")
 @patch("gabbe.llm.GABBE_API_KEY", "test-key")
 def test_call_llm_retries_on_connection_error(mock_sleep, mock_post):
@@ -40,7 +40,7 @@ def test_call_llm_retries_on_connection_error(mock_sleep, mock_post):
     assert mock_post.call_count == 3
     assert mock_sleep.call_count == 2
 
-@patch("gabbe.llm.requests.post")
+@patch("gabbe.llm._post")
 @patch("gabbe.llm.time.sleep")
 @patch("gabbe.llm.GABBE_API_KEY", "test-key")
 def test_call_llm_exhausts_retries(mock_sleep, mock_post):
@@ -51,7 +51,7 @@ def test_call_llm_exhausts_retries(mock_sleep, mock_post):
     assert mock_post.call_count == _LLM_MAX_RETRIES
     assert mock_sleep.call_count == _LLM_MAX_RETRIES - 1 # Sleeps after 1st and 2nd attempt, not after last
 
-@patch("gabbe.llm.requests.post")
+@patch("gabbe.llm._post")
 @patch("gabbe.llm.time.sleep")
 @patch("gabbe.llm.GABBE_API_KEY", "test-key")
 def test_call_llm_no_retry_on_400(mock_sleep, mock_post):
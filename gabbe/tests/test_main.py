@@ -63,6 +63,20 @@ def test_db_no_flag_prints_help(tmp_project, capsys):
     assert "--init" in captured.out
 
 
+def test_db_rebuild_stats_reports_drift(tmp_project, capsys):
+    from gabbe.main import main
+    from gabbe.database import db_connection
+    with db_connection() as conn:
+        conn.execute("INSERT INTO tasks (title, status) VALUES ('A', 'DONE')")
+        conn.execute("UPDATE task_status_counts SET task_count = 7 WHERE status = 'DONE'")
+    with patch("sys.argv", ["gabbe", "db", "--rebuild-stats"]):
+        main()
+    assert "tasks[DONE]: stored 7, actual 1" in capsys.readouterr().out
+    with patch("sys.argv", ["gabbe", "db", "--rebuild-stats"]):
+        main()
+    assert "match tasks and runs" in capsys.readouterr().out
+
+
 # ---------------------------------------------------------------------------
 # sync command
 # ---------------------------------------------------------------------------
@@ -1,7 +1,10 @@
 """Tests for gabbe.mcp_server."""
 
 import json
+import os
 import shlex
+import signal
+import sys
 import pytest
 from unittest.mock import patch, MagicMock
 
@@ -11,16 +14,12 @@ from unittest.mock import patch, MagicMock
 # ---------------------------------------------------------------------------
 
 def test_run_command_handler_uses_shell_false(tmp_project):
-    """run_command_handler must call subprocess.run with shell=False (no injection)."""
+    """run_command_handler must start the process with shell=False (no injection)."""
     import subprocess
     from gabbe.mcp_server import run_command_handler
 
-    mock_result = MagicMock()
-    mock_result.stdout = "hello\n"
-    mock_result.stderr = ""
-    mock_result.returncode = 0
-
-    with patch("gabbe.mcp_server.subprocess.run", return_value=mock_result) as mock_run:
+    # wraps=: the real (harmless) process runs, the call is still recorded.
+    with patch("gabbe.mcp_server.subprocess.Popen", wraps=subprocess.Popen) as mock_run:
         run_command_handler("echo hello")
         args, kwargs = mock_run.call_args
         # First positional arg must be a list (shlex.split result), not a string
@@ -32,15 +31,10 @@ def test_run_command_handler_returns_dict(tmp_project):
     """run_command_handler returns stdout, stderr, returncode dict."""
     from gabbe.mcp_server import run_command_handler
 
-    mock_result = MagicMock()
-    mock_result.stdout = "output"
-    mock_result.stderr = ""
-    mock_result.returncode = 0
-
-    with patch("gabbe.mcp_server.subprocess.run", return_value=mock_result):
-        result = run_command_handler("echo output")
+    result = run_command_handler("echo output")
 
-    assert result["stdout"] == "output"
+    assert result["stdout"] == "output\n"
+    assert result["stderr"] == ""
     assert result["returncode"] == 0
 
 
@@ -49,18 +43,16 @@ def test_run_command_handler_no_shell_injection(tmp_project):
 
     shlex.split('echo safe; rm -rf /tmp/evil') returns
     ['echo', 'safe;', 'rm', '-rf', '/tmp/evil'] — all tokens, no shell expansion.
-    subprocess.run is called with shell=False so ';' is never treated as a
-    command separator; the mock verifies the exact token list and shell flag.
+    subprocess.Popen is called with shell=False so ';' is never treated as a
+    command separator; the mock verifies the exact token list and shell flag,
+    and echo prints the "command" instead of anything running it.
     """
+    import subprocess
     from gabbe.mcp_server import run_command_handler
 
-    mock_result = MagicMock()
-    mock_result.stdout = ""
-    mock_result.stderr = ""
-    mock_result.returncode = 0
-
-    with patch("gabbe.mcp_server.subprocess.run", return_value=mock_result) as mock_run:
-        run_command_handler("echo safe; rm -rf /tmp/evil")
+    with patch("gabbe.mcp_server.subprocess.Popen", wraps=subprocess.Popen) as mock_run:
+        result = run_command_handler("echo safe; rm -rf /tmp/evil")
+        assert result["stdout"] == "safe; rm -rf /tmp/evil\n"
         args, kwargs = mock_run.call_args
         cmd_list = args[0]
 
@@ -221,3 +213,256 @@ def test_serve_malformed_json_returns_parse_error(tmp_project):
     responses = [json.loads(o) for o in outputs if o.strip()]
     assert len(responses) == 1
     assert responses[0]["error"]["code"] == -32700
+
+
+# ---------------------------------------------------------------------------
+# Concurrent dispatch, batches and cancellation
+# ---------------------------------------------------------------------------
+
+class _ScriptedStdin:
+    """stdin whose lines can wait for a condition before being read."""
+
+    def __init__(self, steps):
+        self.steps = list(steps)  # (line, wait_for or None)
+
+    def readline(self):
+        import time
+        if not self.steps:
+            return ""
+        line, wait_for = self.steps.pop(0)
+        deadline = time.monotonic() + 5
+        while wait_for is not None and not wait_for() and time.monotonic() < deadline:
+            time.sleep(0.005)
+        return line
+
+
+def _serve_script(steps, execute, **serve_kwargs):
+    from gabbe.mcp_server import serve
+
+    outputs = []
+    with patch("gabbe.mcp_server.RunContext") as MockCtx, \
+         patch("sys.stdin", _ScriptedStdin(steps)), \
+         patch("builtins.print", side_effect=lambda s, **kw: outputs.append(s)):
+        mock_ctx = MagicMock()
+        MockCtx.return_value.__enter__ = MagicMock(return_value=mock_ctx)
+        MockCtx.return_value.__exit__ = MagicMock(return_value=False)
+        mock_ctx.gateway.execute.side_effect = execute
+        serve(**serve_kwargs)
+    return [json.loads(o) for o in outputs if o.strip()], outputs
+
+
+def _call(req_id, command):
+    return _make_request("tools/call", {"name": "run_command", "arguments": {"command": command}}, req_id)
+
+
+def test_serve_answers_calls_out_of_order(tmp_project):
+    """A slow call does not hold up a later fast one; responses carry their ids."""
+    import time
+    written = []
+
+    def execute(name, args, **kw):
+        if args["command"] == "slow":
+            deadline = time.monotonic() + 5
+            while not any('"id": 2' in o for o in written) and time.monotonic() < deadline:
+                time.sleep(0.005)
+        return {"stdout": args["command"]}
+
+    from gabbe.mcp_server import serve
+    with patch("gabbe.mcp_server.RunContext") as MockCtx, \
+         patch("sys.stdin", _ScriptedStdin([(_call(1, "slow"), None), (_call(2, "fast"), None)])), \
+         patch("builtins.print", side_effect=lambda s, **kw: written.append(s)):
+        mock_ctx = MagicMock()
+        MockCtx.return_value.__enter__ = MagicMock(return_value=mock_ctx)
+        MockCtx.return_value.__exit__ = MagicMock(return_value=False)
+        mock_ctx.gateway.execute.side_effect = execute
+        serve()
+    assert [json.loads(o)["id"] for o in written] == [2, 1]
+
+
+def test_serve_limits_concurrent_calls(tmp_project):
+    import threading
+    import time
+    lock = threading.Lock()
+    state = {"now": 0, "peak": 0}
+
+    def execute(name, args, **kw):
+        with lock:
+            state["now"] += 1
+            state["peak"] = max(state["peak"], state["now"])
+        time.sleep(0.05)
+        with lock:
+            state["now"] -= 1
+        return {}
+
+    responses, _ = _serve_script([(_call(i, "x"), None) for i in range(6)], execute, max_concurrency=2)
+    assert sorted(r["id"] for r in responses) == list(range(6))
+    assert state["peak"] == 2
+
+
+def test_serve_batch_returns_one_array(tmp_project):
+    batch = json.dumps([
+        {"jsonrpc": "2.0", "id": 1, "method": "tools/list"},
+        {"jsonrpc": "2.0", "id": 2, "method": "tools/call",
+         "params": {"name": "run_command", "arguments": {"command": "echo"}}},
+        {"jsonrpc": "2.0", "method": "notifications/initialized"},
+        "not a request",
+    ]) + "\n"
+    _, raw = _serve_script([(batch, None)], lambda name, args, **kw: {"ok": True})
+    assert len(raw) == 1
+    replies = json.loads(raw[0])
+    assert isinstance(replies, list)
+    assert [r.get("id") for r in replies] == [1, 2, None]
+    assert json.loads(replies[1]["result"]["content"][0]["text"]) == {"ok": True}
+    assert replies[2]["error"]["code"] == -32600
+
+
+def test_serve_empty_and_notification_batches(tmp_project):
+    notifications = json.dumps([{"jsonrpc": "2.0", "method": "notifications/initialized"}]) + "\n"
+    responses, raw = _serve_script([("[]\n", None), (notifications, None)], lambda *a, **kw: {})
+    assert len(raw) == 1
+    assert responses[0]["error"]["code"] == -32600
+
+
+def test_serve_cancel_kills_running_command(tmp_project):
+    """notifications/cancelled kills the subprocess and suppresses the response."""
+    import time
+    from gabbe import mcp_server
+
+    cancel = json.dumps({"jsonrpc": "2.0", "method": "notifications/cancelled",
+                         "params": {"requestId": 7, "reason": "user"}}) + "\n"
+    results = []
+
+    def execute(name, args, **kw):
+        result = mcp_server.run_command_handler(args["command"])
+        results.append(result)
+        return result
+
+    started = time.monotonic()
+    with patch("gabbe.mcp_server._ALLOWED_COMMANDS", ["sleep", "echo"]):
+        responses, _ = _serve_script([
+            (_call(7, "sleep 30"), None),
+            (cancel, lambda: 7 in mcp_server._running),
+            (_call(8, "echo done"), None),
+        ], execute)
+    assert time.monotonic() - started < 10
+    assert [r["id"] for r in responses] == [8]
+    assert any(r["returncode"] != 0 for r in results)  # the sleep was killed
+    assert mcp_server._running == {} and mcp_server._cancelled == set()
+
+
+def test_serve_cancel_of_unknown_request_is_ignored(tmp_project):
+    from gabbe import mcp_server
+    cancel = json.dumps({"jsonrpc": "2.0", "method": "notifications/cancelled",
+                         "params": {"requestId": 99}}) + "\n"
+    responses, _ = _serve_script([(cancel, None), (_call(1, "x"), None)], lambda *a, **kw: {"x": 1})
+    assert [r["id"] for r in responses] == [1]
+    assert mcp_server._cancelled == set()
+
+
+# ---------------------------------------------------------------------------
+# Streaming run_command: truncation, timeouts, progress, audit
+# ---------------------------------------------------------------------------
+
+def test_run_streaming_keeps_head_and_tail():
+    import sys
+    from gabbe.mcp_server import _run_streaming
+
+    script = "import sys; sys.stdout.write('A' * 5000 + 'B' * 100000 + 'C' * 5000)"
+    seen = []
+    result = _run_streaming([sys.executable, "-c", script], max_bytes=2048,
+                            on_output=lambda progress, text: seen.append((progress, text)))
+    head, _, tail = result["stdout"].partition("\n... [")
+    assert head == "A" * 1024
+    assert tail.endswith("C" * 1024)
+    assert result["truncated_bytes"] == {"stdout": 110000 - 2048}
+    # Progress saw everything, in order, with a growing byte count.
+    assert "".join(text for _, text in seen) == "A" * 5000 + "B" * 100000 + "C" * 5000
+    assert [p for p, _ in seen] == sorted(p for p, _ in seen)
+    assert seen[-1][0] == 110000
+
+
+@pytest.mark.skipif(not hasattr(__import__("os"), "killpg"), reason="POSIX process groups")
+def test_run_streaming_timeout_kills_process_group(tmp_path):
+    import os
+    import time
+    from gabbe.mcp_server import _run_streaming
+
+    pid_file = tmp_path / "child.pid"
+    started = time.monotonic()
+    result = _run_streaming(["sh", "-c", f"sleep 30 & echo $! > {pid_file}; wait"], timeout=0.5)
+    assert time.monotonic() - started < 5
+    assert result["timed_out"] is True
+    assert result["returncode"] != 0
+    child = int(pid_file.read_text())
+
+    def alive(pid):
+        if os.path.isdir("/proc"):
+            try:
+                with open(f"/proc/{pid}/stat") as f:
+                    return f.read().rsplit(")", 1)[1].split()[0] != "Z"  # zombies are dead
+            except FileNotFoundError:
+                return False
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        return True
+
+    deadline = time.monotonic() + 2
+    while alive(child):
+        if time.monotonic() > deadline:
+            pytest.fail("grandchild outlived the timeout")
+        time.sleep(0.02)
+
+
+def test_serve_sends_progress_notifications(tmp_project):
+    from gabbe import mcp_server
+
+    call = json.dumps({
+        "jsonrpc": "2.0", "id": 3, "method": "tools/call",
+        "params": {"name": "run_command", "arguments": {"command": "echo streamed"},
+                   "_meta": {"progressToken": "tok"}},
+    }) + "\n"
+    with patch("gabbe.mcp_server._ALLOWED_COMMANDS", ["echo"]):
+        responses, _ = _serve_script(
+            [(call, None)], lambda name, args, **kw: mcp_server.run_command_handler(args["command"])
+        )
+    assert [r.get("method") for r in responses] == ["notifications/progress", None]
+    assert responses[0]["params"] == {"progressToken": "tok", "progress": 9, "message": "streamed\n"}
+    assert responses[1]["id"] == 3
+
+
+def test_run_command_audit_span_reports_bytes_and_rss(tmp_project):
+    from gabbe.context import RunContext
+    from gabbe.database import get_db
+    from gabbe.gateway import ToolDefinition
+    from gabbe.mcp_server import run_command_handler
+    from gabbe.policy import PolicyEngine, ToolAllowlistPolicy
+
+    with RunContext.from_config(command="mcp-audit", policy=PolicyEngine([ToolAllowlistPolicy(["*"], [])])) as ctx:
+        ctx.gateway.register(ToolDefinition("run_command", "", {}, run_command_handler, {"r"}))
+        ctx.gateway.execute("run_command", {"command": "echo hello"}, "r", ctx)
+        run_id = ctx.run_id
+    with get_db() as conn:
+        row = conn.execute("SELECT metadata FROM audit_spans WHERE run_id = ? AND event_type = 'tool_call'",
+                           (run_id,)).fetchone()
+    metadata = json.loads(row["metadata"])
+    assert metadata["bytes_streamed"] == 6
+    assert metadata["stdout_bytes"] == 6 and metadata["stderr_bytes"] == 0
+    assert metadata["timed_out"] is False
+    if hasattr(__import__("os"), "wait4"):
+        assert metadata["peak_rss_kb"] > 0
+
+
+@pytest.mark.skipif(not hasattr(os, "wait4"), reason="wait4 is POSIX-only")
+def test_reap_decodes_exit_status_without_waitstatus_to_exitcode():
+    import subprocess
+    from gabbe.mcp_server import _reap
+    with patch.object(os, "waitstatus_to_exitcode", None, create=True):
+        exited = subprocess.Popen([sys.executable, "-c", "raise SystemExit(3)"])
+        assert _reap(exited)[0] == 3
+        killed = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+        killed.kill()
+        code, peak = _reap(killed)
+    assert code == -signal.SIGKILL
+    assert peak is None or peak > 0
@@ -0,0 +1,69 @@
+"""Unit tests for gabbe.pii."""
+import pytest
+
+from gabbe.config import PII_PATTERNS
+from gabbe.pii import PIIStreamScanner, _find, clear_cache, contains_pii, scan
+
+SAMPLES = [
+    ("Contact user@example.com for details", ["email"]),
+    ("Call 555-123-4567 for support", ["phone"]),
+    ("SSN: 123-45-6789", ["ssn"]),
+    ("Card: 4111 1111 1111 1111", ["credit_card"]),
+    ("api_key=super_secret_value_here", ["credential"]),
+    ("PASSWORD : hunter2", ["credential"]),
+    ("Fix the login bug in auth.py", []),
+    ("Order 12345 shipped at 10:30", []),
+]
+
+
+@pytest.mark.parametrize("text, categories", SAMPLES)
+def test_scan_categories(text, categories):
+    assert scan(text).categories == categories
+
+
+@pytest.mark.parametrize("text, _", SAMPLES)
+def test_agrees_with_individual_patterns(text, _):
+    assert contains_pii(text) == any(p.search(text) for p in PII_PATTERNS)
+
+
+def test_scan_reports_spans_in_order():
+    text = "mail a.b@x.com, call 555-123-4567, token: abc"
+    result = scan(text)
+    assert [(m.category, text[m.start:m.end]) for m in result.matches] == [
+        ("email", "a.b@x.com"),
+        ("phone", "555-123-4567"),
+        ("credential", "token: abc"),
+    ]
+
+
+def test_prefilter_skips_text_without_triggers():
+    assert scan("just words and spaces " * 1000).found is False
+    assert scan("").found is False and scan(None).found is False
+
+
+def test_results_are_cached_by_content():
+    clear_cache()
+    text = "reach me at someone@example.org"
+    first = scan(text)
+    assert scan("".join(["reach me at ", "someone@example.org"])) is first
+
+
+def test_stream_scanner_finds_matches_across_chunks():
+    text = "hello " * 30 + "user@exa" + "mple.com then " * 10 + "api_key=abc"
+    scanner = PIIStreamScanner(overlap=16)
+    found = []
+    for i in range(0, len(text), 7):
+        found += scanner.feed(text[i:i + 7])
+    found += scanner.close()
+    assert [text[m.start:m.end] for m in found] == ["user@example.com", "api_key=abc"]
+    assert scanner.found and scanner.matches == found
+
+
+def test_stream_scanner_matches_whole_text_scan():
+    text = ("Call 555-123-4567 or mail ops@corp.io. " * 40) + "secret=xyz"
+    scanner = PIIStreamScanner(overlap=64)
+    streamed = []
+    for i in range(0, len(text), 50):
+        streamed += scanner.feed(text[i:i + 50])
+    streamed += scanner.close()
+    assert streamed == list(_find(text))
@@ -212,3 +212,117 @@ def test_from_yaml_allowlist_from_file(tmp_path):
     engine = PolicyEngine.from_yaml(path=policies_file)
     assert engine.evaluate({"tool": "call_llm"}).allowed is True
     assert engine.evaluate({"tool": "dangerous"}).allowed is False
+
+
+# --------------------------------------------------------------------------
+# Memoised loading, compiled decisions and hot reload
+# --------------------------------------------------------------------------
+
+class _CountingPolicy(ContentSafetyPolicy):
+    def __init__(self):
+        self.calls = 0
+
+    def check(self, context):
+        self.calls += 1
+        return super().check(context)
+
+
+def test_from_yaml_memoises_unchanged_file(tmp_path):
+    import os
+    from unittest.mock import patch
+    policies_file = tmp_path / "policies.yml"
+    policies_file.write_text("version: '1'\ntools:\n  allowed: ['*']\n")
+    first = PolicyEngine.from_yaml(path=policies_file)
+    with patch("gabbe.policy.yaml.safe_load") as parse:
+        assert PolicyEngine.from_yaml(path=policies_file) is first
+        # Touched but identical content: re-hashed, not re-parsed.
+        os.utime(policies_file, ns=(0, 10**9))
+        assert PolicyEngine.from_yaml(path=policies_file) is first
+    parse.assert_not_called()
+
+    policies_file.write_text("version: '2'\ntools:\n  allowed: [call_llm]\n")
+    second = PolicyEngine.from_yaml(path=policies_file)
+    assert second is not first and second.version == "2"
+
+
+def test_static_denial_skips_content_policies():
+    content = _CountingPolicy()
+    engine = PolicyEngine([ToolAllowlistPolicy(["call_llm"], []), content])
+    result = engine.evaluate({"tool": "run_command", "arguments": {"p": "a@b.com"}})
+    assert result.allowed is False and "allowlist" in result.reason
+    assert content.calls == 0
+
+
+def test_content_policy_before_static_denial_still_wins():
+    engine = PolicyEngine([ContentSafetyPolicy(), ToolAllowlistPolicy([], [])])
+    result = engine.evaluate({"tool": "x", "arguments": {"p": "mail a@b.com"}})
+    assert result.policy_name == "ContentSafetyPolicy"
+    assert engine.evaluate({"tool": "x", "arguments": {"p": "clean"}}).policy_name == "ToolAllowlistPolicy"
+
+
+def test_decision_table_is_precomputed_for_named_tools_and_roles():
+    engine = PolicyEngine([
+        ToolAllowlistPolicy(["call_llm", "run_command"], []),
+        RolePolicy({"agent": ["call_llm"]}),
+    ])
+    assert engine._table[("call_llm", "agent")] is None
+    assert engine._table[("run_command", "agent")][1].policy_name == "RolePolicy"
+    assert engine.evaluate({"tool": "other", "role": "agent"}).allowed is False
+
+
+def test_repeated_decisions_come_from_the_lru():
+    content = _CountingPolicy()
+    engine = PolicyEngine([ToolAllowlistPolicy(["*"], []), content])
+    context = {"tool": "call_llm", "role": "r", "arguments": {"prompt": "hello"}}
+    assert engine.evaluate(context).allowed is True
+    assert engine.evaluate(dict(context)).allowed is True
+    assert content.calls == 1
+    assert engine.evaluate({**context, "arguments": {"prompt": "bye"}}).allowed is True
+    assert content.calls == 2
+
+
+def test_uncacheable_custom_policy_runs_every_time():
+    from gabbe.policy import Policy, PolicyResult
+
+    class Flaky(Policy):
+        calls = 0
+
+        def check(self, context):
+            Flaky.calls += 1
+            return PolicyResult(True, "ok", "Flaky")
+
+    engine = PolicyEngine([Flaky()])
+    engine.evaluate({"tool": "t"})
+    engine.evaluate({"tool": "t"})
+    assert Flaky.calls == 2
+
+
+def test_watcher_hot_swaps_and_checkpoints_record_new_version(tmp_project):
+    from gabbe.context import RunContext
+    from gabbe.policy import watch_policy
+
+    policy_file = tmp_project / "project" / "policies.yml"
+    policy_file.write_text("version: 'v1'\ntools:\n  allowed: ['*']\n")
+    with RunContext(command="policy-reload") as ctx:
+        assert ctx.policy.version == "v1"
+        first = ctx.save_checkpoint(0, "start", {})
+
+        policy_file.write_text("version: 'v2'\ntools:\n  allowed: []\n  denied: ['*']\n")
+        assert watch_policy(policy_file).check() is True
+        assert ctx.policy.version == "v2"
+        assert ctx.policy.evaluate({"tool": "call_llm"}).allowed is False
+        second = ctx.save_checkpoint(1, "next", {}, parent_id=first)
+
+        history = ctx.checkpoints.get_history(ctx.run_id)
+    assert [h["policy_version"] for h in history] == ["v1", "v2"]
+    assert second is not None
+
+
+def test_watcher_keeps_last_good_policy_on_parse_error(tmp_path):
+    from gabbe.policy import PolicyWatcher
+    policy_file = tmp_path / "policies.yml"
+    policy_file.write_text("version: 'ok'\ntools:\n  allowed: ['*']\n")
+    watcher = PolicyWatcher(policy_file)
+    policy_file.write_text("tools: [unclosed\n")
+    assert watcher.check() is False
+    assert watcher.engine.version == "ok"
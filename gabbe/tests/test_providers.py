@@ -0,0 +1,283 @@
+"""Unit tests for gabbe.providers and provider dispatch in gabbe.llm."""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+import pytest
+
+from gabbe.providers import (
+    Provider,
+    ProviderRegistry,
+    ProviderUnavailable,
+    set_registry,
+)
+
+
+def _registry(*providers, **kwargs):
+    kwargs.setdefault("eject_failures", 2)
+    kwargs.setdefault("eject_seconds", 30.0)
+    return ProviderRegistry(list(providers), **kwargs)
+
+
+# ---------------------------------------------------------------------------
+# Selection strategies
+# ---------------------------------------------------------------------------
+
+def test_least_outstanding_prefers_idle_provider():
+    a = Provider("a", "http://a", "m-a")
+    b = Provider("b", "http://b", "m-b")
+    reg = _registry(a, b)
+    first = reg.acquire("REMOTE")
+    second = reg.acquire("REMOTE")
+    assert {first.name, second.name} == {"a", "b"}
+    reg.release(first, True, 10.0)
+    assert reg.acquire("REMOTE") is first
+
+
+def test_weighted_round_robin_follows_weights():
+    a = Provider("a", "http://a", "m-a", weight=3)
+    b = Provider("b", "http://b", "m-b", weight=1)
+    reg = _registry(a, b, strategy="weighted_round_robin")
+    picks = []
+    for _ in range(8):
+        p = reg.acquire("REMOTE")
+        picks.append(p.name)
+        reg.release(p, True)
+    assert picks.count("a") == 6 and picks.count("b") == 2
+    # Smooth WRR interleaves rather than sending bursts to one provider.
+    assert "b" in picks[:4]
+
+
+def test_ewma_prefers_faster_provider():
+    fast = Provider("fast", "http://f", "m")
+    slow = Provider("slow", "http://s", "m")
+    reg = _registry(fast, slow, strategy="ewma")
+    reg.release(reg.acquire("REMOTE"), True, 10.0)
+    reg.release(reg.acquire("REMOTE"), True, 500.0)
+    assert fast.ewma_ms is not None and slow.ewma_ms is not None
+    picked = reg.acquire("REMOTE")
+    assert picked is (fast if fast.ewma_ms < slow.ewma_ms else slow)
+
+
+def test_unknown_strategy_falls_back():
+    assert ProviderRegistry([], strategy="random").strategy == "least_outstanding"
+
+
+def test_pools_are_isolated():
+    local = Provider("ollama", "http://l", "llama", pool="LOCAL")
+    reg = _registry(local)
+    assert reg.acquire("LOCAL") is local
+    with pytest.raises(ProviderUnavailable):
+        reg.acquire("REMOTE")
+
+
+def test_acquire_times_out_at_max_concurrency():
+    a = Provider("a", "http://a", "m", max_concurrency=1)
+    reg = _registry(a)
+    reg.acquire("REMOTE")
+    with pytest.raises(ProviderUnavailable):
+        reg.acquire("REMOTE", timeout=0.05)
+
+
+def test_acquire_waits_for_release():
+    a = Provider("a", "http://a", "m", max_concurrency=1)
+    reg = _registry(a)
+    held = reg.acquire("REMOTE")
+    threading.Timer(0.05, reg.release, args=(held, True)).start()
+    assert reg.acquire("REMOTE", timeout=2) is a
+
+
+# ---------------------------------------------------------------------------
+# Passive circuit breaker
+# ---------------------------------------------------------------------------
+
+def test_consecutive_failures_eject_and_probe_reinstates():
+    a = Provider("a", "http://a", "m")
+    b = Provider("b", "http://b", "m")
+    reg = _registry(a, b, eject_failures=2, eject_seconds=30.0)
+    with patch("gabbe.providers.time.monotonic", return_value=100.0):
+        for _ in range(2):
+            a.outstanding += 1
+            reg.release(a, False)
+        assert a.ejected_until == 130.0
+        assert all(reg.acquire("REMOTE") is b for _ in range(3))
+
+    with patch("gabbe.providers.time.monotonic", return_value=131.0):
+        probe = reg.acquire("REMOTE")
+        assert probe is a and a.probing
+        # Only one probe at a time while half-open.
+        assert reg.acquire("REMOTE") is b
+        reg.release(a, True, 20.0)
+    assert a.ejected_until == 0.0 and a.ejections == 0 and not a.probing
+
+
+def test_failed_probe_doubles_ejection():
+    a = Provider("a", "http://a", "m")
+    reg = _registry(a, Provider("b", "http://b", "m"), eject_failures=1, eject_seconds=10.0)
+    with patch("gabbe.providers.time.monotonic", return_value=0.0):
+        a.outstanding += 1
+        reg.release(a, False)
+    assert a.ejected_until == 10.0
+    with patch("gabbe.providers.time.monotonic", return_value=11.0):
+        a.outstanding += 1
+        a.probing = True
+        reg.release(a, False)
+    assert a.ejected_until == 11.0 + 20.0 and a.ejections == 2
+
+
+def test_cancelled_request_does_not_affect_health():
+    a = Provider("a", "http://a", "m")
+    reg = _registry(a, eject_failures=1)
+    reg.acquire("REMOTE")
+    reg.release(a, None)
+    assert a.outstanding == 0 and a.failures == 0 and a.ejected_until == 0.0
+
+
+def test_panic_mode_when_all_ejected():
+    a = Provider("a", "http://a", "m")
+    reg = _registry(a, eject_failures=1)
+    a.outstanding += 1
+    reg.release(a, False)
+    assert reg.acquire("REMOTE") is a
+
+
+# ---------------------------------------------------------------------------
+# Config loading
+# ---------------------------------------------------------------------------
+
+def test_from_config_reads_providers(tmp_path, monkeypatch):
+    monkeypatch.setenv("TEST_PROVIDER_KEY", "secret")
+    path = tmp_path / "config.json"
+    path.write_text(json.dumps({
+        "provider_strategy": "ewma",
+        "providers": [
+            {"name": "cloud", "url": "http://c", "model": "big", "api_key_env": "TEST_PROVIDER_KEY",
+             "max_concurrency": 4, "price": {"input": 0.001, "output": 0.002}},
+            {"name": "local", "url": "http://l", "model": "small", "pool": "local"},
+        ],
+    }))
+    reg = ProviderRegistry.from_config(path)
+    assert reg.strategy == "ewma"
+    cloud, local = reg.providers
+    assert cloud.api_key == "secret" and cloud.max_concurrency == 4 and cloud.pool == "REMOTE"
+    assert local.pool == "LOCAL" and local.api_key is None
+
+
+def test_from_config_rejects_bad_pool(tmp_path):
+    path = tmp_path / "config.json"
+    path.write_text(json.dumps({"providers": [
+        {"name": "x", "url": "http://x", "model": "m", "pool": "EDGE"},
+    ]}))
+    assert not ProviderRegistry.from_config(path).configured
+
+
+def test_budget_uses_declared_price(tmp_project):
+    from gabbe.budget import Budget
+    set_registry(_registry(
+        Provider("c", "http://c", "priced-model", price={"input": 0.01, "output": 0.02})
+    ))
+    cost = Budget().price_usage("priced-model", {"prompt_tokens": 10, "completion_tokens": 5})
+    assert cost == pytest.approx(0.2)
+
+
+# ---------------------------------------------------------------------------
+# Dispatch through gabbe.llm
+# ---------------------------------------------------------------------------
+
+class _ModelEcho(BaseHTTPRequestHandler):
+    """Answers with the requested model name; ``fail`` makes it return 503."""
+
+    disable_nagle_algorithm = True
+    fail = False
+    seen = None
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        type(self).seen.append((body["model"], self.headers.get("Authorization")))
+        if type(self).fail:
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        payload = json.dumps({
+            "choices": [{"message": {"content": body["model"]}}],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def echo_server():
+    import gabbe.llm as llm_mod
+    handler = type("Handler", (_ModelEcho,), {"seen": [], "fail": False})
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    llm_mod.close_session()
+    yield handler, f"http://127.0.0.1:{httpd.server_address[1]}/v1/chat/completions"
+    llm_mod.close_session()
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_call_llm_dispatches_by_pool(tmp_project, echo_server):
+    from gabbe.llm import call_llm
+    handler, url = echo_server
+    set_registry(_registry(
+        Provider("cloud", url, "big-model", api_key="k"),
+        Provider("ollama", url, "small-model", pool="LOCAL"),
+    ))
+    with patch("gabbe.llm.GABBE_API_KEY", None):
+        assert call_llm("hi", use_cache=False, pool="LOCAL") == "small-model"
+        assert call_llm("hi", use_cache=False) == "big-model"
+    assert handler.seen == [("small-model", None), ("big-model", "Bearer k")]
+
+
+def test_failing_provider_is_ejected(tmp_project, echo_server):
+    from gabbe.llm import call_llm
+    from gabbe.retry import RetryPolicy
+    handler, url = echo_server
+    handler.fail = True
+    bad = Provider("bad", url, "bad-model")
+    set_registry(_registry(bad, eject_failures=2))
+    with patch("gabbe.llm._retry_policy", RetryPolicy(max_attempts=2, base_delay=0)):
+        assert call_llm("hi", use_cache=False) is None
+    assert bad.failures == 2 and bad.ejected_until > 0
+    assert bad.outstanding == 0
+
+
+def test_local_pool_never_falls_back_to_remote(tmp_project):
+    from gabbe.llm import call_llm
+    set_registry(ProviderRegistry())
+    with patch("gabbe.llm.GABBE_API_KEY", "k"), patch("gabbe.llm._post") as post:
+        with pytest.raises(ProviderUnavailable):
+            call_llm("my email is a@b.com", use_cache=False, pool="LOCAL")
+    post.assert_not_called()
+
+
+def test_route_dispatch_sends_pii_to_local(tmp_project, echo_server):
+    from gabbe.route import dispatch
+    handler, url = echo_server
+    set_registry(_registry(
+        Provider("cloud", url, "big-model"),
+        Provider("ollama", url, "small-model", pool="LOCAL"),
+    ))
+    decision, response = dispatch("Email user@domain.com about this bug")
+    assert decision == "LOCAL" and response == "small-model"
+
+
+def test_route_dispatch_without_local_provider_sends_nothing(tmp_project):
+    from gabbe.route import dispatch
+    set_registry(ProviderRegistry())
+    with patch("gabbe.llm.GABBE_API_KEY", "k"), patch("gabbe.llm._post") as post:
+        decision, response = dispatch("Email user@domain.com about this bug")
+    assert decision == "LOCAL" and response is None
+    post.assert_not_called()
@@ -0,0 +1,115 @@
+"""Unit tests for gabbe.retry and its use in gabbe.llm."""
+import random
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from unittest.mock import MagicMock, patch
+
+import pytest
+import requests
+
+from gabbe.retry import RetryPolicy, TokenBucket, parse_retry_after
+
+
+def test_parse_retry_after_seconds_and_dates():
+    now = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    assert parse_retry_after("7") == 7.0
+    assert parse_retry_after(format_datetime(now + timedelta(seconds=30), usegmt=True), now=now) == 30.0
+    assert parse_retry_after(format_datetime(now - timedelta(seconds=30), usegmt=True), now=now) == 0.0
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
+    assert parse_retry_after(MagicMock()) is None
+
+
+def test_no_jitter_is_capped_exponential():
+    policy = RetryPolicy(max_attempts=10, base_delay=1, max_delay=5, jitter="none")
+    assert [policy.backoff(n) for n in range(1, 5)] == [1, 2, 4, 5]
+
+
+def test_full_jitter_stays_under_exponential_ceiling():
+    policy = RetryPolicy(max_attempts=10, base_delay=1, max_delay=8, jitter="full", rng=random.Random(1))
+    for attempt in range(1, 6):
+        ceiling = min(8, 2 ** (attempt - 1))
+        assert all(0 <= policy.backoff(attempt) <= ceiling for _ in range(50))
+
+
+def test_decorrelated_jitter_bounds():
+    policy = RetryPolicy(max_attempts=10, base_delay=1, max_delay=20, jitter="decorrelated", rng=random.Random(2))
+    previous = None
+    for attempt in range(1, 8):
+        delay = policy.backoff(attempt, previous)
+        assert 1 <= delay <= min(20, max(1, (previous or 1) * 3))
+        previous = delay
+
+
+def test_next_delay_honours_retry_after_and_wall_time():
+    policy = RetryPolicy(max_attempts=3, base_delay=1, jitter="none")
+    assert policy.next_delay(1, retry_after=10) == 10
+    assert policy.next_delay(1, retry_after=0.1) == 1
+    assert policy.next_delay(1, remaining=0.5) is None
+    assert policy.next_delay(1, retry_after=10, remaining=5) is None
+    assert policy.next_delay(3) is None  # attempts exhausted
+
+
+def test_token_bucket_spaces_requests_after_burst():
+    bucket = TokenBucket(rate=10, capacity=2)
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == pytest.approx(0.1, abs=0.02)
+    assert TokenBucket(rate=0).reserve() == 0
+
+
+def _http_error(status, headers=None):
+    response = requests.models.Response()
+    response.status_code = status
+    response.headers.update(headers or {})
+    return requests.exceptions.HTTPError(f"{status}", response=response)
+
+
+def _ok():
+    response = MagicMock()
+    response.json.return_value = {"choices": [{"message": {"content": "ok"}}]}
+    return response
+
+
+@patch("gabbe.llm.time.sleep")
+@patch("gabbe.llm.GABBE_API_KEY", "k")
+@patch("gabbe.llm._retry_policy", RetryPolicy(max_attempts=3, base_delay=1, jitter="none"))
+def test_llm_waits_for_retry_after(mock_sleep):
+    from gabbe.llm import call_llm
+    from gabbe import retry
+    retry.reset_retry_stats()
+    with patch("gabbe.llm._post", side_effect=[_http_error(429, {"Retry-After": "12"}), _ok()]):
+        assert call_llm("p") == "ok"
+    mock_sleep.assert_called_once_with(12.0)
+    stats = retry.get_retry_stats()
+    assert stats["retries"] == 1 and stats["retry_after_honored"] == 1
+    assert stats["by_status"] == {429: 1}
+
+
+@patch("gabbe.llm.time.sleep")
+@patch("gabbe.llm.GABBE_API_KEY", "k")
+def test_llm_real_auth_error_response_is_not_retried(mock_sleep):
+    # A real Response is falsy for 4xx/5xx; the status must still be read from it.
+    from gabbe.llm import call_llm
+    with patch("gabbe.llm._post", side_effect=_http_error(401)) as post:
+        assert call_llm("p") is None
+    assert post.call_count == 1
+    mock_sleep.assert_not_called()
+
+
+@patch("gabbe.llm.time.sleep")
+@patch("gabbe.llm.GABBE_API_KEY", "k")
+@patch("gabbe.llm._retry_policy", RetryPolicy(max_attempts=5, base_delay=1, jitter="none"))
+def test_llm_stops_retrying_when_wall_time_budget_cannot_cover_it(mock_sleep, tmp_project):
+    from gabbe import retry
+    from gabbe.budget import Budget
+    from gabbe.context import RunContext
+    from gabbe.llm import call_llm
+    retry.reset_retry_stats()
+    with patch("gabbe.llm._post", side_effect=_http_error(503, {"Retry-After": "60"})) as post, \
+         RunContext(command="retry-budget", budget=Budget(max_wall_seconds=30)) as ctx:
+        assert call_llm("p", run_context=ctx) is None
+    assert post.call_count == 1
+    mock_sleep.assert_not_called()
+    stats = retry.get_retry_stats()
+    assert stats["budget_stops"] == 1 and stats["gave_up"] == 1
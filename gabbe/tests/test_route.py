@@ -1,6 +1,8 @@
 """Unit tests for gabbe.route."""
 from unittest.mock import patch
-from gabbe.route import detect_pii, calculate_complexity, route_request
+import json
+
+from gabbe.route import detect_pii, calculate_complexity, route_batch, route_request
 
 
 # ---------------------------------------------------------------------------
@@ -40,6 +42,7 @@ class TestCalculateComplexity:
         assert score <= 10
         assert "Simple" in reason or "Heuristic" in reason
 
+    @patch("gabbe.route.ROUTE_UNCERTAIN_BAND", 100)
     @patch("gabbe.route.call_llm", side_effect=EnvironmentError("no key"))
     def test_long_prompt_fallback(self, mock_llm):
         """Fallback heuristic when LLM is unavailable (raises EnvironmentError)."""
@@ -47,6 +50,22 @@ class TestCalculateComplexity:
         score, reason = calculate_complexity(long_prompt)
         assert "Fallback" in reason
 
+    @patch("gabbe.route.call_llm")
+    def test_confident_local_score_skips_llm(self, mock_llm):
+        prompt = "Architect a distributed, concurrent migration of the billing schema. " * 8
+        score, reason = calculate_complexity(prompt)
+        assert score > 60 and reason.startswith("Heuristic")
+        mock_llm.assert_not_called()
+
+    @patch("gabbe.route.ROUTE_UNCERTAIN_BAND", 100)
+    @patch("gabbe.route.call_llm", return_value='{"score": 72, "reason": "llm"}')
+    def test_uncertain_score_asks_llm_once(self, mock_llm, tmp_project):
+        prompt = "Refactor utils.py so the retry helper is reusable"
+        assert calculate_complexity(prompt) == (72, "llm")
+        # The LLM's answer is remembered, so the next call is free.
+        assert calculate_complexity(prompt)[0] == 72
+        mock_llm.assert_called_once()
+
     @patch("gabbe.route.call_llm", side_effect=EnvironmentError("no key"))
     def test_complex_keywords_increase_score(self, mock_llm):
         # Force LLM failure so heuristic fallback runs
@@ -73,3 +92,25 @@ class TestRouteRequest:
         # Force complexity score above threshold without calling LLM
         result = route_request("architect a distributed system " * 5)
         assert result == "REMOTE"
+
+
+# ---------------------------------------------------------------------------
+# route_batch
+# ---------------------------------------------------------------------------
+
+class TestRouteBatch:
+    @patch("gabbe.route.call_llm")
+    def test_batch_scores_locally_and_reports_agreement(self, mock_llm, tmp_path, capsys):
+        batch = tmp_path / "prompts.jsonl"
+        batch.write_text("\n".join([
+            "Fix typo in readme",
+            json.dumps({"prompt": "Rename a variable", "score": 5}),
+            json.dumps({"prompt": "Architect a distributed consensus protocol " * 10, "score": 90}),
+            json.dumps({"prompt": "Fix the comment wording", "score": 80}),
+            "Email ops@example.com the report",
+        ]))
+        stats = route_batch(str(batch))
+        mock_llm.assert_not_called()
+        assert stats["prompts"] == 5 and stats["pii"] == 1
+        assert stats["compared"] == 3 and stats["agree"] == 2
+        assert "Agreement with LLM: 66.7%" in capsys.readouterr().out
@@ -0,0 +1,55 @@
+"""Unit tests for gabbe.schema."""
+import pytest
+
+from gabbe.schema import HAS_JSONSCHEMA, compile_validator
+
+SIMPLE = {
+    "type": "object",
+    "properties": {
+        "command": {"type": "string", "description": "shell command"},
+        "timeout": {"type": "integer"},
+        "ratio": {"type": ["number", "null"]},
+        "mode": {"type": "string", "enum": ["fast", "safe"]},
+    },
+    "required": ["command"],
+    "additionalProperties": False,
+}
+
+
+def test_empty_schema_compiles_to_nothing():
+    assert compile_validator({}) is None
+    assert compile_validator(None) is None
+
+
+def test_simple_schema_uses_fast_path():
+    validate = compile_validator(SIMPLE)
+    assert validate.fast_path is True
+    validate({"command": "ls", "timeout": 5, "ratio": None, "mode": "safe"})
+    validate({"command": "ls", "timeout": 5.0, "ratio": 0.5})
+
+
+@pytest.mark.parametrize("arguments, message", [
+    ({}, "'command' is a required property"),
+    ({"command": 1}, "1 is not of type 'string'"),
+    ({"command": "ls", "timeout": True}, "True is not of type 'integer'"),
+    ({"command": "ls", "ratio": "x"}, "'x' is not of type 'number', 'null'"),
+    ({"command": "ls", "mode": "slow"}, "'slow' is not one of ['fast', 'safe']"),
+    ({"command": "ls", "shell": True}, "Additional properties are not allowed ('shell' was unexpected)"),
+    ([], "[] is not of type 'object'"),
+])
+def test_fast_path_errors_match_jsonschema_wording(arguments, message):
+    with pytest.raises(ValueError, match="Argument validation failed") as exc:
+        compile_validator(SIMPLE)(arguments)
+    assert message in str(exc.value)
+
+
+def test_rich_schema_is_not_fast_pathed():
+    rich = {"type": "object", "properties": {"n": {"type": "integer", "minimum": 0}}}
+    validate = compile_validator(rich)
+    if not HAS_JSONSCHEMA:
+        assert validate is None
+        return
+    assert validate.fast_path is False
+    validate({"n": 1})
+    with pytest.raises(ValueError, match="less than the minimum"):
+        validate({"n": -1})
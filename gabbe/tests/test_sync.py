@@ -185,6 +185,336 @@ def test_sync_atomic_write_creates_file(tmp_project):
     assert "Atomic Task" in tasks_file.read_text()
 
 
+def test_import_from_md_reports_stats_and_touches_only_changes(tmp_project):
+    from gabbe.database import get_db
+    from gabbe.sync import import_from_md
+
+    conn = get_db()
+    try:
+        c = conn.cursor()
+        c.execute("INSERT INTO tasks (title, status, updated_at) VALUES ('Keep', 'TODO', '2000-01-01 00:00:00')")
+        c.execute("INSERT INTO tasks (title, status, updated_at) VALUES ('Flip', 'TODO', '2000-01-01 00:00:00')")
+        stats = import_from_md(c, "- [ ] Keep\n- [x] Flip\n- [/] New\n")
+        conn.commit()
+        rows = {r["title"]: r for r in c.execute("SELECT title, status, updated_at FROM tasks")}
+    finally:
+        conn.close()
+
+    assert stats == {"inserted": 1, "updated": 1, "skipped": 1}
+    assert rows["Keep"]["updated_at"] == "2000-01-01 00:00:00"
+    assert rows["Flip"]["status"] == "DONE"
+    assert rows["Flip"]["updated_at"] != "2000-01-01 00:00:00"
+    assert rows["New"]["status"] == "IN_PROGRESS"
+
+
+def test_import_from_md_duplicate_titles_last_one_wins(tmp_project):
+    from gabbe.database import get_db
+    from gabbe.sync import import_from_md
+
+    conn = get_db()
+    try:
+        c = conn.cursor()
+        c.execute("INSERT INTO tasks (title, status) VALUES ('Old', 'DONE')")
+        stats = import_from_md(c, "- [ ] Twice\n- [x] Old\n- [x] Twice\n- [x] Twice\n- [ ] Old\n")
+        conn.commit()
+        rows = c.execute("SELECT title, status FROM tasks ORDER BY title").fetchall()
+        leftovers = c.execute("SELECT name FROM sqlite_temp_master").fetchall()
+    finally:
+        conn.close()
+
+    assert stats == {"inserted": 1, "updated": 2, "skipped": 2}
+    assert [(r["title"], r["status"]) for r in rows] == [("Old", "TODO"), ("Twice", "DONE")]
+    assert leftovers == []
+
+
+# ---------------------------------------------------------------------------
+# incremental sync
+# ---------------------------------------------------------------------------
+
+def _task_rows():
+    from gabbe.database import get_db
+    conn = get_db()
+    try:
+        return {r["title"]: (r["status"], r["updated_at"]) for r in conn.execute("SELECT * FROM tasks")}
+    finally:
+        conn.close()
+
+
+def _bump_mtime(path):
+    import os
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 2_000_000_000))
+
+
+def test_tasks_version_counts_writes(tmp_project):
+    from gabbe.database import db_connection
+    from gabbe.sync import _tasks_version
+    with db_connection() as conn:
+        c = conn.cursor()
+        before = _tasks_version(c)
+        c.execute("INSERT INTO tasks (title) VALUES ('A')")
+        c.execute("UPDATE tasks SET status = 'DONE' WHERE title = 'A'")
+        c.execute("DELETE FROM tasks")
+        assert _tasks_version(c) == before + 3
+
+
+def test_unchanged_sync_does_not_read_the_file(tmp_project, capsys):
+    import gabbe.sync as sync_mod
+    (tmp_project / "project/TASKS.md").write_text("- [ ] A\n- [x] B\n")
+    sync_mod.sync_tasks()
+    with patch.object(sync_mod, "_file_hash") as file_hash, \
+         patch.object(sync_mod, "iter_task_section_lines") as section:
+        sync_mod.sync_tasks()
+    file_hash.assert_not_called()
+    section.assert_not_called()
+    assert "No changes detected" in capsys.readouterr().out
+
+
+def test_touched_file_is_not_reimported(tmp_project):
+    import gabbe.sync as sync_mod
+    tasks_file = tmp_project / "project/TASKS.md"
+    tasks_file.write_text("- [ ] A\n")
+    sync_mod.sync_tasks()
+    _bump_mtime(tasks_file)
+    with patch.object(sync_mod, "import_from_md") as imp:
+        sync_mod.sync_tasks()
+    imp.assert_not_called()
+
+
+def test_one_line_edit_writes_one_row(tmp_project):
+    import gabbe.sync as sync_mod
+    tasks_file = tmp_project / "project/TASKS.md"
+    tasks_file.write_text("# Tasks\n" + "".join(f"- [ ] Task {i}\n" for i in range(200)))
+    sync_mod.sync_tasks()
+    before = _task_rows()
+
+    tasks_file.write_text(tasks_file.read_text().replace("- [ ] Task 17\n", "- [x] Task 17\n- [/] Task new\n"))
+    _bump_mtime(tasks_file)
+    with patch.object(sync_mod, "import_from_md", wraps=sync_mod.import_from_md) as imp:
+        sync_mod.sync_tasks()
+    assert [t["title"] for t in imp.call_args.args[1]] == ["Task 17", "Task new"]
+
+    after = _task_rows()
+    assert after["Task 17"][0] == "DONE"
+    assert after["Task new"][0] == "IN_PROGRESS"
+    assert {k: v for k, v in after.items() if k not in ("Task 17", "Task new")} == \
+        {k: v for k, v in before.items() if k != "Task 17"}
+
+
+def test_one_line_edit_rewrites_one_snapshot_block(tmp_project):
+    import gabbe.sync as sync_mod
+    from gabbe.database import get_db
+
+    def snapshot():
+        conn = get_db()
+        try:
+            blocks = dict(conn.execute("SELECT seq, digest FROM task_sync_blocks").fetchall())
+            entries = {r[0]: tuple(r) for r in conn.execute("SELECT * FROM task_sync_tasks")}
+        finally:
+            conn.close()
+        return blocks, entries
+
+    tasks_file = tmp_project / "project/TASKS.md"
+    tasks_file.write_text("".join(f"- [ ] Task {i}\n" for i in range(1000)))
+    sync_mod.sync_tasks()
+    blocks, entries = snapshot()
+    assert len(blocks) > 3
+
+    tasks_file.write_text(tasks_file.read_text().replace("- [ ] Task 500\n", "- [x] Task 500\n"))
+    _bump_mtime(tasks_file)
+    sync_mod.sync_tasks()
+    new_blocks, new_entries = snapshot()
+    assert new_blocks.keys() == blocks.keys()
+    assert len([seq for seq in blocks if blocks[seq] != new_blocks[seq]]) == 1
+    assert {t for t in entries if entries[t] != new_entries[t]} == {"Task 500"}
+
+
+def test_duplicate_title_edit_falls_back_to_full_import(tmp_project):
+    import gabbe.sync as sync_mod
+    tasks_file = tmp_project / "project/TASKS.md"
+    tasks_file.write_text("- [ ] A\n- [ ] B\n")
+    sync_mod.sync_tasks()
+    tasks_file.write_text("- [ ] A\n- [ ] B\n- [x] A\n")
+    _bump_mtime(tasks_file)
+    sync_mod.sync_tasks()
+    assert _task_rows()["A"][0] == "DONE"
+
+
+def test_db_change_with_unchanged_file_is_exported(tmp_project):
+    import gabbe.sync as sync_mod
+    from gabbe.database import get_db
+    tasks_file = tmp_project / "project/TASKS.md"
+    tasks_file.write_text("- [ ] A\n")
+    sync_mod.sync_tasks()
+    conn = get_db()
+    try:
+        conn.execute("UPDATE tasks SET status = 'DONE' WHERE title = 'A'")
+        conn.commit()
+    finally:
+        conn.close()
+    sync_mod.sync_tasks()
+    assert "- [x] A" in tasks_file.read_text()
+
+
+# ---------------------------------------------------------------------------
+# task IDs, nesting and tags
+# ---------------------------------------------------------------------------
+
+_NESTED = (
+    "- [ ] Release #ops <!-- id:r1 -->\n"
+    "  - [x] Write notes #docs #ops\n"
+    "  - [/] Tag build <!-- id:r2 -->\n"
+    "    - [ ] Sign artifacts\n"
+    "- [ ] Retro\n"
+)
+
+
+def _task_graph():
+    from gabbe.database import get_db
+    conn = get_db()
+    try:
+        return {r["title"]: (r["status"], r["task_key"], r["parent"], r["tags"]) for r in conn.execute(
+            "SELECT t.*, p.title AS parent FROM tasks t LEFT JOIN tasks p ON p.id = t.parent_id"
+        )}
+    finally:
+        conn.close()
+
+
+def test_parse_ids_nesting_and_tags():
+    tasks = {t["title"]: t for t in parse_markdown_tasks(_NESTED)}
+    assert tasks["Release #ops"]["task_key"] == "r1"
+    assert tasks["Release #ops"]["tags"] == ["ops"]
+    assert tasks["Write notes #docs #ops"]["tags"] == ["docs", "ops"]
+    assert tasks["Write notes #docs #ops"]["parent"] == "Release #ops"
+    assert tasks["Sign artifacts"]["parent"] == "Tag build"
+    assert tasks["Sign artifacts"]["depth"] == 2
+    assert tasks["Retro"]["parent"] is None
+    assert parse_markdown_tasks("- [ ] Fix #12 before v2\n")[0]["tags"] == []
+
+
+def test_roundtrip_keeps_ids_and_nesting():
+    tasks = parse_markdown_tasks(_NESTED)
+    assert parse_markdown_tasks(generate_markdown_tasks(tasks)) == tasks
+
+
+def test_sync_stores_parents_tags_and_ids(tmp_project):
+    import gabbe.sync as sync_mod
+    from gabbe.database import get_db
+    (tmp_project / "project/TASKS.md").write_text(_NESTED)
+    sync_mod.sync_tasks()
+    graph = _task_graph()
+    assert graph["Tag build"] == ("IN_PROGRESS", "r2", "Release #ops", None)
+    assert graph["Sign artifacts"][2] == "Tag build"
+    conn = get_db()
+    try:
+        tagged = {r[0] for r in conn.execute(
+            "SELECT t.title FROM task_tags g JOIN tasks t ON t.id = g.task_id WHERE g.tag = 'ops'")}
+    finally:
+        conn.close()
+    assert tagged == {"Release #ops", "Write notes #docs #ops"}
+
+
+def test_rename_with_id_updates_the_row(tmp_project):
+    import gabbe.sync as sync_mod
+    tasks_file = tmp_project / "project/TASKS.md"
+    tasks_file.write_text(_NESTED)
+    sync_mod.sync_tasks()
+    before = _task_rows()
+    tasks_file.write_text(_NESTED.replace("Tag build", "Tag and push build"))
+    _bump_mtime(tasks_file)
+    sync_mod.sync_tasks()
+    graph = _task_graph()
+    assert "Tag build" not in graph
+    assert graph["Tag and push build"][:3] == ("IN_PROGRESS", "r2", "Release #ops")
+    assert graph["Sign artifacts"][2] == "Tag and push build"
+    assert len(graph) == len(before)
+
+
+def test_edit_that_reparents_later_tasks_is_applied(tmp_project):
+    import gabbe.sync as sync_mod
+    tasks_file = tmp_project / "project/TASKS.md"
+    tasks_file.write_text(_NESTED)
+    sync_mod.sync_tasks()
+    tasks_file.write_text(_NESTED.replace("  - [/] Tag build", "- [ ] Ship\n  - [/] Tag build"))
+    _bump_mtime(tasks_file)
+    sync_mod.sync_tasks()
+    graph = _task_graph()
+    assert graph["Ship"][2] is None
+    assert graph["Tag build"][2] == "Ship"
+    assert graph["Sign artifacts"][2] == "Tag build"
+
+
+def test_export_writes_nesting_and_ids(tmp_project):
+    import gabbe.sync as sync_mod
+    from gabbe.database import get_db
+    tasks_file = tmp_project / "project/TASKS.md"
+    tasks_file.write_text(_NESTED)
+    sync_mod.sync_tasks()
+    conn = get_db()
+    try:
+        conn.execute("UPDATE tasks SET status = 'DONE' WHERE title = 'Sign artifacts'")
+        conn.execute("INSERT INTO tasks (title, parent_id) SELECT 'Announce', id FROM tasks WHERE title = 'Release #ops'")
+        conn.commit()
+    finally:
+        conn.close()
+    sync_mod.sync_tasks()
+    lines = tasks_file.read_text().split(_S)[1].split(_E)[0].strip("\n").split("\n")
+    assert lines == [
+        "- [ ] Release #ops <!-- id:r1 -->",
+        "  - [x] Write notes #docs #ops",
+        "  - [/] Tag build <!-- id:r2 -->",
+        "    - [x] Sign artifacts",
+        "  - [ ] Announce",
+        "- [ ] Retro",
+    ]
+
+
+# ---------------------------------------------------------------------------
+# streaming parser / exporter
+# ---------------------------------------------------------------------------
+
+_S, _E = "<!-- GABBE:TASKS:START -->", "<!-- GABBE:TASKS:END -->"
+
+
+@pytest.mark.parametrize("content", [
+    "",
+    "- [ ] A",
+    "- [ ] A\n- [x] B\n",
+    f"# Notes\n{_S}\n- [ ] In\n{_E}\n- [ ] Out\n",
+    f"{_S}- [/] Same line{_E}",
+    f"{_E}\n- [ ] Reversed markers\n{_S}\n",
+    f"pre {_S} tail\n- [ ] \u00e9t\u00e9\n  {_E} post",
+])
+def test_iter_task_section_lines_matches_string_parser(tmp_path, content):
+    from gabbe.sync import _task_section_lines, iter_markdown_tasks, iter_task_section_lines
+    path = tmp_path / "TASKS.md"
+    path.write_bytes(content.encode("utf-8"))
+    assert list(iter_task_section_lines(path)) == _task_section_lines(content)
+    assert list(iter_markdown_tasks(path)) == parse_markdown_tasks(content)
+
+
+def test_iter_task_section_lines_handles_crlf(tmp_path):
+    from gabbe.sync import iter_markdown_tasks
+    path = tmp_path / "TASKS.md"
+    path.write_bytes(f"{_S}\r\n- [x] A\r\n{_E}\r\n".encode())
+    assert [(t["title"], t["status"]) for t in iter_markdown_tasks(path)] == [("A", "DONE")]
+
+
+def test_export_streams_rows_and_keeps_surrounding_text(tmp_project):
+    from unittest.mock import MagicMock
+    import gabbe.sync as sync_mod
+    tasks_file = tmp_project / "project/TASKS.md"
+    tasks_file.write_text(f"# Notes\n\n{_S}\n- [ ] stale\n{_E}\n\nFooter\n")
+    rows = [{"title": "One", "status": "DONE"}, {"title": "Two", "status": "TODO"}]
+    cursor = MagicMock()
+    cursor.fetchall.side_effect = AssertionError("export must not fetchall()")
+    cursor.__iter__.side_effect = lambda: iter(rows)
+
+    sync_mod.export_to_md(cursor)
+
+    assert tasks_file.read_text() == f"# Notes\n\n{_S}\n- [x] One\n- [ ] Two\n{_E}\n\nFooter\n"
+
+
 # ---------------------------------------------------------------------------
 # _atomic_write
 # ---------------------------------------------------------------------------
@@ -1,7 +1,20 @@
 
+from contextlib import contextmanager
 from unittest.mock import MagicMock, patch
 from gabbe.sync import sync_tasks, _MARKER_START, _MARKER_END
 
+def _yield(conn):
+    """Stand-in for gabbe.sync.db_connection that yields *conn*."""
+    @contextmanager
+    def _cm(path=None):
+        yield conn
+    return _cm
+
+
+# Columns a plain top-level task row has besides title and status.
+_PLAIN = {'tags': None, 'task_key': None, 'parent': None, 'depth': 0}
+
+
 def test_sync_preserves_preamble_no_markers(tmp_path):
     """
     Test that when project/TASKS.md has no markers, the sync process preserves 
@@ -23,25 +36,26 @@ def test_sync_preserves_preamble_no_markers(tmp_path):
     # file_mtime = 100, db_mtime = 200
     # Mocking get_db_timestamp to return 200
     
-    # We need to patch get_db and TASKS_FILE config
-    with patch("gabbe.sync.get_db", return_value=mock_db), \
+    # We need to patch db_connection and TASKS_FILE config
+    with patch("gabbe.sync.db_connection", _yield(mock_db)), \
          patch("gabbe.sync.TASKS_FILE", tasks_file), \
          patch("gabbe.sync.get_db_timestamp", return_value=200.0), \
          patch("pathlib.Path.stat") as mock_stat:
         
         # Mock file mtime to be older than DB (100.0 < 200.0)
         mock_stat.return_value.st_mtime = 100.0
+        mock_stat.return_value.configure_mock(st_size=0, st_mtime_ns=100, st_ino=1)
         
-        # Mock DB tasks fetch
-        mock_cursor.fetchone.side_effect = [
-             (5,), # count(*) > 0
-             (200.0,), # max timestamp
-        ]
+        # No sync state recorded in project_state yet
+        mock_cursor.fetchone.return_value = None
         
-        mock_cursor.fetchall.return_value = [
-            {'title': 'New DB Task 1', 'status': 'TODO'},
-            {'title': 'New DB Task 2', 'status': 'DONE'},
+        db_rows = [
+            {'title': 'New DB Task 1', 'status': 'TODO', **_PLAIN},
+            {'title': 'New DB Task 2', 'status': 'DONE', **_PLAIN},
         ]
+        mock_cursor.fetchall.return_value = db_rows
+        # export_to_md streams rows by iterating the cursor
+        mock_cursor.__iter__.side_effect = lambda: iter(db_rows)
         
         # 3. Run Sync
         sync_tasks()
@@ -75,15 +89,18 @@ def test_sync_appends_if_no_tasks_found(tmp_path):
     mock_db = MagicMock()
     mock_cursor = mock_db.cursor.return_value
     
-    with patch("gabbe.sync.get_db", return_value=mock_db), \
+    with patch("gabbe.sync.db_connection", _yield(mock_db)), \
          patch("gabbe.sync.TASKS_FILE", tasks_file), \
          patch("gabbe.sync.get_db_timestamp", return_value=200.0), \
          patch("pathlib.Path.stat") as mock_stat:
         
         mock_stat.return_value.st_mtime = 100.0
+        mock_stat.return_value.configure_mock(st_size=0, st_mtime_ns=100, st_ino=1)
         
-        mock_cursor.fetchone.side_effect = [(1,), (200.0,)]
-        mock_cursor.fetchall.return_value = [{'title': 'Task A', 'status': 'TODO'}]
+        mock_cursor.fetchone.return_value = None
+        db_rows = [{'title': 'Task A', 'status': 'TODO', **_PLAIN}]
+        mock_cursor.fetchall.return_value = db_rows
+        mock_cursor.__iter__.side_effect = lambda: iter(db_rows)
         
         sync_tasks()
         
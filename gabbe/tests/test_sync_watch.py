@@ -0,0 +1,142 @@
+"""Tests for gabbe.sync_watch (gabbe sync --watch)."""
+import sys
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+from gabbe.sync_watch import InotifyWatcher, PollWatcher, SyncWatcher
+
+
+def _wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        threading.Event().wait(0.01)
+    return predicate()
+
+
+@pytest.fixture()
+def running_watcher(tmp_project):
+    tasks_file = tmp_project / "project/TASKS.md"
+    tasks_file.write_text("- [ ] A\n- [ ] B\n")
+    watcher = SyncWatcher(tasks_file, debounce=0.15, max_delay=1.0, poll_interval=0.02,
+                          watcher=PollWatcher())
+    thread = threading.Thread(target=watcher.run, daemon=True)
+    thread.start()
+    assert _wait_for(lambda: watcher.stats()["syncs"] == 1)
+    yield watcher, tasks_file
+    watcher.stop()
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+
+
+def _status(title):
+    from gabbe.database import get_db
+    conn = get_db()
+    try:
+        row = conn.execute("SELECT status FROM tasks WHERE title = ?", (title,)).fetchone()
+        return row["status"] if row else None
+    finally:
+        conn.close()
+
+
+def test_burst_of_edits_is_one_sync(running_watcher):
+    watcher, tasks_file = running_watcher
+    for i in range(5):
+        tasks_file.write_text(f"- [x] A\n- [ ] B\n- [ ] C{'+' * i}\n")
+    assert _wait_for(lambda: _status("C++++") == "TODO")
+    threading.Event().wait(0.3)
+    stats = watcher.stats()
+    assert stats["syncs"] == 2
+    assert stats["latency_ms"]["count"] == 1
+    assert stats["latency_ms"]["p50"] >= 150
+    assert _status("A") == "DONE"
+
+
+def test_db_commit_from_another_connection_is_exported(running_watcher):
+    from gabbe.database import get_db
+    watcher, tasks_file = running_watcher
+    conn = get_db()
+    try:
+        conn.execute("UPDATE tasks SET status = 'DONE' WHERE title = 'B'")
+        conn.commit()
+    finally:
+        conn.close()
+    assert _wait_for(lambda: "- [x] B" in tasks_file.read_text())
+    assert watcher.stats()["db_events"] >= 1
+
+
+def test_own_writes_do_not_retrigger(running_watcher):
+    watcher, _ = running_watcher
+    threading.Event().wait(0.3)
+    assert watcher.stats()["syncs"] == 1
+    assert watcher.stats()["file_events"] == watcher.stats()["db_events"] == 0
+
+
+def test_edit_during_sync_triggers_another_sync(running_watcher):
+    import gabbe.sync
+    watcher, tasks_file = running_watcher
+    real_sync = gabbe.sync.sync_tasks
+    edited = []
+
+    def sync_then_edit():
+        real_sync()
+        if not edited:
+            edited.append(True)
+            tasks_file.write_text("- [ ] A\n- [ ] B\n- [ ] C\n- [ ] Mid-sync\n")
+
+    with patch("gabbe.sync.sync_tasks", side_effect=sync_then_edit):
+        tasks_file.write_text("- [ ] A\n- [ ] B\n- [ ] C\n")
+        assert _wait_for(lambda: _status("Mid-sync") == "TODO")
+
+
+def test_export_settles_after_one_extra_sync(running_watcher):
+    from gabbe.database import get_db
+    watcher, _ = running_watcher
+    conn = get_db()
+    try:
+        conn.execute("INSERT INTO tasks (title, status) VALUES ('From DB', 'TODO')")
+        conn.commit()
+    finally:
+        conn.close()
+    assert _wait_for(lambda: watcher.stats()["syncs"] >= 2)
+    threading.Event().wait(0.5)
+    assert watcher.stats()["syncs"] <= 3
+
+
+def test_failed_sync_is_counted_and_watch_continues(running_watcher):
+    watcher, tasks_file = running_watcher
+    with patch("gabbe.sync.sync_tasks", side_effect=RuntimeError("boom")):
+        tasks_file.write_text("- [ ] A\n- [ ] B\n- [ ] C\n")
+        assert _wait_for(lambda: watcher.stats()["errors"] == 1)
+    tasks_file.write_text("- [ ] A\n- [ ] B\n- [ ] D\n")
+    assert _wait_for(lambda: _status("D") == "TODO")
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="inotify is Linux-only")
+def test_inotify_watcher_filters_to_the_file(tmp_path):
+    target = tmp_path / "TASKS.md"
+    target.write_text("")
+    watcher = InotifyWatcher(target)
+    try:
+        (tmp_path / "other.md").write_text("x")
+        assert watcher.wait(0.2) is False
+        tmp = tmp_path / ".tmp_tasks_1"
+        tmp.write_text("- [ ] A\n")
+        tmp.replace(target)  # atomic save, as export_to_md does
+        assert watcher.wait(1.0) is True
+        watcher.interrupt()
+        assert watcher.wait(1.0) is False
+    finally:
+        watcher.close()
+
+
+def test_sync_watch_flag_dispatches(tmp_project):
+    from gabbe.main import main
+    with patch("sys.argv", ["gabbe", "sync", "--watch"]), \
+         patch("gabbe.sync_watch.watch") as mock_watch:
+        main()
+    mock_watch.assert_called_once()
@@ -0,0 +1,125 @@
+"""Tests for offline token estimation and pre-flight budget checks."""
+import json
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from gabbe.budget import Budget, BudgetExceeded
+from gabbe.tokens import cache_info, estimate_prompt_tokens, estimate_tokens
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("", 0),
+    ("Hello world", 2),
+    ("The quick brown fox jumps over the lazy dog.", 10),
+    ("12345678", 3),
+])
+def test_estimate_tokens_matches_bpe_on_simple_text(text, expected):
+    assert estimate_tokens(text) == expected
+
+
+def test_estimate_scales_with_length_and_script():
+    word = estimate_tokens("internationalization")
+    assert 2 <= word <= 4
+    assert estimate_tokens("日本語のテキスト") >= 6
+    prose = "Refactor the payment service to use the new retry policy. " * 50
+    assert 400 <= estimate_tokens(prose) <= 700
+
+
+def test_estimates_are_memoised():
+    text = "def handler(event, context):\n    return {'ok': True}\n" * 3
+    estimate_tokens(text)
+    hits = cache_info().hits
+    estimate_tokens(text)
+    assert cache_info().hits == hits + 1
+
+
+def test_prompt_estimate_includes_chat_framing():
+    assert estimate_prompt_tokens("hi", "sys") == estimate_tokens("hi") + estimate_tokens("sys") + 9
+    assert estimate_prompt_tokens("hi") == estimate_tokens("hi") + 6
+
+
+def test_budget_preflight_fits_caps_and_rejects(tmp_project):
+    budget = Budget(max_tokens=1000)
+    assert budget.preflight("m", 100, 512) == 512
+    assert budget.preflight("m", 700, 512) == 300
+    with pytest.raises(BudgetExceeded):
+        budget.preflight("m", 995, 512, min_completion_tokens=16)
+
+
+def test_budget_preflight_uses_prices(tmp_project):
+    budget = Budget(max_cost_usd=1.0)
+    budget._cached_prices["priced"] = {
+        "input": 0.001, "output": 0.01, "reasoning": 0.0, "cache_creation": 0.0, "cache_read": 0.0,
+    }
+    # $0.5 of prompt leaves $0.5 => 50 completion tokens.
+    assert budget.preflight("priced", 500, 512) == 50
+    with pytest.raises(BudgetExceeded):
+        budget.preflight("priced", 1001, 512)
+
+
+def _ok_response():
+    response = MagicMock()
+    response.json.return_value = {
+        "choices": [{"message": {"content": "ok"}}],
+        "usage": {"prompt_tokens": 5, "completion_tokens": 1, "total_tokens": 6},
+    }
+    return response
+
+
+def test_call_llm_rejects_oversized_prompt_without_sending(tmp_project):
+    import gabbe.llm as llm_mod
+    from gabbe.context import RunContext
+
+    with patch("gabbe.llm.GABBE_API_KEY", "k"), \
+         patch("gabbe.llm._post") as post, \
+         RunContext(command="preflight", budget=Budget(max_tokens=50)) as ctx:
+        with pytest.raises(BudgetExceeded):
+            llm_mod.call_llm("word " * 200, run_context=ctx)
+        spans = ctx.tracer.get_run_trace(ctx.run_id)
+
+    post.assert_not_called()
+    assert spans[0]["status"] == "rejected"
+    assert json.loads(spans[0]["metadata"])["preflight"]["prompt_tokens"] > 50
+
+
+def test_call_llm_caps_completion_to_fit(tmp_project):
+    import gabbe.llm as llm_mod
+    from gabbe.context import RunContext
+
+    with patch("gabbe.llm.GABBE_API_KEY", "k"), \
+         patch("gabbe.llm._post", return_value=_ok_response()) as post, \
+         RunContext(command="preflight", budget=Budget(max_tokens=200)) as ctx:
+        assert llm_mod.call_llm("short prompt", run_context=ctx) == "ok"
+        span = ctx.tracer.get_run_trace(ctx.run_id)[0]
+
+    sent = post.call_args.kwargs["json"]
+    expected = 200 - estimate_prompt_tokens("short prompt", "You are a helpful assistant.")
+    assert sent["max_tokens"] == expected
+    assert json.loads(span["metadata"])["preflight"]["max_tokens"] == expected
+
+
+def test_call_llm_without_budget_pressure_sends_no_cap(tmp_project):
+    import gabbe.llm as llm_mod
+    from gabbe.context import RunContext
+
+    with patch("gabbe.llm.GABBE_API_KEY", "k"), \
+         patch("gabbe.llm._post", return_value=_ok_response()) as post, \
+         RunContext(command="preflight") as ctx:
+        llm_mod.call_llm("short prompt", run_context=ctx)
+    assert "max_tokens" not in post.call_args.kwargs["json"]
+
+
+def test_gateway_rejects_llm_tool_before_running_it(tmp_project):
+    from gabbe.context import RunContext
+    from gabbe.gateway import ToolDefinition
+
+    handler = MagicMock(return_value="done")
+    with RunContext(command="preflight", budget=Budget(max_tokens=20)) as ctx:
+        ctx.gateway.register(ToolDefinition(
+            name="ask", description="", parameters={}, handler=handler, allowed_roles={"r"},
+            token_estimate=lambda args: estimate_prompt_tokens(args["p"]),
+        ))
+        with pytest.raises(BudgetExceeded):
+            ctx.gateway.execute("ask", {"p": "explain " * 100}, "r", ctx)
+    handler.assert_not_called()
@@ -0,0 +1,189 @@
+"""Tests for gabbe.tool_cache and the gateway's use of it."""
+import json
+import os
+import types
+
+import pytest
+
+from gabbe import tool_cache
+from gabbe.gateway import PolicyDenied, ToolDefinition
+from gabbe.policy import PolicyEngine, ToolAllowlistPolicy
+from gabbe.tool_cache import MISS, ToolResultCache, make_key, mtime_token
+
+
+def _allow_all():
+    return PolicyEngine([ToolAllowlistPolicy(["*"], [])])
+
+
+class Counter:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, **kwargs):
+        self.calls += 1
+        return {"n": self.calls, "args": kwargs}
+
+
+def _cached_tool(handler, **kwargs):
+    return ToolDefinition("read", "", {}, handler, {"t"}, cacheable=True, **kwargs)
+
+
+def test_key_ignores_argument_order():
+    assert make_key("t", {"a": 1, "b": [1, 2]}) == make_key("t", {"b": [1, 2], "a": 1})
+    assert make_key("t", {"a": 1}) != make_key("u", {"a": 1})
+    assert make_key("t", {"a": 1}) != make_key("t", {"a": "1"})
+
+
+def test_hit_skips_handler_and_is_traced(tmp_project):
+    from gabbe.context import RunContext
+    from gabbe.database import get_db
+    handler = Counter()
+    with RunContext.from_config(command="tc", policy=_allow_all()) as ctx:
+        ctx.gateway.register(_cached_tool(handler))
+        first = ctx.gateway.execute("read", {"path": "a"}, "t", ctx)
+        first["n"] = 99  # callers can't corrupt the cached copy
+        second = ctx.gateway.execute("read", {"path": "a"}, "t", ctx)
+        ctx.gateway.execute("read", {"path": "b"}, "t", ctx)
+        run_id = ctx.run_id
+    assert handler.calls == 2
+    assert second == {"n": 1, "args": {"path": "a"}}
+    with get_db() as conn:
+        rows = conn.execute(
+            "SELECT status, metadata FROM audit_spans WHERE run_id = ? AND event_type = 'tool_call' "
+            "ORDER BY id", (run_id,)
+        ).fetchall()
+    hits = [json.loads(r["metadata"] or "{}").get("cache_hit") for r in rows]
+    assert hits == [None, True, None]
+    assert all(r["status"] == "ok" for r in rows)
+
+
+def test_hit_is_still_policy_checked(tmp_project):
+    from gabbe.context import RunContext
+    handler = Counter()
+    with RunContext.from_config(command="tc", policy=_allow_all()) as ctx:
+        ctx.gateway.register(_cached_tool(handler))
+        ctx.gateway.execute("read", {}, "t", ctx)
+        ctx.policy = PolicyEngine([ToolAllowlistPolicy([], ["read"])])
+        with pytest.raises(PolicyDenied):
+            ctx.gateway.execute("read", {}, "t", ctx)
+
+
+def test_hits_do_not_spend_budget_or_rate_limit(tmp_project):
+    from gabbe.budget import Budget
+    from gabbe.context import RunContext
+    handler = Counter()
+    with RunContext.from_config(command="tc", policy=_allow_all(), budget=Budget(max_tool_calls=1)) as ctx:
+        ctx.gateway.register(_cached_tool(handler, rate_limit_per_min=1))
+        for _ in range(5):
+            ctx.gateway.execute("read", {}, "t", ctx)
+    assert handler.calls == 1
+
+
+def test_errors_are_not_cached(tmp_project):
+    from gabbe.context import RunContext
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("first")
+        return "ok"
+
+    with RunContext.from_config(command="tc", policy=_allow_all()) as ctx:
+        ctx.gateway.register(_cached_tool(flaky))
+        with pytest.raises(RuntimeError):
+            ctx.gateway.execute("read", {}, "t", ctx)
+        assert ctx.gateway.execute("read", {}, "t", ctx) == "ok"
+        assert ctx.gateway.execute("read", {}, "t", ctx) == "ok"
+    assert len(calls) == 2
+
+
+def test_predicate_decides_per_call(tmp_project):
+    from gabbe.context import RunContext
+    handler = Counter()
+    with RunContext.from_config(command="tc", policy=_allow_all()) as ctx:
+        ctx.gateway.register(ToolDefinition(
+            "cmd", "", {}, handler, {"t"}, cacheable=lambda args: args["command"] == "ls",
+        ))
+        for _ in range(2):
+            ctx.gateway.execute("cmd", {"command": "ls"}, "t", ctx)
+            ctx.gateway.execute("cmd", {"command": "rm x"}, "t", ctx)
+    assert handler.calls == 3
+
+
+def test_ttl_expiry(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(tool_cache, "time", types.SimpleNamespace(monotonic=lambda: clock[0]))
+    cache = ToolResultCache()
+    tool = _cached_tool(Counter(), cache_ttl=10)
+    cache.put(tool, {}, "v")
+    clock[0] += 9.9
+    assert cache.get(tool, {}) == "v"
+    clock[0] += 0.1
+    assert cache.get(tool, {}) is MISS
+    assert cache.stats()["entries"] == 0
+
+
+def test_mtime_validator_invalidates(tmp_path, tmp_project):
+    from gabbe.context import RunContext
+    target = tmp_path / "f.txt"
+    target.write_text("one")
+
+    def read(path):
+        with open(path) as f:
+            return f.read()
+
+    with RunContext.from_config(command="tc", policy=_allow_all()) as ctx:
+        ctx.gateway.register(_cached_tool(read, cache_validator=lambda a: mtime_token([a["path"]])))
+        assert ctx.gateway.execute("read", {"path": str(target)}, "t", ctx) == "one"
+        target.write_text("two")
+        st = os.stat(target)
+        os.utime(target, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+        assert ctx.gateway.execute("read", {"path": str(target)}, "t", ctx) == "two"
+
+
+def test_invalidates_hook(tmp_project):
+    from gabbe.context import RunContext
+    handler = Counter()
+    with RunContext.from_config(command="tc", policy=_allow_all()) as ctx:
+        ctx.gateway.register(_cached_tool(handler))
+        ctx.gateway.register(ToolDefinition("write", "", {}, lambda: None, {"t"}, invalidates=("read",)))
+        ctx.gateway.execute("read", {}, "t", ctx)
+        ctx.gateway.execute("write", {}, "t", ctx)
+        ctx.gateway.execute("read", {}, "t", ctx)
+    assert handler.calls == 2
+
+
+def test_lru_eviction():
+    cache = ToolResultCache(max_entries=2)
+    tool = _cached_tool(Counter())
+    for i in range(3):
+        cache.put(tool, {"i": i}, i)
+        cache.get(tool, {"i": 0})  # keep 0 recent
+    assert cache.get(tool, {"i": 0}) == 0
+    assert cache.get(tool, {"i": 1}) is MISS
+    assert cache.get(tool, {"i": 2}) == 2
+    assert cache.stats()["evictions"] == 1
+
+
+def test_execute_many_serves_hits(tmp_project):
+    from gabbe.context import RunContext
+    handler = Counter()
+    with RunContext.from_config(command="tc", policy=_allow_all()) as ctx:
+        ctx.gateway.register(_cached_tool(handler))
+        ctx.gateway.execute("read", {"k": 1}, "t", ctx)
+        results = ctx.gateway.execute_many([("read", {"k": 1}), ("read", {"k": 2})], "t", ctx)
+        again = ctx.gateway.execute_many([("read", {"k": 2})], "t", ctx)
+    assert [r.unwrap()["n"] for r in results] == [1, 2]
+    assert again[0].unwrap()["n"] == 2
+    assert handler.calls == 2
+
+
+def test_mcp_run_command_cache_is_opt_in(monkeypatch):
+    from gabbe import mcp_server
+    monkeypatch.setattr(mcp_server, "_CACHEABLE_COMMANDS", [["git", "status"], ["ls"]])
+    assert mcp_server._command_is_cacheable({"command": "git status --short"})
+    assert mcp_server._command_is_cacheable({"command": "ls -la"})
+    assert not mcp_server._command_is_cacheable({"command": "git stash"})
+    assert not mcp_server._command_is_cacheable({"command": "lsof"})
+    assert not mcp_server._command_is_cacheable({"command": "'unterminated"})
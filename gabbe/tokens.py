@@ -0,0 +1,76 @@
+"""Offline token estimates for budgeting LLM calls before they are sent.
+
+No tokenizer files and no network: text is pre-split with the same kind of
+regex that byte-pair-encoding tokenizers (cl100k-style) use, and each piece
+is costed from its length and character class. Common words become one
+token, long or rare words a few, digits go in groups of three and
+non-ASCII text costs roughly a token per character. That is close enough to
+stop a call that would obviously break a Budget; it is not a billing
+source of truth (``record_llm_usage`` still uses the provider's counts).
+
+Results are memoised per string (``GABBE_TOKEN_CACHE_SIZE`` entries), so
+re-estimating the same system prompt on every call is a dict lookup.
+"""
+from __future__ import annotations
+
+import functools
+import re
+
+from .config import TOKEN_CACHE_SIZE
+
+# Pre-tokenizer, cl100k-style. Python's re has no \p{L}: [^\W\d_] is "letter".
+_PIECES = re.compile(
+    r"""'(?:[sdmt]|ll|ve|re)"""          # contractions
+    r"""|[^\r\n\w]?[^\W\d_]+"""          # a word, with one leading space/punctuation
+    r"""|\d{1,3}"""                      # numbers, three digits per token
+    r"""| ?[^\s\w]+[\r\n]*"""            # punctuation runs
+    r"""|\s*[\r\n]+"""                   # newlines (with preceding indentation)
+    r"""|\s+(?!\S)|\s+""",               # other whitespace
+    re.IGNORECASE,
+)
+
+# Chat-format framing (OpenAI): every message costs a few tokens on top of
+# its content, and the reply is primed with a few more.
+TOKENS_PER_MESSAGE = 3
+TOKENS_PER_REPLY = 3
+
+
+def _piece_tokens(piece: str) -> int:
+    if piece.isascii():
+        core = piece.lstrip()
+        if not core:
+            return 1 + len(piece) // 16  # runs of whitespace merge well
+        if core[-1].isalpha():
+            letters = len(core) - (0 if core[0].isalpha() else 1)
+            # Frequent words are single tokens; longer ones split into ~6-char chunks.
+            return 1 + max(0, letters - 5) // 6
+        return (len(core) + 2) // 3
+    # Non-ASCII: most scripts (CJK, emoji, accented runs) cost about one
+    # token per character in byte-level BPE vocabularies.
+    ascii_chars = sum(1 for ch in piece if ch.isascii())
+    return max(1, len(piece) - ascii_chars + (ascii_chars + 3) // 4)
+
+
+@functools.lru_cache(maxsize=TOKEN_CACHE_SIZE)
+def _count(text: str) -> int:
+    return sum(_piece_tokens(piece) for piece in _PIECES.findall(text))
+
+
+def estimate_tokens(text) -> int:
+    """Estimated token count of *text* (0 for empty or None)."""
+    if not text:
+        return 0
+    return _count(str(text))
+
+
+def estimate_prompt_tokens(prompt, system_prompt=None) -> int:
+    """Estimated ``prompt_tokens`` of a system + user chat completion request."""
+    total = TOKENS_PER_REPLY + TOKENS_PER_MESSAGE + estimate_tokens(prompt)
+    if system_prompt:
+        total += TOKENS_PER_MESSAGE + estimate_tokens(system_prompt)
+    return total
+
+
+def cache_info():
+    """functools cache statistics of the per-string memo."""
+    return _count.cache_info()
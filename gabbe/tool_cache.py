@@ -0,0 +1,134 @@
+"""Result cache for idempotent tool calls.
+
+A ``ToolDefinition`` opts in with ``cacheable`` (a bool, or a predicate on
+the arguments for tools that are only sometimes read-only) and
+``cache_ttl``. Results are keyed by the tool name and its canonicalised
+arguments (JSON with sorted keys) and kept in a per-gateway LRU of
+``GABBE_TOOL_CACHE_ENTRIES`` entries.
+
+An entry is dropped when:
+
+- its TTL expires;
+- the tool's ``cache_validator(arguments)`` returns something different from
+  when it was stored (``mtime_token`` builds one from file mtimes);
+- a tool that names it in ``invalidates`` runs successfully (e.g. a
+  ``write_file`` tool invalidating ``read_file``), or ``invalidate`` is
+  called.
+
+Errors are never cached. Hits return a deep copy, so callers can't mutate
+the stored result.
+"""
+from __future__ import annotations
+
+import copy
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Iterable, Optional
+
+from .config import TOOL_CACHE_ENTRIES
+
+logger = logging.getLogger("gabbe.tool_cache")
+
+MISS = object()  # returned by ToolResultCache.get() when there is no usable entry
+
+
+def make_key(name: str, arguments: dict) -> str:
+    """Cache key for one call: the tool and its arguments, key order ignored."""
+    material = json.dumps(
+        [name, arguments], sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=repr
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def mtime_token(paths: Iterable) -> tuple:
+    """``(path, mtime_ns)`` for each path (None if missing), for a ``cache_validator``."""
+    token = []
+    for path in paths:
+        try:
+            token.append((str(path), os.stat(path).st_mtime_ns))
+        except OSError:
+            token.append((str(path), None))
+    return tuple(token)
+
+
+class ToolResultCache:
+    """Thread-safe LRU of tool results with TTL and validator-based invalidation."""
+
+    def __init__(self, max_entries: int = TOOL_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        # key -> (tool name, expires_at or None, validator token, value)
+        self._entries: OrderedDict[str, tuple] = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "invalidations": 0}
+
+    @staticmethod
+    def accepts(tool, arguments: dict) -> bool:
+        cacheable = tool.cacheable
+        return bool(cacheable(arguments) if callable(cacheable) else cacheable)
+
+    def get(self, tool, arguments: dict, key: Optional[str] = None):
+        """The cached result for this call, or ``MISS``."""
+        key = key or make_key(tool.name, arguments)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return MISS
+            _, expires_at, token, value = entry
+        # The validator may stat files: run it outside the lock.
+        stale = expires_at is not None and time.monotonic() >= expires_at
+        if not stale and tool.cache_validator is not None:
+            stale = tool.cache_validator(arguments) != token
+        with self._lock:
+            if stale:
+                if self._entries.get(key) is entry:
+                    del self._entries[key]
+                    self._stats["invalidations"] += 1
+                self._stats["misses"] += 1
+                return MISS
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+        return copy.deepcopy(value)
+
+    def put(self, tool, arguments: dict, value: Any, key: Optional[str] = None,
+            token: Any = None):
+        """Store *value*; *token* is the validator's result from before the call ran."""
+        if self.max_entries <= 0:
+            return
+        key = key or make_key(tool.name, arguments)
+        expires_at = time.monotonic() + tool.cache_ttl if tool.cache_ttl > 0 else None
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._entries[key] = (tool.name, expires_at, token, value)
+            self._entries.move_to_end(key)
+            self._stats["stores"] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def invalidate(self, names: Optional[Iterable[str]] = None) -> int:
+        """Drop the entries of the tools in *names* (all entries if None)."""
+        with self._lock:
+            if names is None:
+                dropped = list(self._entries)
+            else:
+                names = set(names)
+                dropped = [k for k, entry in self._entries.items() if entry[0] in names]
+            for key in dropped:
+                del self._entries[key]
+            self._stats["invalidations"] += len(dropped)
+        if dropped:
+            logger.debug("Invalidated %d cached tool result(s)", len(dropped))
+        return len(dropped)
+
+    def stats(self) -> dict:
+        with self._lock:
+            snap = dict(self._stats)
+            snap["entries"] = len(self._entries)
+        return snap
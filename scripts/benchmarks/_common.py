@@ -0,0 +1,161 @@
+"""Shared helpers for the GABBE benchmark scripts.
+
+Benchmarks run against a throw-away project directory so they never touch
+the real ``project/state.db``. Run them from the repository root, e.g.::
+
+    python scripts/benchmarks/bench_database.py
+"""
+import contextlib
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from unittest.mock import patch
+
+# Allow running the scripts from a source checkout without installing gabbe.
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+
+@contextlib.contextmanager
+def temp_project():
+    """Yield a temporary project root with every GABBE path pointed at it."""
+    with tempfile.TemporaryDirectory(prefix="gabbe_bench_") as tmp:
+        root = Path(tmp)
+        gabbe_dir = root / "project"
+        gabbe_dir.mkdir()
+        db_path = gabbe_dir / "state.db"
+        tasks_file = gabbe_dir / "TASKS.md"
+        policy_file = gabbe_dir / "policies.yml"
+        policy_file.write_text("version: '1'\ntools:\n  allowed:\n    - '*'\n")
+
+        import gabbe.audit
+        import gabbe.database
+        import gabbe.policy
+        import gabbe.sync
+
+        patches = [
+            patch("gabbe.config.PROJECT_ROOT", root),
+            patch("gabbe.config.GABBE_DIR", gabbe_dir),
+            patch("gabbe.config.DB_PATH", db_path),
+            patch("gabbe.config.TASKS_FILE", tasks_file),
+            patch("gabbe.config.GABBE_POLICY_FILE", policy_file),
+            patch("gabbe.policy.GABBE_POLICY_FILE", policy_file),
+            patch("gabbe.database.GABBE_DIR", gabbe_dir),
+            patch("gabbe.database.DB_PATH", db_path),
+            patch("gabbe.sync.TASKS_FILE", tasks_file),
+            patch("gabbe.audit.GABBE_DIR", gabbe_dir),
+        ]
+        with contextlib.ExitStack() as stack:
+            for p in patches:
+                stack.enter_context(p)
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                gabbe.database.init_db()
+            try:
+                yield root
+            finally:
+                gabbe.database.close_connections()
+
+
+class _StubChatHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        server = self.server
+        if server.response_delay:
+            time.sleep(server.response_delay)
+        body = json.dumps({
+            "model": request.get("model", "stub"),
+            "choices": [{"message": {"role": "assistant", "content": "ok"}}],
+            "usage": {"prompt_tokens": 8, "completion_tokens": 1, "total_tokens": 9},
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class _StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, connect_delay, response_delay):
+        self.connect_delay = connect_delay
+        self.response_delay = response_delay
+        self.connections = 0
+        super().__init__(("127.0.0.1", 0), _StubChatHandler)
+
+    def finish_request(self, request, client_address):
+        self.connections += 1
+        # Stand-in for the TCP + TLS handshake round trips of a remote API.
+        if self.connect_delay:
+            time.sleep(self.connect_delay)
+        super().finish_request(request, client_address)
+
+
+@contextlib.contextmanager
+def stub_openai_server(connect_delay_ms=0.0, response_delay_ms=0.0):
+    """Serve a minimal OpenAI-compatible ``/v1/chat/completions`` on localhost.
+
+    Yields ``(url, server)``; ``server.connections`` counts accepted sockets.
+    *connect_delay_ms* is paid once per new connection, emulating handshake cost.
+    """
+    server = _StubServer(connect_delay_ms / 1000.0, response_delay_ms / 1000.0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}/v1/chat/completions", server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def rate(count, seconds):
+    return count / seconds if seconds > 0 else float("inf")
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of *samples* (pct in 0-100)."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    k = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[k]
+
+
+def summarize_latencies(samples_ms):
+    return {
+        "p50": percentile(samples_ms, 50),
+        "p99": percentile(samples_ms, 99),
+        "mean": statistics.fmean(samples_ms) if samples_ms else 0.0,
+    }
+
+
+class Timer:
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
+        return False
+
+
+def print_table(title, header, rows):
+    print(f"\n{title}")
+    widths = [max(len(str(c)) for c in col) for col in zip(header, *rows)]
+    fmt = "  ".join(f"{{:<{w}}}" for w in widths)
+    print(fmt.format(*header))
+    print("  ".join("-" * w for w in widths))
+    for row in rows:
+        print(fmt.format(*row))
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""Benchmark SQLite write paths: per-call connections vs the pooled WAL manager.
+
+"before" replays the pre-pool access pattern with raw sqlite3: a fresh
+connection per helper call, rollback journal, synchronous=FULL, and an
+INSERT + commit per span. "after" drives the real AuditTracer / RunContext
+code, which now sits on ``gabbe.database.db_connection``; "after+async" adds
+the batched SpanWriter (GABBE_AUDIT_ASYNC).
+
+Usage:
+    python scripts/benchmarks/bench_database.py [--spans N] [--runs N] [--threads N]
+"""
+import argparse
+import json
+import sqlite3
+import threading
+import uuid
+
+from _common import Timer, print_table, rate, temp_project
+
+_SPAN_SQL = """
+    INSERT INTO audit_spans
+    (run_id, span_id, parent_span_id, timestamp, event_type, node_name,
+     input_data, output_data, reasoning_content, model_name,
+     prompt_tokens, completion_tokens, reasoning_tokens, cache_hit_tokens,
+     cost_usd, duration_ms, status, metadata)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+def _legacy_connect(db_path):
+    conn = sqlite3.connect(str(db_path))
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def _legacy_spans(db_path, count, errors):
+    conn = _legacy_connect(db_path)
+    try:
+        for i in range(count):
+            try:
+                conn.execute(_SPAN_SQL, (
+                    "bench", uuid.uuid4().hex[:16], None, "2026-01-01T00:00:00",
+                    "tool_call", f"node_{i}", json.dumps({"i": i}), json.dumps({"ok": True}),
+                    None, None, 0, 0, 0, 0, 0.0, 1.0, "ok", None,
+                ))
+                conn.commit()
+            except sqlite3.OperationalError:
+                errors.append(1)
+    finally:
+        conn.close()
+
+
+def _legacy_runs(db_path, count, errors):
+    for _ in range(count):
+        try:
+            # Budget._load_prices opened and closed its own connection ...
+            conn = _legacy_connect(db_path)
+            conn.execute("SELECT * FROM pricing_registry").fetchall()
+            conn.close()
+            # ... and RunContext opened another for the lifetime of the run.
+            conn = _legacy_connect(db_path)
+            run_id = str(uuid.uuid4())
+            conn.execute(
+                "INSERT INTO runs (id, command, status, initiator, agent_persona, config_snapshot) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (run_id, "bench", "running", "bench", None, "{}"),
+            )
+            conn.commit()
+            conn.execute(
+                "UPDATE runs SET ended_at = CURRENT_TIMESTAMP, status = ?, stop_reason = ?, "
+                "total_tokens_used = ?, total_cost_usd = ? WHERE id = ?",
+                ("completed", "success", 0, 0.0, run_id),
+            )
+            conn.commit()
+            conn.close()
+        except sqlite3.OperationalError:
+            errors.append(1)
+
+
+def _pooled_spans(count, errors, async_writes=False):
+    from gabbe.audit import AuditTracer
+    tracer = AuditTracer("bench", async_writes=async_writes)
+    for i in range(count):
+        try:
+            span = tracer.start_span("tool_call", f"node_{i}", {"i": i})
+            tracer.end_span(span, output_data={"ok": True})
+        except sqlite3.OperationalError:
+            errors.append(1)
+    tracer.close()
+
+
+def _pooled_runs(count, errors):
+    from gabbe.context import RunContext
+    for _ in range(count):
+        try:
+            with RunContext(command="bench", initiator="bench"):
+                pass
+        except sqlite3.OperationalError:
+            errors.append(1)
+
+
+def _run_threads(target, threads, per_thread, *args):
+    errors = []
+    workers = [
+        threading.Thread(target=target, args=(*args, per_thread, errors))
+        for _ in range(threads)
+    ]
+    with Timer() as t:
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+    return t.elapsed, len(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--spans", type=int, default=2000, help="spans per thread")
+    parser.add_argument("--runs", type=int, default=300, help="runs per thread")
+    parser.add_argument("--threads", type=int, default=4, help="concurrent writer threads")
+    args = parser.parse_args()
+
+    import logging
+    logging.disable(logging.INFO)
+
+    rows = []
+    for label, threads in (("1 thread", 1), (f"{args.threads} threads", args.threads)):
+        with temp_project() as root:
+            db_path = root / "project" / "state.db"
+            legacy = sqlite3.connect(str(db_path))
+            legacy.execute("PRAGMA journal_mode = DELETE")
+            legacy.close()
+
+            spans_t, spans_err = _run_threads(_legacy_spans, threads, args.spans, db_path)
+            runs_t, runs_err = _run_threads(_legacy_runs, threads, args.runs, db_path)
+            rows.append(("before", label,
+                         f"{rate(threads * args.spans, spans_t):,.0f}",
+                         f"{rate(threads * args.runs, runs_t):,.0f}",
+                         spans_err + runs_err))
+
+        with temp_project():
+            spans_t, spans_err = _run_threads(lambda n, e: _pooled_spans(n, e), threads, args.spans)
+            runs_t, runs_err = _run_threads(lambda n, e: _pooled_runs(n, e), threads, args.runs)
+            rows.append(("after", label,
+                         f"{rate(threads * args.spans, spans_t):,.0f}",
+                         f"{rate(threads * args.runs, runs_t):,.0f}",
+                         spans_err + runs_err))
+
+        with temp_project():
+            spans_t, spans_err = _run_threads(lambda n, e: _pooled_spans(n, e, True), threads, args.spans)
+            rows.append(("after+async", label,
+                         f"{rate(threads * args.spans, spans_t):,.0f}", "-", spans_err))
+
+    print_table(
+        "SQLite write throughput (before: per-call connect + rollback journal; after: pooled WAL)",
+        ("mode", "concurrency", "spans/sec", "runs/sec", "lock errors"),
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""Benchmark per-call ToolGateway overhead with 1, 10 and 100 registered tools.
+
+Each call goes through ``ToolGateway.execute`` with a no-op handler, so the
+time is the gateway itself: policy, budget, rate limit, circuit breaker,
+argument validation and the audit span. "validate" isolates the argument
+check:
+
+- "fast path": the hand-rolled validator compiled at register() for flat schemas
+- "jsonschema": a rich schema compiled once with jsonschema (if installed)
+- "per-call": the old ``jsonschema.validate(...)`` on every call (if installed)
+
+With ``--shared``, rate-limit and breaker state go through a SQLite state
+file (``GABBE_TOOL_STATE_FILE``) instead of memory, i.e. two small
+transactions per call.
+
+Usage:
+    python scripts/benchmarks/bench_gateway.py [--calls N] [--tools 1,10,100] [--shared]
+"""
+import argparse
+import os
+
+from _common import Timer, print_table, temp_project
+
+from gabbe.schema import HAS_JSONSCHEMA
+
+SIMPLE = {
+    "type": "object",
+    "properties": {
+        "command": {"type": "string"},
+        "timeout": {"type": "integer"},
+        "cwd": {"type": ["string", "null"]},
+    },
+    "required": ["command"],
+    "additionalProperties": False,
+}
+RICH = {
+    "type": "object",
+    "properties": {
+        "command": {"type": "string", "minLength": 1},
+        "timeout": {"type": "integer", "minimum": 1, "maximum": 600},
+        "cwd": {"type": ["string", "null"]},
+    },
+    "required": ["command"],
+    "additionalProperties": False,
+}
+ARGS = {"command": "pytest -q", "timeout": 30, "cwd": None}
+
+
+def _noop(**kwargs):
+    return "ok"
+
+
+def _variants():
+    yield "none", {}, None
+    yield "fast path", SIMPLE, None
+    if HAS_JSONSCHEMA:
+        import jsonschema
+
+        def per_call(arguments):
+            try:
+                jsonschema.validate(instance=arguments, schema=RICH)
+            except jsonschema.ValidationError as e:
+                raise ValueError(f"Argument validation failed: {e.message}")
+
+        yield "jsonschema", RICH, None
+        yield "per-call", RICH, per_call
+
+
+def _measure(n_tools, schema, override, calls, shared):
+    from gabbe.budget import Budget
+    from gabbe.context import RunContext
+    from gabbe.gateway import ToolDefinition, ToolGateway
+    from gabbe.limits import MemoryLimitStore, SQLiteLimitStore
+    from gabbe.policy import PolicyEngine, ToolAllowlistPolicy
+
+    policy = PolicyEngine([ToolAllowlistPolicy(["*"], [])])
+    budget = Budget(max_tool_calls=calls + 1)
+    store = (SQLiteLimitStore(os.path.join(shared, f"limits-{n_tools}.db"))
+             if shared else MemoryLimitStore())
+    gateway = ToolGateway(store)
+    with RunContext(command="bench-gateway", policy=policy, budget=budget, gateway=gateway) as ctx:
+        names = [f"tool_{i}" for i in range(n_tools)]
+        for name in names:
+            ctx.gateway.register(ToolDefinition(
+                name, "", schema, _noop, {"bench"}, rate_limit_per_min=calls * 2,
+            ))
+            if override is not None:
+                ctx.gateway.registry[name].validator = override
+        validator = ctx.gateway.registry[names[0]].validator
+        with Timer() as t:
+            for i in range(calls):
+                ctx.gateway.execute(names[i % n_tools], ARGS, "bench", ctx)
+        validate_us = 0.0
+        if validator is not None:
+            with Timer() as v:
+                for _ in range(calls):
+                    validator(ARGS)
+            validate_us = v.elapsed / calls * 1e6
+    return t.elapsed / calls * 1e6, validate_us
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=2000, help="execute() calls per case")
+    parser.add_argument("--tools", default="1,10,100", help="comma-separated registry sizes")
+    parser.add_argument("--shared", action="store_true", help="keep limit state in a SQLite file")
+    args = parser.parse_args()
+
+    rows = []
+    with temp_project() as root:
+        shared = str(root) if args.shared else None
+        for n_tools in (int(n) for n in args.tools.split(",")):
+            for label, schema, override in _variants():
+                call_us, validate_us = _measure(n_tools, schema, override, args.calls, shared)
+                rows.append((n_tools, label, f"{call_us:,.1f}", f"{validate_us:,.2f}"))
+    if not HAS_JSONSCHEMA:
+        print("jsonschema is not installed: only the fast path and no-schema cases are shown.")
+    print_table(
+        "ToolGateway.execute overhead (us per call, no-op handler)",
+        ("tools", "validation", "execute", "validate"),
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    main()
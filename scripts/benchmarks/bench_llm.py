@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""Benchmark LLM call latency: requests.post per call vs the pooled session.
+
+Both modes drive ``gabbe.llm._call_with_retry`` against a local stub
+OpenAI-compatible server. "before" patches the transport back to a bare
+``requests.post`` (new TCP connection per call); "after" uses the module's
+pooled keep-alive session. ``--connect-delay-ms`` makes the stub charge a
+fixed cost per new connection, standing in for TCP + TLS setup to a remote
+endpoint.
+
+Usage:
+    python scripts/benchmarks/bench_llm.py [--calls N] [--threads N] [--connect-delay-ms MS]
+"""
+import argparse
+import threading
+import time
+from unittest.mock import patch
+
+import requests
+
+from _common import Timer, print_table, rate, stub_openai_server, summarize_latencies
+
+
+def _worker(calls, samples, connects):
+    import gabbe.llm as llm
+    for _ in range(calls):
+        metrics = {}
+        start = time.perf_counter()
+        content, _ = llm._call_with_retry("ping", "sys", 0, 10, metrics=metrics)
+        samples.append((time.perf_counter() - start) * 1000)
+        connects.append(metrics.get("connect_ms", 0.0))
+        if content is None:
+            raise RuntimeError("stub server call failed")
+
+
+def _measure(threads, calls):
+    samples, connects = [], []
+    workers = [
+        threading.Thread(target=_worker, args=(calls, samples, connects))
+        for _ in range(threads)
+    ]
+    with Timer() as t:
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+    return samples, connects, t.elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=300, help="calls per thread")
+    parser.add_argument("--threads", type=int, default=4, help="concurrent callers")
+    parser.add_argument("--connect-delay-ms", type=float, default=15.0,
+                        help="simulated handshake cost per new connection")
+    parser.add_argument("--response-delay-ms", type=float, default=2.0,
+                        help="simulated server processing time per request")
+    args = parser.parse_args()
+
+    import logging
+    logging.disable(logging.WARNING)
+    import gabbe.llm as llm
+
+    rows = []
+    for label, threads in (("1 thread", 1), (f"{args.threads} threads", args.threads)):
+        for mode in ("before", "after"):
+            with stub_openai_server(args.connect_delay_ms, args.response_delay_ms) as (url, server), \
+                 patch("gabbe.llm.GABBE_API_KEY", "bench-key"), \
+                 patch("gabbe.llm.GABBE_API_URL", url):
+                llm.close_session()
+                if mode == "before":
+                    with patch("gabbe.llm._post", requests.post):
+                        samples, connects, elapsed = _measure(threads, args.calls)
+                else:
+                    samples, connects, elapsed = _measure(threads, args.calls)
+                llm.close_session()
+                stats = summarize_latencies(samples)
+                rows.append((
+                    mode, label,
+                    f"{stats['p50']:.2f}", f"{stats['p99']:.2f}",
+                    f"{rate(len(samples), elapsed):,.0f}",
+                    server.connections,
+                ))
+
+    print_table(
+        f"LLM call latency in ms (stub server, {args.connect_delay_ms:g}ms per new connection)",
+        ("mode", "concurrency", "p50", "p99", "calls/sec", "connections"),
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""Load-test ``gabbe serve-mcp``: requests/sec and latency percentiles.
+
+Starts the MCP server as a subprocess in a throw-away project and drives it
+from a local client over stdin/stdout. The client pipelines every
+``tools/call`` request (``run_command`` with ``--command``, by default a
+short ``sleep`` standing in for a slow tool), matches responses by ``id``
+and times each one from send to response.
+
+Each ``--concurrency`` value sets ``GABBE_MCP_MAX_CONCURRENCY`` for one
+server; 1 is equivalent to the old loop that handled one request at a time.
+
+Usage:
+    python scripts/benchmarks/bench_mcp.py [--requests N] [--concurrency 1,8,32]
+                                           [--command "sleep 0.02"]
+"""
+import argparse
+import json
+import os
+import shlex
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+from _common import print_table, rate, summarize_latencies, temp_project
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+SERVER = "import sys; from gabbe.main import main; sys.argv = ['gabbe', 'serve-mcp']; main()"
+
+
+def _request(req_id, method, params=None):
+    return json.dumps({"jsonrpc": "2.0", "id": req_id, "method": method, "params": params or {}}) + "\n"
+
+
+def _measure(root, concurrency, requests, command):
+    env = dict(
+        os.environ,
+        PYTHONPATH=str(REPO_ROOT),
+        GABBE_MCP_MAX_CONCURRENCY=str(concurrency),
+        GABBE_MCP_ALLOWED_COMMANDS=shlex.split(command)[0],
+        GABBE_MCP_RATE_LIMIT_PER_MIN=str(requests * 100),
+        GABBE_MAX_TOOL_CALLS_PER_RUN=str(requests * 2),
+        GABBE_MAX_WALL_TIME="3600",
+    )
+    env.pop("GABBE_MCP_TOKEN", None)
+    proc = subprocess.Popen(
+        [sys.executable, "-c", SERVER], cwd=root, env=env, text=True,
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+    )
+    sent, latencies_ms, errors = {}, [], []
+    done = threading.Event()
+
+    def read():
+        for line in proc.stdout:
+            reply = json.loads(line)
+            if reply.get("id") in sent:
+                latencies_ms.append((time.perf_counter() - sent.pop(reply["id"])) * 1000)
+                if "error" in reply:
+                    errors.append(reply["error"])
+                if len(latencies_ms) == requests:
+                    done.set()
+                    return
+
+    proc.stdin.write(_request(0, "initialize"))
+    proc.stdin.flush()
+    assert "result" in json.loads(proc.stdout.readline())
+    reader = threading.Thread(target=read, daemon=True)
+    reader.start()
+
+    start = time.perf_counter()
+    for i in range(1, requests + 1):
+        sent[i] = time.perf_counter()
+        proc.stdin.write(_request(i, "tools/call", {"name": "run_command",
+                                                   "arguments": {"command": command}}))
+        proc.stdin.flush()
+    finished = done.wait(timeout=600)
+    elapsed = time.perf_counter() - start
+    proc.stdin.close()
+    proc.wait(timeout=60)
+    if not finished:
+        raise RuntimeError(f"only {len(latencies_ms)}/{requests} responses received")
+    if errors:
+        raise RuntimeError(f"{len(errors)} requests failed, e.g. {errors[0]}")
+    return elapsed, latencies_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200, help="tools/call requests per server")
+    parser.add_argument("--concurrency", default="1,8,32", help="comma-separated GABBE_MCP_MAX_CONCURRENCY values")
+    parser.add_argument("--command", default="sleep 0.02", help="run_command to execute per request")
+    args = parser.parse_args()
+
+    rows = []
+    with temp_project() as root:
+        for concurrency in (int(c) for c in args.concurrency.split(",")):
+            elapsed, samples = _measure(root, concurrency, args.requests, args.command)
+            stats = summarize_latencies(samples)
+            rows.append((
+                concurrency, args.requests, f"{rate(args.requests, elapsed):,.1f}",
+                f"{stats['p50']:,.1f}", f"{stats['p99']:,.1f}", f"{max(samples):,.1f}",
+            ))
+    print_table(
+        f"serve-mcp under load ({args.command!r} per request, all requests pipelined)",
+        ("concurrency", "requests", "req/s", "p50 ms", "p99 ms", "max ms"),
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""Benchmark PII detection: five separate regex searches vs gabbe.pii.
+
+"before" replays the old ``detect_pii`` loop: each of the original five
+patterns is searched in turn over the whole prompt. "after" is
+``gabbe.pii.scan`` (pre-filter + one combined regex), first on a cold cache
+and then again on the same content (served from the content-hash cache).
+"stream" feeds the same prompt through ``PIIStreamScanner`` in 4 KB chunks.
+
+Each size is measured for a clean prompt (code and prose, no PII: the
+common case, and the worst case for the old loop) and a prompt whose only
+PII is at the very end.
+
+Usage:
+    python scripts/benchmarks/bench_pii.py [--sizes 100K,1M,10M] [--repeat N]
+"""
+import argparse
+import re
+
+from _common import Timer, print_table
+
+from gabbe.pii import PIIStreamScanner, clear_cache, scan
+
+_LEGACY_PATTERNS = [
+    re.compile(r"[\w\.-]+@[\w\.-]+\.[a-zA-Z]{2,}"),
+    re.compile(r"\b\d{3}[-.\s]\d{3}[-.\s]\d{4}\b"),
+    re.compile(r"\b\d{3}-\d{2}-\d{4}\b"),
+    re.compile(r"\b(?:\d{4}[-\s]?){3}\d{4}\b"),
+    re.compile(r"(?i)\b(?:password|passwd|api[_\-]?key|secret|token)\s*[:=]\s*\S+"),
+]
+
+_FILLER = (
+    "def handle(request, retries=3):\n"
+    "    # Retry the upstream call; give up after `retries` attempts.\n"
+    "    for attempt in range(retries):\n"
+    "        response = session.get(url, timeout=30)\n"
+    "        if response.status_code == 200:\n"
+    "            return response.json()\n"
+    "The scheduler assigns 24 workers to queue 7 and rebalances every 15 minutes.\n"
+)
+
+
+def _parse_size(text):
+    units = {"K": 1024, "M": 1024 * 1024}
+    text = text.strip().upper()
+    return int(float(text[:-1]) * units[text[-1]]) if text[-1] in units else int(text)
+
+
+def _corpus(size, dirty):
+    text = (_FILLER * (size // len(_FILLER) + 1))[:size]
+    return text + " contact: ops@example.com" if dirty else text
+
+
+def _legacy(text):
+    return any(p.search(text) for p in _LEGACY_PATTERNS)
+
+
+def _stream(text, chunk=4096):
+    scanner = PIIStreamScanner()
+    for i in range(0, len(text), chunk):
+        scanner.feed(text[i:i + chunk])
+    scanner.close()
+    return scanner.found
+
+
+def _time(fn, text, repeat, before=None):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        if before:
+            before()
+        with Timer() as t:
+            result = fn(text)
+        best = min(best, t.elapsed)
+    return best * 1000, bool(result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="100K,1M,10M", help="comma-separated prompt sizes")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per case (best is reported)")
+    args = parser.parse_args()
+
+    rows = []
+    for label in args.sizes.split(","):
+        size = _parse_size(label)
+        for dirty in (False, True):
+            text = _corpus(size, dirty)
+            before_ms, before_hit = _time(_legacy, text, args.repeat)
+            cold_ms, cold_hit = _time(scan, text, args.repeat, before=clear_cache)
+            warm_ms, _ = _time(scan, text, args.repeat)
+            stream_ms, stream_hit = _time(_stream, text, args.repeat)
+            assert before_hit == cold_hit == stream_hit == dirty
+            rows.append((
+                label, "PII at end" if dirty else "clean",
+                f"{before_ms:,.1f}", f"{cold_ms:,.1f}", f"{warm_ms:,.2f}", f"{stream_ms:,.1f}",
+                f"{before_ms / cold_ms:,.1f}x",
+            ))
+
+    print_table(
+        "PII detection time in ms (before: 5 separate searches; after: gabbe.pii)",
+        ("size", "prompt", "before", "after cold", "after cached", "stream 4KB", "speedup"),
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""Benchmark dashboard reads: aggregating tasks/runs vs the v7 summary tables.
+
+"before" runs the queries ``gabbe status``, ``gabbe forecast`` and
+``gabbe brain activate`` used to issue (``GROUP BY status`` over tasks,
+``SUM`` over runs). "after" reads ``task_status_counts`` and
+``run_totals`` through ``gabbe.database``. The write side is timed too:
+inserting the tasks with the counting triggers in place vs dropped.
+
+Usage:
+    python scripts/benchmarks/bench_summary_stats.py [--sizes 100000,1000000] [--repeat 20]
+"""
+import argparse
+import contextlib
+import os
+
+from _common import Timer, print_table, summarize_latencies, temp_project
+
+
+def _before(conn):
+    c = conn.cursor()
+    c.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status")
+    counts = dict(c.fetchall())
+    c.execute("SELECT SUM(total_cost_usd), SUM(total_tokens_used) FROM runs")
+    return counts, c.fetchone()
+
+
+def _after(conn):
+    from gabbe.database import run_totals, task_status_counts
+
+    c = conn.cursor()
+    return task_status_counts(c), run_totals(c)
+
+
+def _insert(conn, n):
+    with Timer() as t:
+        conn.executemany(
+            "INSERT INTO tasks (title, status) VALUES (?, ?)",
+            ((f"Task {i:07d}", ("TODO", "IN_PROGRESS", "DONE")[i % 3]) for i in range(n)),
+        )
+        conn.executemany(
+            "INSERT INTO runs (id, total_cost_usd, total_tokens_used) VALUES (?, ?, ?)",
+            ((f"run-{i}", 0.001 * (i % 7), i % 1000) for i in range(n // 10)),
+        )
+        conn.commit()
+    return t.elapsed
+
+
+def _measure(n, repeat):
+    from gabbe.database import db_connection
+
+    results = {}
+    with temp_project(), open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        with db_connection() as conn:
+            results["insert", "after"] = _insert(conn, n)
+            for label, read in (("before", _before), ("after", _after)):
+                samples = []
+                for _ in range(repeat):
+                    with Timer() as t:
+                        read(conn)
+                    samples.append(t.elapsed * 1000)
+                results["read", label] = summarize_latencies(samples)
+            assert _before(conn)[0] == _after(conn)[0]
+    with temp_project(), open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        with db_connection() as conn:
+            for name in ("insert", "update", "delete"):
+                conn.execute(f"DROP TRIGGER trg_task_status_counts_{name}")
+                conn.execute(f"DROP TRIGGER trg_run_totals_{name}")
+            results["insert", "before"] = _insert(conn, n)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="100000,1000000", help="comma-separated task counts (runs are 1/10)")
+    parser.add_argument("--repeat", type=int, default=20, help="reads per variant")
+    args = parser.parse_args()
+
+    reads, writes = [], []
+    for n in (int(s) for s in args.sizes.split(",")):
+        results = _measure(n, args.repeat)
+        for label in ("before", "after"):
+            stats = results["read", label]
+            reads.append((f"{n:,}", label, f"{stats['p50']:,.3f}", f"{stats['p99']:,.3f}"))
+            writes.append((f"{n:,}", label, f"{results['insert', label] * 1000:,.0f}"))
+    print_table("Dashboard read (task counts + run totals)", ("tasks", "variant", "p50 ms", "p99 ms"), reads)
+    print_table("Bulk insert of tasks and runs (before: no counting triggers)",
+                ("tasks", "variant", "ms"), writes)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""Benchmark TASKS.md import: per-row round trips vs the set-based upsert.
+
+"before" replays the old ``import_from_md`` loop (a SELECT per task, then an
+UPDATE or INSERT, hashing every row). "after" is the current
+``gabbe.sync.import_from_md``: one ``executemany`` into a temp table and one
+``INSERT ... ON CONFLICT(title) DO UPDATE``. Each size is measured twice:
+"bootstrap" imports into an empty table, "resync" re-imports the same tasks
+with 10% of the statuses flipped.
+
+A second table times ``gabbe sync`` itself on a ``--sync-tasks`` line
+TASKS.md: "full" forgets the persisted sync state before every run, which
+is what every sync used to do; "incremental" keeps it.
+
+Usage:
+    python scripts/benchmarks/bench_sync.py [--sizes 1000,10000,100000,1000000]
+                                            [--legacy-max 100000] [--sync-tasks 50000]
+"""
+import argparse
+import contextlib
+import hashlib
+import os
+from datetime import datetime
+
+from _common import Timer, print_table, rate, temp_project
+
+
+def _tasks(n, flip_every=0):
+    tasks = []
+    for i in range(n):
+        status = "DONE" if i % 3 == 0 else "TODO"
+        if flip_every and i % flip_every == 0:
+            status = "TODO" if status == "DONE" else "DONE"
+        title = f"Task {i:07d}"
+        tasks.append({"title": title, "status": status,
+                      "hash": hashlib.sha256(f"{title}|{status}".encode()).hexdigest()})
+    return tasks
+
+
+def _legacy_import(c, tasks):
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    for t in tasks:
+        c.execute("SELECT id, title, status FROM tasks WHERE title = ?", (t["title"],))
+        row = c.fetchone()
+        if row:
+            db_id, db_title, db_status = row
+            if t["hash"] != hashlib.sha256(f"{db_title}|{db_status}".encode()).hexdigest():
+                c.execute("UPDATE tasks SET status = ?, updated_at = ? WHERE id = ?",
+                          (t["status"], now, db_id))
+        else:
+            c.execute("INSERT INTO tasks (title, status, updated_at) VALUES (?, ?, ?)",
+                      (t["title"], t["status"], now))
+
+
+def _measure(import_fn, n):
+    """Seconds for a bootstrap import of *n* tasks and for a 10%-changed resync."""
+    from gabbe.database import db_connection
+
+    first, second = _tasks(n), _tasks(n, flip_every=10)
+    timings = []
+    with temp_project(), db_connection() as conn, \
+            open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for tasks in (first, second):
+            with Timer() as t:
+                import_fn(conn.cursor(), tasks)
+                conn.commit()
+            timings.append(t.elapsed)
+        count = conn.execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+    assert count == n, (count, n)
+    return timings
+
+
+def _sync_once(full):
+    from gabbe.database import db_connection
+    from gabbe.sync import sync_tasks
+
+    if full:
+        with db_connection() as conn:
+            conn.execute("DELETE FROM project_state WHERE key LIKE 'tasks_sync_%'")
+    with Timer() as t:
+        sync_tasks()
+    return t.elapsed
+
+
+def _measure_sync(n, full):
+    """Seconds for a no-op sync and for a sync after a one-line edit."""
+    import gabbe.sync
+
+    with temp_project(), open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        path = gabbe.sync.TASKS_FILE
+        path.write_text("# Project Tasks\n\n" + "".join(f"- [ ] Task {i:07d}\n" for i in range(n)))
+        _sync_once(full=True)
+        noop = _sync_once(full)
+        path.write_text(path.read_text().replace(f"- [ ] Task {n // 2:07d}", f"- [x] Task {n // 2:07d}"))
+        st = os.stat(path)
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 2_000_000_000))
+        edit = _sync_once(full)
+    return noop, edit
+
+
+def main():
+    from gabbe.sync import import_from_md
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1000,10000,100000,1000000", help="comma-separated task counts")
+    parser.add_argument("--legacy-max", type=int, default=100000,
+                        help="skip the per-row loop above this many tasks (it is slow)")
+    parser.add_argument("--sync-tasks", type=int, default=50000, help="TASKS.md size for the sync table")
+    args = parser.parse_args()
+
+    rows = []
+    for n in (int(s) for s in args.sizes.split(",")):
+        variants = [("after", import_from_md)]
+        if n <= args.legacy_max:
+            variants.insert(0, ("before", _legacy_import))
+        for label, fn in variants:
+            bootstrap, resync = _measure(fn, n)
+            rows.append((
+                f"{n:,}", label,
+                f"{bootstrap * 1000:,.0f}", f"{rate(n, bootstrap):,.0f}",
+                f"{resync * 1000:,.0f}", f"{rate(n, resync):,.0f}",
+            ))
+    print_table(
+        "import_from_md: per-row loop vs set-based upsert",
+        ("tasks", "variant", "bootstrap ms", "tasks/s", "resync ms", "tasks/s"),
+        rows,
+    )
+
+    rows = []
+    for label, full in (("full", True), ("incremental", False)):
+        noop, edit = _measure_sync(args.sync_tasks, full)
+        rows.append((label, f"{noop * 1000:,.1f}", f"{edit * 1000:,.1f}"))
+    print_table(
+        f"gabbe sync on a {args.sync_tasks:,}-task TASKS.md",
+        ("variant", "no-op ms", "one-line edit ms"),
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""Benchmark task queries with and without the schema v6 indexes.
+
+The tasks table is filled from a nested, tagged TASKS.md by ``gabbe sync``
+(its time is reported too). Every fifth task is a subtask and every tenth
+is tagged ``#ops``. "before" drops ``idx_tasks_status`` and
+``idx_tasks_parent`` and finds tags with ``LIKE`` on ``tasks.tags``, as a
+query had to without ``task_tags``; "after" uses the indexes.
+
+Usage:
+    python scripts/benchmarks/bench_task_model.py [--sizes 100000,1000000] [--repeat 20]
+"""
+import argparse
+import contextlib
+import os
+
+from _common import Timer, print_table, summarize_latencies, temp_project
+
+QUERIES = {
+    "status counts": (
+        "SELECT status, COUNT(*) FROM tasks GROUP BY status",
+        "SELECT status, COUNT(*) FROM tasks GROUP BY status",
+    ),
+    "tasks tagged #ops": (
+        """SELECT COUNT(*) FROM tasks WHERE tags LIKE '%"ops"%'""",
+        "SELECT COUNT(*) FROM task_tags WHERE tag = 'ops'",
+    ),
+    "subtasks of one task": (
+        "SELECT title FROM tasks WHERE parent_id = ?",
+        "SELECT title FROM tasks WHERE parent_id = ?",
+    ),
+}
+
+
+def _tasks_md(n):
+    lines = ["# Project Tasks", ""]
+    for i in range(n):
+        indent = "  " if i % 5 else ""
+        tag = " #ops" if i % 10 == 0 else ""
+        lines.append(f"{indent}- [{'x' if i % 3 == 0 else ' '}] Task {i:07d}{tag} <!-- id:{i} -->")
+    return "\n".join(lines) + "\n"
+
+
+def _time_query(conn, sql, params, repeat):
+    samples = []
+    for _ in range(repeat):
+        with Timer() as t:
+            conn.execute(sql, params).fetchall()
+        samples.append(t.elapsed * 1000)
+    return summarize_latencies(samples)
+
+
+def _measure(n, repeat):
+    import gabbe.sync
+    from gabbe.database import db_connection
+
+    results = {}
+    with temp_project(), open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        gabbe.sync.TASKS_FILE.write_text(_tasks_md(n))
+        with Timer() as t:
+            gabbe.sync.sync_tasks()
+        sync_seconds = t.elapsed
+        with db_connection() as conn:
+            parent = conn.execute("SELECT id FROM tasks WHERE title = 'Task 0000005'").fetchone()[0]
+            for label, index in (("after", 1), ("before", 0)):
+                if label == "before":
+                    conn.execute("DROP INDEX idx_tasks_status")
+                    conn.execute("DROP INDEX idx_tasks_parent")
+                for name, variants in QUERIES.items():
+                    sql = variants[index]
+                    params = (parent,) if "?" in sql else ()
+                    results[(name, label)] = _time_query(conn, sql, params, repeat)
+            conn.rollback()
+    return sync_seconds, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="100000,1000000", help="comma-separated task counts")
+    parser.add_argument("--repeat", type=int, default=20, help="runs of each query")
+    args = parser.parse_args()
+
+    rows, syncs = [], []
+    for n in (int(s) for s in args.sizes.split(",")):
+        sync_seconds, results = _measure(n, args.repeat)
+        syncs.append((f"{n:,}", f"{sync_seconds * 1000:,.0f}"))
+        for name in QUERIES:
+            for label in ("before", "after"):
+                stats = results[(name, label)]
+                rows.append((f"{n:,}", name, label, f"{stats['p50']:,.2f}", f"{stats['p99']:,.2f}"))
+    print_table("Task queries: full scans vs schema v6 indexes",
+                ("tasks", "query", "variant", "p50 ms", "p99 ms"), rows)
+    print_table("gabbe sync bootstrap of a nested, tagged TASKS.md", ("tasks", "ms"), syncs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""Benchmark TASKS.md parsing and export: whole-file strings vs streaming.
+
+"before" replays the string-based code: ``read_text()`` +
+``parse_markdown_tasks()`` for parsing, and ``fetchall()`` + one big string
++ ``_atomic_write`` for export. "after" is ``iter_markdown_tasks()`` and
+the streaming ``export_to_md()``. The file has a preamble and a postamble
+around the marked task section, so the export has to splice.
+
+Peak memory is the tracemalloc high-water mark of the Python heap during
+the operation (a separate run from the timing, which tracemalloc slows).
+
+Usage:
+    python scripts/benchmarks/bench_tasks_md.py [--sizes 10000,100000,1000000]
+"""
+import argparse
+import contextlib
+import os
+import tracemalloc
+
+from _common import Timer, print_table, temp_project
+
+PREAMBLE = "# Project Tasks\n\nNotes that must survive an export.\n\n"
+POSTAMBLE = "\n## Done log\n\nMore notes.\n"
+
+
+def _legacy_parse(path):
+    from gabbe.sync import parse_markdown_tasks
+
+    return len(parse_markdown_tasks(path.read_text(encoding="utf-8")))
+
+
+def _streaming_parse(path):
+    from gabbe.sync import iter_markdown_tasks
+
+    return sum(1 for _ in iter_markdown_tasks(path))
+
+
+def _legacy_export(c, path):
+    from gabbe.sync import _MARKER_END, _MARKER_START, _atomic_write, _generate_task_lines
+
+    c.execute("SELECT * FROM tasks ORDER BY id")
+    lines = _generate_task_lines(c.fetchall())
+    content = path.read_text(encoding="utf-8")
+    start = content.find(_MARKER_START) + len(_MARKER_START)
+    end = content.find(_MARKER_END)
+    _atomic_write(path, content[:start] + "\n" + lines + "\n" + content[end:])
+
+
+def _streaming_export(c, path):
+    from gabbe.sync import export_to_md
+
+    export_to_md(c)
+
+
+def _run(fn, *args, trace):
+    if trace:
+        tracemalloc.start()
+    try:
+        with Timer() as t:
+            fn(*args)
+        peak = tracemalloc.get_traced_memory()[1] if trace else 0
+    finally:
+        if trace:
+            tracemalloc.stop()
+    return t.elapsed, peak
+
+
+def _measure(n):
+    import gabbe.sync
+    from gabbe.database import db_connection
+    from gabbe.sync import _MARKER_END, _MARKER_START
+
+    results = {}
+    with temp_project(), db_connection() as conn, \
+            open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        path = gabbe.sync.TASKS_FILE
+        conn.executemany(
+            "INSERT INTO tasks (title, status) VALUES (?, ?)",
+            ((f"Task {i:07d}", "DONE" if i % 3 == 0 else "TODO") for i in range(n)),
+        )
+        conn.commit()
+        gabbe.sync.export_to_md(conn.cursor())
+        path.write_text(PREAMBLE + path.read_text().split("\n", 2)[2] + POSTAMBLE)
+        assert path.read_text().count(_MARKER_START) == path.read_text().count(_MARKER_END) == 1
+
+        for op, before, after, args in (
+            ("parse", _legacy_parse, _streaming_parse, (path,)),
+            ("export", _legacy_export, _streaming_export, (conn.cursor(), path)),
+        ):
+            for label, fn in (("before", before), ("after", after)):
+                elapsed, _ = _run(fn, *args, trace=False)
+                _, peak = _run(fn, *args, trace=True)
+                results[(op, label)] = (elapsed, peak)
+        text = path.read_text()
+        assert text.startswith(PREAMBLE) and text.endswith(POSTAMBLE)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="comma-separated task counts")
+    args = parser.parse_args()
+
+    rows = []
+    for n in (int(s) for s in args.sizes.split(",")):
+        for (op, label), (elapsed, peak) in _measure(n).items():
+            rows.append((f"{n:,}", op, label, f"{elapsed * 1000:,.0f}", f"{peak / 1024 / 1024:,.2f}"))
+    print_table(
+        "TASKS.md parse / export: whole-file strings vs streaming",
+        ("tasks", "op", "variant", "ms", "peak MiB"),
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    main()
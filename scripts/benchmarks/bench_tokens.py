@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""Benchmark gabbe.tokens: accuracy against recorded usage, and throughput.
+
+Accuracy compares ``estimate_prompt_tokens(prompt, system_prompt)`` with the
+provider-reported ``prompt_tokens`` of every ``llm_call`` span in an audit
+database (the real ``project/state.db`` by default; it is only read). If
+``tiktoken`` is installed, a synthetic corpus is also scored against its
+cl100k_base encoding. Throughput is measured cold (memo cleared) and warm.
+
+Usage:
+    python scripts/benchmarks/bench_tokens.py [--db PATH] [--repeat N]
+"""
+import argparse
+import json
+import sqlite3
+import statistics
+from pathlib import Path
+
+from _common import Timer, percentile, print_table, rate
+
+from gabbe.tokens import _count, estimate_prompt_tokens, estimate_tokens
+
+_SYNTHETIC = [
+    "Fix the typo in README.md",
+    "Refactor the payment service so retries use exponential backoff with jitter. " * 8,
+    "def parse(line):\n    key, _, value = line.partition('=')\n    return key.strip(), value.strip()\n" * 6,
+    "SELECT id, status, COUNT(*) FROM tasks WHERE status IN ('TODO', 'DONE') GROUP BY status;",
+    "Résumé des tâches: vérifier la configuration, déployer le service, valider les métriques.",
+    "日本語のテキストとEnglish textが混在したプロンプトの例です。",
+    '{"tool": "run_command", "arguments": {"cmd": "pytest -q", "timeout": 300}}' * 4,
+]
+
+
+def _recorded_samples(db_path):
+    if not db_path.exists():
+        return []
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        rows = conn.execute(
+            "SELECT input_data, prompt_tokens FROM audit_spans "
+            "WHERE event_type = 'llm_call' AND prompt_tokens > 0 AND input_data IS NOT NULL"
+        ).fetchall()
+    except sqlite3.Error:
+        return []
+    finally:
+        conn.close()
+    samples = []
+    for input_data, prompt_tokens in rows:
+        try:
+            data = json.loads(input_data)
+        except ValueError:
+            continue
+        if isinstance(data, dict) and data.get("prompt"):
+            samples.append((data["prompt"], data.get("system_prompt"), prompt_tokens))
+    return samples
+
+
+def _accuracy_row(label, samples):
+    errors = [
+        abs(estimate_prompt_tokens(p, s) - actual) / actual for p, s, actual in samples
+    ]
+    bias = statistics.fmean(
+        (estimate_prompt_tokens(p, s) - actual) / actual for p, s, actual in samples
+    )
+    return (
+        label,
+        len(samples),
+        f"{statistics.fmean(errors) * 100:.1f}%",
+        f"{percentile(errors, 90) * 100:.1f}%",
+        f"{sum(e <= 0.10 for e in errors) / len(errors) * 100:.0f}%",
+        f"{bias * 100:+.1f}%",
+    )
+
+
+def _tiktoken_samples():
+    try:
+        import tiktoken
+    except ImportError:
+        return []
+    enc = tiktoken.get_encoding("cl100k_base")
+    # Same chat framing as estimate_prompt_tokens(): 3 per message + 3 for the reply.
+    return [(text, None, len(enc.encode(text)) + 6) for text in _SYNTHETIC]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", type=Path, default=Path("project/state.db"),
+                        help="audit database to read llm_call spans from")
+    parser.add_argument("--repeat", type=int, default=200, help="passes over the corpus")
+    args = parser.parse_args()
+
+    rows = []
+    recorded = _recorded_samples(args.db)
+    if recorded:
+        rows.append(_accuracy_row(f"recorded ({args.db})", recorded))
+    else:
+        print(f"No llm_call spans with prompt_tokens in {args.db}; skipping recorded accuracy.")
+    reference = _tiktoken_samples()
+    if reference:
+        rows.append(_accuracy_row("synthetic vs tiktoken cl100k", reference))
+    if rows:
+        print_table(
+            "Estimate accuracy (relative error vs reported prompt_tokens)",
+            ("corpus", "samples", "mean err", "p90 err", "within 10%", "bias"),
+            rows,
+        )
+
+    corpus = [p for p, _, _ in recorded] or _SYNTHETIC
+    chars = sum(len(t) for t in corpus) * args.repeat
+    with Timer() as cold:
+        for _ in range(args.repeat):
+            _count.cache_clear()
+            for text in corpus:
+                estimate_tokens(text)
+    with Timer() as warm:
+        for _ in range(args.repeat):
+            for text in corpus:
+                estimate_tokens(text)
+    calls = len(corpus) * args.repeat
+    print_table(
+        "Estimator throughput",
+        ("mode", "estimates/sec", "MB/sec"),
+        [
+            ("cold (no memo)", f"{rate(calls, cold.elapsed):,.0f}",
+             f"{rate(chars, cold.elapsed) / 1e6:,.1f}"),
+            ("warm (memoised)", f"{rate(calls, warm.elapsed):,.0f}", "-"),
+        ],
+    )
+
+
+if __name__ == "__main__":
+    main()